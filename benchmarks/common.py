@@ -0,0 +1,45 @@
+"""
+Shared setup for the benchmark scripts in this directory. Run them from the
+repository root, e.g. `python benchmarks/table_render.py`.
+
+Benchmarks that need data create a throwaway test database (like the test
+suite does) on the database configured by DJANGO_SETTINGS_MODULE.
+"""
+import os
+import sys
+import timeit
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+def setup_django(settings_module='task_time_tracker_project.settings.development'):
+    sys.path.insert(0, ROOT)
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', settings_module)
+    os.environ.setdefault('SECRET_KEY', 'benchmark')
+
+    import django
+    django.setup()
+
+def test_database():
+    """Context manager that creates the test database and drops it after"""
+    from contextlib import contextmanager
+
+    from django.test.utils import setup_databases, teardown_databases
+
+    @contextmanager
+    def manager():
+        old_config = setup_databases(verbosity=0, interactive=False)
+        try:
+            yield
+        finally:
+            teardown_databases(old_config, verbosity=0)
+    return manager()
+
+def measure(func, number=20, repeat=5):
+    """Best time for one call to `func`, in seconds"""
+    return min(timeit.repeat(func, number=number, repeat=repeat)) / number
+
+def report(label, seconds, per=None, unit='row'):
+    line = f'{label:<40} {seconds * 1000:9.3f} ms'
+    if per:
+        line += f'  ({seconds / per * 1e6:8.2f} us/{unit})'
+    print(line)
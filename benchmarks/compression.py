@@ -0,0 +1,53 @@
+"""
+Bytes sent for the main pages with and without response compression.
+
+    DJANGO_SETTINGS_MODULE=... python benchmarks/compression.py [tasks]
+
+Fills a throwaway test database with one user's tasks and projects, then
+fetches each page with every encoding the server can produce, printing
+the body size and the time spent compressing it.
+"""
+import sys
+
+from common import measure, report, setup_django, test_database
+
+def main(task_count=200):
+    setup_django()
+    from django.conf import settings
+    from django.contrib.auth import get_user_model
+    from django.test import Client
+    from django.urls import reverse
+
+    from task_time_tracker import compression
+    from task_time_tracker.models import Project, Task
+
+    settings.ALLOWED_HOSTS = ['*']
+    pages = ['dashboard', 'active_tasks', 'completed_tasks', 'projects']
+
+    with test_database():
+        user = get_user_model().objects.create(username='benchmark')
+        projects = [Project.objects.create(user=user, name=f'Project {index}')
+                    for index in range(10)]
+        for index in range(task_count):
+            Task.objects.create(
+                user=user, task_name=f'task {index}', expected_mins=15 + index % 90,
+                actual_mins=index % 60 or None, project=projects[index % 10],
+                completed=index % 3 == 0, active=index % 3 != 0)
+        client = Client()
+        client.force_login(user)
+
+        print(f'{task_count} tasks')
+        for name in pages:
+            url = reverse(name)
+            identity = client.get(url, HTTP_ACCEPT_ENCODING='identity').content
+            print(f'{name:<24} identity {len(identity):>9,} bytes')
+            for encoding in compression.get_available_encodings():
+                body = client.get(url, HTTP_ACCEPT_ENCODING=encoding).content
+                print(f'{name:<24} {encoding:<8} {len(body):>9,} bytes'
+                      f'  ({len(body) / len(identity):6.1%})')
+                report(f'  compress ({encoding})',
+                       measure(lambda: compression.compress(identity, encoding), number=20),
+                       per=len(identity) / 1024, unit='KiB')
+
+if __name__ == '__main__':
+    main(*[int(arg) for arg in sys.argv[1:]])
@@ -0,0 +1,52 @@
+"""
+Time to compute earliest finishes with `utils.critical_path.CriticalPath`.
+
+    python benchmarks/critical_path.py [tasks] [edges]
+
+Builds a random dependency graph (no database needed), then times a full
+build and incremental changes at the start of the graph, where they affect
+the most tasks.
+"""
+import random
+import sys
+
+from common import measure, report, setup_django
+
+setup_django()
+
+from task_time_tracker.utils.critical_path import CriticalPath  # noqa: E402
+
+def main(task_count=20_000, edge_count=50_000):
+    rng = random.Random(0)
+    tasks = [
+        {'id': task_id, 'expected_mins': rng.randint(5, 240),
+         'actual_mins': None, 'project_id': task_id % 50}
+        for task_id in range(task_count)
+    ]
+    # Edges only point back to lower ids, so the graph has no cycles
+    edges = set()
+    while len(edges) < edge_count:
+        task_id = rng.randrange(1, task_count)
+        edges.add((task_id, rng.randrange(max(0, task_id - 500), task_id)))
+    edges = list(edges)
+
+    def build():
+        return CriticalPath(480).build(tasks, edges)
+    critical_path = build()
+
+    def update():
+        task = dict(tasks[0], expected_mins=rng.randint(5, 240))
+        critical_path.update(task)
+
+    def add_and_remove_dependency():
+        critical_path.add_dependency(task_count - 1, 0)
+        critical_path.remove_dependency(task_count - 1, 0)
+
+    print(f'{task_count} tasks, {len(edges)} dependencies')
+    report('build', measure(build, number=1, repeat=3), per=len(edges), unit='edge')
+    report('update first task', measure(update, number=20, repeat=3))
+    report('add + remove a dependency', measure(add_and_remove_dependency, number=20, repeat=3))
+    report('project finish dates', measure(critical_path.get_project_finish_dates, number=5))
+
+if __name__ == '__main__':
+    main(*[int(arg) for arg in sys.argv[1:]])
@@ -0,0 +1,39 @@
+"""
+Time to run the Monte Carlo simulation behind `utils.forecast`.
+
+    python benchmarks/forecast.py [tasks] [trials] [groups]
+
+Simulates random open tasks against a spread of estimate errors (no
+database needed), for a single group as on the dashboard and split into
+projects as on the projects page.
+"""
+import sys
+
+import numpy as np
+
+from common import measure, report, setup_django
+
+setup_django()
+
+from task_time_tracker.utils.forecast import (RATIO_QUANTILES,  # noqa: E402
+                                              simulate_remaining)
+
+def main(task_count=5_000, trials=10_000, group_count=50):
+    rng = np.random.default_rng(0)
+    expected_mins = rng.integers(5, 240, task_count)
+    actual_mins = rng.integers(0, 60, task_count)
+    ratios = np.sort(rng.lognormal(0.2, 0.5, RATIO_QUANTILES)).astype(np.float32)
+    group_starts = np.linspace(0, task_count, group_count, endpoint=False).astype(int)
+
+    def simulate(starts):
+        return lambda: simulate_remaining(expected_mins, actual_mins, starts, ratios,
+                                          trials, np.random.default_rng(1))
+
+    print(f'{task_count} tasks, {trials} trials')
+    report('one group', measure(simulate([0]), number=1, repeat=5),
+           per=trials, unit='trial')
+    report(f'{group_count} groups', measure(simulate(group_starts), number=1, repeat=5),
+           per=trials, unit='trial')
+
+if __name__ == '__main__':
+    main(*[int(arg) for arg in sys.argv[1:]])
@@ -0,0 +1,43 @@
+"""
+Time to roll up a tree of subtasks with `utils.rollups`.
+
+    DJANGO_SETTINGS_MODULE=... python benchmarks/rollups.py [nodes] [children]
+
+Builds one tree of `nodes` tasks, each with up to `children` subtasks, in a
+throwaway test database and times the single-subtree sum and the
+every-node rollup.
+"""
+import random
+import sys
+
+from common import measure, report, setup_django, test_database
+
+def main(nodes=10_000, children=5):
+    setup_django()
+    from django.contrib.auth import get_user_model
+    from django.db import connection
+
+    from task_time_tracker.models import Task
+    from task_time_tracker.utils.rollups import get_task_rollup, get_task_rollups
+
+    with test_database():
+        user = get_user_model().objects.create(username='benchmark')
+        rng = random.Random(0)
+        Task.objects.bulk_create([
+            Task(id=pk, user=user, task_name=f'task {pk}',
+                 parent_id=(pk - 2) // children + 1 if pk > 1 else None,
+                 expected_mins=rng.randint(5, 120),
+                 actual_mins=rng.choice([None, rng.randint(5, 120)]),
+                 completed=rng.random() < 0.5)
+            for pk in range(1, nodes + 1)
+        ], batch_size=5000)
+        root = Task.objects.get(pk=1)
+
+        print(f'{connection.vendor}: {nodes} tasks, up to {children} subtasks each')
+        report('get_task_rollup (root)', measure(lambda: get_task_rollup(root), number=5),
+               per=nodes, unit='task')
+        report('get_task_rollups (every node)', measure(lambda: get_task_rollups([1]), number=5),
+               per=nodes, unit='task')
+
+if __name__ == '__main__':
+    main(*[int(arg) for arg in sys.argv[1:]])
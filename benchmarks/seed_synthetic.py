@@ -0,0 +1,40 @@
+"""
+Throughput of `manage.py seed_synthetic` (`utils/synthetic.py`).
+
+    DJANGO_SETTINGS_MODULE=... python benchmarks/seed_synthetic.py [users] [tasks_per_user]
+
+Seeds a throwaway test database and reports rows written per second, from
+which the time for a larger load can be estimated.
+"""
+import datetime
+import sys
+import time
+
+from common import setup_django, test_database
+
+def main(users=100, tasks_per_user=2000):
+    setup_django()
+    from django.db import connection
+
+    from task_time_tracker.utils.synthetic import seed_synthetic
+
+    with test_database():
+        started = time.perf_counter()
+        counts = seed_synthetic(
+            users=users,
+            tasks_per_user=tasks_per_user,
+            projects_per_user=3,
+            seed=0,
+            start=datetime.date(2022, 1, 1),
+            end=datetime.date(2022, 12, 31),
+        )
+        seconds = time.perf_counter() - started
+
+    rows = sum(counts.values())
+    print(f'{connection.vendor}: {rows} rows in {seconds:.1f}s '
+          f'({rows / seconds:,.0f} rows/s)')
+    for model, count in counts.items():
+        print(f'  {model.__name__:<20} {count:>10}')
+
+if __name__ == '__main__':
+    main(*[int(arg) for arg in sys.argv[1:]])
@@ -0,0 +1,66 @@
+"""
+Render time of the task tables with `ActionButtonColumn` compared with
+plain `TemplateColumn`s rendering the same button templates.
+
+    python benchmarks/table_render.py [rows]
+"""
+import sys
+
+from common import measure, report, setup_django
+
+setup_django()
+
+from django.middleware.csrf import get_token  # noqa: E402
+from django.template import Context, RequestContext, Template  # noqa: E402
+from django.test import RequestFactory  # noqa: E402
+from django_tables2 import TemplateColumn  # noqa: E402
+
+from task_time_tracker.models import Task  # noqa: E402
+from task_time_tracker.tables import (AllTaskTable,  # noqa: E402
+                                      CompletedTaskTable,
+                                      DashboardTaskTable)
+
+def with_template_columns(table_class):
+    """`table_class` with its action columns rendered the old way"""
+    columns = {
+        name: TemplateColumn(verbose_name='', template_name=column.template_name)
+        for name, column in table_class.base_columns.items()
+        if hasattr(column, 'variant_attrs')
+    }
+    return type(table_class.__name__, (table_class,), {'Meta': table_class.Meta, **columns})
+
+def main(rows):
+    tasks = [
+        Task(pk=pk, task_name=f'task {pk}', expected_mins=pk, actual_mins=pk // 2)
+        for pk in range(1, rows + 1)
+    ]
+    for task in tasks:
+        task.archived = task.pk % 2 == 0
+
+    request = RequestFactory().get('/')
+    template = Template('{% load django_tables2 %}{% render_table table %}')
+
+    def render(table_class):
+        return template.render(RequestContext(request, {'table': table_class(tasks)}))
+
+    def render_action_cells(table_class):
+        table = table_class(tasks)
+        table.context = Context({'csrf_token': get_token(request)})
+        names = [name for name in table.columns.names() if name in ('edit', 'delete')]
+        for row in table.rows:
+            for name in names:
+                row.get_cell(name)
+
+    print(f'{rows} rows')
+    for table_class in (DashboardTaskTable, AllTaskTable, CompletedTaskTable):
+        template_table_class = with_template_columns(table_class)
+        name = table_class.__name__
+        report(f'{name} TemplateColumn', measure(lambda: render(template_table_class)), rows)
+        report(f'{name} ActionButtonColumn', measure(lambda: render(table_class)), rows)
+        report(f'  action cells, TemplateColumn',
+               measure(lambda: render_action_cells(template_table_class)), rows)
+        report(f'  action cells, ActionButtonColumn',
+               measure(lambda: render_action_cells(table_class)), rows)
+
+if __name__ == '__main__':
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 100)
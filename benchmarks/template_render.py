@@ -0,0 +1,86 @@
+"""
+Response time per view under three template setups:
+
+- uncached: templates are read and compiled on every render
+- default: Django's default loaders (cached, compiled on first use)
+- production: the explicit cached loaders from `settings.production`,
+  warmed up by `warm_template_cache`, plus the cached navigation fragments
+
+The views run the same queries under every setup, so the differences come
+from template loading and rendering. "first" is the first request after
+the setup is applied (what the first user after a worker boots sees).
+
+    python benchmarks/template_render.py
+"""
+import time
+
+from common import measure, report, setup_django, test_database
+
+setup_django()
+
+from django.conf import settings  # noqa: E402
+from django.core.cache import cache  # noqa: E402
+from django.test import Client, override_settings  # noqa: E402
+from django.urls import reverse  # noqa: E402
+
+from task_time_tracker.models import Task, User  # noqa: E402
+from task_time_tracker.utils.template_helpers import warm_template_cache  # noqa: E402
+
+def templates_setting(loaders=None, app_dirs=True):
+    options = dict(settings.TEMPLATES[0]['OPTIONS'])
+    if loaders is not None:
+        options['loaders'] = loaders
+    return [dict(settings.TEMPLATES[0], APP_DIRS=app_dirs, OPTIONS=options)]
+
+FILE_LOADERS = [
+    'django.template.loaders.filesystem.Loader',
+    'django.template.loaders.app_directories.Loader',
+]
+SETUPS = [
+    ('uncached', dict(TEMPLATES=templates_setting(FILE_LOADERS, app_dirs=False),
+                      CACHES={'default': {'BACKEND': 'django.core.cache.backends.dummy.DummyCache'}})),
+    ('default', dict(TEMPLATES=templates_setting(),
+                     CACHES={'default': {'BACKEND': 'django.core.cache.backends.dummy.DummyCache'}})),
+    ('production', dict(TEMPLATES=templates_setting(
+                            [('django.template.loaders.cached.Loader', FILE_LOADERS)], app_dirs=False),
+                        TEMPLATE_WARM_UP=True)),
+]
+
+def create_data():
+    user = User.objects.create_user(username='benchmark', password='benchmark')
+    tasks = [
+        Task.objects.create(user=user, task_name=f'task {number}', expected_mins=30,
+                            actual_mins=number % 40, active=True, priority=number % 3)
+        for number in range(20)
+    ]
+    return user, tasks
+
+def main():
+    user, tasks = create_data()
+    paths = {
+        'dashboard': reverse('dashboard'),
+        'active_tasks': reverse('active_tasks'),
+        'completed_tasks': reverse('completed_tasks'),
+        'plan': reverse('plan'),
+        'new_task': reverse('new_task'),
+        'edit_task': reverse('edit_task', kwargs={'pk': tasks[0].pk}),
+    }
+
+    for name, overrides in SETUPS:
+        with override_settings(ALLOWED_HOSTS=['testserver'], DEBUG=False, **overrides):
+            cache.clear()
+            if settings.TEMPLATE_WARM_UP:
+                warm_template_cache()
+            client = Client()
+            client.force_login(user)
+
+            print(name)
+            for view, path in paths.items():
+                started = time.perf_counter()
+                client.get(path)
+                report(f'  {view} (first)', time.perf_counter() - started)
+                report(f'  {view}', measure(lambda: client.get(path)))
+
+if __name__ == '__main__':
+    with test_database():
+        main()
@@ -0,0 +1,20 @@
+import os
+import shutil
+import tempfile
+
+# Each worker writes its metrics to files in this directory, and /metrics
+# adds them up (see task_time_tracker/metrics.py). Set before the workers
+# import prometheus_client.
+metrics_dir = os.environ.setdefault(
+    'PROMETHEUS_MULTIPROC_DIR',
+    os.path.join(tempfile.gettempdir(), 'task_time_tracker_metrics'),
+)
+
+def on_starting(server):
+    """Start from zero, not from the files of a previous run"""
+    shutil.rmtree(metrics_dir, ignore_errors=True)
+    os.makedirs(metrics_dir)
+
+def child_exit(server, worker):
+    from prometheus_client import multiprocess
+    multiprocess.mark_process_dead(worker.pid)
@@ -1,9 +1,186 @@
+import json
+
+from django.conf import settings
 from django.contrib import admin
 from django.contrib.auth.admin import UserAdmin
+from django.core.paginator import Paginator
+from django.db import connections
+from django.utils.functional import cached_property
+
+from .models import (AccountDeletion,
+                     ArchivedTask,
+                     ArchivedTaskStatusChange,
+                     Job,
+                     Project,
+                     RecurringTask,
+                     SlowQuery,
+                     Task,
+                     TaskStatusChange,
+                     User)
+from .utils.account_deletion import request_account_deletion
+
+def get_estimated_count(queryset):
+    """The Postgres planner's estimate of the rows in `queryset`, from
+    table statistics, or `None` on other databases"""
+    connection = connections[queryset.db]
+    if connection.vendor != 'postgresql':
+        return None
+    sql, params = queryset.values('pk').order_by().query.sql_with_params()
+    with connection.cursor() as cursor:
+        cursor.execute(f'EXPLAIN (FORMAT JSON) {sql}', params)
+        plan = cursor.fetchone()[0]
+    if isinstance(plan, str):
+        plan = json.loads(plan)
+    return int(plan[0]['Plan']['Plan Rows'])
+
+class EstimatedCountPaginator(Paginator):
+    """
+    Counts exactly up to ADMIN_EXACT_COUNT_LIMIT rows, and past that uses
+    the planner's estimate, so a changelist over millions of rows never
+    waits for a full `COUNT(*)`.
+    """
+
+    @cached_property
+    def count(self):
+        limit = settings.ADMIN_EXACT_COUNT_LIMIT
+        count = self.object_list.order_by()[:limit + 1].count()
+        if count <= limit:
+            return count
+        estimate = get_estimated_count(self.object_list)
+        if estimate is None:
+            return super().count
+        return max(estimate, count)
+
+class ScaledModelAdmin(admin.ModelAdmin):
+    """
+    Changelist settings for tables with millions of rows: estimated
+    counts, newest rows first by an indexed column, and searches that only
+    use indexed lookups. A search for a whole number looks up
+    `id_search_field`.
+    """
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
+    list_per_page = 50
+    ordering = ['-pk']
+    id_search_field = 'pk'
+
+    def get_search_results(self, request, queryset, search_term):
+        term = search_term.strip()
+        if term.isdigit():
+            return queryset.filter(**{self.id_search_field: int(term)}), False
+        return super().get_search_results(request, queryset, search_term)
+
+@admin.register(Task)
+class TaskAdmin(ScaledModelAdmin):
+    list_display = ['id', 'task_name', 'user', 'project', 'expected_mins',
+                    'actual_mins', 'completed', 'active', 'created_date']
+    list_select_related = ['user', 'project']
+    # Empty `deleted_date` is outside the trash
+    list_filter = ['completed', ('deleted_date', admin.EmptyFieldListFilter)]
+    # Case-sensitive prefix searches can use the `task_name` and username
+    # pattern indexes; `icontains` would scan the table
+    search_fields = ['task_name__startswith', 'user__username__startswith']
+    raw_id_fields = ['user', 'project', 'parent', 'recurring_task']
+
+    def get_queryset(self, request):
+        # The default manager leaves out trashed tasks, which admins still
+        # need to find and restore
+        queryset = Task.all_objects.get_queryset()
+        ordering = self.get_ordering(request)
+        if ordering:
+            queryset = queryset.order_by(*ordering)
+        return queryset
+
+@admin.register(Project)
+class ProjectAdmin(ScaledModelAdmin):
+    list_display = ['id', 'name', 'user', 'task_count', 'open_task_count', 'created_date']
+    list_select_related = ['user']
+    # Like `TaskAdmin`, searches use the name and username pattern indexes
+    search_fields = ['name__startswith', 'user__username__startswith']
+    raw_id_fields = ['user', 'parent']
+
+class CreatedDateListFilter(admin.DateFieldListFilter):
+    """Filters status changes through `between`, so only the monthly
+    partitions the chosen dates fall in are read"""
+
+    def queryset(self, request, queryset):
+        start = self.used_parameters.get(self.lookup_kwarg_since)
+        end = self.used_parameters.get(self.lookup_kwarg_until)
+        if start and end:
+            return queryset.between(start, end)
+        return super().queryset(request, queryset)
+
+@admin.register(TaskStatusChange)
+class TaskStatusChangeAdmin(ScaledModelAdmin):
+    list_display = ['id', 'task_id', 'task_name', 'active_datetime',
+                    'inactive_datetime', 'completed_datetime', 'created_datetime']
+    list_select_related = ['task']
+    list_filter = [('created_datetime', CreatedDateListFilter)]
+    ordering = ['-created_datetime']
+    search_fields = ['task__task_name__startswith']
+    id_search_field = 'task_id'
+    raw_id_fields = ['task']
+
+    @admin.display(ordering='task__task_name')
+    def task_name(self, obj):
+        return obj.task.task_name
+
+@admin.register(ArchivedTask)
+class ArchivedTaskAdmin(ScaledModelAdmin):
+    list_display = ['id', 'task_name', 'user', 'completed_date', 'archived_date']
+    list_select_related = ['user']
+    raw_id_fields = ['user', 'project']
+
+@admin.register(ArchivedTaskStatusChange)
+class ArchivedTaskStatusChangeAdmin(ScaledModelAdmin):
+    list_display = ['id', 'task_id', 'created_datetime']
+    id_search_field = 'task_id'
+    raw_id_fields = ['task']
+
+@admin.register(User)
+class SiteUserAdmin(UserAdmin):
+    actions = ['request_deletion']
+
+    @admin.action(description='Delete selected accounts in the background')
+    def request_deletion(self, request, queryset):
+        """Deleting a heavy user in one go can time out, so hand them to
+        `manage.py delete_accounts`"""
+        for user in queryset:
+            request_account_deletion(user)
+        self.message_user(request, f'{len(queryset)} accounts will be deleted in the background')
+
+@admin.register(AccountDeletion)
+class AccountDeletionAdmin(admin.ModelAdmin):
+    list_display = ['username', 'user_id', 'requested_date', 'rows_deleted',
+                    'last_batch_date', 'completed_date']
+    search_fields = ['username']
+    readonly_fields = [field.name for field in AccountDeletion._meta.fields]
+
+    def has_add_permission(self, request):
+        return False
+
+@admin.register(Job)
+class JobAdmin(admin.ModelAdmin):
+    list_display = ['id', 'name', 'status', 'attempts', 'run_after', 'finished_date']
+    list_filter = ['status', 'name']
+    # A job's kwargs can hold personal details, so they aren't shown
+    exclude = ['kwargs']
+    readonly_fields = [field.name for field in Job._meta.fields if field.name != 'kwargs']
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+admin.site.register(RecurringTask)
 
-from .models import Project, Task, TaskStatusChange, User
+@admin.register(SlowQuery)
+class SlowQueryAdmin(admin.ModelAdmin):
+    list_display = ['created_date', 'duration_ms', 'view_name', 'call_site', 'database']
+    list_filter = ['view_name', 'database']
+    search_fields = ['sql', 'call_site']
+    date_hierarchy = 'created_date'
+    readonly_fields = [field.name for field in SlowQuery._meta.fields]
 
-admin.site.register(Project)
-admin.site.register(Task)
-admin.site.register(TaskStatusChange)
-admin.site.register(User, UserAdmin)
\ No newline at end of file
+    def has_add_permission(self, request):
+        return False
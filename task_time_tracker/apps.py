@@ -4,3 +4,6 @@ from django.apps import AppConfig
 class TimeTrackerConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'task_time_tracker'
+
+    def ready(self):
+        from . import signals, slow_queries  # noqa: F401
@@ -0,0 +1,113 @@
+"""
+Compression of dynamic responses (pages, fragments, JSON), done by
+`CompressionMiddleware`.
+
+Brotli is used when the `brotli` package is installed and the client
+accepts it, gzip otherwise. Responses below COMPRESSION_MIN_BYTES, and
+types that are already compressed (images, fonts), are sent as they are,
+but every compressible type gets `Vary: Accept-Encoding` so caches keep
+the encodings apart. Streaming responses are compressed chunk by chunk,
+flushing after each one, so the client still gets each chunk as soon as
+it's produced. Event streams (and anything marked `no-transform`) are
+left alone.
+
+Static files are compressed once, when `collectstatic` runs (see
+STATICFILES_STORAGE in production), and served precompressed by
+WhiteNoise, so `FileResponse`s are skipped here.
+"""
+import zlib
+
+from django.conf import settings
+from django.http import FileResponse
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+def get_available_encodings():
+    """Encodings the server can produce, most preferred first"""
+    return ('br', 'gzip') if brotli is not None else ('gzip',)
+
+def parse_accept_encoding(header):
+    """`{coding: q}` for an `Accept-Encoding` header"""
+    accepted = {}
+    for item in header.split(','):
+        coding, *params = [part.strip() for part in item.split(';')]
+        if not coding:
+            continue
+        q = 1.0
+        for param in params:
+            name, _, value = param.partition('=')
+            if name.strip().lower() == 'q':
+                try:
+                    q = float(value)
+                except ValueError:
+                    q = 0.0
+        accepted[coding.lower()] = q
+    return accepted
+
+def choose_encoding(header):
+    """The encoding to send for `header`, or `None` for none. The client's
+    weights come first, then the server's preference."""
+    accepted = parse_accept_encoding(header)
+    available = get_available_encodings()
+    weights = {
+        coding: accepted.get(coding, accepted.get('*', 0.0))
+        for coding in available
+    }
+    best = max(available, key=lambda coding: (weights[coding], -available.index(coding)))
+    return best if weights[best] > 0 else None
+
+def is_compressible(response):
+    """Whether `response` could be sent compressed, depending on the
+    client and its size"""
+    if (response.has_header('Content-Encoding')
+            or isinstance(response, FileResponse)
+            or response.status_code in (204, 206, 304)
+            or 'no-transform' in response.get('Cache-Control', '')):
+        return False
+    content_type = response.get('Content-Type', '').split(';')[0].strip().lower()
+    return content_type in settings.COMPRESSION_CONTENT_TYPES
+
+class Compressor(object):
+    """Incremental brotli or gzip compressor"""
+
+    def __init__(self, encoding):
+        self.encoding = encoding
+        if encoding == 'br':
+            self._compressor = brotli.Compressor(
+                mode=brotli.MODE_TEXT, quality=settings.COMPRESSION_BROTLI_QUALITY)
+        else:
+            # wbits 16 + 15 writes a gzip header and trailer
+            self._compressor = zlib.compressobj(
+                settings.COMPRESSION_GZIP_LEVEL, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+
+    def compress(self, data):
+        if self.encoding == 'br':
+            return self._compressor.process(data)
+        return self._compressor.compress(data)
+
+    def flush(self):
+        """Everything compressed so far, in a form the client can decode
+        without waiting for the rest"""
+        if self.encoding == 'br':
+            return self._compressor.flush()
+        return self._compressor.flush(zlib.Z_SYNC_FLUSH)
+
+    def finish(self):
+        if self.encoding == 'br':
+            return self._compressor.finish()
+        return self._compressor.flush(zlib.Z_FINISH)
+
+def compress(content, encoding):
+    compressor = Compressor(encoding)
+    return compressor.compress(content) + compressor.finish()
+
+def compress_stream(chunks, encoding):
+    compressor = Compressor(encoding)
+    for chunk in chunks:
+        data = compressor.compress(chunk) + compressor.flush()
+        if data:
+            yield data
+    yield compressor.finish()
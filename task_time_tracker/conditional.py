@@ -0,0 +1,80 @@
+"""
+HTTP conditional responses for pages that only show the user's own data.
+
+A page's `ETag` and `Last-Modified` come from the user's change marker
+(`User.change_seq` and `User.changed_date`, see `utils.sync`), which every
+change to their tasks and projects moves forward. The user row is loaded
+by the authentication middleware anyway, so a browser revalidating an
+unchanged page gets a 304 without any of the page's own queries running.
+
+Views are designated with `conditional_page` (function views) or
+`ConditionalPageMixin` (class-based views). Pages that change with the
+time of day, like the dashboard's rolling list of today's tasks, pass
+`refresh_hourly` so they're rendered again at least every hour.
+"""
+import hashlib
+
+from django.conf import settings
+from django.contrib.messages import get_messages
+from django.middleware.csrf import get_token
+from django.utils import timezone
+from django.views.decorators.cache import cache_control
+from django.views.decorators.http import condition
+
+def get_page_version(request, refresh_hourly=False):
+    """
+    Return the `(etag, last_modified)` of a page showing `request.user`'s
+    data, or `(None, None)` if the page has to be rendered, e.g. because
+    it has messages to show.
+    """
+    user = request.user
+    if not user.is_authenticated or len(get_messages(request)):
+        return None, None
+
+    # Cached pages carry the CSRF token for their forms, so the secret
+    # it's made from has to be settled before the page is versioned
+    get_token(request)
+
+    parts = [
+        settings.PAGE_CACHE_VERSION,
+        user.pk,
+        user.change_seq,
+        user.daily_capacity_mins,
+        user.time_zone,
+        request.META['CSRF_COOKIE'],
+    ]
+    last_modified = user.changed_date or user.date_joined
+    if refresh_hourly:
+        hour = timezone.now().replace(minute=0, second=0, microsecond=0)
+        parts.append(hour.isoformat())
+        last_modified = max(last_modified, hour)
+
+    etag = hashlib.sha256('|'.join(str(part) for part in parts).encode()).hexdigest()[:32]
+    return etag, last_modified
+
+def conditional_page(view_func=None, refresh_hourly=False):
+    """
+    Answer `If-None-Match`/`If-Modified-Since` with a 304 when the user's
+    data hasn't changed, and mark the page `private` so only the user's
+    browser keeps it, revalidating before each use.
+    """
+    def get_etag(request, *args, **kwargs):
+        return get_page_version(request, refresh_hourly)[0]
+
+    def get_last_modified(request, *args, **kwargs):
+        return get_page_version(request, refresh_hourly)[1]
+
+    def decorator(view_func):
+        view_func = condition(etag_func=get_etag, last_modified_func=get_last_modified)(view_func)
+        return cache_control(private=True, no_cache=True)(view_func)
+
+    return decorator(view_func) if view_func else decorator
+
+class ConditionalPageMixin:
+    """`conditional_page` for class-based views. Put it after
+    `LoginRequiredMixin`, so anonymous users are redirected first."""
+    refresh_hourly = False
+
+    def dispatch(self, request, *args, **kwargs):
+        dispatch = conditional_page(super().dispatch, refresh_hourly=self.refresh_hourly)
+        return dispatch(request, *args, **kwargs)
@@ -0,0 +1,5 @@
+from django.conf import settings
+
+def navigation(request):
+    """Timeout for the cached navigation sidebar in base_layout.html"""
+    return {'nav_cache_seconds': settings.NAV_CACHE_SECONDS}
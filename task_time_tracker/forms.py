@@ -1,9 +1,17 @@
+from datetime import timedelta
+
+from croniter import croniter
 from django import forms
+from django.db.models import Q
 from django.forms import models
 from django.contrib.auth.forms import (PasswordResetForm,
                                        UserCreationForm)
+from django.template import loader
 
-from .models import Project, Task, User
+from .jobs import enqueue
+from .models import Project, RecurringTask, Task, User
+from .utils.critical_path import would_create_cycle
+from .utils.rollups import get_descendant_ids
 
 styles = {
     'short_input': forms.TextInput(attrs={'class': 'short-input'}),
@@ -11,7 +19,22 @@ styles = {
     'num_input': forms.NumberInput(attrs={'class': 'short-input'}),
 }
 
-class NewTaskPageForm(forms.ModelForm):
+class ParentChoiceMixin:
+    """
+    Limits the `parent` choices to the user's own rows. An existing row
+    can't be moved under itself or anything below it, which would make a
+    cycle.
+    """
+    def __init__(self, *args, user=None, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.user = user
+        parents = self.fields['parent'].queryset.filter(user=user)
+        if self.instance.pk:
+            excluded_ids = get_descendant_ids(self._meta.model, self.instance.pk)
+            parents = parents.exclude(pk__in=excluded_ids | {self.instance.pk})
+        self.fields['parent'].queryset = parents
+
+class NewTaskPageForm(ParentChoiceMixin, forms.ModelForm):
     class Meta:
         model = Task
         fields = (
@@ -21,6 +44,7 @@ class NewTaskPageForm(forms.ModelForm):
             'task_notes',
             'expected_mins',
             'actual_mins',
+            'parent',
         )
         labels = {
             'task_name': 'Name',
@@ -29,9 +53,14 @@ class NewTaskPageForm(forms.ModelForm):
             'task_notes': 'Notes/Description',
             'expected_mins': 'Expected Time (in Minutes)',
             'actual_mins': 'Time Spent So Far (in Minutes)',
+            'parent': 'Parent Task',
         }
 
-class NewProjectForm(forms.ModelForm):
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.fields['parent'].queryset = self.fields['parent'].queryset.filter(completed=False)
+
+class NewProjectForm(ParentChoiceMixin, forms.ModelForm):
     class Meta:
         model = Project
         fields = (
@@ -39,7 +68,11 @@ class NewProjectForm(forms.ModelForm):
             'description',
             'start_date',
             'end_date',
+            'parent',
         )
+        labels = {
+            'parent': 'Parent Project',
+        }
     
     def clean(self):
         """Check start_date against end_date"""
@@ -70,7 +103,69 @@ class NewTaskForm(forms.ModelForm):
             'expected_mins': styles['num_input'],
         }
 
-class EditTaskForm(forms.ModelForm):
+class RecurringTaskForm(forms.ModelForm):
+    class Meta:
+        model = RecurringTask
+        fields = (
+            'task_name',
+            'cron_expression',
+            'priority',
+            'task_notes',
+            'expected_mins',
+        )
+        labels = {
+            'task_name': 'Name',
+            'cron_expression': 'Schedule (cron expression)',
+            'task_notes': 'Notes/Description',
+            'expected_mins': 'Expected Time (in Minutes)',
+        }
+        help_texts = {
+            'cron_expression': 'e.g. "0 9 * * 1-5" for 9am every weekday',
+        }
+
+    def clean_cron_expression(self):
+        cron_expression = self.cleaned_data['cron_expression'].strip()
+        if not croniter.is_valid(cron_expression):
+            raise forms.ValidationError('Enter a valid cron expression')
+        return cron_expression
+
+class TrendsForm(forms.Form):
+    """Range and grouping for the trends page. Defaults to the last 30
+    days (ending today in `today`), grouped by day."""
+    start = forms.DateField(required=False)
+    end = forms.DateField(required=False)
+    bucket = forms.ChoiceField(
+        choices=[('day', 'Day'), ('week', 'Week'), ('month', 'Month')],
+        required=False,
+    )
+
+    max_days = 366 * 30
+
+    def __init__(self, *args, today=None, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.today = today
+
+    def clean(self):
+        super().clean()
+
+        end = self.cleaned_data.get('end') or self.today
+        start = self.cleaned_data.get('start') or end - timedelta(days=29)
+        self.cleaned_data.update({
+            'start': start,
+            'end': end,
+            'bucket': self.cleaned_data.get('bucket') or 'day',
+        })
+
+        if start > end:
+            self._errors['end'] = self.error_class([
+                'End date must come after start date'])
+        elif (end - start).days > self.max_days:
+            self._errors['start'] = self.error_class([
+                'Choose a range of 30 years or less'])
+
+        return self.cleaned_data
+
+class EditTaskForm(ParentChoiceMixin, forms.ModelForm):
     class Meta:
         model = Task
         fields = (
@@ -82,13 +177,43 @@ class EditTaskForm(forms.ModelForm):
             'actual_mins',
             'completed',
             'active',
+            'parent',
+            'depends_on',
         )
+        labels = {
+            'parent': 'Parent Task',
+            'depends_on': 'Waits For',
+        }
         widgets = {
             'task_name': styles['short_input'],
             'task_category': styles['short_input'],
             'task_notes': styles['long_input'],
         }
 
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        # Open tasks, and any completed ones it already waits for
+        waits_for = Q(completed=False)
+        if self.instance.pk:
+            waits_for |= Q(dependents=self.instance)
+        self.fields['depends_on'].queryset = (
+            Task.objects
+                .filter(waits_for, user=self.user)
+                .exclude(pk=self.instance.pk)
+                .distinct()
+        )
+
+    def clean_depends_on(self):
+        """A task can't wait for a task that (indirectly) waits for it"""
+        depends_on = self.cleaned_data['depends_on']
+        if self.instance.pk:
+            current_ids = set(self.instance.depends_on.values_list('pk', flat=True))
+            for task in depends_on:
+                if task.pk not in current_ids and would_create_cycle(self.instance.pk, task.pk):
+                    raise forms.ValidationError(
+                        f'"{task.task_name}" already waits for this task')
+        return depends_on
+
 class SitePasswordResetForm(PasswordResetForm):
     email = forms.EmailField(
         label='',
@@ -96,6 +221,25 @@ class SitePasswordResetForm(PasswordResetForm):
         widget=forms.EmailInput(attrs={'autocomplete': 'email'}),
     )
 
+    def send_mail(self, subject_template_name, email_template_name,
+                  context, from_email, to_email, html_email_template_name=None):
+        """Queue the email so a slow mail server doesn't hold up the
+        request. Only the user's pk and the parts of the context that
+        aren't secret are queued; the job makes the reset token."""
+        enqueue(
+            'send_password_reset_email',
+            user_id=context['user'].pk,
+            context={
+                key: value for key, value in context.items()
+                if key not in ('user', 'uid', 'token')
+            },
+            subject_template_name=subject_template_name,
+            email_template_name=email_template_name,
+            html_email_template_name=html_email_template_name,
+            from_email=from_email,
+            to_email=to_email,
+        )
+
 class SiteUserCreationForm(UserCreationForm):
     email = forms.EmailField()
     
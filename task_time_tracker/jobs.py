@@ -0,0 +1,332 @@
+"""
+A small background job queue.
+
+Functions decorated with `@job` can be queued with `enqueue(name, **kwargs)`
+and are run by `manage.py run_jobs`. Jobs are stored in the database (the
+`Job` model) unless `JOB_QUEUE_BROKER` is set to `'redis'`, in which case
+they are kept in Redis at `JOB_QUEUE_REDIS_URL`. Failed jobs are retried
+with exponential backoff until they reach their `max_attempts`.
+
+With `JOB_QUEUE_ALWAYS_EAGER` set, `enqueue` runs the job right away in the
+calling process instead (used in development and tests).
+"""
+from datetime import timedelta
+import json
+import logging
+import time
+import traceback
+import uuid
+
+from django.conf import settings
+from django.contrib.auth.tokens import default_token_generator
+from django.core.mail import EmailMultiAlternatives
+from django.db import transaction
+from django.template import loader
+from django.utils import timezone
+from django.utils.encoding import force_bytes
+from django.utils.http import urlsafe_base64_encode
+
+from .models import Job, User
+
+logger = logging.getLogger(__name__)
+
+registry = {}
+
+def job(name=None, max_attempts=None):
+    """Register a function so it can be queued with `enqueue`"""
+    def decorator(func):
+        job_name = name or func.__name__
+        func.job_name = job_name
+        func.max_attempts = max_attempts or settings.JOB_QUEUE_MAX_ATTEMPTS
+        registry[job_name] = func
+        return func
+    return decorator
+
+def get_retry_delay(attempts):
+    """Seconds to wait before retrying a job that has failed `attempts` times"""
+    delay = settings.JOB_QUEUE_RETRY_BASE_DELAY * 2 ** (attempts - 1)
+    return min(delay, settings.JOB_QUEUE_RETRY_MAX_DELAY)
+
+def get_broker():
+    if settings.JOB_QUEUE_BROKER == 'redis':
+        return RedisBroker(settings.JOB_QUEUE_REDIS_URL)
+    return DatabaseBroker()
+
+def enqueue(name, run_after=None, **kwargs):
+    """Queue the job registered as `name` to run with `kwargs`. The kwargs
+    must be JSON serializable.
+    """
+    func = registry[name]
+    if settings.JOB_QUEUE_ALWAYS_EAGER:
+        return func(**kwargs)
+    return get_broker().push(
+        name,
+        kwargs,
+        max_attempts=func.max_attempts,
+        run_after=run_after or timezone.now(),
+    )
+
+def run_job(broker, queued_job):
+    """Run a reserved job and report the outcome back to its broker.
+    Returns `True` if the job succeeded.
+    """
+    started = time.perf_counter()
+    try:
+        registry[queued_job.name](**queued_job.kwargs)
+    except Exception:
+        duration_ms = (time.perf_counter() - started) * 1000
+        error = traceback.format_exc()
+        logger.exception(
+            'Job %s (%s) failed after %.1f ms on attempt %s',
+            queued_job.name, queued_job.id, duration_ms, queued_job.attempts,
+        )
+        broker.fail(queued_job, error, duration_ms)
+        return False
+
+    duration_ms = (time.perf_counter() - started) * 1000
+    logger.info(
+        'Job %s (%s) succeeded in %.1f ms',
+        queued_job.name, queued_job.id, duration_ms,
+    )
+    broker.complete(queued_job, duration_ms)
+    return True
+
+
+# Brokers
+
+# Recorded as the error of a job whose worker died (or was killed, e.g.
+# for running out of memory) while running it
+LEASE_EXPIRED_ERROR = 'The job\'s lease ran out before it finished'
+
+class DatabaseBroker(object):
+    """Stores jobs as `Job` rows. Workers claim a job by moving its
+    `run_after` forward by `JOB_QUEUE_LEASE_SECONDS`. A job whose worker
+    dies counts as a failed attempt once the lease runs out, so it is
+    retried with backoff like any other failure, and a job that keeps
+    killing its worker ends up failed.
+    """
+
+    def push(self, name, kwargs, max_attempts, run_after):
+        return Job.objects.create(
+            name=name,
+            kwargs=kwargs,
+            max_attempts=max_attempts,
+            run_after=run_after,
+        )
+
+    def reserve(self):
+        now = timezone.now()
+        with transaction.atomic():
+            expired_jobs = (Job.objects
+                                .select_for_update(skip_locked=True)
+                                .filter(status=Job.Status.RUNNING, run_after__lte=now))
+            for expired_job in expired_jobs:
+                self.fail(expired_job, LEASE_EXPIRED_ERROR, None)
+
+            queued_job = (Job.objects
+                              .select_for_update(skip_locked=True)
+                              .filter(status=Job.Status.QUEUED, run_after__lte=now)
+                              .order_by('run_after')
+                              .first()
+            )
+            if queued_job is None:
+                return None
+
+            queued_job.status = Job.Status.RUNNING
+            queued_job.attempts += 1
+            queued_job.started_date = now
+            queued_job.run_after = now + timedelta(seconds=settings.JOB_QUEUE_LEASE_SECONDS)
+            queued_job.save(update_fields=['status', 'attempts', 'started_date', 'run_after'])
+        return queued_job
+
+    def complete(self, queued_job, duration_ms):
+        queued_job.status = Job.Status.SUCCEEDED
+        queued_job.finished_date = timezone.now()
+        queued_job.duration_ms = duration_ms
+        # Nothing reruns a finished job, so don't keep what it was sent
+        queued_job.kwargs = {}
+        queued_job.save(update_fields=['status', 'finished_date', 'duration_ms', 'kwargs'])
+
+    def fail(self, queued_job, error, duration_ms):
+        queued_job.last_error = error
+        queued_job.duration_ms = duration_ms
+        if queued_job.attempts >= queued_job.max_attempts:
+            queued_job.status = Job.Status.FAILED
+            queued_job.finished_date = timezone.now()
+        else:
+            queued_job.status = Job.Status.QUEUED
+            queued_job.run_after = timezone.now() + timedelta(
+                seconds=get_retry_delay(queued_job.attempts))
+        queued_job.save(update_fields=[
+            'status', 'last_error', 'duration_ms', 'finished_date', 'run_after'])
+
+class RedisJob(object):
+    """A job reserved from `RedisBroker`, with the same attributes
+    `run_job` reads from a `Job` row
+    """
+
+    def __init__(self, payload, attempts=0):
+        self.payload = payload
+        self.id = payload['id']
+        self.name = payload['name']
+        self.kwargs = payload['kwargs']
+        self.max_attempts = payload['max_attempts']
+        self.attempts = attempts
+
+    def dumps(self):
+        return json.dumps(self.payload, sort_keys=True)
+
+# Treats running jobs whose lease has run out as failed attempts: queued
+# again after the retry delay, or moved to the dead jobs once they've used
+# up their attempts. Then moves the first due job to the running set and
+# counts the attempt. Run as one script, so a worker that dies part way
+# through can't lose the job.
+RESERVE_SCRIPT = """
+local queued_key, running_key, payloads_key, attempts_key, dead_key = unpack(KEYS)
+local now, lease_until, base_delay, max_delay, error, finished_date = unpack(ARGV)
+
+for _, job_id in ipairs(redis.call('ZRANGEBYSCORE', running_key, '-inf', now)) do
+    redis.call('ZREM', running_key, job_id)
+    local payload = cjson.decode(redis.call('HGET', payloads_key, job_id))
+    local attempts = tonumber(redis.call('HGET', attempts_key, job_id) or 0)
+    if attempts < payload['max_attempts'] then
+        local delay = math.min(base_delay * 2 ^ (attempts - 1), tonumber(max_delay))
+        redis.call('ZADD', queued_key, now + delay, job_id)
+    else
+        payload['attempts'] = attempts
+        payload['last_error'] = error
+        payload['finished_date'] = finished_date
+        redis.call('HSET', dead_key, job_id, cjson.encode(payload))
+        redis.call('HDEL', payloads_key, job_id)
+        redis.call('HDEL', attempts_key, job_id)
+    end
+end
+
+local job_id = redis.call('ZRANGEBYSCORE', queued_key, '-inf', now, 'LIMIT', 0, 1)[1]
+if not job_id then
+    return nil
+end
+redis.call('ZREM', queued_key, job_id)
+redis.call('ZADD', running_key, lease_until, job_id)
+local attempts = redis.call('HINCRBY', attempts_key, job_id, 1)
+return {redis.call('HGET', payloads_key, job_id), attempts}
+"""
+
+class RedisBroker(object):
+    """
+    Stores jobs in Redis: each job's payload and attempt count in a hash
+    keyed by job id, and the ids in two sorted sets scored by timestamp:
+    queued jobs by when they may run, and running jobs by when their lease
+    runs out. Jobs that fail their last attempt are kept with their error
+    in the `dead` hash, like `DatabaseBroker`'s failed jobs. Timing metrics
+    are kept in a hash per job name.
+    """
+    prefix = 'task_time_tracker:jobs'
+
+    def __init__(self, url):
+        import redis
+        self.redis = redis.Redis.from_url(url)
+        self.queued_key = f'{self.prefix}:queued'
+        self.running_key = f'{self.prefix}:running'
+        self.payloads_key = f'{self.prefix}:payloads'
+        self.attempts_key = f'{self.prefix}:attempts'
+        self.dead_key = f'{self.prefix}:dead'
+        self.reserve_script = self.redis.register_script(RESERVE_SCRIPT)
+
+    def push(self, name, kwargs, max_attempts, run_after):
+        queued_job = RedisJob({
+            'id': uuid.uuid4().hex,
+            'name': name,
+            'kwargs': kwargs,
+            'max_attempts': max_attempts,
+        })
+        pipeline = self.redis.pipeline()
+        pipeline.hset(self.payloads_key, queued_job.id, queued_job.dumps())
+        pipeline.zadd(self.queued_key, {queued_job.id: run_after.timestamp()})
+        pipeline.execute()
+        return queued_job
+
+    def reserve(self):
+        now = time.time()
+        claimed = self.reserve_script(
+            keys=[self.queued_key, self.running_key, self.payloads_key,
+                  self.attempts_key, self.dead_key],
+            args=[now, now + settings.JOB_QUEUE_LEASE_SECONDS,
+                  settings.JOB_QUEUE_RETRY_BASE_DELAY, settings.JOB_QUEUE_RETRY_MAX_DELAY,
+                  LEASE_EXPIRED_ERROR, timezone.now().isoformat()],
+        )
+        if claimed is None:
+            return None
+        payload, attempts = claimed
+        return RedisJob(json.loads(payload), int(attempts))
+
+    def _record(self, queued_job, outcome, duration_ms):
+        stats_key = f'{self.prefix}:stats:{queued_job.name}'
+        pipeline = self.redis.pipeline()
+        pipeline.zrem(self.running_key, queued_job.id)
+        pipeline.hincrby(stats_key, outcome, 1)
+        pipeline.hincrbyfloat(stats_key, 'duration_ms', duration_ms)
+        return pipeline
+
+    def _forget(self, pipeline, queued_job):
+        pipeline.hdel(self.payloads_key, queued_job.id)
+        pipeline.hdel(self.attempts_key, queued_job.id)
+
+    def complete(self, queued_job, duration_ms):
+        pipeline = self._record(queued_job, 'succeeded', duration_ms)
+        self._forget(pipeline, queued_job)
+        pipeline.execute()
+
+    def fail(self, queued_job, error, duration_ms):
+        pipeline = self._record(queued_job, 'failed_attempts', duration_ms)
+        if queued_job.attempts < queued_job.max_attempts:
+            run_after = time.time() + get_retry_delay(queued_job.attempts)
+            pipeline.zadd(self.queued_key, {queued_job.id: run_after})
+        else:
+            pipeline.hset(self.dead_key, queued_job.id, json.dumps({
+                **queued_job.payload,
+                'attempts': queued_job.attempts,
+                'last_error': error,
+                'finished_date': timezone.now().isoformat(),
+            }, sort_keys=True))
+            self._forget(pipeline, queued_job)
+        pipeline.execute()
+
+
+# Jobs
+
+@job()
+def send_email(subject, body, from_email, to, html_body=None):
+    """Send an email that's already been rendered"""
+    email_message = EmailMultiAlternatives(subject, body, from_email, to)
+    if html_body is not None:
+        email_message.attach_alternative(html_body, 'text/html')
+    email_message.send()
+
+@job()
+def send_password_reset_email(user_id, context, subject_template_name,
+                              email_template_name, from_email, to_email,
+                              html_email_template_name=None):
+    """
+    Send the email queued by `SitePasswordResetForm.send_mail`. The reset
+    link's token is made here, so it's never stored with the job.
+    """
+    user = User.objects.filter(pk=user_id).first()
+    if user is None:
+        return
+    context = {
+        **context,
+        'user': user,
+        'uid': urlsafe_base64_encode(force_bytes(user.pk)),
+        'token': default_token_generator.make_token(user),
+    }
+    subject = loader.render_to_string(subject_template_name, context)
+    # Email subject *must not* contain newlines
+    subject = ''.join(subject.splitlines())
+    body = loader.render_to_string(email_template_name, context)
+
+    html_body = None
+    if html_email_template_name is not None:
+        html_body = loader.render_to_string(html_email_template_name, context)
+
+    send_email(subject, body, from_email, [to_email], html_body)
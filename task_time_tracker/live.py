@@ -0,0 +1,294 @@
+"""
+Live dashboard updates over server-sent events.
+
+Task changes are published (from `signals.py`, once the transaction
+commits) to a per-user channel, together with the user's refreshed
+dashboard stats. `LiveUpdatesApp` wraps the Django ASGI application in
+`asgi.py` and streams a user's channel to every dashboard they have open
+at `LIVE_UPDATES_PATH`.
+
+The pub/sub layer is chosen by `LIVE_UPDATES_BROKER`: `'memory'` fans out
+within the current process (development and tests), `'redis'` goes
+through Redis at `LIVE_UPDATES_REDIS_URL` so that every web process sees
+every change.
+"""
+import asyncio
+from http.cookies import SimpleCookie
+import json
+import logging
+import threading
+from types import SimpleNamespace
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.contrib.auth import get_user
+from django.db import close_old_connections
+from django.utils.module_loading import import_string
+
+from .utils.model_helpers import (DashboardSummStats,
+                                  format_time,
+                                  get_todays_tasks,
+                                  is_todays_task)
+
+logger = logging.getLogger(__name__)
+
+def get_channel(user_id):
+    return f'task_time_tracker:live:{user_id}'
+
+
+# Brokers
+
+class Subscription(object):
+    """Messages published to one channel, buffered for one listener"""
+
+    def __init__(self, broker, channel, loop, max_size):
+        self.broker = broker
+        self.channel = channel
+        self.loop = loop
+        self.queue = asyncio.Queue(maxsize=max_size)
+        self.overflowed = False
+
+    def put(self, message):
+        """Called on the subscriber's event loop"""
+        try:
+            self.queue.put_nowait(message)
+        except asyncio.QueueFull:
+            # The listener fell behind; tell it to reload rather than
+            # letting it miss updates
+            self.overflowed = True
+
+    async def get(self, timeout):
+        """Wait up to `timeout` seconds for the next message. Returns
+        `None` if there wasn't one.
+        """
+        if self.overflowed:
+            self.overflowed = False
+            self.clear()
+            return {'type': 'reload'}
+        try:
+            return await asyncio.wait_for(self.queue.get(), timeout)
+        except asyncio.TimeoutError:
+            return None
+
+    def clear(self):
+        while not self.queue.empty():
+            self.queue.get_nowait()
+
+    def close(self):
+        self.broker.unsubscribe(self)
+
+class InProcessBroker(object):
+    """Fans messages out to subscribers in the current process. `publish`
+    can be called from any thread.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.subscriptions = {}
+
+    def has_subscribers(self, channel):
+        return bool(self.subscriptions.get(channel))
+
+    def publish(self, channel, message):
+        with self.lock:
+            subscriptions = list(self.subscriptions.get(channel, ()))
+        for subscription in subscriptions:
+            subscription.loop.call_soon_threadsafe(subscription.put, message)
+
+    def subscribe(self, channel):
+        """Subscribe to `channel`. Must be called from the event loop the
+        messages will be read on.
+        """
+        subscription = Subscription(
+            self, channel, asyncio.get_running_loop(),
+            max_size=settings.LIVE_UPDATES_QUEUE_SIZE,
+        )
+        with self.lock:
+            self.subscriptions.setdefault(channel, set()).add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription):
+        with self.lock:
+            subscriptions = self.subscriptions.get(subscription.channel, set())
+            subscriptions.discard(subscription)
+            if not subscriptions:
+                self.subscriptions.pop(subscription.channel, None)
+
+class RedisBroker(InProcessBroker):
+    """
+    Publishes through Redis. Each process holds a single Redis pub/sub
+    connection, subscribed to the channels its listeners need, and hands
+    incoming messages to them the same way `InProcessBroker` does.
+    """
+
+    def __init__(self, url):
+        import redis
+        super().__init__()
+        self.redis = redis.Redis.from_url(url)
+        self.pubsub = self.redis.pubsub(ignore_subscribe_messages=True)
+        self.listener = None
+
+    def has_subscribers(self, channel):
+        return any(count for _, count in self.redis.pubsub_numsub(channel))
+
+    def publish(self, channel, message):
+        self.redis.publish(channel, json.dumps(message))
+
+    def _receive(self, message):
+        channel = message['channel'].decode()
+        super().publish(channel, json.loads(message['data']))
+
+    def subscribe(self, channel):
+        subscription = super().subscribe(channel)
+        with self.lock:
+            if len(self.subscriptions[channel]) == 1:
+                self.pubsub.subscribe(**{channel: self._receive})
+            if self.listener is None:
+                self.listener = self.pubsub.run_in_thread(sleep_time=0.5, daemon=True)
+        return subscription
+
+    def unsubscribe(self, subscription):
+        super().unsubscribe(subscription)
+        with self.lock:
+            if subscription.channel not in self.subscriptions:
+                self.pubsub.unsubscribe(subscription.channel)
+
+_broker = None
+
+def get_broker():
+    """Return this process's broker, creating it on first use"""
+    global _broker
+    if _broker is None:
+        if settings.LIVE_UPDATES_BROKER == 'redis':
+            _broker = RedisBroker(settings.LIVE_UPDATES_REDIS_URL)
+        else:
+            _broker = InProcessBroker()
+    return _broker
+
+
+# Messages
+
+def get_dashboard_stats(user_id):
+    """The dashboard's summary stats, formatted the way it displays them"""
+    summ_stats = DashboardSummStats(get_todays_tasks(user_id))
+    return {
+        'initial_estimated_time': format_time(summ_stats.initial_estimated_time),
+        'current_estimated_time': format_time(summ_stats.current_estimated_time),
+        'actual_time': format_time(summ_stats.actual_time),
+        'unfinished_time': format_time(summ_stats.unfinished_time),
+    }
+
+def get_task_message(user_id, task_id, task=None):
+    """
+    Describe a change to a task for the dashboard, with `task` set to
+    `None` if it was deleted. `on_dashboard` tells the page whether the
+    task's row belongs in its table (the same rule as `get_todays_tasks`).
+    """
+    message = {
+        'type': 'task',
+        'id': task_id,
+        'deleted': task is None,
+        'on_dashboard': False,
+        'stats': get_dashboard_stats(user_id),
+    }
+    if task is not None:
+        message.update({
+            'on_dashboard': is_todays_task(task),
+            'task': {
+                'task_name': task.task_name,
+                'expected_mins': task.expected_mins,
+                'actual_mins': task.actual_mins,
+                'completed': task.completed,
+            },
+            'edit_url': task.get_edit_task_url(),
+            'delete_url': task.get_delete_task_url(),
+        })
+    return message
+
+def publish_task_change(user_id, task_id, task=None):
+    """Send a task change to the user's open dashboards, if there are any"""
+    broker = get_broker()
+    channel = get_channel(user_id)
+    try:
+        if broker.has_subscribers(channel):
+            broker.publish(channel, get_task_message(user_id, task_id, task))
+    except Exception:
+        # Live updates are best effort; never fail the save because of them
+        logger.exception('Could not publish live update for task %s', task_id)
+
+
+# ASGI endpoint
+
+def format_event(message):
+    return f'event: {message["type"]}\ndata: {json.dumps(message)}\n\n'.encode()
+
+@sync_to_async
+def get_user_id(scope):
+    """Authenticate the request from its Django session cookie"""
+    headers = dict(scope.get('headers', ()))
+    cookie = SimpleCookie(headers.get(b'cookie', b'').decode('latin-1'))
+    morsel = cookie.get(settings.SESSION_COOKIE_NAME)
+    if morsel is None:
+        return None
+
+    close_old_connections()
+    try:
+        session_store = import_string(settings.SESSION_ENGINE).SessionStore
+        user = get_user(SimpleNamespace(session=session_store(morsel.value)))
+    finally:
+        close_old_connections()
+    return user.pk if user.is_authenticated else None
+
+class LiveUpdatesApp(object):
+    """
+    ASGI application that serves the event stream at `LIVE_UPDATES_PATH`
+    and passes every other request on to `application`. Kept outside of
+    Django's request handling because each open stream is a long-lived
+    connection that shouldn't tie up a worker thread.
+    """
+
+    def __init__(self, application):
+        self.application = application
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] == 'http' and scope['path'] == settings.LIVE_UPDATES_PATH:
+            await self.stream(scope, receive, send)
+        else:
+            await self.application(scope, receive, send)
+
+    async def stream(self, scope, receive, send):
+        user_id = await get_user_id(scope)
+        if user_id is None:
+            await send({'type': 'http.response.start', 'status': 403, 'headers': []})
+            await send({'type': 'http.response.body', 'body': b''})
+            return
+
+        subscription = get_broker().subscribe(get_channel(user_id))
+        disconnected = asyncio.ensure_future(self.wait_for_disconnect(receive))
+        try:
+            await send({
+                'type': 'http.response.start',
+                'status': 200,
+                'headers': [
+                    (b'content-type', b'text/event-stream'),
+                    (b'cache-control', b'no-cache'),
+                    (b'x-accel-buffering', b'no'),
+                ],
+            })
+            await send({
+                'type': 'http.response.body',
+                'body': f'retry: {settings.LIVE_UPDATES_RETRY_MS}\n\n'.encode(),
+                'more_body': True,
+            })
+            while not disconnected.done():
+                message = await subscription.get(settings.LIVE_UPDATES_KEEPALIVE_SECONDS)
+                # A comment line keeps proxies from closing an idle stream
+                body = format_event(message) if message else b': keepalive\n\n'
+                await send({'type': 'http.response.body', 'body': body, 'more_body': True})
+        finally:
+            subscription.close()
+            disconnected.cancel()
+
+    async def wait_for_disconnect(self, receive):
+        while (await receive())['type'] != 'http.disconnect':
+            pass
@@ -0,0 +1,36 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from task_time_tracker.utils.archive_helpers import (archive_completed_tasks,
+                                                     get_archive_cutoff)
+
+class Command(BaseCommand):
+    help = (
+        'Move tasks completed more than --days days ago, along with their '
+        'status changes, into the archive tables. Meant to be run on a '
+        'schedule (e.g. daily with Heroku Scheduler).'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--days',
+            type=int,
+            default=settings.TASK_ARCHIVE_AFTER_DAYS,
+            help='Archive tasks completed more than this many days ago',
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=settings.TASK_ARCHIVE_BATCH_SIZE,
+            help='Number of tasks moved per transaction',
+        )
+
+    def handle(self, *args, **options):
+        cutoff = get_archive_cutoff(options['days'])
+        archived_count = archive_completed_tasks(
+            cutoff,
+            batch_size=options['batch_size'],
+        )
+        self.stdout.write(
+            f'Archived {archived_count} tasks completed before {cutoff:%Y-%m-%d}'
+        )
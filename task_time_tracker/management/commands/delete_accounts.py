@@ -0,0 +1,37 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from task_time_tracker.utils.account_deletion import delete_accounts
+
+class Command(BaseCommand):
+    help = (
+        'Delete the data of accounts whose deletion was requested, a batch '
+        'at a time. Safe to interrupt: the next run carries on where it '
+        'stopped. Meant to be run on a schedule (e.g. hourly with Heroku '
+        'Scheduler).'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=settings.ACCOUNT_DELETION_BATCH_SIZE,
+            help='Number of rows deleted per transaction',
+        )
+        parser.add_argument(
+            '--rows-per-second',
+            type=float,
+            default=settings.ACCOUNT_DELETION_ROWS_PER_SECOND,
+            help='Most rows deleted a second, on average (0 for no limit)',
+        )
+
+    def handle(self, *args, **options):
+        deletions = delete_accounts(
+            batch_size=options['batch_size'],
+            rows_per_second=options['rows_per_second'],
+        )
+        for deletion in deletions:
+            self.stdout.write(
+                f'Deleted {deletion.username} ({deletion.rows_deleted} rows)'
+            )
+        self.stdout.write(f'Deleted {len(deletions)} accounts')
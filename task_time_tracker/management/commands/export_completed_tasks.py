@@ -0,0 +1,38 @@
+import csv
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import CommandError
+
+from task_time_tracker.routers import ReplicaReadsCommand
+from task_time_tracker.utils.archive_helpers import get_completed_tasks
+
+FIELDS = [
+    'task_name',
+    'task_category',
+    'task_notes',
+    'expected_mins',
+    'actual_mins',
+    'created_date',
+    'completed_date',
+    'archived',
+]
+
+class Command(ReplicaReadsCommand):
+    help = (
+        "Write a user's completed tasks, including archived ones, as CSV. "
+        'Reads from the replica when one is configured.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('username')
+
+    def handle(self, *args, **options):
+        try:
+            user = get_user_model().objects.get(username=options['username'])
+        except get_user_model().DoesNotExist:
+            raise CommandError(f"No user named {options['username']!r}")
+
+        writer = csv.writer(self.stdout, lineterminator='\n')
+        writer.writerow(FIELDS)
+        for task in get_completed_tasks(user).iterator():
+            writer.writerow([getattr(task, field) for field in FIELDS])
@@ -0,0 +1,22 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from task_time_tracker.utils.recurring import generate_recurring_tasks
+
+class Command(BaseCommand):
+    help = (
+        'Create tasks for every due occurrence of the active recurring '
+        'tasks. Safe to run as often as every minute.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=settings.RECURRING_TASK_BATCH_SIZE,
+            help='Number of recurring tasks processed per query',
+        )
+
+    def handle(self, *args, **options):
+        generated_count = generate_recurring_tasks(batch_size=options['batch_size'])
+        self.stdout.write(f'Generated {generated_count} recurring task occurrences')
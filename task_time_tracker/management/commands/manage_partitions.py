@@ -0,0 +1,58 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from task_time_tracker.utils.partitions import (compact_partitions,
+                                                ensure_partitions,
+                                                expire_partitions,
+                                                is_partitioned)
+
+class Command(BaseCommand):
+    help = (
+        'Create upcoming monthly TaskStatusChange partitions and apply the '
+        'retention policy to old ones. Only does anything on Postgres. '
+        'Meant to be run on a schedule (e.g. daily with Heroku Scheduler).'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--months-ahead',
+            type=int,
+            default=settings.TASK_STATUS_CHANGE_PARTITIONS_AHEAD,
+            help='Number of future months to create partitions for',
+        )
+        parser.add_argument(
+            '--retention-months',
+            type=int,
+            default=settings.TASK_STATUS_CHANGE_RETENTION_MONTHS,
+            help='Detach partitions older than this many months',
+        )
+        parser.add_argument(
+            '--drop',
+            action='store_true',
+            help='Drop expired partitions instead of detaching them',
+        )
+        parser.add_argument(
+            '--compact',
+            action='store_true',
+            help='VACUUM FREEZE partitions for months that have ended',
+        )
+
+    def handle(self, *args, **options):
+        if not is_partitioned():
+            self.stdout.write('TaskStatusChange is not partitioned on this database')
+            return
+
+        for name in ensure_partitions(options['months_ahead']):
+            self.stdout.write(f'Created {name}')
+
+        if options['retention_months'] is not None:
+            expired = expire_partitions(
+                options['retention_months'],
+                drop=options['drop'],
+            )
+            for name in expired:
+                self.stdout.write(f'{"Dropped" if options["drop"] else "Detached"} {name}')
+
+        if options['compact']:
+            for name in compact_partitions():
+                self.stdout.write(f'Compacted {name}')
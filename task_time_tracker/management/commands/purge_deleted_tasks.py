@@ -0,0 +1,35 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from task_time_tracker.utils.trash import get_purge_cutoff, purge_deleted_tasks
+
+class Command(BaseCommand):
+    help = (
+        'Delete tasks that have been in the trash for more than --days days, '
+        'along with their status changes, for good. Meant to be run on a '
+        'schedule (e.g. daily with Heroku Scheduler).'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--days',
+            type=int,
+            default=settings.TASK_PURGE_AFTER_DAYS,
+            help='Purge tasks deleted more than this many days ago',
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=settings.TASK_PURGE_BATCH_SIZE,
+            help='Number of tasks or status changes deleted per transaction',
+        )
+
+    def handle(self, *args, **options):
+        cutoff = get_purge_cutoff(options['days'])
+        purged_count = purge_deleted_tasks(
+            cutoff,
+            batch_size=options['batch_size'],
+        )
+        self.stdout.write(
+            f'Purged {purged_count} tasks deleted before {cutoff:%Y-%m-%d}'
+        )
@@ -0,0 +1,22 @@
+from django.core.management.base import BaseCommand
+
+from task_time_tracker.utils.project_counters import reconcile_project_counters
+
+class Command(BaseCommand):
+    help = (
+        'Recount the task totals cached on every project and fix the ones '
+        'that drifted (e.g. after writes that bypassed Task.save). Safe to '
+        'run while the site is up.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=500,
+            help='Number of projects recounted per transaction',
+        )
+
+    def handle(self, *args, **options):
+        drifted_count = reconcile_project_counters(batch_size=options['batch_size'])
+        self.stdout.write(f'Fixed the counters of {drifted_count} projects')
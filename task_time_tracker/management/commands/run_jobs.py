@@ -0,0 +1,47 @@
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from task_time_tracker.jobs import get_broker, run_job
+
+class Command(BaseCommand):
+    help = 'Run queued background jobs (see task_time_tracker/jobs.py)'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--burst',
+            action='store_true',
+            help='Exit once there are no jobs left to run',
+        )
+        parser.add_argument(
+            '--max-jobs',
+            type=int,
+            default=None,
+            help='Exit after running this many jobs',
+        )
+        parser.add_argument(
+            '--poll-interval',
+            type=float,
+            default=settings.JOB_QUEUE_POLL_INTERVAL,
+            help='Seconds to wait between checks of an empty queue',
+        )
+
+    def handle(self, *args, **options):
+        broker = get_broker()
+        succeeded = failed = 0
+
+        while options['max_jobs'] is None or succeeded + failed < options['max_jobs']:
+            queued_job = broker.reserve()
+            if queued_job is None:
+                if options['burst']:
+                    break
+                time.sleep(options['poll_interval'])
+                continue
+
+            if run_job(broker, queued_job):
+                succeeded += 1
+            else:
+                failed += 1
+
+        self.stdout.write(f'Ran {succeeded + failed} jobs ({failed} failed)')
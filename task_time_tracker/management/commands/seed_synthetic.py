@@ -0,0 +1,81 @@
+from datetime import date, timedelta
+import time
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from task_time_tracker.utils.synthetic import get_username, seed_synthetic
+
+class Command(BaseCommand):
+    help = (
+        'Fill the database with synthetic users, projects, tasks and task '
+        'status histories for scale testing. The same --seed and --end '
+        'always generate the same data. Uses COPY on Postgres.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=100)
+        parser.add_argument(
+            '--tasks-per-user',
+            type=int,
+            default=1000,
+            help='Average number of tasks per user',
+        )
+        parser.add_argument(
+            '--projects-per-user',
+            type=float,
+            default=3,
+            help='Average number of projects per user',
+        )
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument(
+            '--days',
+            type=int,
+            default=365,
+            help='Number of days of history to generate',
+        )
+        parser.add_argument(
+            '--end',
+            type=date.fromisoformat,
+            default=None,
+            help='Last day of history (YYYY-MM-DD), today by default',
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=100_000,
+            help='Number of tasks written at a time',
+        )
+
+    def handle(self, *args, **options):
+        seed = options['seed']
+        if get_user_model().objects.filter(username=get_username(seed, 0)).exists():
+            raise CommandError(
+                f'This database already has the data for --seed {seed}; use another seed'
+            )
+
+        end = options['end'] or timezone.localdate()
+        start = end - timedelta(days=options['days'] - 1)
+        started = time.monotonic()
+
+        def progress(counts):
+            self.stdout.write(
+                f"{counts_summary(counts)} ({time.monotonic() - started:.0f}s)")
+
+        counts = seed_synthetic(
+            users=options['users'],
+            tasks_per_user=options['tasks_per_user'],
+            projects_per_user=options['projects_per_user'],
+            seed=seed,
+            start=start,
+            end=end,
+            batch_size=options['batch_size'],
+            progress=progress if options['verbosity'] > 1 else None,
+        )
+        self.stdout.write(
+            f'Inserted {counts_summary(counts)} in {time.monotonic() - started:.1f}s')
+
+def counts_summary(counts):
+    return ', '.join(
+        f'{count} {model._meta.verbose_name_plural}' for model, count in counts.items())
@@ -0,0 +1,159 @@
+"""
+Request, database and template timings, and task write rates, exposed at
+`/metrics` in the Prometheus text format.
+
+Under gunicorn every worker is a separate process. When the
+`PROMETHEUS_MULTIPROC_DIR` environment variable is set (gunicorn.conf.py
+sets it), each process writes its samples to memory-mapped files in that
+directory, and `/metrics` adds up the files of every process. Otherwise
+samples are kept in this process's memory.
+"""
+from contextlib import ExitStack
+import os
+from time import perf_counter
+
+from django.conf import settings
+from django.db import connections
+from django.http import HttpResponse, HttpResponseForbidden
+from django.template.backends import django as django_backend
+from django.template import TemplateDoesNotExist
+from django.utils.crypto import constant_time_compare
+from prometheus_client import (CONTENT_TYPE_LATEST,
+                               REGISTRY,
+                               CollectorRegistry,
+                               Counter,
+                               Histogram,
+                               generate_latest,
+                               multiprocess)
+
+REQUEST_DURATION = Histogram(
+    'task_time_tracker_request_duration_seconds',
+    'Time spent handling a request, by URL name',
+    ['view', 'method', 'status'],
+)
+REQUEST_QUERIES = Histogram(
+    'task_time_tracker_request_queries',
+    'Number of database queries made by a request, by URL name',
+    ['view'],
+    buckets=(0, 1, 2, 5, 10, 20, 50, 100, 200, 500),
+)
+REQUEST_DB_DURATION = Histogram(
+    'task_time_tracker_request_db_duration_seconds',
+    'Time a request spent waiting on the database, by URL name',
+    ['view'],
+)
+TEMPLATE_RENDER_DURATION = Histogram(
+    'task_time_tracker_template_render_duration_seconds',
+    'Time spent rendering a template, including the templates it includes',
+    ['template'],
+)
+TASK_WRITES = Counter(
+    'task_time_tracker_task_writes',
+    'Tasks created, updated and deleted',
+    ['operation'],
+)
+TASK_STATUS_CHANGE_WRITES = Counter(
+    'task_time_tracker_task_status_change_writes',
+    'TaskStatusChange rows created',
+)
+
+UNMATCHED_VIEW = '<unmatched>'
+# Methods are labelled as sent only if they're one of these, so clients
+# can't create a series per made-up method
+KNOWN_METHODS = frozenset(
+    ['GET', 'HEAD', 'POST', 'PUT', 'PATCH', 'DELETE', 'OPTIONS', 'TRACE', 'CONNECT'])
+OTHER_METHOD = 'other'
+
+def get_registry():
+    """The registry to read samples from"""
+    if 'PROMETHEUS_MULTIPROC_DIR' in os.environ:
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+        return registry
+    return REGISTRY
+
+def get_view_name(request):
+    resolver_match = getattr(request, 'resolver_match', None)
+    if resolver_match is None:
+        return UNMATCHED_VIEW
+    return resolver_match.view_name
+
+def get_method_label(request):
+    return request.method if request.method in KNOWN_METHODS else OTHER_METHOD
+
+class QueryTimer:
+    """`execute_wrapper` that counts queries and the time they take"""
+
+    def __init__(self):
+        self.count = 0
+        self.duration = 0.0
+
+    def __call__(self, execute, sql, params, many, context):
+        start = perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.count += 1
+            self.duration += perf_counter() - start
+
+class MetricsMiddleware:
+    """Time each request and its queries. Goes first in `MIDDLEWARE`."""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        query_timer = QueryTimer()
+        start = perf_counter()
+        status = 500
+        try:
+            with ExitStack() as stack:
+                for connection in connections.all():
+                    stack.enter_context(connection.execute_wrapper(query_timer))
+                response = self.get_response(request)
+            status = response.status_code
+            return response
+        finally:
+            view = get_view_name(request)
+            REQUEST_DURATION.labels(view, get_method_label(request), status).observe(
+                perf_counter() - start)
+            REQUEST_QUERIES.labels(view).observe(query_timer.count)
+            REQUEST_DB_DURATION.labels(view).observe(query_timer.duration)
+
+class Template(django_backend.Template):
+
+    def render(self, context=None, request=None):
+        start = perf_counter()
+        try:
+            return super().render(context, request)
+        finally:
+            template_name = self.origin.template_name or '<string>'
+            TEMPLATE_RENDER_DURATION.labels(template_name).observe(
+                perf_counter() - start)
+
+class DjangoTemplates(django_backend.DjangoTemplates):
+    """The Django template backend, timing each template it renders"""
+
+    def from_string(self, template_code):
+        return Template(self.engine.from_string(template_code), self)
+
+    def get_template(self, template_name):
+        try:
+            return Template(self.engine.get_template(template_name), self)
+        except TemplateDoesNotExist as exc:
+            django_backend.reraise(exc, self)
+
+def metrics_view(request):
+    """Every metric, in the Prometheus text format. Without a
+    `METRICS_TOKEN` they're only served with `DEBUG` on."""
+    if not settings.METRICS_TOKEN:
+        if not settings.DEBUG:
+            return HttpResponseForbidden()
+    elif not constant_time_compare(
+            request.headers.get('Authorization', ''),
+            f'Bearer {settings.METRICS_TOKEN}'):
+        return HttpResponseForbidden()
+    return HttpResponse(
+        generate_latest(get_registry()),
+        content_type=CONTENT_TYPE_LATEST,
+    )
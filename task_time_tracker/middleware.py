@@ -0,0 +1,99 @@
+from django.conf import settings
+from django.utils.cache import patch_vary_headers
+
+from task_time_tracker import compression, routers, slow_queries
+
+class CompressionMiddleware:
+    """
+    Compress dynamic responses with brotli or gzip (see
+    `task_time_tracker/compression.py`). Goes before any middleware that
+    reads or changes the response body.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        response = self.get_response(request)
+        if not compression.is_compressible(response):
+            return response
+        patch_vary_headers(response, ('Accept-Encoding',))
+
+        if not response.streaming and len(response.content) < settings.COMPRESSION_MIN_BYTES:
+            return response
+        encoding = compression.choose_encoding(request.META.get('HTTP_ACCEPT_ENCODING', ''))
+        if encoding is None:
+            return response
+
+        if response.streaming:
+            response.streaming_content = compression.compress_stream(
+                response.streaming_content, encoding)
+            del response.headers['Content-Length']
+        else:
+            content = compression.compress(response.content, encoding)
+            if len(content) >= len(response.content):
+                return response
+            response.content = content
+            response.headers['Content-Length'] = str(len(content))
+
+        # The bytes differ from the uncompressed response's, so a strong
+        # ETag can't be shared between them
+        etag = response.get('ETag')
+        if etag and etag.startswith('"'):
+            response.headers['ETag'] = 'W/' + etag
+        response.headers['Content-Encoding'] = encoding
+        return response
+
+class ReplicaMiddleware:
+    """
+    Read designated views (see `task_time_tracker/routers.py`) from the
+    replica, and keep a user on `default` for a little while after they
+    write. Goes after `AuthenticationMiddleware`.
+    """
+    SAFE_METHODS = ('GET', 'HEAD', 'OPTIONS')
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        try:
+            response = self.get_response(request)
+        finally:
+            # Covers rendering `TemplateResponse`s, which happens after the
+            # view returns
+            token = getattr(request, '_replica_token', None)
+            if token is not None:
+                routers.stop_reading_from_replica(token)
+
+        if (request.method not in self.SAFE_METHODS
+                and routers.get_replica_alias() is not None
+                and request.user.is_authenticated):
+            routers.stick_to_primary(request)
+        return response
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        if (request.method in self.SAFE_METHODS
+                and routers.is_replica_view(view_func)
+                and not routers.is_stuck_to_primary(request)):
+            request._replica_token = routers.start_reading_from_replica()
+        return None
+
+class SlowQueryMiddleware:
+    """Attribute slow queries (see `task_time_tracker/slow_queries.py`) to
+    the view they ran in"""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        try:
+            return self.get_response(request)
+        finally:
+            token = getattr(request, '_slow_query_view_token', None)
+            if token is not None:
+                slow_queries.reset_current_view(token)
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        request._slow_query_view_token = slow_queries.set_current_view(
+            request.resolver_match.view_name)
+        return None
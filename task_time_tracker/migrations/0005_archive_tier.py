@@ -0,0 +1,68 @@
+# Generated by Django 4.1.4 on 2026-10-19 02:07
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('task_time_tracker', '0004_alter_task_priority'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ArchivedTask',
+            fields=[
+                ('id', models.BigIntegerField(primary_key=True, serialize=False)),
+                ('task_name', models.CharField(max_length=60)),
+                ('task_category', models.TextField(blank=True)),
+                ('task_notes', models.TextField(blank=True)),
+                ('expected_mins', models.IntegerField()),
+                ('actual_mins', models.IntegerField(blank=True, null=True)),
+                ('completed', models.BooleanField(default=True)),
+                ('active', models.BooleanField(default=False)),
+                ('priority', models.IntegerField(blank=True, choices=[(None, '—-'), (3, 'High'), (2, 'Medium'), (1, 'Low')], null=True)),
+                ('created_date', models.DateTimeField()),
+                ('completed_date', models.DateTimeField(null=True)),
+                ('archived_date', models.DateTimeField(default=django.utils.timezone.now)),
+            ],
+            options={
+                'ordering': ['-created_date'],
+            },
+        ),
+        migrations.CreateModel(
+            name='ArchivedTaskStatusChange',
+            fields=[
+                ('id', models.BigIntegerField(primary_key=True, serialize=False)),
+                ('active_datetime', models.DateTimeField(blank=True, null=True)),
+                ('inactive_datetime', models.DateTimeField(blank=True, null=True)),
+                ('completed_datetime', models.DateTimeField(blank=True, null=True)),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name='task',
+            index=models.Index(fields=['completed', 'completed_date'], name='task_time_t_complet_2c9ac9_idx'),
+        ),
+        migrations.AddField(
+            model_name='archivedtaskstatuschange',
+            name='task',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='task_time_tracker.archivedtask'),
+        ),
+        migrations.AddField(
+            model_name='archivedtask',
+            name='project',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, to='task_time_tracker.project'),
+        ),
+        migrations.AddField(
+            model_name='archivedtask',
+            name='user',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.AddIndex(
+            model_name='archivedtask',
+            index=models.Index(fields=['user', 'completed_date'], name='task_time_t_user_id_2d96f9_idx'),
+        ),
+    ]
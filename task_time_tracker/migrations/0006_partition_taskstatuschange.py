@@ -0,0 +1,63 @@
+# Generated by Django 4.1.4 on 2026-10-19 02:09
+
+from django.db import migrations, models
+from django.db.models import OuterRef, Subquery
+from django.db.models.functions import Coalesce
+import django.utils.timezone
+
+from task_time_tracker.utils.partitions import partition_table, unpartition_table
+
+
+def backfill_created_datetime(apps, schema_editor):
+    """Date existing status changes by their own timestamps, falling back
+    to the task's created date for rows that have none"""
+    TaskStatusChange = apps.get_model('task_time_tracker', 'TaskStatusChange')
+    Task = apps.get_model('task_time_tracker', 'Task')
+
+    task_created_date = Task.objects.filter(pk=OuterRef('task_id')).values('created_date')
+    TaskStatusChange.objects.update(
+        created_datetime=Coalesce(
+            'completed_datetime',
+            'active_datetime',
+            'inactive_datetime',
+            Subquery(task_created_date),
+        )
+    )
+
+
+def partition(apps, schema_editor):
+    partition_table(schema_editor)
+
+
+def unpartition(apps, schema_editor):
+    unpartition_table(schema_editor)
+
+
+class Migration(migrations.Migration):
+
+    # Each step gets its own transaction: Postgres refuses to rename a table
+    # that has pending deferred-constraint events from the backfill
+    atomic = False
+
+    dependencies = [
+        ('task_time_tracker', '0005_archive_tier'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='archivedtaskstatuschange',
+            name='created_datetime',
+            field=models.DateTimeField(default=django.utils.timezone.now),
+        ),
+        migrations.AddField(
+            model_name='taskstatuschange',
+            name='created_datetime',
+            field=models.DateTimeField(default=django.utils.timezone.now),
+        ),
+        migrations.RunPython(
+            backfill_created_datetime,
+            migrations.RunPython.noop,
+            atomic=True,
+        ),
+        migrations.RunPython(partition, unpartition, atomic=True),
+    ]
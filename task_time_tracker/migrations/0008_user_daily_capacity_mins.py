@@ -0,0 +1,18 @@
+# Generated by Django 4.1.4 on 2026-10-19 02:16
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('task_time_tracker', '0007_job'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='user',
+            name='daily_capacity_mins',
+            field=models.IntegerField(default=480),
+        ),
+    ]
@@ -0,0 +1,57 @@
+# Generated by Django 4.1.4 on 2026-10-19 02:17
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('task_time_tracker', '0008_user_daily_capacity_mins'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RecurringTask',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('task_name', models.CharField(max_length=60)),
+                ('task_notes', models.TextField(blank=True)),
+                ('expected_mins', models.IntegerField()),
+                ('priority', models.IntegerField(blank=True, choices=[(None, '—-'), (3, 'High'), (2, 'Medium'), (1, 'Low')], null=True)),
+                ('cron_expression', models.CharField(max_length=100)),
+                ('active', models.BooleanField(default=True)),
+                ('next_run_date', models.DateTimeField(blank=True)),
+                ('created_date', models.DateTimeField(auto_now_add=True)),
+            ],
+        ),
+        migrations.AddField(
+            model_name='task',
+            name='occurrence',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='recurringtask',
+            name='project',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, to='task_time_tracker.project'),
+        ),
+        migrations.AddField(
+            model_name='recurringtask',
+            name='user',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.AddField(
+            model_name='task',
+            name='recurring_task',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, to='task_time_tracker.recurringtask'),
+        ),
+        migrations.AddIndex(
+            model_name='recurringtask',
+            index=models.Index(fields=['active', 'next_run_date'], name='task_time_t_active_fa144b_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='task',
+            constraint=models.UniqueConstraint(fields=('recurring_task', 'occurrence'), name='unique_recurring_task_occurrence'),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 4.1.4 on 2026-10-19 02:38
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('task_time_tracker', '0009_recurring_task'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='user',
+            name='time_zone',
+            field=models.CharField(default='America/New_York', max_length=63),
+        ),
+    ]
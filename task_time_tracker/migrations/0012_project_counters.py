@@ -0,0 +1,65 @@
+# Generated by Django 4.1.4 on 2026-10-19 03:02
+
+from django.db import migrations, models
+from django.db.models import Count, Q, Sum
+
+COUNTERS = ('task_count', 'open_task_count', 'expected_mins', 'actual_mins')
+
+def count_project_tasks(apps, schema_editor):
+    """Fill in the counters from the live and archived tasks"""
+    Project = apps.get_model('task_time_tracker', 'Project')
+    totals = {}
+    for model_name in ('Task', 'ArchivedTask'):
+        model = apps.get_model('task_time_tracker', model_name)
+        rows = (model.objects
+                    .filter(project__isnull=False)
+                    .values('project_id')
+                    .annotate(
+                        task_count=Count('id'),
+                        open_task_count=Count('id', filter=Q(completed=False)),
+                        expected_mins=Sum('expected_mins'),
+                        actual_mins=Sum('actual_mins'),
+                    )
+                    .order_by()
+        )
+        for row in rows:
+            project_totals = totals.setdefault(row['project_id'], [0, 0, 0, 0])
+            for index, name in enumerate(COUNTERS):
+                project_totals[index] += row[name] or 0
+
+    projects = list(Project.objects.filter(pk__in=totals).only('pk'))
+    for project in projects:
+        for name, total in zip(COUNTERS, totals[project.pk]):
+            setattr(project, name, total)
+    Project.objects.bulk_update(projects, COUNTERS, batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('task_time_tracker', '0011_slow_query'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='project',
+            name='actual_mins',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='project',
+            name='expected_mins',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='project',
+            name='open_task_count',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='project',
+            name='task_count',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.RunPython(count_project_tasks, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 4.1.4 on 2026-10-19 03:27
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('task_time_tracker', '0015_sync'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='user',
+            name='changed_date',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 4.1.4 on 2026-10-19 03:39
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('task_time_tracker', '0016_user_changed_date'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='task',
+            index=models.Index(fields=['task_name'], name='task_name_pattern_idx', opclasses=['varchar_pattern_ops']),
+        ),
+    ]
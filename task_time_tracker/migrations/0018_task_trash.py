@@ -0,0 +1,22 @@
+# Generated by Django 4.1.4 on 2026-10-19 03:48
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('task_time_tracker', '0017_task_name_pattern_index'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='task',
+            name='deleted_date',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddIndex(
+            model_name='task',
+            index=models.Index(condition=models.Q(('deleted_date__isnull', False)), fields=['deleted_date'], name='task_deleted_date_idx'),
+        ),
+    ]
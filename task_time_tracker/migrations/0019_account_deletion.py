@@ -0,0 +1,26 @@
+# Generated by Django 4.1.4 on 2026-10-19 03:58
+
+from django.db import migrations, models
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('task_time_tracker', '0018_task_trash'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AccountDeletion',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('user_id', models.BigIntegerField(unique=True)),
+                ('username', models.CharField(max_length=150)),
+                ('requested_date', models.DateTimeField(default=django.utils.timezone.now)),
+                ('rows_deleted', models.BigIntegerField(default=0)),
+                ('last_batch_date', models.DateTimeField(blank=True, null=True)),
+                ('completed_date', models.DateTimeField(blank=True, null=True)),
+            ],
+        ),
+    ]
@@ -1,14 +1,90 @@
-from datetime import datetime
+from datetime import datetime, timedelta
+import zoneinfo
 
+from croniter import croniter
+from django.conf import settings
 from django.contrib.auth.models import AbstractUser
-from django.db import models
+from django.db import connections, models, router, transaction
 from django.urls import reverse
 from django.utils import timezone
 from django.utils.translation import gettext_lazy as _
 
 class User(AbstractUser):
+
+    # Minutes of task work planned per day (see `utils.planner`)
+    daily_capacity_mins = models.IntegerField(default=8 * 60)
+
+    # IANA time zone name, used to group history into days (`utils.trends`)
+    time_zone = models.CharField(max_length=63, default=settings.TIME_ZONE)
+
+    # Last change sequence number handed out to the user's tasks and
+    # projects, and when (see `utils.sync` and `conditional`)
+    change_seq = models.BigIntegerField(default=0)
+    changed_date = models.DateTimeField(blank=True, null=True)
+
     class Meta:
         db_table = 'auth_user'
+        indexes = [
+            # Prefix searches in the admin (`user__username__startswith`)
+            models.Index(fields=['username'], name='username_pattern_idx',
+                         opclasses=['varchar_pattern_ops']),
+        ]
+
+    # Only written by `next_change_seq`
+    CHANGE_FIELDS = ('change_seq', 'changed_date')
+
+    def save(self, *args, **kwargs):
+        """Save, leaving out the change sequence fields. The in-memory copy
+        of them may be out of date, and writing it back would make the
+        sequence go backwards."""
+        if not self._state.adding and not kwargs.get('force_insert'):
+            update_fields = kwargs.get('update_fields')
+            if update_fields is None:
+                update_fields = [field.name for field in self._meta.concrete_fields
+                                 if not field.primary_key]
+            kwargs['update_fields'] = [
+                field_name for field_name in update_fields
+                if field_name not in self.CHANGE_FIELDS
+            ]
+        super().save(*args, **kwargs)
+
+    @classmethod
+    def next_change_seq(cls, user_id):
+        """
+        Increment and return the user's change sequence number, and set
+        `changed_date`. The `UPDATE` locks the user's row until the
+        transaction ends, so one user's changes commit in sequence order.
+        """
+        connection = connections[router.db_for_write(cls)]
+        now = timezone.now()
+        if connection.vendor in ('postgresql', 'sqlite'):
+            table = connection.ops.quote_name(cls._meta.db_table)
+            with connection.cursor() as cursor:
+                cursor.execute(
+                    f'UPDATE {table} SET change_seq = change_seq + 1, changed_date = %s '
+                    f'WHERE id = %s RETURNING change_seq',
+                    [connection.ops.adapt_datetimefield_value(now), user_id],
+                )
+                row = cursor.fetchone()
+            return row[0] if row else 0
+        users = cls.objects.filter(pk=user_id)
+        users.update(change_seq=models.F('change_seq') + 1, changed_date=now)
+        return users.values_list('change_seq', flat=True).first() or 0
+
+    def get_time_zone(self):
+        """The user's time zone, or the site's if theirs isn't valid"""
+        try:
+            return zoneinfo.ZoneInfo(self.time_zone)
+        except (zoneinfo.ZoneInfoNotFoundError, ValueError):
+            return timezone.get_default_timezone()
+
+class TaskStatusChangeQuerySet(models.QuerySet):
+
+    def between(self, start, end):
+        """Filter to status changes recorded in [start, end). Filtering on
+        the partition key lets Postgres skip partitions outside the window.
+        """
+        return self.filter(created_datetime__gte=start, created_datetime__lt=end)
 
 class TaskStatusChange(models.Model):
     
@@ -19,6 +95,18 @@ class TaskStatusChange(models.Model):
 
     completed_datetime = models.DateTimeField(blank=True, null=True)
 
+    # When the change was recorded. On Postgres the table is partitioned
+    # by month on this column (see `utils.partitions`).
+    created_datetime = models.DateTimeField(default=timezone.now)
+
+    objects = TaskStatusChangeQuerySet.as_manager()
+
+class TaskManager(models.Manager):
+    """Leaves out tasks in the trash (see `utils.trash`)"""
+
+    def get_queryset(self):
+        return super().get_queryset().filter(deleted_date=None)
+
 class Task(models.Model):
 
     user = models.ForeignKey(User, on_delete=models.CASCADE, default=1)
@@ -36,6 +124,16 @@ class Task(models.Model):
         null=True,
     )
 
+    # Parent task, for subtasks. Time is rolled up the tree by
+    # `utils.rollups`.
+    parent = models.ForeignKey(
+        'self',
+        on_delete=models.CASCADE,
+        blank=True,
+        null=True,
+        related_name='subtasks',
+    )
+
     # Completion durations
     expected_mins = models.IntegerField()
     actual_mins = models.IntegerField(null=True, blank=True)
@@ -64,58 +162,144 @@ class Task(models.Model):
         null=True,
     )
 
+    # Set on tasks generated from a `RecurringTask`
+    recurring_task = models.ForeignKey(
+        'RecurringTask',
+        on_delete=models.SET_NULL,
+        blank=True,
+        null=True,
+    )
+    occurrence = models.DateTimeField(blank=True, null=True)
+
+    # The user's `change_seq` when the task was last saved (see `utils.sync`)
+    change_seq = models.BigIntegerField(default=0)
+
+    # When the task was moved to the trash. Trashed tasks are left out of
+    # `objects` and deleted for good by `manage.py purge_deleted_tasks`.
+    deleted_date = models.DateTimeField(blank=True, null=True)
+
+    # Tasks that have to be completed before this one can start (see
+    # `utils.critical_path`)
+    depends_on = models.ManyToManyField(
+        'self',
+        through='TaskDependency',
+        through_fields=('task', 'depends_on'),
+        symmetrical=False,
+        blank=True,
+        related_name='dependents',
+    )
+
+    objects = TaskManager()
+    # Including the trash
+    all_objects = models.Manager()
+
     class Meta:
         ordering = ['-created_date']
+        indexes = [
+            models.Index(fields=['completed', 'completed_date']),
+            models.Index(fields=['user', 'change_seq', 'id']),
+            # Prefix searches in the admin (`task_name__startswith`)
+            models.Index(fields=['task_name'], name='task_name_pattern_idx',
+                         opclasses=['varchar_pattern_ops']),
+            # Only the trash, for purging it
+            models.Index(fields=['deleted_date'], name='task_deleted_date_idx',
+                         condition=models.Q(deleted_date__isnull=False)),
+        ]
+        constraints = [
+            # Makes generating recurring tasks idempotent
+            models.UniqueConstraint(
+                fields=['recurring_task', 'occurrence'],
+                name='unique_recurring_task_occurrence',
+            ),
+        ]
 
     def __str__(self):
         return f'{self.id} "{self.task_name}" created on {self.created_date.strftime("%m/%d/%y")}'
     
+    # Fields that feed the project's counters (see `utils.project_counters`)
+    COUNTED_FIELDS = ('project_id', 'completed', 'expected_mins', 'actual_mins')
+
     def __init__(self, *args, **kwargs):
         """Store old active values to see if they change"""
         super(Task, self).__init__(*args, **kwargs)
         self.old_active = self.active
         self.old_completed = self.completed
-    
+        self.counted_values = self.get_counted_values()
+
+    def get_counted_values(self):
+        """The values of `COUNTED_FIELDS`, or `None` if any are deferred"""
+        if any(name not in self.__dict__ for name in self.COUNTED_FIELDS):
+            return None
+        return tuple(self.__dict__[name] for name in self.COUNTED_FIELDS)
+
+    def refresh_from_db(self, using=None, fields=None):
+        super(Task, self).refresh_from_db(using=using, fields=fields)
+        if fields is None or self.counted_values is None:
+            self.counted_values = self.get_counted_values()
+        else:
+            self.counted_values = tuple(
+                self.__dict__[name] if name in fields or name.removesuffix('_id') in fields else old
+                for name, old in zip(self.COUNTED_FIELDS, self.counted_values)
+            )
+
     def save(self, *args, **kwargs):
         """Create TaskActivity instance if active changes"""
-        super(Task, self).save(*args, **kwargs)
-        self.check_active_status()
-        self.check_completed_status()
-        self.enforce_completed_active_exclusivity()
+        # Atomic so that the project counter updates made by the post_save
+        # signal commit with the row
+        with transaction.atomic():
+            derived_values = (self.completed_date, self.active)
+            status_changes = [*self.check_active_status(), *self.check_completed_status()]
+            self.enforce_completed_active_exclusivity()
+
+            self.change_seq = User.next_change_seq(self.user_id)
+            if kwargs.get('update_fields') is not None:
+                kwargs['update_fields'] = {*kwargs['update_fields'], 'change_seq'}
+                # The checks above may have changed these too
+                if (self.completed_date, self.active) != derived_values:
+                    kwargs['update_fields'] |= {'completed_date', 'active'}
+            super(Task, self).save(*args, **kwargs)
+
+            for status_change in status_changes:
+                status_change.task = self
+                status_change.save()
     
     def check_active_status(self):
         """Check if the `.active` property of the instance changed. If so, 
-        create a TaskStatusChange instance.
+        return an unsaved TaskStatusChange instance for it.
         """
         if self.old_active == False and self.active == True:
-            TaskStatusChange.objects.create(
-                task=self,
-                active_datetime=timezone.now(),
-            )
+            changed_datetime = timezone.now()
+            return [TaskStatusChange(
+                active_datetime=changed_datetime,
+                created_datetime=changed_datetime,
+            )]
         elif self.old_active == True and self.active == False:
-            TaskStatusChange.objects.create(
-                task=self,
-                inactive_datetime=timezone.now(),
-            )
+            changed_datetime = timezone.now()
+            return [TaskStatusChange(
+                inactive_datetime=changed_datetime,
+                created_datetime=changed_datetime,
+            )]
+        return []
 
     def check_completed_status(self):
         """Check if the `.completed` property of the instanced changed. If so, 
-        create a TaskStatusChange instance and update the `.completed_date` 
-        property.
+        update the `.completed_date` property and return an unsaved
+        TaskStatusChange instance for it.
         """
         completed_changed = self.old_completed == False and self.completed == True
         completed_wo_date = self.completed and not self.completed_date
         
         if completed_changed or completed_wo_date:
             self.completed_date = timezone.now()
-            status_change = TaskStatusChange.objects.create(
-                task=self,
+            return [TaskStatusChange(
                 completed_datetime=self.completed_date,
-            )
+                created_datetime=self.completed_date,
+            )]
 
         elif self.old_completed == True and self.completed == False:
-            TaskStatusChange.objects.create(task=self)
             self.completed_date = None
+            return [TaskStatusChange()]
+        return []
     
     def enforce_completed_active_exclusivity(self):
         """If `completed` is `True`, set `active` to False."""
@@ -128,6 +312,26 @@ class Task(models.Model):
     def get_delete_task_url(self):
         return reverse('delete_task', kwargs={'pk': self.id})
 
+class TaskDependency(models.Model):
+    """`task` can't start until `depends_on` is completed"""
+
+    task = models.ForeignKey(
+        Task, on_delete=models.CASCADE, related_name='dependency_links')
+    depends_on = models.ForeignKey(
+        Task, on_delete=models.CASCADE, related_name='dependent_links')
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=['task', 'depends_on'],
+                name='unique_task_dependency',
+            ),
+            models.CheckConstraint(
+                check=~models.Q(task=models.F('depends_on')),
+                name='task_dependency_not_self',
+            ),
+        ]
+
 class Project(models.Model):
 
     user = models.ForeignKey(User, on_delete=models.CASCADE, default=1)
@@ -143,6 +347,353 @@ class Project(models.Model):
     start_date = models.DateField(blank=True, null=True)
     end_date = models.DateField(blank=True, null=True)
     completed_date = models.DateTimeField(blank=True, null=True)
-    
+
+    # Parent project, for sub-projects. Sub-projects are kept if their
+    # parent is deleted.
+    parent = models.ForeignKey(
+        'self',
+        on_delete=models.SET_NULL,
+        blank=True,
+        null=True,
+        related_name='subprojects',
+    )
+
+    # Totals over the project's tasks, archived ones included. Kept
+    # current by `utils.project_counters`; `manage.py
+    # reconcile_project_counters` repairs any drift.
+    task_count = models.IntegerField(default=0)
+    open_task_count = models.IntegerField(default=0)
+    expected_mins = models.IntegerField(default=0)
+    actual_mins = models.IntegerField(default=0)
+
+    # The user's `change_seq` when the project was last saved (see
+    # `utils.sync`)
+    change_seq = models.BigIntegerField(default=0)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['user', 'change_seq', 'id']),
+            # Prefix searches in the admin (`name__startswith`)
+            models.Index(fields=['name'], name='project_name_pattern_idx',
+                         opclasses=['varchar_pattern_ops']),
+        ]
+
+    def __str__(self):
+        return self.name
+
+    def save(self, *args, **kwargs):
+        with transaction.atomic():
+            self.change_seq = User.next_change_seq(self.user_id)
+            if kwargs.get('update_fields') is not None:
+                kwargs['update_fields'] = {*kwargs['update_fields'], 'change_seq'}
+            super(Project, self).save(*args, **kwargs)
+
+class Tombstone(models.Model):
+    """A deleted (or archived) task or project, kept so clients syncing
+    the user's data (`utils.sync`) learn it's gone"""
+
+    class Kind(models.TextChoices):
+        TASK = 'task', _('Task')
+        PROJECT = 'project', _('Project')
+
+    user = models.ForeignKey(User, on_delete=models.CASCADE)
+    kind = models.CharField(max_length=10, choices=Kind.choices)
+    object_id = models.BigIntegerField()
+
+    # Archived tasks still exist, in `ArchivedTask`
+    archived = models.BooleanField(default=False)
+
+    change_seq = models.BigIntegerField()
+    deleted_date = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['user', 'change_seq', 'id']),
+        ]
+
+class RecurringTask(models.Model):
+    """Template for a task that is created again on a cron schedule by
+    `manage.py generate_recurring_tasks`"""
+
+    user = models.ForeignKey(User, on_delete=models.CASCADE)
+
+    # Copied onto each generated task
+    task_name = models.CharField(max_length=60)
+    task_notes = models.TextField(blank=True)
+    expected_mins = models.IntegerField()
+    priority = models.IntegerField(
+        choices=Task.Priority.choices,
+        blank=True,
+        null=True,
+    )
+    project = models.ForeignKey(
+        'Project',
+        on_delete=models.SET_NULL,
+        blank=True,
+        null=True,
+    )
+
+    # Schedule, e.g. '0 9 * * 1-5' for 9am on weekdays (in TIME_ZONE)
+    cron_expression = models.CharField(max_length=100)
+    active = models.BooleanField(default=True)
+
+    # Next occurrence that hasn't been generated yet
+    next_run_date = models.DateTimeField(blank=True)
+
+    created_date = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['active', 'next_run_date']),
+        ]
+
+    def __str__(self):
+        return f'{self.task_name} ({self.cron_expression})'
+
+    def save(self, *args, **kwargs):
+        """Schedule the first occurrence of new templates"""
+        if self.next_run_date is None:
+            self.next_run_date = self.get_next_occurrence(timezone.now())
+        super(RecurringTask, self).save(*args, **kwargs)
+
+    def get_next_occurrence(self, after):
+        """Return the first scheduled time after `after`, evaluating the
+        cron expression in the current time zone"""
+        schedule = croniter(self.cron_expression, timezone.localtime(after))
+        return schedule.get_next(datetime)
+
+    def get_due_occurrences(self, now, limit=None):
+        """
+        Return the scheduled times from `next_run_date` up to `now`, oldest
+        first, or with `limit` only the last `limit` of them. Those are
+        found by walking the schedule back from `now`, so a template that
+        was missed for a long time costs at most `limit` steps.
+        """
+        if self.next_run_date > now:
+            return []
+        if limit is None:
+            occurrences = []
+            occurrence = self.next_run_date
+            while occurrence <= now:
+                occurrences.append(occurrence)
+                occurrence = self.get_next_occurrence(occurrence)
+            return occurrences
+
+        # Starting just after `now` includes an occurrence at `now` itself
+        schedule = croniter(self.cron_expression,
+                            timezone.localtime(now) + timedelta(seconds=1))
+        occurrences = []
+        while len(occurrences) < limit:
+            occurrence = schedule.get_prev(datetime)
+            if occurrence > now:
+                continue
+            if occurrence <= self.next_run_date:
+                # The first due time, even if the schedule has changed since
+                occurrences.append(self.next_run_date)
+                break
+            occurrences.append(occurrence)
+        return occurrences[::-1]
+
+    def build_task(self, occurrence):
+        """Return an unsaved `Task` for one occurrence"""
+        return Task(
+            user_id=self.user_id,
+            task_name=self.task_name,
+            task_notes=self.task_notes,
+            expected_mins=self.expected_mins,
+            priority=self.priority,
+            project_id=self.project_id,
+            recurring_task=self,
+            occurrence=occurrence,
+        )
+
+
+# Archive tier
+
+class ArchivedTask(models.Model):
+    """Completed task moved out of the `Task` table by the `archive_tasks`
+    management command. Field names mirror `Task` so the two tables can be
+    queried together (see `utils.archive_helpers.get_completed_tasks`).
+    """
+
+    # Keeps the primary key the task had in the `Task` table
+    id = models.BigIntegerField(primary_key=True)
+
+    user = models.ForeignKey(User, on_delete=models.CASCADE)
+
+    # Text values
+    task_name = models.CharField(max_length=60)
+    task_category = models.TextField(blank=True)
+    task_notes = models.TextField(blank=True)
+
+    # Related project
+    project = models.ForeignKey(
+        'Project',
+        on_delete=models.SET_NULL,
+        blank=True,
+        null=True,
+    )
+
+    # Completion durations
+    expected_mins = models.IntegerField()
+    actual_mins = models.IntegerField(null=True, blank=True)
+
+    # Status
+    completed = models.BooleanField(default=True)
+    active = models.BooleanField(default=False)
+    priority = models.IntegerField(
+        choices=Task.Priority.choices,
+        blank=True,
+        null=True,
+    )
+
+    # Dates
+    created_date = models.DateTimeField()
+    completed_date = models.DateTimeField(null=True)
+    archived_date = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        ordering = ['-created_date']
+        indexes = [
+            models.Index(fields=['user', 'completed_date']),
+        ]
+
+    def __str__(self):
+        return f'{self.id} "{self.task_name}" archived on {self.archived_date.strftime("%m/%d/%y")}'
+
+    @classmethod
+    def from_task(cls, task, archived_date=None):
+        """Build an unsaved `ArchivedTask` from a `Task` instance"""
+        return cls(
+            archived_date=archived_date or timezone.now(),
+            **{field: getattr(task, field) for field in cls.shared_fields()},
+        )
+
+    @classmethod
+    def shared_fields(cls):
+        """Return the attribute names that exist on both `Task` and
+        `ArchivedTask`, in `Task` field order.
+        """
+        archived_attnames = {field.attname for field in cls._meta.concrete_fields}
+        return [
+            field.attname for field in Task._meta.concrete_fields
+            if field.attname in archived_attnames
+        ]
+
+class ArchivedTaskStatusChange(models.Model):
+
+    # Keeps the primary key the row had in the `TaskStatusChange` table
+    id = models.BigIntegerField(primary_key=True)
+
+    task = models.ForeignKey('ArchivedTask', on_delete=models.CASCADE)
+
+    active_datetime = models.DateTimeField(blank=True, null=True)
+    inactive_datetime = models.DateTimeField(blank=True, null=True)
+
+    completed_datetime = models.DateTimeField(blank=True, null=True)
+
+    created_datetime = models.DateTimeField(default=timezone.now)
+
+    @classmethod
+    def from_status_change(cls, status_change):
+        """Build an unsaved `ArchivedTaskStatusChange` from a
+        `TaskStatusChange` instance
+        """
+        return cls(
+            id=status_change.id,
+            task_id=status_change.task_id,
+            active_datetime=status_change.active_datetime,
+            inactive_datetime=status_change.inactive_datetime,
+            completed_datetime=status_change.completed_datetime,
+            created_datetime=status_change.created_datetime,
+        )
+
+
+# Background jobs
+
+class Job(models.Model):
+    """A queued call to a function registered in `jobs.py`"""
+
+    class Status(models.TextChoices):
+        QUEUED = 'queued', _('Queued')
+        RUNNING = 'running', _('Running')
+        SUCCEEDED = 'succeeded', _('Succeeded')
+        FAILED = 'failed', _('Failed')
+
+    name = models.CharField(max_length=100)
+    kwargs = models.JSONField(default=dict)
+
+    status = models.CharField(
+        max_length=10,
+        choices=Status.choices,
+        default=Status.QUEUED,
+    )
+    attempts = models.IntegerField(default=0)
+    max_attempts = models.IntegerField(default=5)
+    last_error = models.TextField(blank=True)
+
+    # Earliest time the job may (re)run. While a job is running this is
+    # the end of the worker's lease on it.
+    run_after = models.DateTimeField(default=timezone.now)
+
+    # Timing
+    created_date = models.DateTimeField(auto_now_add=True)
+    started_date = models.DateTimeField(blank=True, null=True)
+    finished_date = models.DateTimeField(blank=True, null=True)
+    duration_ms = models.FloatField(blank=True, null=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['status', 'run_after']),
+        ]
+
+    def __str__(self):
+        return f'{self.id} {self.name} ({self.status})'
+
+class SlowQuery(models.Model):
+    """A query that took longer than `SLOW_QUERY_THRESHOLD_MS` (see
+    `slow_queries.py`)"""
+
+    database = models.CharField(max_length=63)
+    sql = models.TextField()
+    params = models.TextField(blank=True)
+    duration_ms = models.FloatField()
+
+    # Where the query came from: the URL name of the view, the innermost
+    # line of app code that ran it, and every line of app code on the stack
+    view_name = models.CharField(max_length=255, blank=True)
+    call_site = models.CharField(max_length=255, blank=True)
+    stack = models.TextField(blank=True)
+
+    # EXPLAIN (ANALYZE, BUFFERS) output, for the sampled SELECTs on Postgres
+    plan = models.TextField(blank=True)
+
+    created_date = models.DateTimeField(default=timezone.now, db_index=True)
+
+    class Meta:
+        ordering = ['-created_date']
+        verbose_name_plural = 'slow queries'
+
+    def __str__(self):
+        return f'{self.duration_ms:.0f} ms {self.call_site or self.sql[:50]}'
+
+
+# Account deletion
+
+class AccountDeletion(models.Model):
+    """An account being deleted a batch at a time by `manage.py
+    delete_accounts` (see `utils.account_deletion`)"""
+
+    # Not a foreign key, so the record outlives the user
+    user_id = models.BigIntegerField(unique=True)
+    username = models.CharField(max_length=150)
+
+    requested_date = models.DateTimeField(default=timezone.now)
+
+    # Progress, saved with each batch
+    rows_deleted = models.BigIntegerField(default=0)
+    last_batch_date = models.DateTimeField(blank=True, null=True)
+    completed_date = models.DateTimeField(blank=True, null=True)
+
     def __str__(self):
-        return self.name
\ No newline at end of file
+        return f'{self.username} ({self.rows_deleted} rows deleted)'
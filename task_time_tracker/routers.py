@@ -0,0 +1,95 @@
+"""
+Routes the reads of designated read-only views and management commands to
+a read replica (the `REPLICA_DATABASE` alias). Everything else, and every
+write, uses `default`.
+
+Views are designated with `replica_reads` (function views) or
+`ReplicaReadsMixin` (class-based views), and commands by subclassing
+`ReplicaReadsCommand`. `ReplicaMiddleware` turns routing on for designated
+views, except for the `REPLICA_STICKY_SECONDS` after a user's own POST so
+that they always see what they just changed.
+"""
+from contextlib import contextmanager
+from contextvars import ContextVar
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import DEFAULT_DB_ALIAS
+
+STICKY_SESSION_KEY = 'task_time_tracker:primary_until'
+
+_reading_from_replica = ContextVar('reading_from_replica', default=False)
+
+def get_replica_alias():
+    """The replica's alias, or `None` if reads should stay on `default`"""
+    return settings.REPLICA_DATABASE or None
+
+def start_reading_from_replica(enabled=True):
+    """Send reads to the replica until `stop_reading_from_replica` is
+    called with the returned token"""
+    return _reading_from_replica.set(enabled)
+
+def stop_reading_from_replica(token):
+    _reading_from_replica.reset(token)
+
+@contextmanager
+def read_from_replica(enabled=True):
+    """Send reads made inside the block to the replica"""
+    token = start_reading_from_replica(enabled)
+    try:
+        yield
+    finally:
+        stop_reading_from_replica(token)
+
+def is_reading_from_replica():
+    return _reading_from_replica.get() and get_replica_alias() is not None
+
+def stick_to_primary(request):
+    """Read this user's requests from `default` for a little while"""
+    request.session[STICKY_SESSION_KEY] = time.time() + settings.REPLICA_STICKY_SECONDS
+
+def is_stuck_to_primary(request):
+    session = getattr(request, 'session', None)
+    return session is not None and session.get(STICKY_SESSION_KEY, 0) > time.time()
+
+def replica_reads(view_func):
+    """Mark a function view as safe to read from the replica"""
+    view_func.replica_reads = True
+    return view_func
+
+class ReplicaReadsMixin:
+    """Mark a class-based view as safe to read from the replica"""
+    replica_reads = True
+
+def is_replica_view(view_func):
+    view_class = getattr(view_func, 'view_class', None)
+    return (getattr(view_func, 'replica_reads', False)
+            or getattr(view_class, 'replica_reads', False))
+
+class ReplicaReadsCommand(BaseCommand):
+    """A management command that only reads, and reads from the replica"""
+
+    def execute(self, *args, **options):
+        with read_from_replica():
+            return super().execute(*args, **options)
+
+class ReplicaRouter:
+
+    def db_for_read(self, model, **hints):
+        if is_reading_from_replica():
+            return get_replica_alias()
+        return None
+
+    def db_for_write(self, model, **hints):
+        # Objects read from the replica would otherwise be saved back to it
+        instance = hints.get('instance')
+        if instance is not None and instance._state.db == get_replica_alias():
+            return DEFAULT_DB_ALIAS
+        return None
+
+    def allow_relation(self, obj1, obj2, **hints):
+        databases = {DEFAULT_DB_ALIAS, get_replica_alias()}
+        if obj1._state.db in databases and obj2._state.db in databases:
+            return True
+        return None
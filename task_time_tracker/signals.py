@@ -0,0 +1,168 @@
+from functools import partial
+
+from django.db import transaction
+from django.db.models.signals import m2m_changed, post_delete, post_save, pre_delete
+from django.dispatch import receiver
+
+from . import metrics
+from .live import publish_task_change
+from .models import Project, Task, TaskDependency, TaskStatusChange, Tombstone, User
+from .utils import project_counters, sync
+from .utils.cache_helpers import bump_user_generations
+from .utils.critical_path import (change_user_dependencies,
+                                  invalidate_user_critical_paths,
+                                  remove_from_user_critical_path,
+                                  update_user_critical_path)
+from .utils.planner import invalidate_user_plans, remove_from_user_plan, update_user_plan
+from .utils.trash import task_restored, task_trashed
+
+@receiver(post_save, sender=Task)
+@receiver(task_restored, sender=Task)
+def replan_saved_task(sender, instance, raw=False, **kwargs):
+    """Keep the user's cached day plan current"""
+    if not raw:
+        update_user_plan(instance)
+
+@receiver(post_delete, sender=Task)
+@receiver(task_trashed, sender=Task)
+def replan_deleted_task(sender, instance, **kwargs):
+    remove_from_user_plan(instance)
+
+@receiver(post_save, sender=Project)
+@receiver(post_delete, sender=Project)
+def replan_project(sender, instance, raw=False, update_fields=None, **kwargs):
+    """Plans order tasks by their project's end date, so a change to it can
+    move any of the project's tasks"""
+    if not raw and (update_fields is None or 'end_date' in update_fields):
+        invalidate_user_plans([instance.user_id])
+
+@receiver(post_save, sender=Task)
+@receiver(task_restored, sender=Task)
+def recalculate_saved_task(sender, instance, raw=False, **kwargs):
+    """Keep the user's cached critical path current"""
+    if not raw:
+        update_user_critical_path(instance)
+
+@receiver(post_delete, sender=Task)
+@receiver(task_trashed, sender=Task)
+def recalculate_deleted_task(sender, instance, **kwargs):
+    remove_from_user_critical_path(instance)
+
+def get_dependency_user_id(dependency):
+    # The task may be gone when its dependencies are deleted with it
+    return Task.objects.filter(pk=dependency.task_id).values_list('user_id', flat=True).first()
+
+@receiver(post_save, sender=TaskDependency)
+def add_dependency(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        user_id = get_dependency_user_id(instance)
+        change_user_dependencies(
+            user_id, added=[(instance.task_id, instance.depends_on_id)])
+        sync.touch(Task.objects.filter(pk=instance.task_id), user_id)
+
+@receiver(post_delete, sender=TaskDependency)
+def remove_dependency(sender, instance, **kwargs):
+    user_id = get_dependency_user_id(instance)
+    if user_id is not None:
+        change_user_dependencies(
+            user_id, removed=[(instance.task_id, instance.depends_on_id)])
+        sync.touch(Task.objects.filter(pk=instance.task_id), user_id)
+
+@receiver(m2m_changed, sender=Task.depends_on.through)
+def change_dependencies(sender, instance, action, reverse, pk_set, **kwargs):
+    """`task.depends_on.add()` and `.set()` create the rows with
+    `bulk_create`, which doesn't send `post_save`"""
+    if action == 'post_add':
+        if reverse:
+            added = [(task_id, instance.pk) for task_id in pk_set]
+        else:
+            added = [(instance.pk, depends_on_id) for depends_on_id in pk_set]
+        change_user_dependencies(instance.user_id, added=added)
+        sync.touch(Task.objects.filter(pk__in={task_id for task_id, _ in added}),
+                   instance.user_id)
+    elif action == 'post_clear':
+        invalidate_user_critical_paths([instance.user_id])
+
+@receiver(post_save, sender=Task)
+@receiver(task_restored, sender=Task)
+def publish_saved_task(sender, instance, raw=False, **kwargs):
+    """Push the change to the user's open dashboards once it's committed"""
+    if not raw:
+        transaction.on_commit(
+            partial(publish_task_change, instance.user_id, instance.pk, instance))
+
+@receiver(post_delete, sender=Task)
+@receiver(task_trashed, sender=Task)
+def publish_deleted_task(sender, instance, **kwargs):
+    # The instance's pk is cleared by the time the transaction commits
+    transaction.on_commit(
+        partial(publish_task_change, instance.user_id, instance.pk))
+
+@receiver(post_save, sender=Task)
+@receiver(post_delete, sender=Task)
+@receiver(task_trashed, sender=Task)
+@receiver(task_restored, sender=Task)
+def bump_generation(sender, instance, raw=False, **kwargs):
+    """Expire cached results derived from the user's tasks"""
+    if not raw:
+        bump_user_generations([instance.user_id])
+
+@receiver(post_save, sender=Task)
+@receiver(task_restored, sender=Task)
+def update_project_counters(sender, instance, created, raw=False, update_fields=None, **kwargs):
+    """Apply the task's change to its project's totals"""
+    if not raw:
+        project_counters.count_saved_task(instance, created, update_fields)
+
+@receiver(post_delete, sender=Task)
+@receiver(task_trashed, sender=Task)
+def remove_from_project_counters(sender, instance, **kwargs):
+    project_counters.count_deleted_task(instance)
+
+@receiver(post_delete, sender=Task)
+@receiver(task_trashed, sender=Task)
+def record_deleted_task(sender, instance, **kwargs):
+    """Leave a tombstone for clients syncing the user's tasks"""
+    sync.record_deletion(instance, Tombstone.Kind.TASK)
+
+@receiver(task_trashed, sender=Task)
+@receiver(task_restored, sender=Task)
+def touch_dependents(sender, instance, **kwargs):
+    """Tasks only list the live tasks they wait for, so the ones waiting
+    for a trashed or restored task have changed"""
+    if TaskDependency.objects.filter(depends_on=instance).exists():
+        sync.touch(Task.objects.filter(depends_on=instance), instance.user_id)
+
+@receiver(pre_delete, sender=Project)
+def touch_project_members(sender, instance, **kwargs):
+    """The project's tasks and sub-projects are about to be detached
+    from it with an `UPDATE`, which skips their `save`"""
+    sync.touch(Task.objects.filter(project=instance), instance.user_id)
+    sync.touch(Project.objects.filter(parent=instance), instance.user_id)
+
+@receiver(post_delete, sender=Project)
+def record_deleted_project(sender, instance, **kwargs):
+    sync.record_deletion(instance, Tombstone.Kind.PROJECT)
+
+@receiver(pre_delete, sender=User)
+def stop_syncing_user(sender, instance, **kwargs):
+    """The user's tombstones are deleted along with them, so don't leave
+    new ones for their rows"""
+    sync.suspend_users([instance.pk])
+
+@receiver(post_delete, sender=User)
+def forget_deleted_user(sender, instance, **kwargs):
+    sync.resume_users([instance.pk])
+
+@receiver(post_save, sender=Task)
+def count_saved_task(sender, instance, created, raw=False, **kwargs):
+    metrics.TASK_WRITES.labels('create' if created else 'update').inc()
+
+@receiver(post_delete, sender=Task)
+def count_deleted_task(sender, instance, **kwargs):
+    metrics.TASK_WRITES.labels('delete').inc()
+
+@receiver(post_save, sender=TaskStatusChange)
+def count_status_change(sender, instance, created, **kwargs):
+    if created:
+        metrics.TASK_STATUS_CHANGE_WRITES.inc()
@@ -0,0 +1,196 @@
+"""
+Records queries slower than `SLOW_QUERY_THRESHOLD_MS`: their SQL and
+parameters, the view they ran in and the app code that ran them.
+
+Each slow query is logged to the `task_time_tracker.slow_queries` logger
+(a rotating file, see `LOGGING`) right away, and saved as a `SlowQuery`
+row, browsable in the admin, from a background thread. On Postgres a
+sample (`SLOW_QUERY_EXPLAIN_RATE`) of slow SELECTs is also run again
+under `EXPLAIN (ANALYZE, BUFFERS)` in that thread, on the read replica if
+there is one, in a transaction that is rolled back. SELECTs that lock
+rows (`FOR UPDATE`/`FOR SHARE`) aren't run again. With `SLOW_QUERY_ALWAYS_EAGER` set, all of that happens
+inline instead (used in tests).
+"""
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from contextvars import ContextVar
+import json
+import logging
+import os
+import random
+import re
+import threading
+from time import perf_counter
+import traceback
+
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import close_old_connections, connections, transaction
+from django.db.backends.signals import connection_created
+from django.dispatch import receiver
+
+from .routers import get_replica_alias
+
+logger = logging.getLogger(__name__)
+
+APP_DIR = os.path.dirname(os.path.abspath(__file__))
+
+# Frames in these files are plumbing, not where a query came from
+IGNORED_FILES = {
+    os.path.join(APP_DIR, 'slow_queries.py'),
+    os.path.join(APP_DIR, 'metrics.py'),
+}
+
+# Transaction control, not worth recording, and recording it could open a
+# savepoint while Django is still opening one
+IGNORED_STATEMENTS = ('SAVEPOINT', 'RELEASE', 'ROLLBACK', 'BEGIN', 'COMMIT', 'SET')
+
+# Running these again would wait for, or take, the row locks that the
+# transaction they came from still holds
+LOCKING_CLAUSE = re.compile(r'\bFOR\s+(NO\s+KEY\s+UPDATE|UPDATE|KEY\s+SHARE|SHARE)\b', re.IGNORECASE)
+
+_current_view = ContextVar('slow_queries_current_view', default='')
+
+# Set while recording, so the recorder's own queries aren't recorded
+_recording = ContextVar('slow_queries_recording', default=False)
+
+_executor = None
+_executor_lock = threading.Lock()
+_pending = None
+
+def set_current_view(view_name):
+    """Attribute queries to `view_name` until `reset_current_view` is
+    called with the returned token"""
+    return _current_view.set(view_name)
+
+def reset_current_view(token):
+    _current_view.reset(token)
+
+@contextmanager
+def not_recorded():
+    token = _recording.set(True)
+    try:
+        yield
+    finally:
+        _recording.reset(token)
+
+def get_app_stack():
+    """The frames of app code on the stack, outermost first, as
+    `path:line in function`"""
+    base_dir = os.path.dirname(APP_DIR)
+    return [
+        f'{os.path.relpath(frame.filename, base_dir)}:{frame.lineno} in {frame.name}'
+        for frame in traceback.extract_stack()
+        if frame.filename.startswith(APP_DIR) and frame.filename not in IGNORED_FILES
+    ]
+
+def format_params(params):
+    try:
+        return json.dumps(params, cls=DjangoJSONEncoder)
+    except TypeError:
+        return repr(params)
+
+def get_executor():
+    global _executor, _pending
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(
+                max_workers=1, thread_name_prefix='slow-queries')
+            _pending = threading.BoundedSemaphore(settings.SLOW_QUERY_MAX_PENDING)
+        return _executor
+
+def should_explain(connection, sql, many):
+    return (connection.vendor == 'postgresql'
+            and not many
+            and sql.lstrip().upper().startswith('SELECT')
+            and not LOCKING_CLAUSE.search(sql)
+            and random.random() < settings.SLOW_QUERY_EXPLAIN_RATE)
+
+def get_explain_alias(alias):
+    """Run EXPLAINs on the read replica when there is one, so they don't
+    add to the primary's load"""
+    return get_replica_alias() or alias
+
+def explain(alias, sql, params):
+    """Run `sql` under EXPLAIN (ANALYZE, BUFFERS) and return the plan"""
+    connection = connections[alias]
+    try:
+        with transaction.atomic(using=alias):
+            with connection.cursor() as cursor:
+                cursor.execute('SET LOCAL statement_timeout = %s',
+                               [settings.SLOW_QUERY_EXPLAIN_TIMEOUT_MS])
+                cursor.execute(f'EXPLAIN (ANALYZE, BUFFERS) {sql}', params)
+                plan = '\n'.join(row[0] for row in cursor.fetchall())
+            # ANALYZE runs the query; don't keep anything it did
+            transaction.set_rollback(True, using=alias)
+    except Exception as exc:
+        return f'EXPLAIN failed: {exc}'
+    return plan
+
+def save_slow_query(record, params, explain_plan):
+    from .models import SlowQuery
+
+    with not_recorded():
+        if explain_plan:
+            record['plan'] = explain(get_explain_alias(record['database']),
+                                     record['sql'], params)
+        # In a savepoint when inline, so a failure can't break the
+        # transaction the slow query ran in
+        with transaction.atomic():
+            SlowQuery.objects.create(**record)
+
+def save_in_background(record, params, explain_plan):
+    close_old_connections()
+    try:
+        save_slow_query(record, params, explain_plan)
+    except Exception:
+        logger.exception('Could not save slow query')
+    finally:
+        close_old_connections()
+        _pending.release()
+
+def record_slow_query(connection, sql, params, many, duration_ms):
+    stack = get_app_stack()
+    record = {
+        'database': connection.alias,
+        'sql': sql,
+        'params': format_params(params),
+        'duration_ms': duration_ms,
+        'view_name': _current_view.get(),
+        'call_site': stack[-1] if stack else '',
+        'stack': '\n'.join(stack),
+    }
+    logger.warning('Slow query (%.0f ms) %s', duration_ms, json.dumps(record))
+
+    explain_plan = should_explain(connection, sql, many)
+    if settings.SLOW_QUERY_ALWAYS_EAGER:
+        save_slow_query(record, params, explain_plan)
+        return
+
+    executor = get_executor()
+    # Drop records rather than queue without limit if the database is
+    # too slow to keep up
+    if _pending.acquire(blocking=False):
+        executor.submit(save_in_background, record, params, explain_plan)
+
+def time_query(execute, sql, params, many, context):
+    """`execute_wrapper` installed on every connection"""
+    threshold = settings.SLOW_QUERY_THRESHOLD_MS
+    if threshold is None or _recording.get():
+        return execute(sql, params, many, context)
+
+    start = perf_counter()
+    result = execute(sql, params, many, context)
+    duration_ms = (perf_counter() - start) * 1000
+    if duration_ms >= threshold and not sql.lstrip().upper().startswith(IGNORED_STATEMENTS):
+        with not_recorded():
+            try:
+                record_slow_query(context['connection'], sql, params, many, duration_ms)
+            except Exception:
+                logger.exception('Could not record slow query')
+    return result
+
+@receiver(connection_created)
+def install(sender, connection, **kwargs):
+    if time_query not in connection.execute_wrappers:
+        connection.execute_wrappers.append(time_query)
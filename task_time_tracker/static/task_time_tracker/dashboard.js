@@ -0,0 +1,299 @@
+// Keeps the dashboard current without full page reloads:
+//  - creating, editing and deleting tasks from the dashboard (and undoing a
+//    delete) asks the server for just the changed table row and stats card,
+//    and swaps them in place (without JavaScript the forms post and
+//    redirect as usual). The card's projected finish and forecast are
+//    loaded afterwards, separately.
+//  - changes made elsewhere arrive over the live updates event stream
+(function () {
+  var script = document.currentScript;
+  var liveUrl = script && script.dataset.liveUrl;
+
+  // Same order as `DashboardTaskTable.Meta.fields`
+  var COLUMNS = ['task_name', 'expected_mins', 'actual_mins', 'completed'];
+  var STATS = [
+    'initial_estimated_time',
+    'current_estimated_time',
+    'actual_time',
+    'unfinished_time',
+  ];
+
+  function csrfToken() {
+    var input = document.querySelector('input[name=csrfmiddlewaretoken]');
+    return input ? input.value : '';
+  }
+
+  // Render a value the way django-tables2 does
+  function renderValue(cell, value) {
+    cell.textContent = '';
+    if (value === true || value === false) {
+      var span = document.createElement('span');
+      span.className = value ? 'true' : 'false';
+      span.textContent = value ? '✔' : '✘';
+      cell.appendChild(span);
+    } else if (value === null || value === '') {
+      cell.textContent = '—';
+    } else {
+      cell.textContent = value;
+    }
+  }
+
+  function button(label) {
+    var element = document.createElement('button');
+    element.className = 'btn btn-primary';
+    element.textContent = label;
+    return element;
+  }
+
+  function buildRow(message) {
+    var row = document.createElement('tr');
+    row.dataset.id = message.id;
+    COLUMNS.forEach(function () {
+      row.appendChild(document.createElement('td'));
+    });
+
+    var editCell = document.createElement('td');
+    var editLink = document.createElement('a');
+    editLink.href = message.edit_url;
+    editLink.appendChild(button('Edit'));
+    editCell.appendChild(editLink);
+    row.appendChild(editCell);
+
+    var deleteCell = document.createElement('td');
+    var deleteForm = document.createElement('form');
+    deleteForm.method = 'POST';
+    deleteForm.action = message.delete_url;
+    var token = document.createElement('input');
+    token.type = 'hidden';
+    token.name = 'csrfmiddlewaretoken';
+    token.value = csrfToken();
+    deleteForm.appendChild(token);
+    deleteForm.appendChild(button('Delete'));
+    deleteCell.appendChild(deleteForm);
+    row.appendChild(deleteCell);
+    return row;
+  }
+
+  function applyTask(message) {
+    var table = document.getElementById('active-task-table');
+    if (!table) {
+      return;
+    }
+    var row = table.querySelector('tr[data-id="' + message.id + '"]');
+
+    if (message.deleted || !message.on_dashboard) {
+      if (row) {
+        row.remove();
+      }
+      return;
+    }
+    if (!row) {
+      row = buildRow(message);
+      table.tBodies[0].appendChild(row);
+    }
+    COLUMNS.forEach(function (column, index) {
+      renderValue(row.cells[index], message.task[column]);
+    });
+  }
+
+  function applyStats(stats) {
+    STATS.forEach(function (name) {
+      var element = document.getElementById(name.replace(/_/g, '-'));
+      if (element && stats[name] !== undefined) {
+        element.textContent = stats[name];
+      }
+    });
+  }
+
+  // Fragments
+
+  function table() {
+    return document.getElementById('active-task-table');
+  }
+
+  function parseRow(html) {
+    var tbody = document.createElement('tbody');
+    tbody.innerHTML = html;
+    return tbody.querySelector('tr');
+  }
+
+  function replaceWithHtml(element, html) {
+    var container = document.createElement('div');
+    container.innerHTML = html;
+    var replacement = container.firstElementChild;
+    element.replaceWith(replacement);
+    return replacement;
+  }
+
+  function showMessage(html) {
+    var messages = document.getElementById('messages');
+    if (!messages) {
+      return;
+    }
+    var alert = document.createElement('div');
+    alert.className = 'alert alert-success';
+    alert.setAttribute('role', 'alert');
+    alert.innerHTML = html;
+    messages.appendChild(alert);
+  }
+
+  // Fill in the stats card's outlook, which fragments leave out
+  function loadOutlook() {
+    var outlook = document.getElementById('outlook');
+    if (!outlook || !outlook.dataset.url) {
+      return;
+    }
+    fetch(outlook.dataset.url, {
+      credentials: 'same-origin',
+    }).then(function (response) {
+      if (!response.ok) {
+        throw new Error('Unexpected response ' + response.status);
+      }
+      return response.text();
+    }).then(function (html) {
+      // Skip it if a newer card has replaced this one
+      if (outlook.isConnected) {
+        replaceWithHtml(outlook, html);
+      }
+    }).catch(function () {});
+  }
+
+  // Apply a `render_task_fragments` response
+  function applyFragments(data) {
+    var stats = document.getElementById('summ-stats');
+    if (stats) {
+      replaceWithHtml(stats, data.stats);
+      loadOutlook();
+    }
+    if (data.message) {
+      showMessage(data.message);
+    }
+    if (!table()) {
+      return;
+    }
+    var row = table().querySelector('tr[data-id="' + data.id + '"]');
+    closeEditRow(data.id);
+    if (data.row) {
+      var newRow = parseRow(data.row);
+      if (row) {
+        row.replaceWith(newRow);
+      } else {
+        table().tBodies[0].appendChild(newRow);
+      }
+    } else if (row) {
+      row.remove();
+    }
+  }
+
+  // POST a form asking for fragments. Resolves with the parsed response,
+  // or falls back to submitting the form normally.
+  function postForm(form) {
+    return fetch(form.action || window.location.href, {
+      method: 'POST',
+      body: new FormData(form),
+      headers: {'X-Fragment': 'true'},
+      credentials: 'same-origin',
+    }).then(function (response) {
+      if (response.status !== 200 && response.status !== 400) {
+        throw new Error('Unexpected response ' + response.status);
+      }
+      return response.json().then(function (data) {
+        return {ok: response.ok, data: data};
+      });
+    }).catch(function () {
+      form.submit();
+    });
+  }
+
+  function closeEditRow(taskId) {
+    var editRow = document.querySelector('tr.edit-task-row[data-task-id="' + taskId + '"]');
+    if (editRow) {
+      editRow.remove();
+    }
+    return editRow;
+  }
+
+  function openEditRow(link) {
+    var row = link.closest('tr');
+    if (closeEditRow(row.dataset.id)) {
+      return;
+    }
+    fetch(link.href, {
+      headers: {'X-Fragment': 'true'},
+      credentials: 'same-origin',
+    }).then(function (response) {
+      if (!response.ok) {
+        throw new Error('Unexpected response ' + response.status);
+      }
+      return response.text();
+    }).then(function (html) {
+      var editRow = document.createElement('tr');
+      editRow.className = 'edit-task-row';
+      editRow.dataset.taskId = row.dataset.id;
+      var cell = document.createElement('td');
+      cell.colSpan = row.cells.length;
+      cell.innerHTML = html;
+      editRow.appendChild(cell);
+      row.after(editRow);
+    }).catch(function () {
+      window.location.href = link.href;
+    });
+  }
+
+  function handleSubmit(event) {
+    var form = event.target;
+    var isNewTask = form.id === 'new-task-form';
+    var isEdit = form.classList.contains('edit-task-form');
+    var isDelete = !isEdit && table() && table().contains(form);
+    var isUndo = form.classList.contains('undo-delete-form');
+    if (!isNewTask && !isEdit && !isDelete && !isUndo) {
+      return;
+    }
+    event.preventDefault();
+    postForm(form).then(function (result) {
+      if (!result) {
+        return;
+      }
+      if (result.ok) {
+        applyFragments(result.data);
+        if (isUndo) {
+          form.closest('.alert').remove();
+        }
+        if (isNewTask) {
+          form.reset();
+        }
+      } else {
+        // Redisplay the form with its errors
+        replaceWithHtml(form, result.data.form);
+      }
+    });
+  }
+
+  if (window.fetch) {
+    document.addEventListener('submit', handleSubmit);
+    document.addEventListener('click', function (event) {
+      var link = event.target.closest('#active-task-table a.edit-task-link');
+      if (link) {
+        event.preventDefault();
+        openEditRow(link);
+      }
+    });
+  }
+
+  // Live updates
+
+  if (!liveUrl || !window.EventSource) {
+    return;
+  }
+
+  var source = new EventSource(liveUrl);
+  source.addEventListener('task', function (event) {
+    var message = JSON.parse(event.data);
+    applyTask(message);
+    applyStats(message.stats);
+  });
+  // Sent when this page fell too far behind to catch up
+  source.addEventListener('reload', function () {
+    window.location.reload();
+  });
+})();
@@ -0,0 +1,53 @@
+// Draws the trends chart from the `trends_data` endpoint, using the
+// range and grouping in the page's query string.
+(function () {
+  var script = document.currentScript;
+  var canvas = document.getElementById('trends-chart');
+  if (!canvas || !window.Chart) {
+    return;
+  }
+
+  var url = script.dataset.url + window.location.search;
+  fetch(url, {credentials: 'same-origin'})
+    .then(function (response) {
+      return response.json();
+    })
+    .then(function (series) {
+      if (!series.points) {
+        return;
+      }
+      document.getElementById('trends-bucket').textContent = '(by ' + series.bucket + ')';
+      new Chart(canvas, {
+        type: 'bar',
+        data: {
+          labels: series.points.map(function (point) { return point.date; }),
+          datasets: [
+            {
+              type: 'line',
+              label: 'Expected (mins)',
+              data: series.points.map(function (point) { return point.expected_mins; }),
+              borderColor: '#4e73df',
+            },
+            {
+              type: 'line',
+              label: 'Actual (mins)',
+              data: series.points.map(function (point) { return point.actual_mins; }),
+              borderColor: '#e74a3b',
+            },
+            {
+              label: 'Tasks completed',
+              data: series.points.map(function (point) { return point.completed_count; }),
+              backgroundColor: 'rgba(28, 200, 138, 0.4)',
+              yAxisID: 'count',
+            },
+          ],
+        },
+        options: {
+          scales: {
+            y: {beginAtZero: true, position: 'left'},
+            count: {beginAtZero: true, position: 'right', grid: {drawOnChartArea: false}},
+          },
+        },
+      });
+    });
+})();
@@ -1,10 +1,129 @@
-from django_tables2 import Table, TemplateColumn
+from django.core.exceptions import FieldDoesNotExist
+from django.db.models import QuerySet
+from django.utils.formats import date_format
+from django.utils.safestring import mark_safe
+from django_tables2 import Column, Table, TemplateColumn
+from django_tables2.utils import Accessor
 
-from .models import Task
+from .models import Project, Task
 
 dashboard_table_class = 'table table-striped table-hover table-sm'
 
-class DashboardTaskTable(Table):
+class ActionButtonColumn(TemplateColumn):
+    """
+    A `TemplateColumn` for per-task buttons such as `edit_button.html`.
+
+    Rendering a template for every row is slow, so the template is rendered
+    once per table for a placeholder task and the output split where the
+    placeholder's pk appears (e.g. in `get_edit_task_url`). Each row then
+    only joins the pieces back together around its own pk. The template
+    can depend on anything that's the same for the whole table (like the
+    CSRF token) but, from the record, only on its pk and the attributes
+    named in `variant_attrs`; one copy is rendered per combination of their
+    values.
+    """
+    placeholder_pk = 987654321987654321
+
+    def __init__(self, template_name, variant_attrs=(), **extra):
+        extra.setdefault('verbose_name', '')
+        # The default accessor, the column's name, can resolve to a model
+        # method like `Task.delete`, which is refused by formatting the
+        # record's repr and so reading fields the table may have deferred
+        extra.setdefault('accessor', 'pk')
+        # Sorting by a button column would just sort by pk
+        extra.setdefault('orderable', False)
+        super().__init__(template_name=template_name, **extra)
+        self.variant_attrs = tuple(variant_attrs)
+
+    def get_parts(self, record, table, value, bound_column, **kwargs):
+        variant = tuple(getattr(record, attr, None) for attr in self.variant_attrs)
+        # The context is part of the key so the CSRF token is never stale
+        key = (bound_column.name, id(getattr(table, 'context', None)), variant)
+        compiled = table.__dict__.setdefault('_action_button_parts', {})
+        if key not in compiled:
+            placeholder = type(record)(pk=self.placeholder_pk)
+            for attr, attr_value in zip(self.variant_attrs, variant):
+                setattr(placeholder, attr, attr_value)
+            html = super().render(placeholder, table, value, bound_column, **kwargs)
+            compiled[key] = html.split(str(self.placeholder_pk))
+        return compiled[key]
+
+    def render(self, record, table, value, bound_column, **kwargs):
+        parts = self.get_parts(record, table, value, bound_column, **kwargs)
+        return mark_safe(str(record.pk).join(parts))
+
+def get_field_path(model, bits):
+    """
+    The concrete fields an accessor's `bits` follow from `model`, stopping
+    at the first bit that isn't one (a method, a property, a reverse
+    relation).
+    """
+    fields = []
+    for bit in bits:
+        try:
+            field = model._meta.get_field(bit)
+        except FieldDoesNotExist:
+            break
+        if not field.concrete or field.many_to_many:
+            break
+        fields.append(field)
+        if not field.is_relation:
+            break
+        model = field.related_model
+    return fields
+
+class PlannedTable(Table):
+    """
+    A table that loads only what it shows. A queryset of `Meta.model`
+    passed in is narrowed with `only()` to the fields the columns read and
+    `select_related()` on the relations they follow, so a page of rows is
+    one query. Columns showing a related object (rendered with its
+    `__str__`) load the whole related row.
+
+    Fields needed without a column of their own go in `required_fields`.
+    Other data, like lists and unions, is used as it is.
+    """
+    required_fields = ()
+
+    def __init__(self, data=None, *args, **kwargs):
+        if (isinstance(data, QuerySet)
+                and data.model is self._meta.model
+                and not data.query.combinator):
+            data = self.plan_queryset(data)
+        super().__init__(data, *args, **kwargs)
+
+    @classmethod
+    def get_query_plan(cls):
+        """`(only_fields, select_related)` for the table's columns"""
+        model = cls._meta.model
+        only_fields = {model._meta.pk.name, *cls.required_fields}
+        select_related = set()
+        for name, column in cls.base_columns.items():
+            accessor = column.accessor or Accessor(name)
+            path = get_field_path(model, accessor.bits)
+            if not path:
+                continue
+            names = [field.name for field in path]
+            if path[-1].is_relation:
+                only_fields.add(names[0])
+                select_related.add('__'.join(names))
+            else:
+                only_fields.add('__'.join(names))
+                if len(path) > 1:
+                    select_related.add('__'.join(names[:-1]))
+        return sorted(only_fields), sorted(select_related)
+
+    def plan_queryset(self, queryset):
+        only_fields, select_related = self.get_query_plan()
+        if select_related:
+            queryset = queryset.select_related(*select_related)
+        return queryset.only(*only_fields)
+
+class TaskTable(PlannedTable):
+    # `Task.__init__` reads these, so deferring them would cost a query a row
+    required_fields = ('active', 'completed')
+
+class DashboardTaskTable(TaskTable):
     """Note: must pass request argument to enable column sorting"""
     class Meta:
         model = Task
@@ -18,16 +137,12 @@ class DashboardTaskTable(Table):
             'class': dashboard_table_class,
             'id': 'active-task-table',
         }
-    edit = TemplateColumn(
-        verbose_name='',
-        template_name='task_time_tracker/components/edit_button.html',
-    )
-    delete = TemplateColumn(
-        verbose_name='',
-        template_name='task_time_tracker/components/delete_button.html',
-    )
+        # Lets live updates find a task's row
+        row_attrs = {'data-id': lambda record: record.pk}
+    edit = ActionButtonColumn('task_time_tracker/components/edit_button.html')
+    delete = ActionButtonColumn('task_time_tracker/components/delete_button.html')
 
-class AllTaskTable(Table):
+class AllTaskTable(TaskTable):
 
     class Meta:
         model = Task
@@ -44,12 +159,9 @@ class AllTaskTable(Table):
             'id': 'big_task_table',
         }
     
-    edit = TemplateColumn(
-        verbose_name='',
-        template_name='task_time_tracker/components/edit_button.html',
-    )
+    edit = ActionButtonColumn('task_time_tracker/components/edit_button.html')
 
-class CompletedTaskTable(Table):
+class CompletedTaskTable(TaskTable):
     class Meta:
         model = Task
         fields = [
@@ -63,7 +175,85 @@ class CompletedTaskTable(Table):
         ]
         attrs = {'class': dashboard_table_class}
     
-    edit = TemplateColumn(
-        verbose_name='',
-        template_name='task_time_tracker/components/edit_button.html',
+    edit = ActionButtonColumn(
+        'task_time_tracker/components/completed_edit_button.html',
+        variant_attrs=['archived'],
+    )
+
+class ProjectTable(PlannedTable):
+    """
+    Project summaries, read from the counters on `Project`. The totals
+    including sub-projects come from `rollups`, a `utils.rollups` result
+    for the user's project trees, forecast finishes from `finish_dates`
+    (see `utils.critical_path`), and finishes allowing for how far off the
+    user's estimates usually are from `forecasts` (see `utils.forecast`).
+    """
+    class Meta:
+        model = Project
+        fields = [
+            'name',
+            'parent',
+            'task_count',
+            'open_task_count',
+            'expected_mins',
+            'actual_mins',
+            'end_date',
+            'created_date',
+        ]
+        attrs = {'class': dashboard_table_class}
+
+    def __init__(self, *args, rollups=None, finish_dates=None, forecasts=None, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.rollups = rollups or {}
+        self.finish_dates = finish_dates or {}
+        self.forecasts = forecasts or {}
+
+    parent = Column(verbose_name='Parent project')
+    task_count = Column(verbose_name='Tasks')
+    open_task_count = Column(verbose_name='Open tasks')
+    total_expected_mins = Column(
+        verbose_name='Expected mins with sub-projects',
+        empty_values=(),
+        orderable=False,
+    )
+    remaining_mins = Column(
+        verbose_name='Remaining mins with sub-projects',
+        empty_values=(),
+        orderable=False,
     )
+
+    forecast_finish = Column(
+        verbose_name='Forecast finish',
+        empty_values=(),
+        orderable=False,
+        attrs={'td': {'class': lambda table, record: (
+            'table-danger' if table.is_late(record) else '')}},
+    )
+
+    likely_finish = Column(
+        verbose_name='80% likely by',
+        empty_values=(),
+        orderable=False,
+    )
+
+    def is_late(self, record):
+        finish_date = self.finish_dates.get(record.pk)
+        return bool(record.end_date and finish_date and finish_date > record.end_date)
+
+    def render_forecast_finish(self, record):
+        finish_date = self.finish_dates.get(record.pk)
+        return date_format(finish_date, 'D, M j') if finish_date else '—'
+
+    def render_likely_finish(self, record):
+        for point in self.forecasts.get(record.pk, ()):
+            if point.percentile == 80 and point.finish_date:
+                return date_format(point.finish_date, 'D, M j')
+        return '—'
+
+    def render_total_expected_mins(self, record):
+        rollup = self.rollups.get(record.pk)
+        return rollup.expected_mins if rollup else record.expected_mins
+
+    def render_remaining_mins(self, record):
+        rollup = self.rollups.get(record.pk)
+        return rollup.remaining_mins if rollup else '—'
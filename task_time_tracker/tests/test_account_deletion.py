@@ -0,0 +1,109 @@
+import datetime
+from io import StringIO
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.test import TestCase
+from django.urls import reverse
+from django.utils import timezone
+
+from task_time_tracker.models import (AccountDeletion,
+                                      ArchivedTask,
+                                      Project,
+                                      RecurringTask,
+                                      Task,
+                                      TaskStatusChange,
+                                      Tombstone)
+from task_time_tracker.utils.account_deletion import (delete_account,
+                                                      delete_account_batch,
+                                                      request_account_deletion)
+from task_time_tracker.utils.archive_helpers import archive_completed_tasks
+from task_time_tracker.utils.recurring import generate_recurring_tasks
+from task_time_tracker.utils.test_helpers import create_project, create_task
+from task_time_tracker.utils.trash import trash_task
+
+class AccountDeletionTests(TestCase):
+
+    def setUp(self):
+        self.user = get_user_model().objects.create_user(username='username', password='password')
+        self.other_user = get_user_model().objects.create_user(username='other')
+        self.other_task = create_task(user=self.other_user)
+
+        project = create_project(user=self.user)
+        parent = create_task(user=self.user, project=project)
+        subtask = create_task(user=self.user, parent=parent)
+        subtask.depends_on.add(parent)
+        TaskStatusChange.objects.create(task=parent)
+        trash_task(create_task(user=self.user))
+        create_task(user=self.user, completed=True,
+                    completed_date=timezone.now() - datetime.timedelta(days=100))
+        archive_completed_tasks(timezone.now() - datetime.timedelta(days=90))
+        RecurringTask.objects.create(user=self.user, task_name='recurring',
+                                     expected_mins=5, cron_expression='0 9 * * *',
+                                     next_run_date=timezone.now() - datetime.timedelta(days=1))
+
+    def assert_account_gone(self):
+        self.assertFalse(get_user_model().objects.filter(pk=self.user.pk).exists())
+        for model in (Project, RecurringTask, ArchivedTask, Tombstone):
+            self.assertFalse(model.objects.filter(user_id=self.user.pk).exists(), model)
+        self.assertFalse(Task.all_objects.filter(user_id=self.user.pk).exists())
+        self.assertTrue(Task.objects.filter(pk=self.other_task.pk).exists())
+
+    def test_view_deactivates_and_logs_out(self):
+        self.client.force_login(self.user)
+
+        response = self.client.post(reverse('delete_account'), follow=True)
+
+        self.assertRedirects(response, reverse('login'))
+        self.assertFalse(response.context['user'].is_authenticated)
+        self.user.refresh_from_db()
+        self.assertFalse(self.user.is_active)
+        self.assertFalse(self.client.login(username='username', password='password'))
+        self.assertTrue(AccountDeletion.objects.filter(user_id=self.user.pk).exists())
+
+    def test_recurring_tasks_stop_once_deletion_is_requested(self):
+        request_account_deletion(self.user)
+        task_count = Task.all_objects.filter(user=self.user).count()
+
+        generate_recurring_tasks()
+
+        self.assertEqual(Task.all_objects.filter(user=self.user).count(), task_count)
+
+    def test_rows_are_deleted_in_batches(self):
+        deletion = request_account_deletion(self.user)
+
+        with mock.patch('task_time_tracker.utils.account_deletion.time.sleep'):
+            deletion = delete_account(deletion, batch_size=1, rows_per_second=0)
+
+        self.assert_account_gone()
+        self.assertIsNotNone(deletion.completed_date)
+        self.assertGreater(deletion.rows_deleted, 8)
+
+    def test_progress_is_kept_between_runs(self):
+        deletion = request_account_deletion(self.user)
+
+        deletion, deleted_count = delete_account_batch(deletion.pk, batch_size=1)
+        self.assertEqual((deleted_count, deletion.rows_deleted), (1, 1))
+        self.assertTrue(get_user_model().objects.filter(pk=self.user.pk).exists())
+
+        out = StringIO()
+        call_command('delete_accounts', '--rows-per-second', '0', stdout=out)
+
+        self.assert_account_gone()
+        self.assertIn('Deleted 1 accounts', out.getvalue())
+        deletion.refresh_from_db()
+        self.assertIsNotNone(deletion.completed_date)
+
+        # Finished deletions are left alone
+        self.assertEqual(delete_account_batch(deletion.pk)[1], 0)
+
+    def test_deletes_are_throttled(self):
+        deletion = request_account_deletion(self.user)
+
+        with mock.patch('task_time_tracker.utils.account_deletion.time.sleep') as sleep:
+            delete_account(deletion, batch_size=100, rows_per_second=10)
+
+        rows_deleted = AccountDeletion.objects.get().rows_deleted
+        self.assertAlmostEqual(sum(call.args[0] for call in sleep.call_args_list),
+                               rows_deleted / 10, delta=1)
@@ -0,0 +1,138 @@
+import datetime
+import unittest
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+
+from task_time_tracker.admin import EstimatedCountPaginator, get_estimated_count
+from task_time_tracker.models import AccountDeletion, Job, Task, TaskStatusChange
+from task_time_tracker.utils.test_helpers import create_project, create_task
+from task_time_tracker.utils.trash import trash_task
+
+class ScaledAdminTests(TestCase):
+
+    def setUp(self):
+        self.user = get_user_model().objects.create_superuser(username='admin')
+        self.project = create_project(user=self.user, name='Errands')
+        self.task = create_task(user=self.user, project=self.project, task_name='Groceries')
+        self.other_task = create_task(user=self.user, task_name='Laundry')
+        self.client.force_login(self.user)
+
+    def get_changelist(self, model_name, **params):
+        url = reverse(f'admin:task_time_tracker_{model_name}_changelist')
+        return self.client.get(url, params)
+
+    def test_changelists(self):
+        for model_name in ('task', 'project', 'taskstatuschange',
+                           'archivedtask', 'archivedtaskstatuschange'):
+            with self.subTest(model_name):
+                self.assertEqual(self.get_changelist(model_name).status_code, 200)
+
+    def test_prefix_search(self):
+        response = self.get_changelist('task', q='Groc')
+
+        self.assertContains(response, 'Groceries')
+        self.assertNotContains(response, 'Laundry')
+
+    def test_id_search(self):
+        response = self.get_changelist('task', q=str(self.other_task.pk))
+
+        self.assertContains(response, 'Laundry')
+        self.assertNotContains(response, 'Groceries')
+
+    def test_trashed_tasks_are_listed_and_filtered(self):
+        trash_task(self.other_task)
+
+        for params, task_names in (({}, {'Groceries', 'Laundry'}),
+                                   ({'deleted_date__isempty': '0'}, {'Laundry'}),
+                                   ({'deleted_date__isempty': '1'}, {'Groceries'})):
+            with self.subTest(params):
+                response = self.get_changelist('task', **params)
+                self.assertEqual({task.task_name for task in response.context['cl'].result_list},
+                                 task_names)
+
+        url = reverse('admin:task_time_tracker_task_change', args=[self.other_task.pk])
+        self.assertEqual(self.client.get(url).status_code, 200)
+
+    def test_status_changes_are_searched_by_task_id(self):
+        TaskStatusChange.objects.create(task=self.task)
+        TaskStatusChange.objects.create(task=self.other_task)
+
+        response = self.get_changelist('taskstatuschange', q=str(self.task.pk))
+
+        task_ids = {status_change.task_id for status_change in response.context['cl'].result_list}
+        self.assertEqual(task_ids, {self.task.pk})
+
+    def test_status_changes_are_filtered_by_date(self):
+        old = TaskStatusChange.objects.create(
+            task=self.task, created_datetime=timezone.now() - datetime.timedelta(days=30))
+        recent = TaskStatusChange.objects.create(task=self.task)
+        now = timezone.now()
+
+        # As the filter's "Past 7 days" link sends them
+        response = self.get_changelist('taskstatuschange', **{
+            'created_datetime__gte': str(now - datetime.timedelta(days=7)),
+            'created_datetime__lt': str(now + datetime.timedelta(days=1)),
+        })
+
+        status_change_ids = {status_change.pk for status_change in response.context['cl'].result_list}
+        self.assertIn(recent.pk, status_change_ids)
+        self.assertNotIn(old.pk, status_change_ids)
+
+    def test_job_kwargs_are_not_shown(self):
+        queued_job = Job.objects.create(name='send_email', kwargs={'body': 'secret body'})
+
+        for url in (reverse('admin:task_time_tracker_job_changelist'),
+                    reverse('admin:task_time_tracker_job_change', args=[queued_job.pk])):
+            with self.subTest(url):
+                response = self.client.get(url)
+                self.assertContains(response, 'send_email')
+                self.assertNotContains(response, 'secret body')
+
+    def test_users_are_deleted_in_the_background(self):
+        other_user = get_user_model().objects.create_user(username='other')
+
+        self.client.post(reverse('admin:task_time_tracker_user_changelist'),
+                         {'action': 'request_deletion', '_selected_action': [other_user.pk]})
+
+        other_user.refresh_from_db()
+        self.assertFalse(other_user.is_active)
+        self.assertTrue(AccountDeletion.objects.filter(user_id=other_user.pk).exists())
+
+class EstimatedCountPaginatorTests(TestCase):
+
+    def setUp(self):
+        user = get_user_model().objects.create_user(username='username')
+        for index in range(5):
+            create_task(user=user, task_name=f'task {index}')
+
+    def test_small_counts_are_exact(self):
+        with mock.patch('task_time_tracker.admin.get_estimated_count') as estimate:
+            paginator = EstimatedCountPaginator(Task.objects.all(), 2)
+            self.assertEqual(paginator.count, 5)
+        estimate.assert_not_called()
+
+    @override_settings(ADMIN_EXACT_COUNT_LIMIT=2)
+    def test_large_counts_are_estimated(self):
+        with mock.patch('task_time_tracker.admin.get_estimated_count', return_value=1000):
+            paginator = EstimatedCountPaginator(Task.objects.all(), 2)
+            self.assertEqual(paginator.count, 1000)
+            self.assertEqual(paginator.num_pages, 500)
+
+    @override_settings(ADMIN_EXACT_COUNT_LIMIT=2)
+    def test_estimates_are_at_least_the_bounded_count(self):
+        with mock.patch('task_time_tracker.admin.get_estimated_count', return_value=0):
+            self.assertEqual(EstimatedCountPaginator(Task.objects.all(), 2).count, 3)
+
+    @override_settings(ADMIN_EXACT_COUNT_LIMIT=2)
+    def test_counts_are_exact_without_estimates(self):
+        with mock.patch('task_time_tracker.admin.get_estimated_count', return_value=None):
+            self.assertEqual(EstimatedCountPaginator(Task.objects.all(), 2).count, 5)
+
+    @unittest.skipUnless(connection.vendor == 'postgresql', 'Estimates need Postgres')
+    def test_estimate_comes_from_the_planner(self):
+        self.assertIsInstance(get_estimated_count(Task.objects.filter(completed=False)), int)
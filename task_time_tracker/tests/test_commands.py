@@ -0,0 +1,487 @@
+import datetime
+from io import StringIO
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.core.management import CommandError, call_command
+from django.db import connection
+from django.db.models import F
+from django.test import TestCase, TransactionTestCase
+from django.utils import timezone
+
+from task_time_tracker.models import (ArchivedTask,
+                                      ArchivedTaskStatusChange,
+                                      Project,
+                                      RecurringTask,
+                                      Task,
+                                      TaskStatusChange)
+from task_time_tracker.utils.archive_helpers import get_completed_tasks
+from task_time_tracker.utils.partitions import (DEFAULT_PARTITION,
+                                                add_months,
+                                                compact_partitions,
+                                                create_partition,
+                                                ensure_partitions,
+                                                expire_partitions,
+                                                is_partitioned,
+                                                list_partitions,
+                                                month_range,
+                                                month_start,
+                                                partition_month,
+                                                partition_name)
+from task_time_tracker.utils.project_counters import reconcile_project_counters
+from task_time_tracker.utils.recurring import generate_recurring_tasks
+from task_time_tracker.utils.synthetic import CHUNK_USERS, generate_chunk
+from task_time_tracker.utils.test_helpers import create_project, create_task, get_user
+
+class ArchiveTasksCommandTests(TestCase):
+
+    def create_completed_task(self, days_ago, **kwargs):
+        """Create a completed task with a completed_date `days_ago` days ago"""
+        task = create_task(**kwargs)
+        task.completed = True
+        task.save()
+        Task.objects.filter(pk=task.pk).update(
+            completed_date=timezone.now() - datetime.timedelta(days=days_ago)
+        )
+        return Task.objects.get(pk=task.pk)
+
+    def test_old_completed_tasks_are_moved_to_archive(self):
+        """
+        Tasks completed before the cutoff are removed from `Task` and
+        recreated in `ArchivedTask` with the same primary key
+        """
+        old_task = self.create_completed_task(days_ago=100, task_name='old')
+        recent_task = self.create_completed_task(days_ago=1, task_name='recent')
+
+        call_command('archive_tasks', days=90, stdout=StringIO())
+
+        self.assertFalse(Task.objects.filter(pk=old_task.pk).exists())
+        self.assertTrue(Task.objects.filter(pk=recent_task.pk).exists())
+
+        archived_task = ArchivedTask.objects.get()
+        self.assertEqual(archived_task.pk, old_task.pk)
+        self.assertEqual(archived_task.task_name, 'old')
+        self.assertEqual(archived_task.completed_date, old_task.completed_date)
+
+    def test_parents_wait_for_their_subtasks(self):
+        """Archiving a parent would delete its subtasks with it"""
+        parent = self.create_completed_task(days_ago=100, task_name='parent')
+        create_task(task_name='open subtask', parent=parent)
+
+        call_command('archive_tasks', days=90, stdout=StringIO())
+
+        self.assertEqual(Task.objects.count(), 2)
+        self.assertFalse(ArchivedTask.objects.exists())
+
+    def test_archived_tasks_still_count_towards_their_project(self):
+        project = create_project()
+        self.create_completed_task(days_ago=100, project=project, expected_mins=10)
+
+        call_command('archive_tasks', days=90, stdout=StringIO())
+
+        project.refresh_from_db()
+        self.assertEqual((project.task_count, project.open_task_count), (1, 0))
+        self.assertEqual(project.expected_mins, 10)
+
+    def test_status_changes_are_moved_with_their_task(self):
+        """
+        A task's `TaskStatusChange` rows move to `ArchivedTaskStatusChange`
+        """
+        old_task = self.create_completed_task(days_ago=100)
+        status_change_ids = list(
+            TaskStatusChange.objects.filter(task=old_task)
+                                    .values_list('pk', flat=True)
+        )
+        self.assertTrue(status_change_ids)
+
+        call_command('archive_tasks', days=90, stdout=StringIO())
+
+        self.assertFalse(TaskStatusChange.objects.exists())
+        self.assertEqual(
+            sorted(ArchivedTaskStatusChange.objects.values_list('pk', flat=True)),
+            sorted(status_change_ids),
+        )
+
+    def test_archives_in_batches(self):
+        """All eligible tasks are archived regardless of batch size"""
+        for i in range(5):
+            self.create_completed_task(days_ago=100)
+
+        call_command('archive_tasks', days=90, batch_size=2, stdout=StringIO())
+
+        self.assertEqual(Task.objects.count(), 0)
+        self.assertEqual(ArchivedTask.objects.count(), 5)
+
+    def test_incomplete_tasks_are_never_archived(self):
+        """Tasks that are not completed stay in the `Task` table"""
+        task = create_task(created_date=timezone.now() - datetime.timedelta(days=365))
+
+        call_command('archive_tasks', days=0, stdout=StringIO())
+
+        self.assertTrue(Task.objects.filter(pk=task.pk).exists())
+
+    def test_get_completed_tasks_spans_both_tables(self):
+        """
+        `get_completed_tasks` returns `Task` instances from both tables and
+        flags the archived ones
+        """
+        user = get_user(None)
+        old_task = self.create_completed_task(days_ago=100, user=user)
+        recent_task = self.create_completed_task(days_ago=1, user=user)
+        call_command('archive_tasks', days=90, stdout=StringIO())
+
+        completed_tasks = {task.pk: task for task in get_completed_tasks(user)}
+
+        self.assertEqual(set(completed_tasks), {old_task.pk, recent_task.pk})
+        self.assertTrue(completed_tasks[old_task.pk].archived)
+        self.assertFalse(completed_tasks[recent_task.pk].archived)
+        self.assertIsInstance(completed_tasks[old_task.pk], Task)
+
+class ManagePartitionsCommandTests(TestCase):
+
+    def test_month_helpers(self):
+        """Month arithmetic wraps across years"""
+        self.assertEqual(add_months(datetime.date(2022, 11, 1), 3), datetime.date(2023, 2, 1))
+        self.assertEqual(add_months(datetime.date(2022, 1, 1), -1), datetime.date(2021, 12, 1))
+        self.assertEqual(
+            month_range(datetime.date(2022, 11, 15), datetime.date(2023, 1, 1)),
+            [datetime.date(2022, 11, 1), datetime.date(2022, 12, 1), datetime.date(2023, 1, 1)],
+        )
+
+    def test_partition_names_round_trip(self):
+        month = datetime.date(2022, 3, 1)
+        self.assertEqual(partition_month(partition_name(month)), month)
+        self.assertIsNone(partition_month(DEFAULT_PARTITION))
+
+    def test_command_is_noop_without_partitioning(self):
+        """On databases without partitioning the command changes nothing"""
+        if is_partitioned():
+            self.skipTest('TaskStatusChange is partitioned on this database')
+        out = StringIO()
+        call_command('manage_partitions', retention_months=1, drop=True, stdout=out)
+        self.assertIn('not partitioned', out.getvalue())
+
+    def test_rows_in_the_default_partition_move_to_a_new_partition(self):
+        """A month that started before its partition was created"""
+        if not is_partitioned():
+            self.skipTest('TaskStatusChange is not partitioned on this database')
+        month = add_months(month_start(timezone.now()), 24)
+        created_datetime = datetime.datetime(month.year, month.month, 2, tzinfo=datetime.timezone.utc)
+        status_change = TaskStatusChange.objects.create(
+            task=create_task(), created_datetime=created_datetime)
+
+        create_partition(month)
+
+        self.assertIn(partition_name(month), list_partitions())
+        with connection.cursor() as cursor:
+            cursor.execute(f'SELECT COUNT(*) FROM {DEFAULT_PARTITION}')
+            self.assertEqual(cursor.fetchone()[0], 0)
+            cursor.execute(f'SELECT "id" FROM {partition_name(month)}')
+            self.assertEqual(cursor.fetchall(), [(status_change.pk,)])
+
+    def create_status_change(self, month, day=2):
+        return TaskStatusChange.objects.create(
+            task=create_task(),
+            created_datetime=datetime.datetime(month.year, month.month, day,
+                                               tzinfo=datetime.timezone.utc),
+        )
+
+    def table_exists(self, name):
+        with connection.cursor() as cursor:
+            cursor.execute('SELECT to_regclass(%s)', [name])
+            return cursor.fetchone()[0] is not None
+
+    def test_upcoming_partitions_are_created(self):
+        if not is_partitioned():
+            self.skipTest('TaskStatusChange is not partitioned on this database')
+        next_month = add_months(month_start(timezone.now()), 1)
+        with connection.cursor() as cursor:
+            cursor.execute(f'DROP TABLE {partition_name(next_month)}')
+
+        self.assertEqual(ensure_partitions(3), [partition_name(next_month)])
+        self.assertEqual(ensure_partitions(3), [])
+        self.assertIn(partition_name(next_month), list_partitions())
+
+    def test_old_partitions_are_detached_or_dropped(self):
+        if not is_partitioned():
+            self.skipTest('TaskStatusChange is not partitioned on this database')
+        this_month = month_start(timezone.now())
+        detached_month, dropped_month = add_months(this_month, -30), add_months(this_month, -29)
+        kept_month = add_months(this_month, -2)
+        for month in (detached_month, kept_month):
+            create_partition(month)
+        status_change = self.create_status_change(detached_month)
+
+        self.assertEqual(expire_partitions(24), [partition_name(detached_month)])
+
+        self.assertEqual(list_partitions()[0], partition_name(kept_month))
+        self.assertFalse(TaskStatusChange.objects.filter(pk=status_change.pk).exists())
+        # A detached partition is kept as a table of its own
+        with connection.cursor() as cursor:
+            cursor.execute(f'SELECT "id" FROM {partition_name(detached_month)}')
+            self.assertEqual(cursor.fetchall(), [(status_change.pk,)])
+
+        create_partition(dropped_month)
+        self.assertEqual(expire_partitions(24, drop=True), [partition_name(dropped_month)])
+        self.assertFalse(self.table_exists(partition_name(dropped_month)))
+
+    def test_date_ranges_only_read_their_partitions(self):
+        if not is_partitioned():
+            self.skipTest('TaskStatusChange is not partitioned on this database')
+        month = month_start(timezone.now())
+        start = datetime.datetime(month.year, month.month, 1, tzinfo=datetime.timezone.utc)
+
+        queryset = TaskStatusChange.objects.between(start, start + datetime.timedelta(days=7))
+        plan = queryset.explain()
+
+        self.assertIn(partition_name(month), plan)
+        self.assertNotIn(partition_name(add_months(month, 1)), plan)
+        self.assertNotIn(DEFAULT_PARTITION, plan)
+
+class CompactPartitionsTests(TransactionTestCase):
+    """`VACUUM` can't run inside the transaction `TestCase` wraps tests in"""
+
+    def setUp(self):
+        if not is_partitioned():
+            self.skipTest('TaskStatusChange is not partitioned on this database')
+        self.month = add_months(month_start(timezone.now()), -2)
+        create_partition(self.month)
+        self.addCleanup(self.drop_partition)
+
+    def drop_partition(self):
+        with connection.cursor() as cursor:
+            cursor.execute(f'DROP TABLE IF EXISTS {partition_name(self.month)}')
+
+    def test_closed_partitions_are_frozen_and_analyzed(self):
+        created_datetime = datetime.datetime(self.month.year, self.month.month, 2,
+                                             tzinfo=datetime.timezone.utc)
+        task = create_task()
+        for _ in range(3):
+            TaskStatusChange.objects.create(task=task, created_datetime=created_datetime)
+
+        compacted = compact_partitions()
+
+        self.assertIn(partition_name(self.month), compacted)
+        self.assertNotIn(partition_name(month_start(timezone.now())), compacted)
+        with connection.cursor() as cursor:
+            # Set by ANALYZE; -1 until a table has been analyzed
+            cursor.execute('SELECT reltuples FROM pg_class WHERE relname = %s',
+                           [partition_name(self.month)])
+            self.assertEqual(cursor.fetchone()[0], 3)
+
+class GenerateRecurringTasksCommandTests(TestCase):
+
+    def create_recurring_task(self, cron_expression='0 9 * * *', **kwargs):
+        return RecurringTask.objects.create(
+            user=get_user(None),
+            task_name='recurring',
+            expected_mins=15,
+            cron_expression=cron_expression,
+            **kwargs,
+        )
+
+    def test_new_recurring_task_is_scheduled(self):
+        """Saving a new template sets its first occurrence"""
+        recurring_task = self.create_recurring_task()
+        self.assertGreater(recurring_task.next_run_date, timezone.now())
+
+    def test_due_occurrence_creates_task(self):
+        """
+        A due template creates a task for its occurrence and moves on to
+        the next occurrence
+        """
+        now = timezone.now().replace(second=30, microsecond=0)
+        occurrence = now.replace(second=0)
+        recurring_task = self.create_recurring_task(
+            cron_expression='* * * * *', next_run_date=occurrence)
+
+        generate_recurring_tasks(now=now)
+
+        task = Task.objects.get()
+        self.assertEqual(task.recurring_task, recurring_task)
+        self.assertEqual(task.occurrence, occurrence)
+        self.assertEqual(task.expected_mins, 15)
+        self.assertTrue(task.active)
+
+        recurring_task.refresh_from_db()
+        self.assertEqual(recurring_task.next_run_date, occurrence + datetime.timedelta(minutes=1))
+
+    def test_generated_tasks_are_counted_in_their_project(self):
+        now = timezone.now().replace(second=30, microsecond=0)
+        project = create_project()
+        self.create_recurring_task(
+            cron_expression='* * * * *', next_run_date=now.replace(second=0),
+            project=project)
+
+        generate_recurring_tasks(now=now)
+
+        project.refresh_from_db()
+        self.assertEqual((project.task_count, project.open_task_count), (1, 1))
+        self.assertEqual(project.expected_mins, 15)
+
+    def test_generation_is_idempotent(self):
+        """
+        Running the generator twice, even with a stale schedule, creates
+        each occurrence only once
+        """
+        now = timezone.now().replace(second=30, microsecond=0)
+        occurrence = now.replace(second=0)
+        recurring_task = self.create_recurring_task(
+            cron_expression='* * * * *', next_run_date=occurrence)
+
+        generate_recurring_tasks(now=now)
+        RecurringTask.objects.filter(pk=recurring_task.pk).update(next_run_date=occurrence)
+        generate_recurring_tasks(now=now)
+
+        self.assertEqual(Task.objects.count(), 1)
+
+    def test_missed_occurrences_are_capped(self):
+        """Only the latest missed occurrences are created"""
+        self.create_recurring_task(
+            cron_expression='0 * * * *',
+            next_run_date=timezone.now() - datetime.timedelta(hours=10),
+        )
+
+        generate_recurring_tasks(max_catch_up=2)
+
+        self.assertEqual(Task.objects.count(), 2)
+
+    def test_catching_up_walks_back_from_now(self):
+        """A template missed for a month doesn't step through every
+        occurrence since"""
+        now = timezone.now()
+        recurring_task = self.create_recurring_task(
+            cron_expression='* * * * *',
+            next_run_date=now - datetime.timedelta(days=30),
+        )
+
+        with mock.patch.object(RecurringTask, 'get_next_occurrence') as get_next_occurrence:
+            occurrences = recurring_task.get_due_occurrences(now, limit=2)
+        get_next_occurrence.assert_not_called()
+
+        self.assertEqual(len(occurrences), 2)
+        self.assertTrue(now - datetime.timedelta(minutes=2) < occurrences[0] < occurrences[1] <= now)
+
+    def test_limited_occurrences_match_the_full_walk(self):
+        now = timezone.now()
+        for next_run_date in (now - datetime.timedelta(hours=5), now - datetime.timedelta(minutes=30)):
+            recurring_task = RecurringTask(cron_expression='0 * * * *', next_run_date=next_run_date)
+            every_occurrence = recurring_task.get_due_occurrences(now)
+            for limit in (1, 3, 10):
+                with self.subTest(next_run_date=next_run_date, limit=limit):
+                    self.assertEqual(recurring_task.get_due_occurrences(now, limit=limit),
+                                     every_occurrence[-limit:])
+
+    def test_inactive_and_future_templates_are_skipped(self):
+        self.create_recurring_task(
+            active=False,
+            next_run_date=timezone.now() - datetime.timedelta(minutes=1),
+        )
+        self.create_recurring_task()
+
+        generate_recurring_tasks()
+
+        self.assertFalse(Task.objects.exists())
+
+    def test_processes_templates_in_batches(self):
+        for i in range(5):
+            self.create_recurring_task(
+                cron_expression='* * * * *',
+                next_run_date=timezone.now() - datetime.timedelta(minutes=1),
+            )
+
+        generate_recurring_tasks(batch_size=2)
+
+        self.assertEqual(Task.objects.count(), 5)
+
+class SeedSyntheticCommandTests(TestCase):
+
+    def seed(self, **kwargs):
+        options = {
+            'users': 3,
+            'tasks_per_user': 20,
+            'seed': 1,
+            'end': datetime.date(2022, 6, 30),
+            'days': 90,
+            'stdout': StringIO(),
+            **kwargs,
+        }
+        call_command('seed_synthetic', **options)
+
+    def test_rows_are_consistent(self):
+        self.seed()
+
+        users = get_user_model().objects.filter(username__startswith='synthetic-1-')
+        tasks = Task.objects.filter(user__in=users)
+        self.assertEqual(users.count(), 3)
+        self.assertTrue(tasks.exists())
+        # Tasks are only ever in their own user's projects
+        self.assertFalse(tasks.exclude(project=None).exclude(project__user=F('user')).exists())
+
+        for task in tasks.filter(completed=True):
+            self.assertFalse(task.active)
+            self.assertGreaterEqual(task.completed_date, task.created_date)
+            self.assertIsNotNone(task.actual_mins)
+            status_change = TaskStatusChange.objects.get(task=task)
+            self.assertEqual(status_change.completed_datetime, task.completed_date)
+
+        for task in tasks.filter(completed=False, active=False):
+            self.assertIsNotNone(
+                TaskStatusChange.objects.get(task=task).inactive_datetime)
+        self.assertFalse(TaskStatusChange.objects.filter(
+            task__in=tasks.filter(completed=False, active=True)).exists())
+
+    def test_project_counters_match_the_tasks(self):
+        self.seed()
+        self.assertEqual(reconcile_project_counters(), 0)
+
+    def test_same_seed_generates_the_same_rows(self):
+        first_ids = {model: 1 for model in (get_user_model(), Project, Task, TaskStatusChange)}
+        arguments = (7, 0, CHUNK_USERS, 10, 2,
+                     datetime.datetime(2022, 1, 1, tzinfo=datetime.timezone.utc),
+                     datetime.datetime(2022, 6, 30, tzinfo=datetime.timezone.utc),
+                     first_ids)
+
+        self.assertEqual(generate_chunk(*arguments), generate_chunk(*arguments))
+
+    def test_ids_keep_working_after_seeding(self):
+        """Sequences are moved past the ids assigned by the seeder"""
+        self.seed()
+
+        task = create_task(user=get_user_model().objects.first())
+        self.assertEqual(task.pk, Task.objects.order_by('pk').last().pk)
+
+    def test_seed_can_only_be_loaded_once(self):
+        self.seed()
+        with self.assertRaises(CommandError):
+            self.seed()
+        self.seed(seed=2)
+        self.assertEqual(get_user_model().objects.count(), 6)
+
+class ReconcileProjectCountersCommandTests(TestCase):
+
+    def test_drifted_counters_are_repaired(self):
+        """Writes that bypass `Task.save` leave the counters stale until
+        the projects are recounted"""
+        drifted = create_project(name='drifted')
+        correct = create_project(name='correct')
+        create_task(project=correct, expected_mins=5)
+        Task.objects.bulk_create([
+            Task(task_name='bulk', expected_mins=10, actual_mins=4,
+                 user=get_user(None), project=drifted, completed=True),
+            Task(task_name='bulk', expected_mins=20, user=get_user(None), project=drifted),
+        ])
+        ArchivedTask.objects.create(
+            id=1000, task_name='archived', expected_mins=30, user=get_user(None),
+            project=drifted, completed=True, created_date=timezone.now(),
+            archived_date=timezone.now())
+        stdout = StringIO()
+
+        call_command('reconcile_project_counters', batch_size=1, stdout=stdout)
+
+        drifted.refresh_from_db()
+        self.assertEqual(
+            (drifted.task_count, drifted.open_task_count, drifted.expected_mins, drifted.actual_mins),
+            (3, 1, 60, 4),
+        )
+        self.assertIn('Fixed the counters of 1 projects', stdout.getvalue())
@@ -0,0 +1,98 @@
+import gzip
+import unittest
+import zlib
+
+from django.contrib.auth import get_user_model
+from django.http import HttpResponse, StreamingHttpResponse
+from django.test import RequestFactory, SimpleTestCase, TestCase
+from django.urls import reverse
+
+from task_time_tracker import compression
+from task_time_tracker.middleware import CompressionMiddleware
+from task_time_tracker.utils.test_helpers import create_task
+
+HTML = b'<tr class="table-row"><td class="align-middle">task</td></tr>' * 100
+
+def respond(response, accept_encoding='gzip, deflate, br'):
+    request = RequestFactory().get('/', HTTP_ACCEPT_ENCODING=accept_encoding)
+    return CompressionMiddleware(lambda request: response)(request)
+
+class ChooseEncodingTests(SimpleTestCase):
+
+    def test_client_weights_come_first(self):
+        self.assertEqual(compression.choose_encoding('gzip;q=1.0, br;q=0.5'), 'gzip')
+        self.assertEqual(compression.choose_encoding('*'), compression.get_available_encodings()[0])
+
+    def test_refused_encodings_arent_used(self):
+        self.assertIsNone(compression.choose_encoding('gzip;q=0, br;q=0'))
+        self.assertIsNone(compression.choose_encoding('identity'))
+        self.assertIsNone(compression.choose_encoding(''))
+
+class CompressionMiddlewareTests(SimpleTestCase):
+
+    def test_pages_are_gzipped(self):
+        response = respond(HttpResponse(HTML), accept_encoding='gzip')
+
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+        self.assertEqual(response['Vary'], 'Accept-Encoding')
+        self.assertEqual(int(response['Content-Length']), len(response.content))
+        self.assertEqual(gzip.decompress(response.content), HTML)
+
+    @unittest.skipUnless(compression.brotli, 'brotli is not installed')
+    def test_brotli_is_preferred(self):
+        response = respond(HttpResponse(HTML))
+
+        self.assertEqual(response['Content-Encoding'], 'br')
+        self.assertEqual(compression.brotli.decompress(response.content), HTML)
+
+    def test_small_responses_are_left_alone(self):
+        response = respond(HttpResponse(b'<p>ok</p>'))
+
+        self.assertFalse(response.has_header('Content-Encoding'))
+        self.assertEqual(response['Vary'], 'Accept-Encoding')
+
+    def test_other_types_are_left_alone(self):
+        response = respond(HttpResponse(HTML, content_type='image/png'))
+
+        self.assertFalse(response.has_header('Content-Encoding'))
+        self.assertFalse(response.has_header('Vary'))
+
+    def test_streams_are_compressed_chunk_by_chunk(self):
+        """Each chunk can be decoded as soon as it arrives"""
+        response = respond(StreamingHttpResponse(iter([HTML, HTML])), accept_encoding='gzip')
+        decompressor = zlib.decompressobj(16 + zlib.MAX_WBITS)
+
+        chunks = iter(response.streaming_content)
+        self.assertEqual(decompressor.decompress(next(chunks)), HTML)
+        self.assertEqual(decompressor.decompress(b''.join(chunks)), HTML)
+        self.assertFalse(response.has_header('Content-Length'))
+
+    def test_event_streams_are_left_alone(self):
+        response = respond(StreamingHttpResponse(iter([b'data: 1\n\n']),
+                                                 content_type='text/event-stream'))
+
+        self.assertFalse(response.has_header('Content-Encoding'))
+        self.assertEqual(list(response.streaming_content), [b'data: 1\n\n'])
+
+    def test_etags_are_weakened(self):
+        response = HttpResponse(HTML)
+        response['ETag'] = '"abc"'
+
+        self.assertEqual(respond(response)['ETag'], 'W/"abc"')
+
+class CompressedPageTests(TestCase):
+
+    def test_revalidating_a_compressed_page(self):
+        user = get_user_model().objects.create_user(username='username')
+        for index in range(20):
+            create_task(user=user, task_name=f'task {index}')
+        self.client.force_login(user)
+        url = reverse('active_tasks')
+
+        response = self.client.get(url, HTTP_ACCEPT_ENCODING='gzip')
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+        self.assertIn('task 19', gzip.decompress(response.content).decode())
+
+        response = self.client.get(url, HTTP_ACCEPT_ENCODING='gzip',
+                                   HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(response.status_code, 304)
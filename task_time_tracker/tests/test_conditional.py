@@ -0,0 +1,80 @@
+from django.contrib.auth import get_user_model
+from django.test import TestCase
+from django.urls import reverse
+
+from task_time_tracker.utils.test_helpers import create_project, create_task
+
+class ConditionalPageTests(TestCase):
+    """The task pages answer revalidation with a 304 until the user's data
+    changes"""
+
+    def setUp(self):
+        self.user = get_user_model().objects.create_user(username='username')
+        self.task = create_task(user=self.user, expected_mins=30)
+        self.client.force_login(self.user)
+
+    def revalidate(self, url, response):
+        return self.client.get(url, HTTP_IF_NONE_MATCH=response['ETag'])
+
+    def test_unchanged_pages_are_not_modified(self):
+        for name in ('dashboard', 'active_tasks', 'completed_tasks'):
+            with self.subTest(name):
+                url = reverse(name)
+                response = self.client.get(url)
+                self.assertEqual(response.status_code, 200)
+                self.assertIn('private', response['Cache-Control'])
+                self.assertIn('Last-Modified', response)
+
+                # The session and the user
+                with self.assertNumQueries(2):
+                    response = self.revalidate(url, response)
+                self.assertEqual(response.status_code, 304)
+
+    def test_task_changes_render_the_page_again(self):
+        url = reverse('active_tasks')
+        response = self.client.get(url)
+
+        self.task.expected_mins = 45
+        self.task.save()
+
+        self.assertEqual(self.revalidate(url, response).status_code, 200)
+
+    def test_project_changes_render_the_page_again(self):
+        url = reverse('dashboard')
+        response = self.client.get(url)
+
+        create_project(user=self.user)
+
+        self.assertEqual(self.revalidate(url, response).status_code, 200)
+
+    def test_other_users_changes_dont(self):
+        url = reverse('active_tasks')
+        response = self.client.get(url)
+
+        other_user = get_user_model().objects.create_user(username='other')
+        create_task(user=other_user)
+
+        self.assertEqual(self.revalidate(url, response).status_code, 304)
+
+    def test_pages_differ_between_users(self):
+        url = reverse('active_tasks')
+        response = self.client.get(url)
+
+        other_user = get_user_model().objects.create_user(username='other')
+        self.client.force_login(other_user)
+
+        self.assertEqual(self.revalidate(url, response).status_code, 200)
+
+    def test_settings_changes_render_the_page_again(self):
+        url = reverse('dashboard')
+        response = self.client.get(url)
+
+        self.user.daily_capacity_mins = 60
+        self.user.save()
+
+        self.assertEqual(self.revalidate(url, response).status_code, 200)
+
+    def test_anonymous_users_are_still_redirected(self):
+        self.client.logout()
+        response = self.client.get(reverse('active_tasks'), HTTP_IF_NONE_MATCH='"x"')
+        self.assertEqual(response.status_code, 302)
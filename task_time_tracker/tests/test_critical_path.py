@@ -0,0 +1,192 @@
+import datetime
+import random
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import DatabaseError, IntegrityError, transaction
+from django.test import SimpleTestCase, TestCase
+from django.urls import reverse
+
+from task_time_tracker.forms import EditTaskForm
+from task_time_tracker.models import Task, TaskDependency
+from task_time_tracker.utils.critical_path import (CriticalPath,
+                                                   get_user_critical_path,
+                                                   would_create_cycle)
+from task_time_tracker.utils.test_helpers import create_project, create_task, get_user
+
+START = datetime.date(2022, 1, 3)
+
+def make_task(task_id, expected_mins, actual_mins=None, project_id=None):
+    """Build a task dict in the shape `CriticalPath` reads"""
+    return {
+        'id': task_id,
+        'expected_mins': expected_mins,
+        'actual_mins': actual_mins,
+        'project_id': project_id,
+    }
+
+def get_finishes(critical_path, task_ids):
+    return {task_id: critical_path.get_finish_mins(task_id) for task_id in task_ids}
+
+class CriticalPathTests(SimpleTestCase):
+
+    def build(self):
+        """
+        1 (30) ─┬─> 3 (10) ──> 4 (5)
+        2 (60) ─┘
+        """
+        return CriticalPath(60, start_date=START).build(
+            [make_task(1, 30), make_task(2, 60, actual_mins=20),
+             make_task(3, 10, project_id=7), make_task(4, 5, project_id=7)],
+            [(3, 1), (3, 2), (4, 3)],
+        )
+
+    def test_tasks_start_after_what_they_depend_on(self):
+        critical_path = self.build()
+
+        self.assertEqual(get_finishes(critical_path, [1, 2, 3, 4]),
+                         {1: 30, 2: 40, 3: 50, 4: 55})
+        self.assertEqual(critical_path.get_critical_path(4), [2, 3, 4])
+
+    def test_finishes_become_dates(self):
+        critical_path = CriticalPath(60, start_date=START).build(
+            [make_task(1, 60, project_id=7), make_task(2, 30, project_id=7)], [(2, 1)])
+
+        self.assertEqual(critical_path.get_finish_date(1), START)
+        self.assertEqual(critical_path.get_project_finish_dates(),
+                         {7: START + datetime.timedelta(days=1)})
+
+    def test_updates_only_move_what_depends_on_the_task(self):
+        critical_path = self.build()
+
+        critical_path.update(make_task(1, 100))
+
+        self.assertEqual(get_finishes(critical_path, [1, 2, 3, 4]),
+                         {1: 100, 2: 40, 3: 110, 4: 115})
+        self.assertEqual(critical_path.get_critical_path(4), [1, 3, 4])
+
+    def test_removing_a_task_releases_its_dependents(self):
+        critical_path = self.build()
+
+        critical_path.remove(2)
+
+        self.assertNotIn(2, critical_path)
+        self.assertEqual(get_finishes(critical_path, [3, 4]), {3: 40, 4: 45})
+
+    def test_dependencies_against_the_order_are_resorted(self):
+        critical_path = self.build()
+        critical_path.update(make_task(5, 15))
+
+        # 5 was added last, so it ranks after 1
+        critical_path.add_dependency(1, 5)
+
+        self.assertEqual(get_finishes(critical_path, [5, 1, 3, 4]),
+                         {5: 15, 1: 45, 3: 55, 4: 60})
+
+    def test_cycles_dont_loop_forever(self):
+        critical_path = self.build()
+        critical_path.add_dependency(1, 4)
+        self.assertEqual(set(critical_path.get_project_finish_dates()), {7})
+
+    def test_incremental_changes_match_a_rebuild(self):
+        rng = random.Random(0)
+        tasks = {task_id: make_task(task_id, rng.randint(1, 120)) for task_id in range(200)}
+        dependencies = set()
+        for task_id in range(1, 200):
+            for _ in range(3):
+                dependencies.add((task_id, rng.randrange(task_id)))
+        critical_path = CriticalPath(480, start_date=START).build(
+            list(tasks.values()), dependencies)
+
+        for _ in range(300):
+            task_id = rng.randrange(200)
+            change = rng.random()
+            if change < 0.4:
+                tasks[task_id] = make_task(task_id, rng.randint(1, 120))
+                critical_path.update(tasks[task_id])
+            elif change < 0.7 and task_id:
+                edge = (task_id, rng.randrange(task_id))
+                dependencies.add(edge)
+                critical_path.add_dependency(*edge)
+            elif dependencies:
+                edge = rng.choice(sorted(dependencies))
+                dependencies.discard(edge)
+                critical_path.remove_dependency(*edge)
+
+        rebuilt = CriticalPath(480, start_date=START).build(list(tasks.values()), dependencies)
+        self.assertEqual(get_finishes(critical_path, tasks), get_finishes(rebuilt, tasks))
+
+class TaskDependencyTests(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.user = get_user(None)
+        self.first = create_task(task_name='first', expected_mins=30)
+        self.second = create_task(task_name='second', expected_mins=20)
+        self.third = create_task(task_name='third', expected_mins=10)
+        self.second.depends_on.add(self.first)
+        self.third.depends_on.add(self.second)
+
+    def test_cycles_are_detected(self):
+        with self.assertNumQueries(1):
+            self.assertTrue(would_create_cycle(self.first.pk, self.third.pk))
+        self.assertTrue(would_create_cycle(self.first.pk, self.first.pk))
+        self.assertFalse(would_create_cycle(self.third.pk, self.first.pk))
+
+    def test_task_cant_depend_on_itself(self):
+        with self.assertRaises(IntegrityError):
+            TaskDependency.objects.create(task=self.first, depends_on=self.first)
+
+    def test_edit_form_rejects_cycles(self):
+        form = EditTaskForm(instance=self.first, user=self.user, data={
+            'task_name': 'first',
+            'expected_mins': 30,
+            'depends_on': [self.third.pk],
+        })
+        self.assertIn('already waits for this task', form.errors['depends_on'][0])
+
+    def test_cached_graph_follows_changes(self):
+        """Task saves and dependency changes update the cached graph
+        without rebuilding it, once they're committed"""
+        self.assertEqual(get_user_critical_path(self.user).get_finish_mins(self.third.pk), 60)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.first.expected_mins = 90
+            self.first.save()
+            self.third.depends_on.remove(self.second)
+            fourth = create_task(task_name='fourth', expected_mins=5)
+            fourth.depends_on.add(self.third)
+            self.second.completed = True
+            self.second.save()
+            self.assertEqual(get_user_critical_path(self.user).get_finish_mins(self.third.pk), 60)
+
+        with self.assertNumQueries(0):
+            critical_path = get_user_critical_path(self.user)
+        self.assertNotIn(self.second.pk, critical_path)
+        self.assertEqual(get_finishes(critical_path, [self.first.pk, self.third.pk, fourth.pk]),
+                         {self.first.pk: 90, self.third.pk: 10, fourth.pk: 15})
+
+    def test_rolled_back_dependencies_leave_the_graph_alone(self):
+        get_user_critical_path(self.user)
+
+        with self.captureOnCommitCallbacks(execute=True) as callbacks:
+            try:
+                with transaction.atomic():
+                    self.third.depends_on.add(self.first)
+                    self.third.depends_on.remove(self.second)
+                    raise DatabaseError
+            except DatabaseError:
+                pass
+
+        self.assertEqual(callbacks, [])
+        self.assertEqual(get_user_critical_path(self.user).get_finish_mins(self.third.pk), 60)
+
+    def test_projects_page_shows_forecast_finish(self):
+        project = create_project(end_date=datetime.date(2000, 1, 1))
+        Task.objects.filter(pk=self.third.pk).update(project=project)
+        user = get_user_model().objects.get()
+        self.client.force_login(user)
+
+        response = self.client.get(reverse('projects'))
+
+        self.assertContains(response, 'table-danger')
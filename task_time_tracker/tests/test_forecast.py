@@ -0,0 +1,125 @@
+import datetime
+
+from django.core.cache import cache
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+import numpy as np
+
+from task_time_tracker.models import ArchivedTask
+from task_time_tracker.utils.forecast import (RATIO_QUANTILES,
+                                              forecast_projects,
+                                              forecast_todays_tasks,
+                                              get_error_ratios,
+                                              simulate_remaining)
+from task_time_tracker.utils.test_helpers import create_project, create_task, get_user
+
+class SimulateRemainingTests(SimpleTestCase):
+
+    def test_groups_are_summed_separately(self):
+        ratios = np.full(RATIO_QUANTILES, 2, dtype=np.float32)
+        totals = simulate_remaining([10, 20, 30], [0, 50, 5], [0, 1], ratios,
+                                    trials=5, rng=np.random.default_rng(0))
+
+        # Time already spent beyond the drawn duration counts as 0 left
+        np.testing.assert_array_equal(totals, [[20, 55]] * 5)
+
+    def test_trials_span_chunks(self):
+        ratios = np.linspace(0.5, 3, RATIO_QUANTILES, dtype=np.float32)
+        totals = simulate_remaining(np.ones(100_000), np.zeros(100_000), [0], ratios,
+                                    trials=7, rng=np.random.default_rng(0))
+
+        self.assertEqual(totals.shape, (7, 1))
+        self.assertTrue(np.all(totals > 0))
+
+@override_settings(FORECAST_MIN_HISTORY=4)
+class ForecastTests(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.user = get_user(None)
+
+    def complete_tasks(self, ratios):
+        for ratio in ratios:
+            create_task(expected_mins=10, actual_mins=10 * ratio, completed=True)
+
+    def test_estimates_are_taken_at_face_value_without_history(self):
+        create_task(expected_mins=30, actual_mins=10, active=True)
+
+        self.assertEqual([point.remaining_mins for point in forecast_todays_tasks(self.user)],
+                         [20, 20, 20])
+
+    def test_ratios_include_archived_tasks(self):
+        self.complete_tasks([2, 2])
+        for index in range(2):
+            ArchivedTask.objects.create(
+                id=1000 + index, user=self.user, task_name='archived',
+                expected_mins=10, actual_mins=20, created_date=timezone.now(),
+                completed_date=timezone.now(),
+            )
+
+        np.testing.assert_array_equal(get_error_ratios(self.user),
+                                      np.full(RATIO_QUANTILES, 2))
+
+    def test_percentiles_spread_with_estimate_error(self):
+        self.complete_tasks([1, 1, 2, 3, 4])
+        for _ in range(10):
+            create_task(expected_mins=60, active=True)
+
+        points = forecast_todays_tasks(self.user)
+
+        self.assertEqual([point.percentile for point in points], [50, 80, 95])
+        remaining = [point.remaining_mins for point in points]
+        self.assertEqual(remaining, sorted(remaining))
+        self.assertLess(remaining[0], remaining[-1])
+        self.assertTrue(600 <= remaining[0] and remaining[-1] <= 2400)
+
+    def test_projects_are_forecast_separately(self):
+        self.complete_tasks([2, 2, 2, 2])
+        first = create_project(name='first')
+        second = create_project(name='second')
+        create_task(project=first, expected_mins=30)
+        create_task(project=second, expected_mins=45, actual_mins=40)
+
+        forecasts = forecast_projects(self.user)
+
+        self.assertEqual(forecasts[first.pk][0].remaining_mins, 60)
+        self.assertEqual(forecasts[second.pk][0].remaining_mins, 50)
+
+    def test_forecasts_are_cached_until_a_task_changes(self):
+        task = create_task(expected_mins=30, active=True)
+        forecast_todays_tasks(self.user)
+
+        with self.assertNumQueries(0):
+            forecast_todays_tasks(self.user)
+
+        task.expected_mins = 90
+        with self.captureOnCommitCallbacks(execute=True):
+            task.save()
+            # Other processes can't see the change until it commits
+            self.assertEqual(forecast_todays_tasks(self.user)[0].remaining_mins, 30)
+        self.assertEqual(forecast_todays_tasks(self.user)[0].remaining_mins, 90)
+
+    def test_projects_page_shows_likely_finish(self):
+        """Tasks usually take twice their estimate, so the likely finish is
+        later than the critical-path forecast"""
+        self.complete_tasks([2, 2, 2, 2])
+        self.user.daily_capacity_mins = 60
+        self.user.save()
+        project = create_project()
+        create_task(project=project, expected_mins=150)
+        self.client.force_login(self.user)
+
+        response = self.client.get(reverse('projects'))
+
+        likely_finish = timezone.localdate() + datetime.timedelta(days=4)
+        self.assertContains(response, likely_finish.strftime('%b %-d'))
+
+    def test_dashboard_shows_forecast_times(self):
+        create_task(expected_mins=90, active=True)
+        self.client.force_login(self.user)
+
+        response = self.client.get(reverse('dashboard'))
+
+        self.assertContains(response, 'forecast-times')
+        self.assertEqual(response.context['forecast_times'][0][0], 50)
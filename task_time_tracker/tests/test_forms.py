@@ -4,7 +4,11 @@ from django.urls import reverse
 
 from lorem import get_word
 
-from task_time_tracker.forms import EditTaskForm, NewProjectForm, SitePasswordResetForm
+from task_time_tracker.forms import (EditTaskForm,
+                                     NewProjectForm,
+                                     RecurringTaskForm,
+                                     SitePasswordResetForm)
+from task_time_tracker.utils.test_helpers import create_task
 from task_time_tracker.views import SitePasswordResetConfirmView
 
 class NewProjectFormTests(TestCase):
@@ -63,5 +67,48 @@ class EditTaskFormTests(TestCase):
             'actual_mins',
             'completed',
             'active',
+            'parent',
+            'depends_on',
         )
         self.assertEqual(form._meta.fields, intended_fields)
+
+    def test_task_cant_be_moved_under_its_own_subtasks(self):
+        """
+        The parent choices are the user's other tasks, leaving out the
+        task itself and everything below it
+        """
+        user = get_user_model().objects.create_user(username='username')
+        other_user = get_user_model().objects.create_user(username='other')
+        task = create_task(user=user)
+        subtask = create_task(user=user, parent=task)
+        create_task(user=user, parent=subtask)
+        sibling = create_task(user=user)
+        create_task(user=other_user)
+
+        form = EditTaskForm(instance=task, user=user)
+
+        self.assertEqual(list(form.fields['parent'].queryset), [sibling])
+        form = EditTaskForm(
+            instance=task, user=user,
+            data={'task_name': 'task', 'expected_mins': 5, 'parent': subtask.pk})
+        self.assertIn('parent', form.errors)
+
+
+class RecurringTaskFormTests(TestCase):
+
+    def test_valid_cron_expression_is_valid(self):
+        form = RecurringTaskForm(data={
+            'task_name': get_word(2),
+            'cron_expression': '0 9 * * 1-5',
+            'expected_mins': 10,
+        })
+        self.assertTrue(form.is_valid())
+
+    def test_invalid_cron_expression_is_invalid(self):
+        form = RecurringTaskForm(data={
+            'task_name': get_word(2),
+            'cron_expression': 'every morning',
+            'expected_mins': 10,
+        })
+        self.assertFalse(form.is_valid())
+        self.assertIn('cron_expression', form.errors)
@@ -0,0 +1,136 @@
+import datetime
+import json
+from io import StringIO
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.core import mail
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+
+from task_time_tracker import jobs
+from task_time_tracker.models import Job
+
+@jobs.job(max_attempts=2)
+def failing_test_job():
+    raise ValueError('failing_test_job always fails')
+
+@override_settings(JOB_QUEUE_ALWAYS_EAGER=False, JOB_QUEUE_BROKER='database')
+class DatabaseJobQueueTests(TestCase):
+
+    def test_enqueue_creates_queued_job(self):
+        """Queueing a job stores it without running it"""
+        jobs.enqueue('send_email', subject='s', body='b',
+                     from_email='from@foo.com', to=['to@foo.com'])
+
+        queued_job = Job.objects.get()
+        self.assertEqual(queued_job.name, 'send_email')
+        self.assertEqual(queued_job.status, Job.Status.QUEUED)
+        self.assertEqual(queued_job.kwargs['to'], ['to@foo.com'])
+        self.assertEqual(len(mail.outbox), 0)
+
+    def test_worker_runs_queued_jobs(self):
+        """`run_jobs --burst` runs every due job, then exits"""
+        jobs.enqueue('send_email', subject='s', body='b',
+                     from_email='from@foo.com', to=['to@foo.com'])
+
+        call_command('run_jobs', burst=True, stdout=StringIO())
+
+        queued_job = Job.objects.get()
+        self.assertEqual(queued_job.status, Job.Status.SUCCEEDED)
+        self.assertEqual(queued_job.attempts, 1)
+        self.assertIsNotNone(queued_job.duration_ms)
+        self.assertEqual(len(mail.outbox), 1)
+
+    def test_jobs_that_are_not_due_are_left_alone(self):
+        jobs.enqueue('send_email', run_after=timezone.now() + datetime.timedelta(hours=1),
+                     subject='s', body='b', from_email='from@foo.com', to=['to@foo.com'])
+
+        call_command('run_jobs', burst=True, stdout=StringIO())
+
+        self.assertEqual(Job.objects.get().status, Job.Status.QUEUED)
+        self.assertEqual(len(mail.outbox), 0)
+
+    def test_failed_job_is_retried_with_backoff(self):
+        """
+        A failed job is queued again for later, and marked failed once it
+        has used up its attempts
+        """
+        jobs.enqueue('failing_test_job')
+        broker = jobs.DatabaseBroker()
+
+        jobs.run_job(broker, broker.reserve())
+        queued_job = Job.objects.get()
+        self.assertEqual(queued_job.status, Job.Status.QUEUED)
+        self.assertIn('ValueError', queued_job.last_error)
+        self.assertGreater(queued_job.run_after, timezone.now())
+
+        # Not due yet
+        self.assertIsNone(broker.reserve())
+
+        Job.objects.update(run_after=timezone.now())
+        jobs.run_job(broker, broker.reserve())
+        self.assertEqual(Job.objects.get().status, Job.Status.FAILED)
+
+    def test_retry_delay_doubles_up_to_maximum(self):
+        with override_settings(JOB_QUEUE_RETRY_BASE_DELAY=10,
+                               JOB_QUEUE_RETRY_MAX_DELAY=35):
+            self.assertEqual(
+                [jobs.get_retry_delay(attempts) for attempts in range(1, 5)],
+                [10, 20, 35, 35],
+            )
+
+    def test_job_with_expired_lease_is_picked_up_again(self):
+        """A job left running by a worker that died is run again, after
+        the same backoff as a failed attempt"""
+        jobs.enqueue('send_email', subject='s', body='b',
+                     from_email='from@foo.com', to=['to@foo.com'])
+        broker = jobs.DatabaseBroker()
+        broker.reserve()
+        self.assertIsNone(broker.reserve())
+
+        Job.objects.update(run_after=timezone.now())
+        self.assertIsNone(broker.reserve())
+        queued_job = Job.objects.get()
+        self.assertEqual(queued_job.status, Job.Status.QUEUED)
+        self.assertEqual(queued_job.last_error, jobs.LEASE_EXPIRED_ERROR)
+        self.assertGreater(queued_job.run_after, timezone.now())
+
+        Job.objects.update(run_after=timezone.now())
+        self.assertEqual(broker.reserve().attempts, 2)
+
+    def test_job_whose_lease_expires_on_its_last_attempt_fails(self):
+        """A job that keeps killing its worker isn't retried forever"""
+        jobs.enqueue('failing_test_job')
+        broker = jobs.DatabaseBroker()
+        for attempt in (1, 2):
+            # Make the job due, then let the lease run out
+            Job.objects.update(run_after=timezone.now())
+            self.assertEqual(broker.reserve().attempts, attempt)
+            Job.objects.update(run_after=timezone.now())
+            self.assertIsNone(broker.reserve())
+        queued_job = Job.objects.get()
+        self.assertEqual((queued_job.status, queued_job.attempts), (Job.Status.FAILED, 2))
+        self.assertEqual(queued_job.last_error, jobs.LEASE_EXPIRED_ERROR)
+        self.assertIsNotNone(queued_job.finished_date)
+
+    def test_password_reset_email_is_queued(self):
+        """The password reset view queues its email instead of sending it"""
+        get_user_model().objects.create_user(
+            username='username', password='password', email='user@foo.com')
+
+        self.client.post(reverse('password_reset'), {'email': 'user@foo.com'})
+
+        self.assertEqual(len(mail.outbox), 0)
+        kwargs = Job.objects.get().kwargs
+        self.assertEqual(kwargs['to_email'], 'user@foo.com')
+        # The reset token is only made when the job runs
+        self.assertNotIn('token', kwargs['context'])
+        self.assertNotIn('/reset/', json.dumps(kwargs))
+
+        call_command('run_jobs', burst=True, stdout=StringIO())
+        self.assertEqual(len(mail.outbox), 1)
+        self.assertIn('/reset/', mail.outbox[0].body)
+        self.assertEqual(Job.objects.get().kwargs, {})
@@ -0,0 +1,180 @@
+import asyncio
+import json
+from unittest import mock
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.test import SimpleTestCase, TestCase, override_settings
+
+from task_time_tracker import live
+from task_time_tracker.utils.test_helpers import create_task
+
+class InProcessBrokerTests(SimpleTestCase):
+
+    def test_messages_fan_out_to_every_subscriber(self):
+        """Every open dashboard for a user gets each message"""
+        async def run():
+            broker = live.InProcessBroker()
+            first = broker.subscribe('channel')
+            second = broker.subscribe('channel')
+            other = broker.subscribe('other channel')
+
+            broker.publish('channel', {'type': 'task', 'id': 1})
+
+            return [await subscription.get(0.1) for subscription in (first, second, other)]
+
+        self.assertEqual(
+            asyncio.run(run()),
+            [{'type': 'task', 'id': 1}, {'type': 'task', 'id': 1}, None],
+        )
+
+    def test_closed_subscriptions_stop_receiving(self):
+        async def run():
+            broker = live.InProcessBroker()
+            subscription = broker.subscribe('channel')
+            subscription.close()
+            return broker.has_subscribers('channel')
+
+        self.assertFalse(asyncio.run(run()))
+
+    @override_settings(LIVE_UPDATES_QUEUE_SIZE=1)
+    def test_subscriber_that_falls_behind_is_told_to_reload(self):
+        async def run():
+            broker = live.InProcessBroker()
+            subscription = broker.subscribe('channel')
+            broker.publish('channel', {'type': 'task', 'id': 1})
+            broker.publish('channel', {'type': 'task', 'id': 2})
+            # Let the loop deliver the messages
+            await asyncio.sleep(0)
+            return await subscription.get(0.1), await subscription.get(0.1)
+
+        self.assertEqual(asyncio.run(run()), ({'type': 'reload'}, None))
+
+class PublishTaskChangeTests(TestCase):
+
+    def setUp(self):
+        self.broker = live.InProcessBroker()
+        patcher = mock.patch.object(live, 'get_broker', return_value=self.broker)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_nothing_is_built_without_subscribers(self):
+        """Tasks saved while no dashboard is open don't cost any queries"""
+        task = create_task(task_name='a task', expected_mins=30, active=True)
+
+        with mock.patch.object(live, 'get_task_message') as get_task_message:
+            with self.captureOnCommitCallbacks(execute=True):
+                task.save()
+        get_task_message.assert_not_called()
+
+    def test_saved_task_is_published_with_stats_after_commit(self):
+        task = create_task(task_name='a task', expected_mins=30, active=True)
+
+        with mock.patch.object(self.broker, 'has_subscribers', return_value=True), \
+                mock.patch.object(self.broker, 'publish') as publish:
+            with self.captureOnCommitCallbacks(execute=True):
+                task.actual_mins = 10
+                task.save()
+                publish.assert_not_called()
+
+        channel, message = publish.call_args.args
+        self.assertEqual(channel, live.get_channel(task.user_id))
+        self.assertEqual(message['id'], task.pk)
+        self.assertTrue(message['on_dashboard'])
+        self.assertEqual(message['task']['actual_mins'], 10)
+        self.assertEqual(message['stats']['actual_time'], '10 mins')
+        self.assertEqual(message['stats']['unfinished_time'], '20 mins')
+
+    def test_deleted_task_is_published(self):
+        task = create_task(task_name='a task', expected_mins=30, active=True)
+        task_id = task.pk
+
+        with mock.patch.object(self.broker, 'has_subscribers', return_value=True), \
+                mock.patch.object(self.broker, 'publish') as publish:
+            with self.captureOnCommitCallbacks(execute=True):
+                task.delete()
+
+        message = publish.call_args.args[1]
+        self.assertEqual(message['id'], task_id)
+        self.assertTrue(message['deleted'])
+        self.assertFalse(message['on_dashboard'])
+        self.assertEqual(message['stats']['initial_estimated_time'], '0 mins')
+
+@override_settings(LIVE_UPDATES_KEEPALIVE_SECONDS=0.05)
+class LiveUpdatesAppTests(TestCase):
+
+    def setUp(self):
+        self.broker = live.InProcessBroker()
+        patcher = mock.patch.object(live, 'get_broker', return_value=self.broker)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+        # Would close the test transaction's connection, which Django's test
+        # client guards against the same way
+        patcher = mock.patch.object(live, 'close_old_connections')
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+        self.inner_app = mock.AsyncMock()
+        self.app = live.LiveUpdatesApp(self.inner_app)
+
+    def get_scope(self, path=None, cookie=''):
+        return {
+            'type': 'http',
+            'path': path or settings.LIVE_UPDATES_PATH,
+            'headers': [(b'cookie', cookie.encode())],
+        }
+
+    def log_in(self):
+        """Log a user in and return them with their session cookie"""
+        user = get_user_model().objects.create_user(username='username')
+        self.client.force_login(user)
+        return user, f'{settings.SESSION_COOKIE_NAME}={self.client.session.session_key}'
+
+    async def call_app(self, scope, on_body=None):
+        """Run the app until `on_body` returns `True` for a chunk of the
+        response, then disconnect. Returns the messages it sent.
+        """
+        sent = []
+        disconnected = asyncio.Event()
+
+        async def receive():
+            await disconnected.wait()
+            return {'type': 'http.disconnect'}
+
+        async def send(message):
+            sent.append(message)
+            if on_body and message['type'] == 'http.response.body' and on_body(message['body']):
+                disconnected.set()
+
+        await asyncio.wait_for(self.app(scope, receive, send), 5)
+        return sent
+
+    async def test_other_requests_go_to_django(self):
+        scope = self.get_scope(path='/')
+        await self.call_app(scope)
+        self.inner_app.assert_awaited_once()
+
+    async def test_anonymous_requests_are_forbidden(self):
+        sent = await self.call_app(self.get_scope())
+        self.assertEqual(sent[0]['status'], 403)
+        self.assertFalse(self.broker.subscriptions)
+
+    async def test_user_receives_their_channel(self):
+        """Messages for the logged-in user are streamed as events"""
+        user, cookie = await sync_to_async(self.log_in)()
+
+        def on_body(body):
+            if body.startswith(b'retry'):
+                self.broker.publish(live.get_channel(user.pk), {'type': 'task', 'id': 7})
+            return body.startswith(b'event: task')
+
+        sent = await self.call_app(self.get_scope(cookie=cookie), on_body)
+
+        self.assertEqual(sent[0]['status'], 200)
+        self.assertIn((b'content-type', b'text/event-stream'), sent[0]['headers'])
+        bodies = [message['body'] for message in sent[1:]]
+        event = [body for body in bodies if body.startswith(b'event')][0]
+        self.assertEqual(json.loads(event.split(b'data: ')[1]), {'type': 'task', 'id': 7})
+        self.assertFalse(self.broker.has_subscribers(live.get_channel(user.pk)))
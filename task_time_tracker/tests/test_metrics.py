@@ -0,0 +1,121 @@
+import os
+import subprocess
+import sys
+import tempfile
+from unittest import mock
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from prometheus_client import REGISTRY
+
+from task_time_tracker import metrics
+from task_time_tracker.utils.test_helpers import create_task
+
+def get_sample(name, **labels):
+    return REGISTRY.get_sample_value(name, labels) or 0
+
+class MetricsTests(TestCase):
+
+    def setUp(self):
+        self.user = get_user_model().objects.create_user(username='username')
+        self.client.force_login(self.user)
+
+    def test_requests_are_timed_by_url_name(self):
+        before = {
+            'requests': get_sample('task_time_tracker_request_duration_seconds_count',
+                                   view='dashboard', method='GET', status='200'),
+            'queries': get_sample('task_time_tracker_request_queries_sum', view='dashboard'),
+            'renders': get_sample('task_time_tracker_template_render_duration_seconds_count',
+                                  template='task_time_tracker/dashboard.html'),
+        }
+
+        self.client.get(reverse('dashboard'))
+
+        self.assertEqual(
+            get_sample('task_time_tracker_request_duration_seconds_count',
+                       view='dashboard', method='GET', status='200'),
+            before['requests'] + 1,
+        )
+        self.assertGreater(
+            get_sample('task_time_tracker_request_queries_sum', view='dashboard'),
+            before['queries'],
+        )
+        self.assertEqual(
+            get_sample('task_time_tracker_template_render_duration_seconds_count',
+                       template='task_time_tracker/dashboard.html'),
+            before['renders'] + 1,
+        )
+
+    def test_task_writes_are_counted(self):
+        before = {
+            operation: get_sample('task_time_tracker_task_writes_total', operation=operation)
+            for operation in ('create', 'update', 'delete')
+        }
+        status_changes_before = get_sample('task_time_tracker_task_status_change_writes_total')
+
+        task = create_task(user=self.user)
+        task.completed = True
+        task.save()
+        task.delete()
+
+        for operation in ('create', 'update', 'delete'):
+            self.assertEqual(
+                get_sample('task_time_tracker_task_writes_total', operation=operation),
+                before[operation] + 1,
+            )
+        self.assertGreater(
+            get_sample('task_time_tracker_task_status_change_writes_total'),
+            status_changes_before,
+        )
+
+    def test_unknown_methods_share_a_label(self):
+        def count(method):
+            return get_sample('task_time_tracker_request_duration_seconds_count',
+                              view='dashboard', method=method, status='200')
+        before = count('other')
+
+        self.client.generic('MADE-UP', reverse('dashboard'))
+
+        self.assertEqual(count('other'), before + 1)
+        self.assertEqual(count('MADE-UP'), 0)
+
+    @override_settings(DEBUG=True)
+    def test_metrics_endpoint(self):
+        self.client.get(reverse('dashboard'))
+        self.client.logout()
+        response = self.client.get(reverse('metrics'))
+
+        self.assertEqual(response.status_code, 200)
+        self.assertIn(b'task_time_tracker_request_duration_seconds_bucket', response.content)
+
+    def test_metrics_endpoint_needs_a_token_outside_debug(self):
+        self.assertEqual(self.client.get(reverse('metrics')).status_code, 403)
+
+    @override_settings(METRICS_TOKEN='token')
+    def test_metrics_endpoint_token(self):
+        self.assertEqual(self.client.get(reverse('metrics')).status_code, 403)
+        response = self.client.get(reverse('metrics'), HTTP_AUTHORIZATION='Bearer token')
+        self.assertEqual(response.status_code, 200)
+
+    def test_samples_are_added_up_across_processes(self):
+        """Like gunicorn workers, each process writes its own files"""
+        with tempfile.TemporaryDirectory() as metrics_dir:
+            env = {**os.environ, 'PROMETHEUS_MULTIPROC_DIR': metrics_dir}
+            for _ in range(2):
+                subprocess.run(
+                    [sys.executable, '-c',
+                     'from task_time_tracker import metrics; '
+                     'metrics.TASK_STATUS_CHANGE_WRITES.inc(3)'],
+                    cwd=os.path.dirname(settings.BASE_DIR),
+                    env=env,
+                    check=True,
+                )
+
+            with mock.patch.dict(os.environ, {'PROMETHEUS_MULTIPROC_DIR': metrics_dir}):
+                registry = metrics.get_registry()
+                value = registry.get_sample_value(
+                    'task_time_tracker_task_status_change_writes_total')
+
+        self.assertEqual(value, 6)
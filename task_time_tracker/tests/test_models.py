@@ -2,7 +2,9 @@ import datetime
 from unittest import mock
 
 from django.contrib.auth import get_user_model
+from django.db import connection
 from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
 from django.db.utils import IntegrityError
 from django.utils import timezone
 
@@ -114,6 +116,93 @@ class ProjectModelTests(TestCase):
         project = create_project()
         self.assertEqual(project.description, '')
 
+class ProjectCounterTests(TestCase):
+
+    def assertCounters(self, project, task_count, open_task_count, expected_mins, actual_mins):
+        project.refresh_from_db()
+        self.assertEqual(
+            (project.task_count, project.open_task_count, project.expected_mins, project.actual_mins),
+            (task_count, open_task_count, expected_mins, actual_mins),
+        )
+
+    def test_created_tasks_are_counted(self):
+        project = create_project()
+        create_task(project=project, expected_mins=10)
+        create_task(project=project, expected_mins=20, actual_mins=5)
+        create_task(expected_mins=40)
+
+        self.assertCounters(project, 2, 2, 30, 5)
+
+    def test_updates_apply_the_difference(self):
+        project = create_project()
+        task = create_task(project=project, expected_mins=10)
+
+        task.expected_mins = 15
+        task.actual_mins = 12
+        task.completed = True
+        task.save()
+
+        self.assertCounters(project, 1, 0, 15, 12)
+
+    def test_updates_of_a_loaded_task(self):
+        project = create_project()
+        create_task(project=project, expected_mins=10)
+
+        task = Task.objects.get()
+        task.completed = True
+        task.save()
+        # Without the counted fields, the project is recounted instead
+        task = Task.objects.defer('expected_mins', 'actual_mins').get()
+        task.completed = False
+        task.save()
+
+        self.assertCounters(project, 1, 1, 10, 0)
+
+    def test_fields_left_out_of_update_fields_are_not_counted(self):
+        project = create_project()
+        task = create_task(project=project, expected_mins=10)
+
+        task.expected_mins = 15
+        task.actual_mins = 12
+        task.save(update_fields=['actual_mins'])
+        task.save()
+
+        self.assertCounters(project, 1, 1, 15, 12)
+
+    def test_reassigned_task_moves_between_projects(self):
+        old_project = create_project(name='old')
+        new_project = create_project(name='new')
+        task = create_task(project=old_project, expected_mins=10, actual_mins=3)
+
+        task.project = new_project
+        task.save()
+
+        self.assertCounters(old_project, 0, 0, 0, 0)
+        self.assertCounters(new_project, 1, 1, 10, 3)
+
+    def test_deleted_tasks_are_uncounted(self):
+        project = create_project()
+        task = create_task(project=project, expected_mins=10)
+        create_task(project=project, expected_mins=20)
+
+        task.delete()
+
+        self.assertCounters(project, 1, 1, 20, 0)
+
+    def test_saves_dont_overwrite_each_other(self):
+        """Each save adds its delta to the stored value instead of writing
+        a total computed from a stale copy of the project"""
+        project = create_project()
+        first = create_task(project=project, expected_mins=10)
+        second = create_task(project=project, expected_mins=20)
+
+        first.expected_mins = 11
+        second.expected_mins = 22
+        first.save()
+        second.save()
+
+        self.assertCounters(project, 2, 2, 33, 0)
+
 class TaskStatusChangeModelTests(TestCase):
 
     def test_task_active_status_change_creates_taskstatuschange_obj(self):
@@ -142,6 +231,21 @@ class TaskStatusChangeModelTests(TestCase):
 
         assert TaskStatusChange.objects.get(task=task)
 
+    def test_completing_a_task_saves_the_derived_fields_in_one_update(self):
+        task = create_task(active=True)
+        task.completed = True
+        task_table = connection.ops.quote_name(Task._meta.db_table)
+
+        with CaptureQueriesContext(connection) as queries:
+            task.save(update_fields=['completed'])
+
+        task_updates = [query['sql'] for query in queries
+                        if query['sql'].startswith(f'UPDATE {task_table}')]
+        self.assertEqual(len(task_updates), 1)
+        task.refresh_from_db()
+        self.assertIsNotNone(task.completed_date)
+        self.assertFalse(task.active)
+
     def test_inactive_to_active_change_updates_active_datetime(self):
         """Changing a task's active property from False
         to True adds the current datetime to active_datetime
@@ -180,6 +284,37 @@ class TaskStatusChangeModelTests(TestCase):
                 mocked_datetime
             )
 
+    def test_status_change_records_created_datetime(self):
+        """New status changes are stamped with the time they were recorded"""
+        mocked_datetime = get_mocked_datetime()
+        task = create_task(active=True)
+
+        with mock.patch('django.utils.timezone.now',
+                        mock.Mock(return_value=mocked_datetime)):
+            task.active = False
+            task.save()
+
+        self.assertEqual(
+            TaskStatusChange.objects.get(task=task).created_datetime,
+            mocked_datetime
+        )
+
+    def test_between_filters_on_created_datetime(self):
+        """`between` includes the start of the window and excludes the end"""
+        task = create_task()
+        start = get_mocked_datetime()
+        end = start + datetime.timedelta(days=31)
+
+        at_start = TaskStatusChange.objects.create(task=task, created_datetime=start)
+        TaskStatusChange.objects.create(task=task, created_datetime=end)
+        TaskStatusChange.objects.create(
+            task=task, created_datetime=start - datetime.timedelta(seconds=1))
+
+        self.assertEqual(
+            list(TaskStatusChange.objects.between(start, end)),
+            [at_start]
+        )
+
 class UserModelTests(TestCase):
 
     @classmethod
@@ -0,0 +1,207 @@
+import datetime
+import random
+from unittest import mock
+
+from django.core.cache import cache
+from django.db import DatabaseError, transaction
+from django.test import SimpleTestCase, TestCase
+
+from task_time_tracker.models import Task
+from task_time_tracker.utils.cache_helpers import cache_lock, get_state_keys
+from task_time_tracker.utils.planner import DayPlanner, get_plannable_tasks, get_user_plan
+from task_time_tracker.utils.test_helpers import create_project, create_task, get_user
+
+START = datetime.date(2022, 1, 3)
+CREATED = datetime.datetime(2022, 1, 1, tzinfo=datetime.timezone.utc)
+
+def make_task(task_id, expected_mins, actual_mins=None, priority=None,
+              end_date=None, created_offset=0):
+    """Build a task dict in the shape `DayPlanner` reads"""
+    return {
+        'id': task_id,
+        'task_name': f'task_{task_id}',
+        'expected_mins': expected_mins,
+        'actual_mins': actual_mins,
+        'priority': priority,
+        'created_date': CREATED + datetime.timedelta(minutes=created_offset),
+        'project__end_date': end_date,
+    }
+
+class DayPlannerTests(SimpleTestCase):
+
+    def test_tasks_ordered_by_priority_then_created_date(self):
+        planner = DayPlanner(60, start_date=START).plan([
+            make_task(1, 10, priority=1),
+            make_task(2, 10, priority=3, created_offset=2),
+            make_task(3, 10, priority=3, created_offset=1),
+            make_task(4, 10),
+        ])
+        self.assertEqual(
+            [planned.task_id for planned in planner.get_schedule()],
+            [3, 2, 1, 4],
+        )
+
+    def test_tasks_with_deadlines_are_planned_first(self):
+        planner = DayPlanner(60, start_date=START).plan([
+            make_task(1, 10, priority=3),
+            make_task(2, 10, priority=1, end_date=datetime.date(2022, 2, 1)),
+        ])
+        self.assertEqual(
+            [planned.task_id for planned in planner.get_schedule()],
+            [2, 1],
+        )
+
+    def test_tasks_carry_over_into_the_next_day(self):
+        """A task that doesn't fit in a day is split across days"""
+        planner = DayPlanner(60, start_date=START).plan([
+            make_task(1, 40, priority=3),
+            make_task(2, 50, priority=2),
+        ])
+        first, second = planner.get_schedule()
+
+        self.assertEqual((first.start_date, first.finish_date), (START, START))
+        self.assertEqual(second.start_date, START)
+        self.assertEqual(second.finish_date, START + datetime.timedelta(days=1))
+        self.assertEqual(planner.finish_date, START + datetime.timedelta(days=1))
+        self.assertEqual(
+            [(day.date, day.planned_mins) for day in planner.get_days()],
+            [(START, 60), (START + datetime.timedelta(days=1), 30)],
+        )
+
+    def test_remaining_time_accounts_for_time_spent(self):
+        planner = DayPlanner(60, start_date=START).plan([
+            make_task(1, 40, actual_mins=30),
+            make_task(2, 10, actual_mins=30),
+        ])
+        self.assertEqual(planner.total_mins, 10)
+
+    def test_late_tasks_are_flagged(self):
+        planner = DayPlanner(60, start_date=START).plan([
+            make_task(1, 120, end_date=START),
+        ])
+        self.assertTrue(planner.get_schedule()[0].late)
+
+    def test_no_tasks_has_no_finish_date(self):
+        self.assertIsNone(DayPlanner(60, start_date=START).plan([]).finish_date)
+
+    def test_incremental_updates_match_full_replan(self):
+        """
+        Updating, adding and removing tasks one at a time gives the same
+        schedule as planning the final set of tasks from scratch
+        """
+        rng = random.Random(0)
+        tasks = {
+            task_id: make_task(task_id, rng.randint(5, 120),
+                               priority=rng.choice([None, 1, 2, 3]),
+                               created_offset=rng.randint(0, 1000))
+            for task_id in range(200)
+        }
+        planner = DayPlanner(480, start_date=START).plan(list(tasks.values()))
+
+        for step in range(100):
+            task_id = rng.randrange(250)
+            if task_id in tasks and step % 3 == 0:
+                planner.remove(task_id)
+                del tasks[task_id]
+            else:
+                tasks[task_id] = make_task(task_id, rng.randint(5, 120),
+                                           priority=rng.choice([None, 1, 2, 3]),
+                                           created_offset=rng.randint(0, 1000))
+                planner.update(tasks[task_id])
+
+        replanned = DayPlanner(480, start_date=START).plan(list(tasks.values()))
+        self.assertEqual(planner.get_schedule(), replanned.get_schedule())
+
+class UserPlanTests(TestCase):
+
+    def setUp(self):
+        cache.clear()
+
+    def test_saving_a_task_updates_cached_plan(self):
+        """
+        Once a user's plan is cached, task saves update it without a
+        rebuild, once they're committed
+        """
+        user = get_user(None)
+        create_task(expected_mins=30, user=user)
+        active_tasks = Task.objects.filter(user=user, active=True, completed=False)
+        self.assertEqual(get_user_plan(user, active_tasks).total_mins, 30)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            task = create_task(expected_mins=45, user=user)
+            self.assertEqual(get_user_plan(user, Task.objects.none()).total_mins, 30)
+        self.assertEqual(get_user_plan(user, Task.objects.none()).total_mins, 75)
+
+        task.completed = True
+        with self.captureOnCommitCallbacks(execute=True):
+            task.save()
+        self.assertEqual(get_user_plan(user, Task.objects.none()).total_mins, 30)
+
+    def test_rolled_back_saves_leave_the_plan_alone(self):
+        user = get_user(None)
+        task = create_task(expected_mins=30, user=user)
+        get_user_plan(user, Task.objects.filter(user=user))
+
+        with self.captureOnCommitCallbacks(execute=True) as callbacks:
+            try:
+                with transaction.atomic():
+                    task.expected_mins = 90
+                    task.save()
+                    raise DatabaseError
+            except DatabaseError:
+                pass
+
+        self.assertEqual(callbacks, [])
+        self.assertEqual(get_user_plan(user, Task.objects.none()).total_mins, 30)
+
+    def test_plans_built_during_a_change_are_not_cached(self):
+        """The plan may have been built from the tasks before the change"""
+        user = get_user(None)
+        create_task(expected_mins=30, user=user)
+
+        def build_during_change(task_queryset):
+            tasks = get_plannable_tasks(task_queryset)
+            with self.captureOnCommitCallbacks(execute=True):
+                create_task(expected_mins=45, user=user)
+            return tasks
+
+        with mock.patch('task_time_tracker.utils.planner.get_plannable_tasks',
+                        side_effect=build_during_change):
+            self.assertEqual(get_user_plan(user, Task.objects.filter(user=user)).total_mins, 30)
+
+        self.assertEqual(get_user_plan(user, Task.objects.filter(user=user)).total_mins, 75)
+
+    def test_plan_is_dropped_while_another_change_holds_it(self):
+        user = get_user(None)
+        task = create_task(expected_mins=30, user=user)
+        get_user_plan(user, Task.objects.filter(user=user))
+        plan_key, _, lock_key = get_state_keys('plan', user.pk)
+
+        task.expected_mins = 90
+        with cache_lock(lock_key), \
+                mock.patch('task_time_tracker.utils.cache_helpers.LOCK_WAIT_SECONDS', 0), \
+                self.captureOnCommitCallbacks(execute=True):
+            task.save()
+
+        self.assertIsNone(cache.get(plan_key))
+
+    def test_changing_a_project_end_date_replans(self):
+        user = get_user(None)
+        project = create_project(user=user, end_date=datetime.date(2100, 1, 1))
+        create_task(expected_mins=30, user=user, project=project)
+        tasks = Task.objects.filter(user=user)
+        self.assertFalse(get_user_plan(user, tasks).get_schedule()[0].late)
+
+        project.end_date = datetime.date(2000, 1, 1)
+        with self.captureOnCommitCallbacks(execute=True):
+            project.save()
+
+        self.assertTrue(get_user_plan(user, tasks).get_schedule()[0].late)
+
+    def test_project_end_date_is_used_as_deadline(self):
+        user = get_user(None)
+        project = create_project(user=user, end_date=datetime.date(2000, 1, 1))
+        create_task(expected_mins=30, user=user, project=project)
+
+        plan = get_user_plan(user, Task.objects.filter(user=user))
+        self.assertTrue(plan.get_schedule()[0].late)
@@ -0,0 +1,107 @@
+import sys
+
+from django.contrib.auth import get_user_model
+from django.test import TestCase
+from django.urls import reverse
+
+from task_time_tracker.models import Project, Task
+from task_time_tracker.utils.rollups import (Rollup,
+                                             get_descendant_ids,
+                                             get_project_rollups,
+                                             get_task_rollup,
+                                             get_task_rollups)
+from task_time_tracker.utils.test_helpers import create_project, create_task, get_user
+
+class TaskRollupTests(TestCase):
+
+    def setUp(self):
+        """
+        root (60, 10 spent)
+        ├── first (30, 40 spent, completed)
+        │   └── nested (20, 5 spent)
+        └── second (15)
+        """
+        self.root = create_task(task_name='root', expected_mins=60, actual_mins=10)
+        self.first = create_task(task_name='first', expected_mins=30, actual_mins=40,
+                                 completed=True, parent=self.root)
+        self.nested = create_task(task_name='nested', expected_mins=20, actual_mins=5,
+                                  parent=self.first)
+        self.second = create_task(task_name='second', expected_mins=15, parent=self.root)
+
+    def test_subtree_totals(self):
+        """Remaining time is what's left of the open tasks' estimates"""
+        with self.assertNumQueries(1):
+            rollup = get_task_rollup(self.root)
+
+        self.assertEqual(rollup, Rollup(
+            task_count=4, expected_mins=125, actual_mins=55, remaining_mins=50 + 15 + 15))
+
+    def test_every_node_is_rolled_up(self):
+        with self.assertNumQueries(1):
+            rollups = get_task_rollups([self.root.pk])
+
+        self.assertEqual(rollups[self.root.pk], get_task_rollup(self.root))
+        self.assertEqual(rollups[self.first.pk], Rollup(2, 50, 45, 15))
+        self.assertEqual(rollups[self.nested.pk], Rollup(1, 20, 5, 15))
+        self.assertEqual(rollups[self.second.pk], Rollup(1, 15, 0, 15))
+
+    def test_nested_roots_are_counted_once(self):
+        rollups = get_task_rollups([self.first.pk, self.root.pk])
+        self.assertEqual(rollups[self.root.pk].task_count, 4)
+
+    def test_deep_trees_dont_recurse(self):
+        """A chain deeper than Python's recursion limit is still one query"""
+        depth = sys.getrecursionlimit() + 100
+        user = get_user(None)
+        Task.objects.bulk_create([
+            Task(id=10_000 + index, task_name='chain', expected_mins=1, user=user,
+                 parent_id=10_000 + index - 1 if index else None)
+            for index in range(depth)
+        ])
+
+        with self.assertNumQueries(1):
+            rollups = get_task_rollups([10_000])
+
+        self.assertEqual(rollups[10_000].expected_mins, depth)
+
+    def test_cycles_end(self):
+        """Rows that point at each other don't loop forever"""
+        Task.objects.filter(pk=self.root.pk).update(parent=self.nested)
+
+        self.assertEqual(get_task_rollups([self.root.pk])[self.root.pk].task_count, 4)
+        self.assertEqual(get_descendant_ids(Task, self.root.pk),
+                         {self.first.pk, self.nested.pk, self.second.pk})
+
+    def test_deleting_a_task_deletes_its_subtasks(self):
+        self.first.delete()
+        self.assertEqual(set(Task.objects.values_list('task_name', flat=True)),
+                         {'root', 'second'})
+
+class ProjectRollupTests(TestCase):
+
+    def test_sub_projects_are_included(self):
+        parent = create_project(name='parent')
+        child = create_project(name='child', parent=parent)
+        grandchild = create_project(name='grandchild', parent=child)
+        create_task(project=parent, expected_mins=10)
+        create_task(project=child, expected_mins=20, actual_mins=5)
+        create_task(project=grandchild, expected_mins=30, actual_mins=30, completed=True)
+
+        with self.assertNumQueries(1):
+            rollups = get_project_rollups([parent.pk])
+
+        self.assertEqual(rollups[parent.pk], Rollup(3, 60, 35, 25))
+        self.assertEqual(rollups[child.pk], Rollup(2, 50, 35, 15))
+        self.assertEqual(rollups[grandchild.pk], Rollup(1, 30, 30, 0))
+
+    def test_projects_page_shows_totals_with_sub_projects(self):
+        user = get_user_model().objects.create_user(username='username')
+        parent = Project.objects.create(name='Parent', user=user)
+        child = Project.objects.create(name='Child', user=user, parent=parent)
+        create_task(project=parent, expected_mins=10, user=user)
+        create_task(project=child, expected_mins=1234, user=user)
+        self.client.force_login(user)
+
+        response = self.client.get(reverse('projects'))
+
+        self.assertContains(response, '1244')
@@ -0,0 +1,80 @@
+from io import StringIO
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from task_time_tracker import routers
+from task_time_tracker.models import Task
+
+@override_settings(REPLICA_DATABASE='replica')
+class ReplicaRoutingTests(TestCase):
+    """
+    The `replica` alias is a separate test database, so a read that shows
+    a row only created there must have gone to the replica
+    """
+    databases = {'default', 'replica'}
+
+    def setUp(self):
+        self.user = get_user_model().objects.create_user(username='username')
+        get_user_model().objects.using('replica').bulk_create([
+            get_user_model()(pk=self.user.pk, username=self.user.username,
+                             password=self.user.password),
+        ])
+        Task.objects.create(
+            task_name='primary task', expected_mins=1, completed=True, user=self.user)
+        Task.objects.using('replica').bulk_create([
+            Task(task_name='replica task', expected_mins=1, completed=True, user=self.user),
+        ])
+        self.client.force_login(self.user)
+
+    def get_completed_tasks_page(self):
+        return self.client.get(reverse('completed_tasks')).content.decode()
+
+    def test_designated_views_read_from_the_replica(self):
+        content = self.get_completed_tasks_page()
+
+        self.assertIn('replica task', content)
+        self.assertNotIn('primary task', content)
+
+    def test_other_views_read_from_the_primary(self):
+        content = self.client.get(reverse('dashboard')).content.decode()
+
+        self.assertIn('primary task', content)
+        self.assertNotIn('replica task', content)
+
+    @override_settings(REPLICA_DATABASE=None)
+    def test_nothing_is_read_from_the_replica_unless_configured(self):
+        self.assertIn('primary task', self.get_completed_tasks_page())
+
+    def test_users_read_their_own_writes(self):
+        """After a POST the user reads from the primary for a while"""
+        self.client.post(reverse('dashboard'), {
+            'task_name': 'new task',
+            'expected_mins': 5,
+        })
+        self.assertIn('primary task', self.get_completed_tasks_page())
+
+        with mock.patch('task_time_tracker.routers.time.time',
+                        return_value=routers.time.time() + 60):
+            self.assertIn('replica task', self.get_completed_tasks_page())
+
+    def test_objects_read_from_the_replica_are_saved_to_the_primary(self):
+        with routers.read_from_replica():
+            task = Task.objects.get(task_name='replica task')
+        self.assertEqual(task._state.db, 'replica')
+
+        task.task_name = 'saved task'
+        task.save()
+
+        self.assertTrue(Task.objects.using('default').filter(task_name='saved task').exists())
+
+    def test_read_only_commands_read_from_the_replica(self):
+        stdout = StringIO()
+        call_command('export_completed_tasks', 'username', stdout=stdout)
+
+        lines = stdout.getvalue().splitlines()
+        self.assertEqual(lines[0].split(',')[0], 'task_name')
+        self.assertEqual([line.split(',')[0] for line in lines[1:]], ['replica task'])
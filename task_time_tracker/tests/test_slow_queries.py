@@ -0,0 +1,104 @@
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from task_time_tracker import slow_queries
+from task_time_tracker.models import SlowQuery, Task
+
+def count_tasks():
+    return Task.objects.count()
+
+@override_settings(SLOW_QUERY_THRESHOLD_MS=0, SLOW_QUERY_ALWAYS_EAGER=True,
+                   SLOW_QUERY_EXPLAIN_RATE=1)
+class SlowQueryTests(TestCase):
+
+    def get_slow_queries(self):
+        with slow_queries.not_recorded():
+            return list(SlowQuery.objects.order_by('pk'))
+
+    def test_query_is_recorded_with_its_call_site(self):
+        with self.assertLogs('task_time_tracker.slow_queries', 'WARNING') as logs:
+            count_tasks()
+
+        slow_query, = self.get_slow_queries()
+        self.assertIn('COUNT(*)', slow_query.sql)
+        self.assertEqual(slow_query.database, 'default')
+        self.assertRegex(slow_query.call_site,
+                         r'^task_time_tracker/tests/test_slow_queries.py:\d+ in count_tasks$')
+        self.assertIn('in test_query_is_recorded_with_its_call_site', slow_query.stack)
+        self.assertIn('COUNT(*)', logs.output[0])
+
+    def test_queries_are_attributed_to_their_view(self):
+        user = get_user_model().objects.create_user(username='username')
+        self.client.force_login(user)
+
+        self.client.get(reverse('dashboard'))
+
+        view_names = {slow_query.view_name for slow_query in self.get_slow_queries()}
+        self.assertIn('dashboard', view_names)
+
+    def test_selects_are_explained_on_postgres(self):
+        count_tasks()
+
+        slow_query, = self.get_slow_queries()
+        if connection.vendor == 'postgresql':
+            self.assertIn('Execution Time', slow_query.plan)
+        else:
+            self.assertEqual(slow_query.plan, '')
+
+    def test_writes_are_not_explained(self):
+        """EXPLAIN ANALYZE would run them again"""
+        postgres = mock.Mock(vendor='postgresql')
+
+        self.assertTrue(slow_queries.should_explain(postgres, 'SELECT 1', False))
+        self.assertFalse(slow_queries.should_explain(postgres, 'UPDATE "task" SET x = 1', False))
+        self.assertFalse(slow_queries.should_explain(postgres, 'INSERT INTO "task" VALUES (1)', False))
+
+    def test_locking_selects_are_not_explained(self):
+        """Running them again would wait for the locks their transaction holds"""
+        postgres = mock.Mock(vendor='postgresql')
+
+        for sql in ('SELECT * FROM "job" LIMIT 1 FOR UPDATE SKIP LOCKED',
+                    'SELECT * FROM "task" FOR NO KEY UPDATE',
+                    'select * from "task" for share'):
+            with self.subTest(sql):
+                self.assertFalse(slow_queries.should_explain(postgres, sql, False))
+
+    @override_settings(REPLICA_DATABASE='replica')
+    def test_explains_prefer_the_replica(self):
+        self.assertEqual(slow_queries.get_explain_alias('default'), 'replica')
+        with override_settings(REPLICA_DATABASE=None):
+            self.assertEqual(slow_queries.get_explain_alias('default'), 'default')
+
+    @override_settings(SLOW_QUERY_THRESHOLD_MS=None)
+    def test_nothing_is_recorded_when_turned_off(self):
+        count_tasks()
+        self.assertEqual(self.get_slow_queries(), [])
+
+    @override_settings(SLOW_QUERY_ALWAYS_EAGER=False)
+    def test_records_are_saved_in_the_background(self):
+        executor = mock.Mock()
+        with mock.patch.object(slow_queries, 'get_executor', return_value=executor), \
+                mock.patch.object(slow_queries, '_pending') as pending, \
+                self.assertLogs('task_time_tracker.slow_queries', 'WARNING'):
+            count_tasks()
+
+        pending.acquire.assert_called_once_with(blocking=False)
+        func, record, params, explain_plan = executor.submit.call_args.args
+        self.assertEqual(func, slow_queries.save_in_background)
+        self.assertIn('COUNT(*)', record['sql'])
+        self.assertEqual(self.get_slow_queries(), [])
+
+class SlowQueryAdminTests(TestCase):
+
+    def test_changelist(self):
+        user = get_user_model().objects.create_superuser(username='admin')
+        SlowQuery.objects.create(database='default', sql='SELECT 1', duration_ms=500)
+        self.client.force_login(user)
+
+        response = self.client.get(reverse('admin:task_time_tracker_slowquery_changelist'))
+
+        self.assertContains(response, '500.0')
@@ -0,0 +1,165 @@
+from datetime import timedelta
+
+from django.contrib.auth import get_user_model
+from django.test import TestCase
+from django.urls import reverse
+from django.utils import timezone
+
+from task_time_tracker.models import Project, RecurringTask, Task, Tombstone
+from task_time_tracker.utils.archive_helpers import archive_completed_tasks
+from task_time_tracker.utils.recurring import generate_recurring_tasks
+from task_time_tracker.utils.sync import InvalidToken, get_changes
+from task_time_tracker.utils.test_helpers import create_project, create_task, get_user
+
+def sync_all(user, token=None, limit=500):
+    """Follow pages until caught up, returning every row and the last token"""
+    rows = {'projects': [], 'tasks': [], 'deleted': []}
+    while True:
+        changes = get_changes(user, token, limit)
+        for name in rows:
+            rows[name].extend(changes[name])
+        token = changes['token']
+        if not changes['has_more']:
+            return rows, token
+
+def get_ids(rows):
+    return [row['id'] for row in rows]
+
+class SyncTests(TestCase):
+
+    def setUp(self):
+        self.user = get_user(None)
+        self.project = create_project()
+        self.task = create_task(project=self.project)
+
+    def test_first_sync_returns_everything(self):
+        rows, _ = sync_all(self.user)
+
+        self.assertEqual(get_ids(rows['projects']), [self.project.pk])
+        self.assertEqual(get_ids(rows['tasks']), [self.task.pk])
+        self.assertEqual(rows['tasks'][0]['project_id'], self.project.pk)
+
+    def test_only_changes_since_the_token_are_returned(self):
+        _, token = sync_all(self.user)
+        other = create_task(task_name='other')
+        self.task.expected_mins = 45
+        self.task.save(update_fields=['expected_mins'])
+
+        with self.assertNumQueries(4):
+            changes = get_changes(self.user, token)
+
+        self.assertEqual(get_ids(changes['tasks']), [other.pk, self.task.pk])
+        self.assertEqual(changes['tasks'][1]['expected_mins'], 45)
+        self.assertEqual(changes['projects'], [])
+        self.assertFalse(changes['has_more'])
+
+    def test_saving_a_user_keeps_their_sequence(self):
+        """A user loaded before a task edit and saved after it (e.g. on a
+        password change) doesn't write back the old sequence number"""
+        user = get_user_model().objects.get(pk=self.user.pk)
+        _, token = sync_all(self.user)
+        change_seq = get_user_model().objects.get(pk=self.user.pk).change_seq
+        self.task.expected_mins = 45
+        self.task.save()
+
+        user.set_password('new password')
+        user.save()
+
+        user.refresh_from_db()
+        self.assertGreater(user.change_seq, change_seq)
+        self.assertTrue(user.check_password('new password'))
+        self.assertEqual(get_ids(get_changes(self.user, token)['tasks']), [self.task.pk])
+
+    def test_caught_up_clients_get_nothing(self):
+        _, token = sync_all(self.user)
+        changes = get_changes(self.user, token)
+        self.assertEqual((changes['tasks'], changes['token']), ([], token))
+
+    def test_deletes_leave_tombstones(self):
+        _, token = sync_all(self.user)
+        project_id = self.project.pk
+        self.project.delete()
+        other = create_task(task_name='other')
+        other_id = other.pk
+        other.delete()
+
+        rows, _ = sync_all(self.user, token)
+
+        self.assertEqual(
+            [(row['kind'], row['object_id']) for row in rows['deleted']],
+            [('project', project_id), ('task', other_id)],
+        )
+        # Detaching the task from its project bypasses `save`
+        self.assertEqual(get_ids(rows['tasks']), [self.task.pk])
+        self.assertIsNone(rows['tasks'][0]['project_id'])
+
+    def test_dependency_changes_resend_the_waiting_task(self):
+        first = create_task(task_name='first')
+        _, token = sync_all(self.user)
+        self.task.depends_on.add(first)
+
+        changes = get_changes(self.user, token)
+
+        self.assertEqual(get_ids(changes['tasks']), [self.task.pk])
+        self.assertEqual(changes['tasks'][0]['depends_on'], [first.pk])
+
+    def test_pages_dont_split_bulk_changes(self):
+        """Rows stamped with the same sequence number are paged by id"""
+        _, token = sync_all(self.user)
+        template = RecurringTask.objects.create(
+            user=self.user, task_name='daily', expected_mins=5,
+            cron_expression='0 9 * * *', next_run_date=timezone.now() - timedelta(days=9))
+        generate_recurring_tasks(max_catch_up=7)
+        created_ids = list(Task.objects.filter(recurring_task=template)
+                               .order_by('change_seq', 'id').values_list('id', flat=True))
+
+        rows, _ = sync_all(self.user, token, limit=2)
+
+        self.assertEqual(len(created_ids), 7)
+        self.assertEqual(get_ids(rows['tasks']), created_ids)
+
+    def test_archived_tasks_are_marked(self):
+        self.task.completed = True
+        self.task.save()
+        _, token = sync_all(self.user)
+
+        archive_completed_tasks(timezone.now() + timedelta(days=1))
+
+        rows, _ = sync_all(self.user, token)
+        self.assertEqual([(row['object_id'], row['archived']) for row in rows['deleted']],
+                         [(self.task.pk, True)])
+
+    def test_other_users_changes_arent_returned(self):
+        other_user = get_user_model().objects.create_user(username='other')
+        Project.objects.create(name='Theirs', user=other_user)
+        rows, _ = sync_all(other_user)
+        self.assertEqual(get_ids(rows['projects']), [Project.objects.get(name='Theirs').pk])
+        self.assertEqual(rows['tasks'], [])
+
+    def test_deleting_a_user_leaves_no_tombstones(self):
+        self.user.delete()
+        self.assertFalse(Tombstone.objects.exists())
+
+    def test_invalid_tokens_are_rejected(self):
+        with self.assertRaises(InvalidToken):
+            get_changes(self.user, 'not-a-token')
+
+class SyncViewTests(TestCase):
+
+    def setUp(self):
+        self.user = get_user(None)
+        self.task = create_task()
+        self.client.force_login(self.user)
+
+    def test_returns_changes_as_json(self):
+        response = self.client.get(reverse('sync'))
+        data = response.json()
+
+        self.assertEqual(get_ids(data['tasks']), [self.task.pk])
+
+        response = self.client.get(reverse('sync'), {'token': data['token']})
+        self.assertEqual(response.json()['tasks'], [])
+
+    def test_bad_parameters_are_rejected(self):
+        self.assertEqual(self.client.get(reverse('sync'), {'token': 'x'}).status_code, 400)
+        self.assertEqual(self.client.get(reverse('sync'), {'limit': 'x'}).status_code, 400)
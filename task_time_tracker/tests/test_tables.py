@@ -0,0 +1,144 @@
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.template import RequestContext, Template
+from django.test import RequestFactory, SimpleTestCase, TestCase
+from django_tables2 import Column, TemplateColumn
+
+from task_time_tracker.models import Project, Task
+from task_time_tracker.tables import (AllTaskTable,
+                                      CompletedTaskTable,
+                                      DashboardTaskTable,
+                                      PlannedTable,
+                                      ProjectTable)
+from task_time_tracker.utils.archive_helpers import get_completed_tasks
+from task_time_tracker.utils.test_helpers import create_project, create_task
+
+def get_tasks(count=3, **kwargs):
+    """Unsaved tasks, enough for rendering a table"""
+    return [
+        Task(pk=pk, task_name=f'task_{pk}', expected_mins=pk, **kwargs)
+        for pk in range(1, count + 1)
+    ]
+
+@mock.patch('django.template.context_processors.get_token', return_value='csrf-token')
+class ActionButtonColumnTests(SimpleTestCase):
+    """`ActionButtonColumn` renders the same HTML as a `TemplateColumn` with
+    the same template"""
+
+    def render(self, table):
+        request = RequestFactory().get('/')
+        template = Template('{% load django_tables2 %}{% render_table table %}')
+        return template.render(RequestContext(request, {'table': table}))
+
+    def assert_renders_like_template_columns(self, table_class, tasks):
+        column_names = ['edit', 'delete'] if 'delete' in table_class.base_columns else ['edit']
+        template_columns = {
+            name: TemplateColumn(
+                verbose_name='',
+                orderable=False,
+                template_name=table_class.base_columns[name].template_name,
+            )
+            for name in column_names
+        }
+        template_table_class = type(
+            'TemplateTable', (table_class,), {'Meta': table_class.Meta, **template_columns})
+
+        self.assertEqual(
+            self.render(table_class(tasks)),
+            self.render(template_table_class(tasks)),
+        )
+
+    def test_dashboard_table(self, get_token):
+        self.assert_renders_like_template_columns(DashboardTaskTable, get_tasks())
+
+    def test_all_task_table(self, get_token):
+        self.assert_renders_like_template_columns(AllTaskTable, get_tasks())
+
+    def test_completed_task_table_with_archived_rows(self, get_token):
+        """Archived and live rows each get their own version of the button"""
+        tasks = get_tasks(count=4, completed=True)
+        for task in tasks:
+            task.archived = task.pk % 2 == 0
+
+        html = self.render(CompletedTaskTable(tasks))
+
+        self.assertEqual(html.count('Archived'), 2)
+        self.assert_renders_like_template_columns(CompletedTaskTable, tasks)
+
+    def test_template_is_rendered_once_per_table(self, get_token):
+        with mock.patch.object(TemplateColumn, 'render', autospec=True,
+                               side_effect=TemplateColumn.render) as render:
+            self.render(DashboardTaskTable(get_tasks(count=10)))
+
+        # Once for each of the edit and delete columns
+        self.assertEqual(render.call_count, 2)
+
+    def test_buttons_cant_be_sorted(self, get_token):
+        table = DashboardTaskTable(get_tasks(), order_by='edit')
+
+        self.assertFalse(table.columns['edit'].orderable)
+        self.assertFalse(table.columns['delete'].orderable)
+        self.assertEqual(list(table.order_by), [])
+        self.assertNotIn('sort=edit', self.render(table))
+
+@mock.patch('django.template.context_processors.get_token', return_value='csrf-token')
+class PlannedTableTests(TestCase):
+    """Tables load the fields their columns show, in one query a page"""
+
+    def setUp(self):
+        self.user = get_user_model().objects.create_user(username='username')
+        parent = create_project(user=self.user, name='parent')
+        for index in range(3):
+            project = create_project(user=self.user, name=f'project {index}', parent=parent)
+            create_task(user=self.user, project=project, task_name=f'task {index}',
+                        task_notes='notes ' * 1000)
+
+    def render(self, table):
+        request = RequestFactory().get('/')
+        template = Template('{% load django_tables2 %}{% render_table table %}')
+        return template.render(RequestContext(request, {'table': table}))
+
+    def test_related_objects_are_selected(self, get_token):
+        table = AllTaskTable(Task.objects.filter(user=self.user))
+
+        with self.assertNumQueries(1):
+            html = self.render(table)
+        self.assertIn('project 2', html)
+
+        table = ProjectTable(Project.objects.filter(user=self.user))
+        with self.assertNumQueries(1):
+            self.render(table)
+
+    def test_unshown_fields_are_deferred(self, get_token):
+        table = DashboardTaskTable(Task.objects.filter(user=self.user))
+
+        with self.assertNumQueries(1):
+            html = self.render(table)
+        self.assertIn('task 2', html)
+        self.assertEqual(table.data.data[0].get_deferred_fields(), {
+            'user_id', 'task_category', 'task_notes', 'project_id', 'parent_id',
+            'created_date', 'completed_date', 'priority', 'recurring_task_id',
+            'occurrence', 'change_seq', 'deleted_date',
+        })
+
+    def test_accessors_across_relations(self, get_token):
+        class ProjectNameTable(PlannedTable):
+            project_name = Column(accessor='project__name')
+
+            class Meta:
+                model = Task
+                fields = ['task_name']
+
+        self.assertEqual(ProjectNameTable.get_query_plan(),
+                         (['id', 'project__name', 'task_name'], ['project']))
+
+    def test_unions_are_used_as_they_are(self, get_token):
+        create_task(user=self.user, completed=True)
+        tasks = get_completed_tasks(self.user)
+
+        with mock.patch.object(CompletedTaskTable, 'plan_queryset') as plan_queryset:
+            html = self.render(CompletedTaskTable(tasks))
+
+        plan_queryset.assert_not_called()
+        self.assertIn('Edit', html)
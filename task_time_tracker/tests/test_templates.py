@@ -0,0 +1,72 @@
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.cache.utils import make_template_fragment_key
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from task_time_tracker.utils.template_helpers import get_app_template_names, warm_template_cache
+
+CACHED_LOADERS = [{
+    'BACKEND': 'django.template.backends.django.DjangoTemplates',
+    'OPTIONS': {
+        'context_processors': [
+            'django.template.context_processors.request',
+            'django.contrib.auth.context_processors.auth',
+            'task_time_tracker.context_processors.navigation',
+        ],
+        'loaders': [
+            ('django.template.loaders.cached.Loader', [
+                'django.template.loaders.app_directories.Loader',
+            ]),
+        ],
+    },
+}]
+
+class TemplateWarmUpTests(TestCase):
+
+    def test_app_template_names(self):
+        names = get_app_template_names()
+        self.assertIn('task_time_tracker/base_layout.html', names)
+        self.assertIn('task_time_tracker/components/edit_button.html', names)
+
+    @override_settings(TEMPLATES=CACHED_LOADERS)
+    def test_warm_up_compiles_every_app_template(self):
+        self.assertEqual(warm_template_cache(), len(get_app_template_names()) + 1)
+
+class NavigationCacheTests(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.addCleanup(cache.clear)
+
+    def log_in(self, username):
+        user = get_user_model().objects.create_user(username=username, password='password')
+        self.client.force_login(user)
+        return user
+
+    def test_topbar_is_cached_per_user(self):
+        """Each user sees their own name in the cached top bar"""
+        self.log_in('first_user')
+        self.assertContains(self.client.get(reverse('plan')), 'Welcome, first_user')
+
+        self.log_in('second_user')
+        response = self.client.get(reverse('plan'))
+        self.assertContains(response, 'Welcome, second_user')
+        self.assertNotContains(response, 'first_user')
+
+    def test_logout_link_returns_to_the_page(self):
+        self.log_in('first_user')
+        self.client.get(reverse('plan'))
+
+        response = self.client.get(reverse('active_tasks'))
+        self.assertContains(response, f'?next={reverse("active_tasks")}')
+
+    def test_sidebar_is_cached_once_for_everyone(self):
+        self.log_in('first_user')
+        self.client.get(reverse('plan'))
+        key = make_template_fragment_key('sidebar')
+        self.assertIsNotNone(cache.get(key))
+        cache.set(key, 'cached sidebar')
+
+        self.log_in('second_user')
+        self.assertContains(self.client.get(reverse('active_tasks')), 'cached sidebar')
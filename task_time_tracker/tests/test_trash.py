@@ -0,0 +1,202 @@
+import datetime
+from io import StringIO
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+
+from task_time_tracker.models import Project, Task, TaskStatusChange, Tombstone
+from task_time_tracker.utils.rollups import get_task_rollup
+from task_time_tracker.utils.sync import get_changes
+from task_time_tracker.utils.test_helpers import create_project, create_task
+from task_time_tracker.utils.trash import purge_deleted_tasks, restore_task, trash_task
+
+class TrashTests(TestCase):
+
+    def setUp(self):
+        self.user = get_user_model().objects.create_user(username='username')
+        self.project = create_project(user=self.user)
+        self.task = create_task(user=self.user, project=self.project,
+                                task_name='task', expected_mins=30, active=True)
+        self.client.force_login(self.user)
+
+    def delete(self, task, **kwargs):
+        return self.client.post(reverse('delete_task', kwargs={'pk': task.pk}), **kwargs)
+
+    def undo(self, task, **kwargs):
+        return self.client.post(reverse('undo_delete_task', kwargs={'pk': task.pk}), **kwargs)
+
+    def test_deleting_only_updates_the_task_row(self):
+        """The status changes stay, so nothing cascades"""
+        status_change_count = TaskStatusChange.objects.filter(task=self.task).count()
+
+        with CaptureQueriesContext(connection) as queries:
+            self.delete(self.task, HTTP_X_FRAGMENT='true')
+
+        sql = [query['sql'] for query in queries]
+        self.assertFalse([statement for statement in sql if statement.startswith('DELETE')])
+        self.assertEqual(len([statement for statement in sql
+                              if statement.startswith(f'UPDATE "{Task._meta.db_table}"')]), 1)
+        self.assertFalse(Task.objects.filter(pk=self.task.pk).exists())
+        self.assertIsNotNone(Task.all_objects.get(pk=self.task.pk).deleted_date)
+        self.assertEqual(TaskStatusChange.objects.filter(task=self.task).count(),
+                         status_change_count)
+
+    def test_delete_offers_undo(self):
+        data = self.delete(self.task, HTTP_X_FRAGMENT='true').json()
+
+        self.assertIsNone(data['row'])
+        self.assertIn(reverse('undo_delete_task', kwargs={'pk': self.task.pk}), data['message'])
+
+        data = self.undo(self.task, HTTP_X_FRAGMENT='true').json()
+
+        self.assertIn('task', data['row'])
+        self.assertTrue(Task.objects.filter(pk=self.task.pk).exists())
+
+    def test_delete_without_fragment_header_shows_undo_on_the_dashboard(self):
+        response = self.delete(self.task, follow=True)
+
+        self.assertRedirects(response, reverse('dashboard'))
+        self.assertContains(response, 'class="undo-delete-form')
+
+        response = self.undo(self.task)
+        self.assertRedirects(response, reverse('dashboard'))
+        self.assertTrue(Task.objects.filter(pk=self.task.pk).exists())
+
+    def test_only_the_owner_can_undo(self):
+        trash_task(self.task)
+        other_user = get_user_model().objects.create_user(username='other')
+        self.client.force_login(other_user)
+
+        self.assertEqual(self.undo(self.task).status_code, 404)
+        self.assertFalse(Task.objects.filter(pk=self.task.pk).exists())
+
+    def test_project_counters_follow_the_trash(self):
+        trash_task(self.task)
+        self.project.refresh_from_db()
+        self.assertEqual((self.project.task_count, self.project.expected_mins), (0, 0))
+
+        restore_task(self.task)
+        self.project.refresh_from_db()
+        self.assertEqual((self.project.task_count, self.project.expected_mins), (1, 30))
+
+    def test_subtasks_are_trashed_and_restored_with_their_parent(self):
+        subtask = create_task(user=self.user, parent=self.task, expected_mins=10)
+        deleted_subtask = create_task(user=self.user, parent=self.task, expected_mins=20)
+        trash_task(deleted_subtask)
+        self.assertEqual(get_task_rollup(self.task).expected_mins, 40)
+
+        trash_task(self.task)
+        self.assertFalse(Task.objects.filter(pk=subtask.pk).exists())
+
+        restore_task(self.task)
+        self.assertTrue(Task.objects.filter(pk=subtask.pk).exists())
+        # It was deleted separately, so it stays in the trash
+        self.assertFalse(Task.objects.filter(pk=deleted_subtask.pk).exists())
+
+    def test_restoring_a_subtask_restores_the_tasks_above_it(self):
+        subtask = create_task(user=self.user, project=self.project, parent=self.task)
+        nested_subtask = create_task(user=self.user, project=self.project, parent=subtask)
+        sibling = create_task(user=self.user, project=self.project, parent=self.task)
+        trash_task(self.task)
+
+        self.undo(Task.all_objects.get(pk=nested_subtask.pk))
+
+        self.assertEqual(set(Task.objects.values_list('pk', flat=True)),
+                         {self.task.pk, subtask.pk, nested_subtask.pk})
+        self.assertFalse(Task.objects.filter(pk=sibling.pk).exists())
+        self.project.refresh_from_db()
+        self.assertEqual(self.project.task_count, 3)
+
+    def test_sync_sees_trashing_and_restoring(self):
+        waiting_task = create_task(user=self.user)
+        waiting_task.depends_on.add(self.task)
+        token = get_changes(self.user)['token']
+
+        trash_task(self.task)
+        changes = get_changes(self.user, token)
+        self.assertEqual([row['object_id'] for row in changes['deleted']], [self.task.pk])
+        self.assertEqual(changes['tasks'], [{**changes['tasks'][0], 'id': waiting_task.pk,
+                                             'depends_on': []}])
+
+        restore_task(self.task)
+        changes = get_changes(self.user, changes['token'])
+        self.assertEqual({row['id'] for row in changes['tasks']}, {self.task.pk, waiting_task.pk})
+
+class PurgeDeletedTasksTests(TestCase):
+
+    def setUp(self):
+        self.user = get_user_model().objects.create_user(username='username')
+        self.project = create_project(user=self.user)
+        self.cutoff = timezone.now() - datetime.timedelta(days=30)
+
+    def create_trashed_task(self, days_ago, **kwargs):
+        task = create_task(user=self.user, project=self.project, **kwargs)
+        trash_task(task)
+        Task.all_objects.filter(pk=task.pk).update(
+            deleted_date=timezone.now() - datetime.timedelta(days=days_ago))
+        return Task.all_objects.get(pk=task.pk)
+
+    def test_expired_tasks_are_purged_with_their_status_changes(self):
+        expired = self.create_trashed_task(days_ago=31)
+        for _ in range(3):
+            TaskStatusChange.objects.create(task=expired)
+        recent = self.create_trashed_task(days_ago=1)
+        live = create_task(user=self.user, project=self.project)
+        TaskStatusChange.objects.create(task=live)
+
+        self.assertEqual(purge_deleted_tasks(self.cutoff, batch_size=1), 1)
+
+        self.assertFalse(Task.all_objects.filter(pk=expired.pk).exists())
+        self.assertFalse(TaskStatusChange.objects.filter(task_id=expired.pk).exists())
+        self.assertTrue(Task.all_objects.filter(pk=recent.pk).exists())
+        self.assertTrue(TaskStatusChange.objects.filter(task_id=live.pk).exists())
+
+    def test_counters_and_tombstones_are_left_alone(self):
+        self.create_trashed_task(days_ago=31)
+        create_task(user=self.user, project=self.project, expected_mins=5)
+        tombstone_count = Tombstone.objects.count()
+
+        purge_deleted_tasks(self.cutoff)
+
+        project = Project.objects.get(pk=self.project.pk)
+        self.assertEqual((project.task_count, project.expected_mins), (1, 5))
+        self.assertEqual(Tombstone.objects.count(), tombstone_count)
+
+    def test_parents_wait_for_their_subtasks(self):
+        parent = self.create_trashed_task(days_ago=31)
+        subtask = create_task(user=self.user, parent=parent)
+        trash_task(subtask)
+
+        self.assertEqual(purge_deleted_tasks(self.cutoff), 0)
+
+        Task.all_objects.filter(pk=subtask.pk).update(deleted_date=parent.deleted_date)
+        self.assertEqual(purge_deleted_tasks(self.cutoff, batch_size=1), 2)
+
+    def test_live_subtasks_are_kept(self):
+        """A live subtask of a trashed task doesn't hold up the purge, and
+        isn't purged with it"""
+        parent = self.create_trashed_task(days_ago=31)
+        subtask = create_task(user=self.user, parent=parent)
+        token = get_changes(self.user)['token']
+
+        self.assertEqual(purge_deleted_tasks(self.cutoff), 1)
+
+        subtask = Task.objects.get(pk=subtask.pk)
+        self.assertIsNone(subtask.parent_id)
+        self.assertEqual([row['id'] for row in get_changes(self.user, token)['tasks']],
+                         [subtask.pk])
+
+    def test_command(self):
+        for _ in range(3):
+            self.create_trashed_task(days_ago=31)
+        out = StringIO()
+
+        call_command('purge_deleted_tasks', '--batch-size', '2', stdout=out)
+
+        self.assertIn('Purged 3 tasks', out.getvalue())
+        self.assertFalse(Task.all_objects.exists())
@@ -0,0 +1,119 @@
+import datetime
+import zoneinfo
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import TestCase
+from django.urls import reverse
+
+from task_time_tracker.models import Task
+from task_time_tracker.utils.archive_helpers import archive_completed_tasks
+from task_time_tracker.utils.test_helpers import create_task
+from task_time_tracker.utils.trends import choose_bucket, get_trend_series
+
+NEW_YORK = zoneinfo.ZoneInfo('America/New_York')
+
+class TrendSeriesTests(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.addCleanup(cache.clear)
+        self.user = get_user_model().objects.create_user(
+            username='username', time_zone='America/New_York')
+
+    def complete_task(self, completed_date, expected_mins=30, actual_mins=20):
+        task = create_task(expected_mins=expected_mins, actual_mins=actual_mins,
+                           completed=True, user=self.user)
+        Task.objects.filter(pk=task.pk).update(completed_date=completed_date)
+        task.refresh_from_db()
+        return task
+
+    def get_points(self, *args, **kwargs):
+        series = get_trend_series(self.user, *args, **kwargs)
+        return {point['date']: point for point in series['points']}
+
+    def test_days_are_in_the_users_time_zone(self):
+        """11pm in New York is already the next day in UTC"""
+        self.complete_task(datetime.datetime(2022, 1, 3, 23, tzinfo=NEW_YORK))
+
+        points = self.get_points(datetime.date(2022, 1, 1), datetime.date(2022, 1, 5))
+
+        self.assertEqual(points['2022-01-03']['completed_count'], 1)
+        self.assertEqual(points['2022-01-04']['completed_count'], 0)
+        self.assertEqual(len(points), 5)
+
+    def test_weeks_and_months(self):
+        self.complete_task(datetime.datetime(2022, 1, 4, 12, tzinfo=NEW_YORK))
+        self.complete_task(datetime.datetime(2022, 1, 6, 12, tzinfo=NEW_YORK))
+        self.complete_task(datetime.datetime(2022, 2, 1, 12, tzinfo=NEW_YORK))
+
+        weeks = self.get_points(datetime.date(2022, 1, 1), datetime.date(2022, 2, 28), 'week')
+        months = self.get_points(datetime.date(2022, 1, 1), datetime.date(2022, 2, 28), 'month')
+
+        # Weeks start on Monday
+        self.assertEqual(weeks['2022-01-03']['completed_count'], 2)
+        self.assertEqual(weeks['2022-01-03']['expected_mins'], 60)
+        self.assertEqual(weeks['2022-01-31']['completed_count'], 1)
+        self.assertEqual(months['2022-01-01']['actual_mins'], 40)
+        self.assertEqual(months['2022-02-01']['actual_mins'], 20)
+
+    def test_archived_tasks_are_included(self):
+        day = datetime.datetime(2022, 1, 3, 12, tzinfo=NEW_YORK)
+        self.complete_task(day)
+        archive_completed_tasks(datetime.datetime(2022, 2, 1, tzinfo=NEW_YORK))
+        self.complete_task(day)
+
+        points = self.get_points(datetime.date(2022, 1, 3), datetime.date(2022, 1, 3))
+
+        self.assertEqual(points['2022-01-03']['completed_count'], 2)
+
+    def test_long_ranges_are_downsampled(self):
+        start = datetime.date(2020, 1, 1)
+        self.assertEqual(choose_bucket(start, datetime.date(2020, 6, 1), 'day'), 'day')
+        self.assertEqual(choose_bucket(start, datetime.date(2022, 1, 1), 'day'), 'week')
+        self.assertEqual(choose_bucket(start, datetime.date(2030, 1, 1), 'day'), 'month')
+
+    def test_series_is_one_query_then_cached_until_a_task_changes(self):
+        task = self.complete_task(datetime.datetime(2022, 1, 3, 12, tzinfo=NEW_YORK))
+        start, end = datetime.date(2017, 1, 1), datetime.date(2022, 1, 31)
+
+        with self.assertNumQueries(1):
+            get_trend_series(self.user, start, end)
+        with self.assertNumQueries(0):
+            get_trend_series(self.user, start, end)
+
+        task.actual_mins = 50
+        with self.captureOnCommitCallbacks(execute=True):
+            task.save()
+        with self.assertNumQueries(1):
+            series = get_trend_series(self.user, start, end)
+        self.assertEqual(sum(point['actual_mins'] for point in series['points']), 50)
+
+class TrendsViewTests(TestCase):
+
+    def setUp(self):
+        self.credentials = {
+            'username': 'username',
+            'password': 'password',
+        }
+        get_user_model().objects.create_user(**self.credentials)
+        self.client.login(**self.credentials)
+
+    def test_page_load(self):
+        response = self.client.get(reverse('trends'))
+        self.assertEqual(response.status_code, 200)
+
+    def test_data_defaults_to_the_last_30_days(self):
+        response = self.client.get(reverse('trends_data'))
+        data = response.json()
+
+        self.assertEqual(data['bucket'], 'day')
+        self.assertEqual(len(data['points']), 30)
+
+    def test_data_rejects_backwards_ranges(self):
+        response = self.client.get(reverse('trends_data'), {
+            'start': '2022-02-01',
+            'end': '2022-01-01',
+        })
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('end', response.json()['errors'])
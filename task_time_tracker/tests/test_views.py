@@ -1,13 +1,17 @@
 import datetime
+from unittest import mock
 from venv import create
 
 from django.contrib.auth import get_user_model, get_user
+from django.core.cache import cache
 from django.core.paginator import EmptyPage
 from django.test import tag, TestCase, RequestFactory
 from django.urls import reverse
 from django.utils import timezone
 
-from task_time_tracker.models import Project, Task, TaskStatusChange
+from task_time_tracker.models import Project, RecurringTask, Task, TaskStatusChange
+from task_time_tracker.utils.archive_helpers import archive_completed_tasks
+from task_time_tracker.utils.model_helpers import DashboardSummStats
 from task_time_tracker.utils.test_helpers import create_task
 import task_time_tracker.views as views
 
@@ -380,6 +384,7 @@ class NewTaskViewTests(TestCase):
             'task_notes',
             'expected_mins',
             'actual_mins',
+            'parent',
         )
         self.assertEqual(
             tuple(response.context['form'].fields.keys()), fields
@@ -497,6 +502,7 @@ class NewProjectViewTests(TestCase):
             'description',
             'start_date',
             'end_date',
+            'parent',
         )
         self.assertEqual(
             tuple(response.context['form'].fields.keys()), fields
@@ -638,3 +644,304 @@ class ActiveTasksViewTests(TestCase):
 
         self.assertTrue('user2_task' in task_names)
         self.assertFalse('user1_task' in task_names)
+
+class CompletedTasksViewTests(TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        """Create a user"""
+        super().setUpClass()
+
+        cls.credentials = {
+            'username': 'username',
+            'password': 'password',
+        }
+        cls.User = get_user_model()
+        cls.User.objects.create_user(**cls.credentials)
+    
+    @classmethod
+    def tearDownClass(cls):
+        """Delete the user"""
+        cls.User.objects.get(
+            username=cls.credentials['username']
+        ).delete()
+
+        super().tearDownClass()
+
+    def setUp(self):
+        """Log user in"""
+        super().setUp()
+        self.client.login(**self.credentials)
+
+    def test_completed_tasks_include_archived_tasks(self):
+        """
+        The completed tasks page lists tasks from the archive tables
+        alongside completed tasks that have not been archived yet
+        """
+        user = self.User.objects.get()
+
+        old_task = create_task(task_name='old_task', completed=True, user=user)
+        Task.objects.filter(pk=old_task.pk).update(
+            completed_date=timezone.now() - datetime.timedelta(days=365)
+        )
+        create_task(task_name='recent_task', completed=True, user=user)
+        archive_completed_tasks(timezone.now() - datetime.timedelta(days=90))
+
+        response = self.client.get(reverse('completed_tasks'), {'sort': 'task_name'})
+        task_names = [task.task_name for task in response.context['table'].page.object_list.data]
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(task_names, ['old_task', 'recent_task'])
+        self.assertContains(response, 'Archived')
+
+class ProjectsViewTests(TestCase):
+
+    def test_totals_come_from_the_project_row(self):
+        """Listing projects reads their cached counters, without
+        aggregating over the tasks"""
+        user = get_user_model().objects.create_user(username='username')
+        project = Project.objects.create(name='Garden', user=user)
+        create_task(project=project, expected_mins=30, actual_mins=45, user=user, completed=True)
+        create_task(project=project, expected_mins=15, user=user)
+        self.client.force_login(user)
+
+        response = self.client.get(reverse('projects'))
+        table = response.context['table']
+        with self.assertNumQueries(1):
+            project, = list(table.data)
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(
+            (project.task_count, project.open_task_count, project.expected_mins, project.actual_mins),
+            (2, 1, 45, 45),
+        )
+        self.assertContains(response, 'Garden')
+
+class PlanViewTests(TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        """Create a user"""
+        super().setUpClass()
+
+        cls.credentials = {
+            'username': 'username',
+            'password': 'password',
+        }
+        cls.User = get_user_model()
+        cls.User.objects.create_user(**cls.credentials)
+    
+    @classmethod
+    def tearDownClass(cls):
+        """Delete the user"""
+        cls.User.objects.get(
+            username=cls.credentials['username']
+        ).delete()
+
+        super().tearDownClass()
+
+    def setUp(self):
+        """Log user in"""
+        super().setUp()
+        cache.clear()
+        self.client.login(**self.credentials)
+
+    def test_plan_lists_active_tasks_by_day(self):
+        """
+        Active tasks are spread over days of the user's daily capacity
+        """
+        user = self.User.objects.get()
+        user.daily_capacity_mins = 60
+        user.save()
+
+        create_task(task_name='first_task', expected_mins=60, priority=3, user=user)
+        create_task(task_name='second_task', expected_mins=30, priority=1, user=user)
+        create_task(task_name='done_task', expected_mins=30, completed=True, user=user)
+
+        response = self.client.get(reverse('plan'))
+        plan_days = response.context['plan_days']
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(plan_days), 2)
+        self.assertEqual(
+            [planned.task_name for planned in plan_days[1][0].tasks],
+            ['second_task'],
+        )
+        self.assertNotContains(response, 'done_task')
+
+    def test_dashboard_shows_projected_finish(self):
+        user = self.User.objects.get()
+        create_task(expected_mins=30, user=user)
+
+        response = self.client.get(reverse('dashboard'))
+
+        self.assertEqual(response.context['projected_finish'], timezone.localdate())
+
+class NewRecurringTaskViewTests(TestCase):
+
+    def setUp(self):
+        """Create a user and log them in"""
+        self.credentials = {
+            'username': 'username',
+            'password': 'password',
+        }
+        self.user = get_user_model().objects.create_user(**self.credentials)
+        self.client.login(**self.credentials)
+
+    def test_post_creates_recurring_task_for_logged_in_user(self):
+        self.client.post(
+            reverse('new_recurring_task'),
+            data={
+                'task_name': 'daily standup',
+                'cron_expression': '0 9 * * 1-5',
+                'expected_mins': 15,
+            },
+        )
+        recurring_task = RecurringTask.objects.get(task_name='daily standup')
+
+        self.assertEqual(recurring_task.user, self.user)
+        self.assertIsNotNone(recurring_task.next_run_date)
+
+class TaskFragmentTests(TestCase):
+    """Dashboard changes made with `X-Fragment: true` get back just the
+    changed row and the stats card instead of a redirect"""
+
+    def setUp(self):
+        """Create a user and log them in"""
+        self.credentials = {
+            'username': 'username',
+            'password': 'password',
+        }
+        self.user = get_user_model().objects.create_user(**self.credentials)
+        self.client.login(**self.credentials)
+
+    def test_new_task_returns_row_and_stats(self):
+        response = self.client.post(
+            reverse('dashboard'),
+            data={'task_name': 'fragment task', 'expected_mins': 90},
+            HTTP_X_FRAGMENT='true',
+        )
+        task = Task.objects.get(task_name='fragment task')
+        data = response.json()
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(data['id'], task.pk)
+        self.assertIn(f'data-id="{task.pk}"', data['row'])
+        self.assertIn('fragment task', data['row'])
+        self.assertIn('id="summ-stats"', data['stats'])
+        self.assertIn('1 hr 30 mins', data['stats'])
+
+    def test_invalid_new_task_returns_form_with_errors(self):
+        response = self.client.post(
+            reverse('dashboard'),
+            data={'task_name': 'fragment task'},
+            HTTP_X_FRAGMENT='true',
+        )
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('id="new-task-form"', response.json()['form'])
+        self.assertFalse(Task.objects.exists())
+
+    def test_edit_returns_row_and_stats(self):
+        task = create_task(task_name='task', expected_mins=30, active=True, user=self.user)
+
+        response = self.client.post(
+            reverse('edit_task', kwargs={'pk': task.pk}),
+            data={'task_name': 'renamed', 'expected_mins': 30,
+                  'actual_mins': 10, 'active': True},
+            HTTP_X_FRAGMENT='true',
+        )
+        data = response.json()
+
+        self.assertIn('renamed', data['row'])
+        self.assertIn('20 mins', data['stats'])
+
+    def test_task_leaving_dashboard_has_no_row(self):
+        """A task that's no longer active (or completed today) is removed"""
+        task = create_task(task_name='task', expected_mins=30, active=True, user=self.user)
+
+        response = self.client.post(
+            reverse('edit_task', kwargs={'pk': task.pk}),
+            data={'task_name': 'task', 'expected_mins': 30},
+            HTTP_X_FRAGMENT='true',
+        )
+        self.assertIsNone(response.json()['row'])
+
+    def test_edit_form_fragment(self):
+        """The dashboard can load just the edit form to show it inline"""
+        task = create_task(task_name='task', expected_mins=30, active=True, user=self.user)
+
+        response = self.client.get(
+            reverse('edit_task', kwargs={'pk': task.pk}),
+            HTTP_X_FRAGMENT='true',
+        )
+        self.assertContains(response, 'class="edit-task-form"')
+        self.assertNotContains(response, 'side-navbar')
+
+    def test_edit_without_fragment_header_redirects(self):
+        task = create_task(task_name='task', expected_mins=30, active=True, user=self.user)
+
+        response = self.client.post(
+            reverse('edit_task', kwargs={'pk': task.pk}),
+            data={'task_name': 'renamed', 'expected_mins': 30, 'active': True},
+        )
+        self.assertRedirects(response, reverse('dashboard'))
+
+    def test_delete_returns_stats_without_row(self):
+        task = create_task(task_name='task', expected_mins=30, active=True, user=self.user)
+
+        response = self.client.post(
+            reverse('delete_task', kwargs={'pk': task.pk}),
+            HTTP_X_FRAGMENT='true',
+        )
+        data = response.json()
+
+        self.assertEqual(data['id'], task.pk)
+        self.assertIsNone(data['row'])
+        self.assertFalse(Task.objects.exists())
+
+    def test_fragments_leave_out_the_outlook(self):
+        """Planning and forecasting wait for the script to ask for them"""
+        create_task(task_name='task', expected_mins=30, active=True, user=self.user)
+
+        with mock.patch.object(views, 'get_user_plan') as get_user_plan, \
+                mock.patch.object(views, 'forecast_todays_tasks') as forecast_todays_tasks:
+            response = self.client.post(
+                reverse('dashboard'),
+                data={'task_name': 'fragment task', 'expected_mins': 90},
+                HTTP_X_FRAGMENT='true',
+            )
+
+        get_user_plan.assert_not_called()
+        forecast_todays_tasks.assert_not_called()
+        self.assertIn(f'data-url="{reverse("dashboard_outlook")}"', response.json()['stats'])
+
+    def test_outlook_fragment(self):
+        create_task(task_name='task', expected_mins=30, active=True, user=self.user)
+
+        response = self.client.get(reverse('dashboard_outlook'))
+
+        self.assertContains(response, "id='outlook'")
+        self.assertContains(response, 'Done by')
+        self.assertNotContains(response, 'side-navbar')
+
+class DashboardSummStatsTests(TestCase):
+
+    def test_stats_are_calculated_in_one_query(self):
+        user = get_user_model().objects.create_user(username='username')
+        create_task(expected_mins=30, active=True, user=user)                   # no actual time
+        create_task(expected_mins=30, actual_mins=10, active=True, user=user)   # over estimate
+        create_task(expected_mins=30, actual_mins=45, active=True, user=user)   # under estimate
+        create_task(expected_mins=30, actual_mins=30, active=True, user=user)   # on estimate
+        create_task(expected_mins=30, actual_mins=20, completed=True, user=user)
+
+        summ_stats = DashboardSummStats(Task.objects.filter(user=user))
+        with self.assertNumQueries(1):
+            stats = (
+                summ_stats.initial_estimated_time,
+                summ_stats.actual_time,
+                summ_stats.current_estimated_time,
+                summ_stats.unfinished_time,
+            )
+
+        # The on-estimate task isn't counted in the current estimate
+        self.assertEqual(stats, (150, 105, 30 + 30 + 45 + 20, 30 + 20))
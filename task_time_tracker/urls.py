@@ -5,12 +5,20 @@ from . import views
 
 urlpatterns = [
     path('', views.dashboard, name='dashboard'),
+    path('dashboard-outlook/', views.dashboard_outlook, name='dashboard_outlook'),
     path('delete-task/<int:pk>/', views.DeleteTaskView.as_view(), name='delete_task'),
+    path('undo-delete-task/<int:pk>/', views.undo_delete_task, name='undo_delete_task'),
     path('edit-task/<int:pk>/', views.EditTaskView.as_view(), name='edit_task'),
     path('active-tasks/', views.ActiveTaskView.as_view(), name='active_tasks'),
     path('completed-tasks/', views.CompletedTaskView.as_view(), name='completed_tasks'),
     path('new-task/', views.NewTaskView.as_view(), name='new_task'),
+    path('projects/', views.ProjectsView.as_view(), name='projects'),
     path('new-project/', views.NewProjectView.as_view(), name='new_project'),
+    path('new-recurring-task/', views.NewRecurringTaskView.as_view(), name='new_recurring_task'),
+    path('plan/', views.PlanView.as_view(), name='plan'),
+    path('trends/', views.TrendsView.as_view(), name='trends'),
+    path('trends/data/', views.trends_data, name='trends_data'),
+    path('sync/', views.sync, name='sync'),
 ]
 
 # User authentication
@@ -22,6 +30,9 @@ urlpatterns += [
     path('login/', views.SiteLoginView.as_view(), name='login'),
     path('logout/', views.SiteLogoutView.as_view(), name='logout'),
 
+    # Delete account
+    path('delete-account/', views.DeleteAccountView.as_view(), name='delete_account'),
+
     # Change password
     path('password_change/', auth_views.PasswordChangeView.as_view(), name='password_change'),
     path('password_change/done/', auth_views.PasswordChangeDoneView.as_view(), name='password_change_done'),
@@ -0,0 +1,123 @@
+"""
+Deleting accounts a batch at a time.
+
+Deleting a `User` cascades to all of their tasks, status changes, projects
+and archived tasks in one transaction, which for a heavy user holds locks
+long enough to time out. `request_account_deletion` instead deactivates
+the user right away, which logs them out everywhere, and records an
+`AccountDeletion`. `manage.py delete_accounts` then deletes their rows a
+batch at a time. Each batch commits along with the progress it made, so
+an interrupted run picks up where it stopped. The user row goes last,
+once there's nothing left for it to cascade to.
+"""
+import time
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Exists, OuterRef
+from django.utils import timezone
+
+from task_time_tracker.models import (AccountDeletion,
+                                      ArchivedTask,
+                                      ArchivedTaskStatusChange,
+                                      Project,
+                                      RecurringTask,
+                                      Task,
+                                      TaskDependency,
+                                      TaskStatusChange,
+                                      Tombstone,
+                                      User)
+from task_time_tracker.utils.project_counters import counters_suspended
+from task_time_tracker.utils.sync import sync_suspended
+
+def request_account_deletion(user):
+    """Deactivate `user` and queue their account for deletion"""
+    with transaction.atomic():
+        user.is_active = False
+        user.save(update_fields=['is_active'])
+        deletion, _ = AccountDeletion.objects.get_or_create(
+            user_id=user.pk, defaults={'username': user.username})
+    return deletion
+
+def get_deletion_stages(user_id):
+    """
+    Querysets of the user's rows, in the order they're deleted. Rows that
+    others cascade to come after them, so each batch only deletes the rows
+    it selected. Tasks are deleted before the archive, so tasks archived
+    in the meantime are still caught.
+    """
+    return (
+        TaskStatusChange.objects.filter(task__user_id=user_id),
+        TaskDependency.objects.filter(task__user_id=user_id),
+        # Deleting a parent deletes its subtasks, so parents wait until
+        # their subtasks are gone
+        Task.all_objects
+            .filter(user_id=user_id)
+            .exclude(Exists(Task.all_objects.filter(parent=OuterRef('pk')))),
+        ArchivedTaskStatusChange.objects.filter(task__user_id=user_id),
+        ArchivedTask.objects.filter(user_id=user_id),
+        RecurringTask.objects.filter(user_id=user_id),
+        Project.objects.filter(user_id=user_id),
+        Tombstone.objects.filter(user_id=user_id),
+    )
+
+def delete_account_batch(deletion_id, batch_size=None):
+    """
+    Delete up to `batch_size` rows of the next kind the account still has,
+    or the user once they have none, and record the progress. Returns the
+    updated `AccountDeletion` and the number of rows deleted.
+    """
+    if batch_size is None:
+        batch_size = settings.ACCOUNT_DELETION_BATCH_SIZE
+
+    with transaction.atomic():
+        # Locking the record keeps two runs from working on one account
+        deletion = AccountDeletion.objects.select_for_update().get(pk=deletion_id)
+        if deletion.completed_date is not None:
+            return deletion, 0
+
+        now = timezone.now()
+        # The user's projects and tombstones are going too
+        with counters_suspended(), sync_suspended([deletion.user_id]):
+            for queryset in get_deletion_stages(deletion.user_id):
+                pks = list(queryset.order_by('pk').values_list('pk', flat=True)[:batch_size])
+                if pks:
+                    deleted_count, _ = (queryset.model._base_manager
+                                            .filter(pk__in=pks).delete())
+                    break
+            else:
+                deleted_count, _ = User.objects.filter(pk=deletion.user_id).delete()
+                deletion.completed_date = now
+
+        deletion.rows_deleted += deleted_count
+        deletion.last_batch_date = now
+        deletion.save(update_fields=['rows_deleted', 'last_batch_date', 'completed_date'])
+
+    return deletion, deleted_count
+
+def delete_account(deletion, batch_size=None, rows_per_second=None):
+    """
+    Delete the account a batch at a time until it's gone, deleting at most
+    `rows_per_second` rows a second on average so the primary keeps up
+    with everyone else's writes. Returns the updated `AccountDeletion`.
+    """
+    if rows_per_second is None:
+        rows_per_second = settings.ACCOUNT_DELETION_ROWS_PER_SECOND
+
+    while deletion.completed_date is None:
+        started = time.monotonic()
+        deletion, deleted_count = delete_account_batch(deletion.pk, batch_size)
+        if rows_per_second:
+            elapsed = time.monotonic() - started
+            time.sleep(max(deleted_count / rows_per_second - elapsed, 0))
+
+    return deletion
+
+def delete_accounts(batch_size=None, rows_per_second=None):
+    """Work through every account deletion that hasn't finished, oldest
+    first. Returns the finished `AccountDeletion`s."""
+    deletions = AccountDeletion.objects.filter(completed_date=None).order_by('requested_date', 'pk')
+    return [
+        delete_account(deletion, batch_size, rows_per_second)
+        for deletion in deletions
+    ]
@@ -0,0 +1,91 @@
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import BooleanField, Exists, OuterRef, Value
+from django.utils import timezone
+
+from task_time_tracker.models import (ArchivedTask,
+                                      ArchivedTaskStatusChange,
+                                      Task,
+                                      TaskStatusChange)
+from task_time_tracker.utils.project_counters import counters_suspended
+from task_time_tracker.utils.sync import record_archived_tasks, sync_suspended
+
+def get_archive_cutoff(days=None):
+    """Return the datetime before which completed tasks get archived"""
+    if days is None:
+        days = settings.TASK_ARCHIVE_AFTER_DAYS
+    return timezone.now() - timedelta(days=days)
+
+def archive_completed_tasks(cutoff, batch_size=None):
+    """
+    Move tasks completed before `cutoff` (and their status changes) from the
+    `Task` tables to the archive tables. Each batch is moved in its own
+    transaction so a long run never holds locks on the whole table.
+    Returns the number of tasks archived.
+    """
+    if batch_size is None:
+        batch_size = settings.TASK_ARCHIVE_BATCH_SIZE
+
+    archived_count = 0
+    while True:
+        with transaction.atomic():
+            tasks = list(
+                Task.objects
+                    .select_for_update()
+                    .filter(completed=True, completed_date__lt=cutoff)
+                    # Deleting a parent deletes its subtasks, so parents
+                    # wait until their subtasks have been archived
+                    .exclude(Exists(Task.objects.filter(parent=OuterRef('pk'))))
+                    .order_by('pk')[:batch_size]
+            )
+            if not tasks:
+                break
+
+            archived_date = timezone.now()
+            ArchivedTask.objects.bulk_create([
+                ArchivedTask.from_task(task, archived_date=archived_date)
+                for task in tasks
+            ])
+
+            status_changes = TaskStatusChange.objects.filter(task__in=tasks)
+            ArchivedTaskStatusChange.objects.bulk_create([
+                ArchivedTaskStatusChange.from_status_change(status_change)
+                for status_change in status_changes
+            ])
+
+            status_changes.delete()
+            # Archived tasks still count towards their project's totals,
+            # and get one tombstone per user rather than one per task
+            record_archived_tasks(tasks)
+            with counters_suspended(), sync_suspended({task.user_id for task in tasks}):
+                Task.objects.filter(pk__in=[task.pk for task in tasks]).delete()
+
+        archived_count += len(tasks)
+
+    return archived_count
+
+def get_completed_tasks(user):
+    """
+    Return a user's completed tasks from both the `Task` and `ArchivedTask`
+    tables as one queryset of `Task` instances. Rows from the archive have
+    `archived` set to `True`.
+    """
+    fields = ArchivedTask.shared_fields()
+    field_names = [field.name for field in Task._meta.concrete_fields
+                   if field.attname in fields]
+
+    hot_tasks = (Task.objects
+                     .filter(user=user, completed=True)
+                     .only(*field_names)
+                     .annotate(archived=Value(False, output_field=BooleanField()))
+                     .order_by()
+    )
+    archived_tasks = (ArchivedTask.objects
+                          .filter(user=user)
+                          .annotate(archived=Value(True, output_field=BooleanField()))
+                          .values_list(*fields, 'archived')
+                          .order_by()
+    )
+    return hot_tasks.union(archived_tasks, all=True).order_by('-completed_date')
@@ -0,0 +1,129 @@
+"""
+Per-user cache generations, and per-user state that is kept in the cache
+and changed in place.
+
+Cached results derived from a user's tasks include the user's current
+generation in their cache key. Bumping the generation (whenever a change
+to one of their tasks commits, see `signals.py`) makes every such entry
+unreachable at once, so nothing has to track which keys exist. Bumping
+before the commit would let another process cache results read from the
+old rows under the new generation.
+
+State that is expensive to rebuild (day plans, critical paths) is cached
+and changed in place instead. Changes are applied once they're committed,
+one at a time under a lock, and each one bumps the state's version, so a
+copy built while a change was being committed isn't cached.
+
+All of this relies on every process sharing one cache, which production
+configures (see `CACHES`).
+"""
+from contextlib import contextmanager
+from functools import partial
+import time
+
+from django.core.cache import cache
+from django.db import transaction
+
+LOCK_TIMEOUT_SECONDS = 10
+LOCK_WAIT_SECONDS = 2
+
+def get_version(key):
+    """The counter stored at `key`, started if there is none"""
+    version = cache.get(key)
+    if version is None:
+        # Start from the clock rather than 1, so a counter that was evicted
+        # from the cache can't come back and match stale entries
+        cache.add(key, time.time_ns(), timeout=None)
+        version = cache.get(key)
+    return version
+
+def bump_versions(keys):
+    for key in set(keys):
+        try:
+            cache.incr(key)
+        except ValueError:
+            cache.set(key, time.time_ns(), timeout=None)
+
+@contextmanager
+def cache_lock(key, wait_seconds=0):
+    """
+    Hold the lock `key` for the block, waiting up to `wait_seconds` for it.
+    Yields whether the lock was taken. A lock whose holder died is released
+    after `LOCK_TIMEOUT_SECONDS`.
+    """
+    deadline = time.monotonic() + wait_seconds
+    while True:
+        locked = cache.add(key, True, timeout=LOCK_TIMEOUT_SECONDS)
+        if locked or time.monotonic() >= deadline:
+            break
+        time.sleep(0.01)
+    try:
+        yield locked
+    finally:
+        if locked:
+            cache.delete(key)
+
+def get_generation_key(user_id):
+    return f'task_time_tracker:generation:{user_id}'
+
+def get_user_generation(user_id):
+    return get_version(get_generation_key(user_id))
+
+def bump_user_generations(user_ids):
+    """Expire the users' cached results once the current transaction
+    commits"""
+    keys = [get_generation_key(user_id) for user_id in user_ids]
+    transaction.on_commit(partial(bump_versions, keys))
+
+# Cached state
+
+def get_state_keys(name, user_id):
+    """The keys of the user's cached `name` state, its version and its lock"""
+    key = f'task_time_tracker:{name}:{user_id}'
+    return key, f'{key}:version', f'{key}:lock'
+
+def get_cached_state(name, user_id, is_current, build):
+    """
+    Return the user's cached `name` state if `is_current(state)`, or else
+    `build()` a new one, which is cached unless a change was committed
+    while it was being built.
+    """
+    key, version_key, lock_key = get_state_keys(name, user_id)
+    state = cache.get(key)
+    if state is not None and is_current(state):
+        return state
+
+    version = get_version(version_key)
+    state = build()
+    with cache_lock(lock_key) as locked:
+        if locked and get_version(version_key) == version:
+            cache.set(key, state)
+    return state
+
+def apply_state_change(name, user_id, change):
+    key, version_key, lock_key = get_state_keys(name, user_id)
+    bump_versions([version_key])
+    with cache_lock(lock_key, wait_seconds=LOCK_WAIT_SECONDS) as locked:
+        if not locked:
+            # Another change is taking too long; dropping the state is
+            # safer than changing it at the same time
+            cache.delete(key)
+            return
+        state = cache.get(key)
+        if state is not None:
+            change(state)
+            cache.set(key, state)
+
+def change_cached_state(name, user_id, change):
+    """Call `change(state)` on the user's cached `name` state, if there is
+    one, once the current transaction commits"""
+    transaction.on_commit(partial(apply_state_change, name, user_id, change))
+
+def invalidate_cached_states(name, user_ids):
+    """Drop the users' cached `name` states once the current transaction
+    commits"""
+    def invalidate():
+        keys = [get_state_keys(name, user_id) for user_id in set(user_ids)]
+        bump_versions(version_key for _, version_key, _ in keys)
+        cache.delete_many([key for key, _, _ in keys])
+    transaction.on_commit(invalidate)
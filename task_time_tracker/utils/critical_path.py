@@ -0,0 +1,329 @@
+"""
+Earliest finish dates of a user's open tasks, given the tasks they depend
+on (`TaskDependency`).
+
+Unlike `utils.planner`, which works through tasks one at a time, this
+assumes tasks that don't depend on each other can be worked on side by
+side: a task starts as soon as everything it depends on is finished, and
+takes its remaining time. The latest finish in a project is its forecast
+end, and the chain of tasks leading to it is the critical path.
+"""
+from collections import deque
+from datetime import timedelta
+import heapq
+
+from django.db import connections, router
+from django.db.models import Q
+from django.utils import timezone
+
+from task_time_tracker.models import Task, TaskDependency
+from task_time_tracker.utils.cache_helpers import (change_cached_state,
+                                                   get_cached_state,
+                                                   invalidate_cached_states)
+from task_time_tracker.utils.planner import get_remaining_mins
+
+# Fields `CriticalPath` needs from each task
+CRITICAL_PATH_FIELDS = (
+    'id',
+    'expected_mins',
+    'actual_mins',
+    'project_id',
+)
+
+class CriticalPath(object):
+    """
+    Earliest finish, in working minutes from `start_date`, of every task.
+    Minutes are turned into dates with `capacity_mins` per day, like
+    `DayPlanner` does.
+
+    Tasks are kept in a topological order (`_rank`: everything a task
+    depends on ranks lower). After a change, finishes are recalculated in
+    rank order from the changed task, and only onwards from tasks whose
+    finish actually moved, so a change costs what it affects rather than the
+    size of the graph. Adding a dependency that goes against the order
+    re-sorts the graph first.
+
+    Dependencies on tasks outside the graph (e.g. completed ones) are
+    already met. Tasks in a cycle, which `would_create_cycle` keeps out of
+    the database, are ordered arbitrarily rather than left out.
+    """
+
+    def __init__(self, capacity_mins, start_date=None):
+        self.capacity_mins = max(capacity_mins, 1)
+        self.start_date = start_date or timezone.localdate()
+        self._durations = {}
+        self._projects = {}
+        self._depends_on = {}
+        self._dependents = {}
+        self._rank = {}
+        self._next_rank = 0
+        self._finish = {}
+
+    def build(self, tasks, dependencies):
+        """
+        Replace the graph with `tasks` (dicts with `CRITICAL_PATH_FIELDS`)
+        and `dependencies`, `(task_id, depends_on_id)` pairs
+        """
+        self._durations = {}
+        self._projects = {}
+        self._depends_on = {}
+        self._dependents = {}
+        for task in tasks:
+            self._add_task(task)
+        for task_id, depends_on_id in dependencies:
+            if task_id in self._durations and depends_on_id in self._durations:
+                self._depends_on[task_id].add(depends_on_id)
+                self._dependents[depends_on_id].add(task_id)
+
+        self._sort()
+        self._finish = {}
+        for task_id in sorted(self._rank, key=self._rank.__getitem__):
+            self._finish[task_id] = self._get_finish(task_id)
+        return self
+
+    def update(self, task, dependencies=()):
+        """Add a task (with its `dependencies`, in either direction), or
+        recalculate after its remaining time or project changed"""
+        if task['id'] in self._durations:
+            self._projects[task['id']] = task['project_id']
+            duration = self._get_duration(task)
+            if duration != self._durations[task['id']]:
+                self._durations[task['id']] = duration
+                self._propagate([task['id']])
+            return
+
+        self._add_task(task)
+        # Nothing depends on a new task yet, so it can go last
+        self._rank[task['id']] = self._next_rank
+        self._next_rank += 1
+        self._finish[task['id']] = self._durations[task['id']]
+        for task_id, depends_on_id in dependencies:
+            self.add_dependency(task_id, depends_on_id)
+        self._propagate([task['id']])
+
+    def remove(self, task_id):
+        """Drop a task, e.g. once it's completed, which releases the tasks
+        that depend on it"""
+        if task_id not in self._durations:
+            return
+        dependents = self._dependents.pop(task_id)
+        for depends_on_id in self._depends_on.pop(task_id):
+            self._dependents[depends_on_id].discard(task_id)
+        for dependent_id in dependents:
+            self._depends_on[dependent_id].discard(task_id)
+        for mapping in (self._durations, self._projects, self._rank, self._finish):
+            del mapping[task_id]
+        self._propagate(dependents)
+
+    def add_dependency(self, task_id, depends_on_id):
+        if (task_id not in self._durations or depends_on_id not in self._durations
+                or depends_on_id in self._depends_on[task_id]):
+            return
+        self._depends_on[task_id].add(depends_on_id)
+        self._dependents[depends_on_id].add(task_id)
+        if self._rank[depends_on_id] >= self._rank[task_id]:
+            self._sort()
+        self._propagate([task_id])
+
+    def remove_dependency(self, task_id, depends_on_id):
+        if depends_on_id not in self._depends_on.get(task_id, ()):
+            return
+        self._depends_on[task_id].discard(depends_on_id)
+        self._dependents[depends_on_id].discard(task_id)
+        self._propagate([task_id])
+
+    def _add_task(self, task):
+        self._durations[task['id']] = self._get_duration(task)
+        self._projects[task['id']] = task['project_id']
+        self._depends_on[task['id']] = set()
+        self._dependents[task['id']] = set()
+
+    def _get_duration(self, task):
+        return get_remaining_mins(task['expected_mins'], task['actual_mins'])
+
+    def _get_finish(self, task_id):
+        start = max(
+            (self._finish.get(depends_on_id, 0)
+             for depends_on_id in self._depends_on[task_id]),
+            default=0,
+        )
+        return start + self._durations[task_id]
+
+    def _sort(self):
+        """Set `_rank` to a topological order (Kahn's algorithm)"""
+        waiting = {
+            task_id: len(depends_on)
+            for task_id, depends_on in self._depends_on.items()
+        }
+        ready = deque(task_id for task_id, count in waiting.items() if not count)
+        order = []
+        while ready:
+            task_id = ready.popleft()
+            order.append(task_id)
+            for dependent_id in self._dependents[task_id]:
+                waiting[dependent_id] -= 1
+                if not waiting[dependent_id]:
+                    ready.append(dependent_id)
+        if len(order) < len(waiting):
+            # Whatever is left is in or behind a cycle
+            ordered = set(order)
+            order.extend(task_id for task_id in waiting if task_id not in ordered)
+        self._rank = {task_id: rank for rank, task_id in enumerate(order)}
+        self._next_rank = len(order)
+
+    def _propagate(self, task_ids):
+        """Recalculate the finishes of `task_ids`, then of their dependents
+        in rank order wherever a finish changed"""
+        changed_ids = set(task_ids)
+        heap = [(self._rank[task_id], task_id) for task_id in changed_ids]
+        heapq.heapify(heap)
+        queued = set(changed_ids)
+        while heap:
+            rank, task_id = heapq.heappop(heap)
+            queued.discard(task_id)
+            finish = self._get_finish(task_id)
+            if finish == self._finish.get(task_id) and task_id not in changed_ids:
+                continue
+            self._finish[task_id] = finish
+            for dependent_id in self._dependents[task_id]:
+                # Only a cycle leads back to a lower rank
+                if dependent_id not in queued and self._rank[dependent_id] > rank:
+                    queued.add(dependent_id)
+                    heapq.heappush(heap, (self._rank[dependent_id], dependent_id))
+
+    def _day(self, minute):
+        """Day on which the `minute`th working minute is done"""
+        return self.start_date + timedelta(days=max(minute - 1, 0) // self.capacity_mins)
+
+    def __contains__(self, task_id):
+        return task_id in self._durations
+
+    def get_finish_mins(self, task_id):
+        return self._finish[task_id]
+
+    def get_finish_date(self, task_id):
+        return self._day(self._finish[task_id])
+
+    def get_critical_path(self, task_id):
+        """The chain of tasks that decides when `task_id` finishes, first
+        task first"""
+        path = [task_id]
+        while self._depends_on[path[-1]]:
+            path.append(max(self._depends_on[path[-1]], key=self._finish.__getitem__))
+        return path[::-1]
+
+    def get_project_finish_dates(self):
+        """`{project id: forecast finish date}` for projects with open tasks"""
+        finish_mins = {}
+        for task_id, project_id in self._projects.items():
+            if project_id is not None:
+                finish_mins[project_id] = max(
+                    finish_mins.get(project_id, 0), self._finish[task_id])
+        return {
+            project_id: self._day(minutes)
+            for project_id, minutes in finish_mins.items()
+        }
+
+
+def would_create_cycle(task_id, depends_on_id):
+    """
+    Whether making `task_id` depend on `depends_on_id` would close a loop,
+    i.e. `depends_on_id` already depends on `task_id`, directly or through
+    other tasks. One recursive query up the dependencies.
+    """
+    if task_id == depends_on_id:
+        return True
+    connection = connections[router.db_for_read(TaskDependency)]
+    table = connection.ops.quote_name(TaskDependency._meta.db_table)
+    with connection.cursor() as cursor:
+        cursor.execute(f'''
+            WITH RECURSIVE upstream(id) AS (
+                SELECT depends_on_id FROM {table} WHERE task_id = %s
+                UNION
+                SELECT dependency.depends_on_id
+                FROM {table} dependency JOIN upstream ON dependency.task_id = upstream.id
+            )
+            SELECT 1 FROM upstream WHERE id = %s
+        ''', [depends_on_id, task_id])
+        return cursor.fetchone() is not None
+
+
+# Per-user graphs are cached so a change to one task only recalculates
+# what it affects, as with `utils.planner` (see `utils.cache_helpers`)
+
+def get_open_tasks(user_id):
+    return Task.objects.filter(user_id=user_id, completed=False)
+
+def get_dependencies(task_queryset):
+    """`(task_id, depends_on_id)` pairs between open tasks that involve
+    the tasks in `task_queryset`, in either direction"""
+    return list(
+        TaskDependency.objects
+            .filter(Q(task__in=task_queryset) | Q(depends_on__in=task_queryset))
+            .filter(task__completed=False, depends_on__completed=False)
+            .values_list('task_id', 'depends_on_id')
+    )
+
+def get_user_critical_path(user):
+    """
+    Return the cached `CriticalPath` for `user`, building it from their
+    open tasks if there is none or it's out of date.
+    """
+    today = timezone.localdate()
+
+    def is_current(critical_path):
+        return (critical_path.start_date == today
+                and critical_path.capacity_mins == user.daily_capacity_mins)
+
+    def build():
+        tasks = get_open_tasks(user.pk)
+        critical_path = CriticalPath(user.daily_capacity_mins, start_date=today)
+        dependencies = (TaskDependency.objects
+                            .filter(task__user_id=user.pk, task__completed=False,
+                                    depends_on__completed=False)
+                            .values_list('task_id', 'depends_on_id'))
+        return critical_path.build(
+            list(tasks.values(*CRITICAL_PATH_FIELDS)),
+            list(dependencies),
+        )
+
+    return get_cached_state('critical_path', user.pk, is_current, build)
+
+def update_user_critical_path(task):
+    """Recalculate from `task` in its user's cached graph, if there is one,
+    once the change is committed"""
+    task_model, task_id = type(task), task.pk
+
+    def recalculate(critical_path):
+        task_queryset = task_model.objects.filter(pk=task_id, completed=False)
+        values = list(task_queryset.values(*CRITICAL_PATH_FIELDS))
+        if not values:
+            critical_path.remove(task_id)
+        elif task_id in critical_path:
+            critical_path.update(values[0])
+        else:
+            critical_path.update(values[0], get_dependencies(task_queryset))
+
+    change_cached_state('critical_path', task.user_id, recalculate)
+
+def remove_from_user_critical_path(task):
+    # The task's pk is cleared by the time a delete commits
+    task_id = task.pk
+    change_cached_state('critical_path', task.user_id,
+                        lambda critical_path: critical_path.remove(task_id))
+
+def change_user_dependencies(user_id, added=(), removed=()):
+    """Apply added and removed `(task_id, depends_on_id)` pairs to the
+    user's cached graph, once they're committed"""
+    added, removed = list(added), list(removed)
+
+    def change(critical_path):
+        for task_id, depends_on_id in added:
+            critical_path.add_dependency(task_id, depends_on_id)
+        for task_id, depends_on_id in removed:
+            critical_path.remove_dependency(task_id, depends_on_id)
+
+    change_cached_state('critical_path', user_id, change)
+
+def invalidate_user_critical_paths(user_ids):
+    invalidate_cached_states('critical_path', user_ids)
@@ -1,10 +1,34 @@
 from datetime import timedelta
 import pdb
 
-from django.db.models import F, Q, Sum
+from django.db.models import Case, F, IntegerField, Q, Sum, When
+from django.utils import timezone
+from django.utils.functional import cached_property
 
 import numpy as np
 
+from task_time_tracker.models import Task
+
+def get_todays_tasks(user):
+    """
+    Return active incomplete and complete tasks, excluding tasks that were
+    completed before today.
+    """
+    return (Task.objects
+                .filter(user=user)
+                .filter(
+                    Q(active=True)
+                    | Q(completed_date__gt=timezone.now() - timedelta(days=1))
+                )
+    )
+
+def is_todays_task(task):
+    """Whether `get_todays_tasks` would include `task`"""
+    if task.active:
+        return True
+    return (task.completed_date is not None
+            and task.completed_date > timezone.now() - timedelta(days=1))
+
 def get_col_sum(queryset, col_name: str) -> int:
     """Aggregate a column from a queryset,
     returning the value as an integer"""
@@ -52,57 +76,60 @@ def format_time(minutes: timedelta) -> str:
     return total_time
 
 class DashboardSummStats(object):
+    """
+    Summary stats for a set of tasks. All of them are calculated together in
+    a single aggregate query, run the first time one is read.
+    """
 
     def __init__(self, task_queryset):
         self.task_queryset = task_queryset
 
+    @cached_property
+    def _totals(self):
+        incomplete = Q(completed=False)
+        no_actual = Q(actual_mins=None)
+        over_estimate = Q(expected_mins__gt=F('actual_mins'))
+        under_estimate = Q(expected_mins__lt=F('actual_mins'))
+
+        totals = self.task_queryset.order_by().aggregate(
+            initial_estimated_time=Sum('expected_mins'),
+            actual_time=Sum('actual_mins'),
+            estimated_no_actual_time=Sum('expected_mins', filter=no_actual),
+            # Incomplete tasks count whichever of expected and actual time
+            # is larger (but not when they're equal); complete tasks count
+            # their actual time
+            current_estimated_time=Sum(Case(
+                When(incomplete & no_actual, then='expected_mins'),
+                When(incomplete & over_estimate, then='expected_mins'),
+                When(incomplete & under_estimate, then='actual_mins'),
+                When(completed=True, then='actual_mins'),
+                output_field=IntegerField(),
+            )),
+            unfinished_time=Sum(Case(
+                When(incomplete & no_actual, then='expected_mins'),
+                When(incomplete & over_estimate,
+                     then=F('expected_mins') - F('actual_mins')),
+                output_field=IntegerField(),
+            )),
+        )
+        return {name: int(value or 0) for name, value in totals.items()}
+
     @property
     def initial_estimated_time(self):
-        return get_col_sum(self.task_queryset, 'expected_mins')
+        return self._totals['initial_estimated_time']
     
     @property
     def actual_time(self):
-        return get_col_sum(self.task_queryset, 'actual_mins')
+        return self._totals['actual_time']
     
     @property
     def _estimated_no_actual_time(self):
-        records_no_actual = self.task_queryset.filter(actual_mins=None)
-        return get_col_sum(records_no_actual, 'expected_mins')
+        return self._totals['estimated_no_actual_time']
 
     @property
     def current_estimated_time(self):
-        incomplete = self.task_queryset.filter(completed=False)
-        complete = self.task_queryset.filter(completed=True)
-
-        incomplete_no_actual = incomplete.filter(actual_mins=None)
-        incomplete_gt_actual = incomplete.filter(expected_mins__gt=F('actual_mins'))
-        incomplete_lt_actual = incomplete.filter(expected_mins__lt=F('actual_mins'))
-        
-        incomplete_total = (
-            get_col_sum(incomplete_no_actual, 'expected_mins') +
-            get_col_sum(incomplete_gt_actual, 'expected_mins') +
-            get_col_sum(incomplete_lt_actual, 'actual_mins')
-        )
-
-        complete_total = get_col_sum(complete, 'actual_mins')
-
-        return incomplete_total + complete_total
+        return self._totals['current_estimated_time']
     
     @property
     def unfinished_time(self):
-        records_unfinished = self.task_queryset.filter(completed=False)
-        records_unfinished_wo_actual = records_unfinished.filter(actual_mins=None)
-        records_unfinished_w_actual = records_unfinished.filter(~Q(actual_mins=None))
-
-
-        records_unfinished_w_actual = self.task_queryset.annotate(
-            expected_v_actual = F('expected_mins') - F('actual_mins')
-        )
-        records_time_remaining = records_unfinished_w_actual.filter(
-            expected_v_actual__gt=0).filter(
-                completed=False)
-
-        return (
-                get_col_sum(records_unfinished_wo_actual, 'expected_mins') +
-                get_col_sum(records_time_remaining, 'expected_v_actual')
-        )
\ No newline at end of file
+        return self._totals['unfinished_time']
@@ -0,0 +1,301 @@
+"""
+Monthly range partitioning of the `TaskStatusChange` table on Postgres.
+
+`TaskStatusChange` is an append-only log, so it is split into one partition
+per month of `created_datetime`. Partitions are created ahead of time by
+`manage.py manage_partitions` (run daily and on every release), which also
+detaches or drops partitions that fall outside the retention window. Rows
+for a month without a partition go to the default partition until one is
+created. Every function here is a no-op on other
+database backends, where the table stays a regular table.
+"""
+from datetime import date, datetime, timezone as dt_timezone
+
+from django.db import connection, transaction
+from django.utils import timezone
+
+# Table names are spelled out rather than read from the models because
+# `partition_table` runs inside a migration
+TABLE = 'task_time_tracker_taskstatuschange'
+TASK_TABLE = 'task_time_tracker_task'
+PARTITION_KEY = 'created_datetime'
+DEFAULT_PARTITION = f'{TABLE}_default'
+
+def is_postgres(conn=None):
+    return (conn or connection).vendor == 'postgresql'
+
+def month_start(value):
+    """Return the first day of the (UTC) month `value` falls in"""
+    if isinstance(value, datetime):
+        if timezone.is_aware(value):
+            value = value.astimezone(dt_timezone.utc)
+        value = value.date()
+    return date(value.year, value.month, 1)
+
+def add_months(month, count):
+    """Return the first day of the month `count` months after `month`"""
+    month_index = month.year * 12 + (month.month - 1) + count
+    return date(month_index // 12, month_index % 12 + 1, 1)
+
+def month_range(first_month, last_month):
+    """Return the first day of every month from `first_month` through
+    `last_month`, inclusive
+    """
+    months = []
+    month = month_start(first_month)
+    while month <= last_month:
+        months.append(month)
+        month = add_months(month, 1)
+    return months
+
+def partition_name(month):
+    return f'{TABLE}_p{month:%Y_%m}'
+
+def partition_month(name):
+    """Inverse of `partition_name`. Returns `None` for tables that are not
+    monthly partitions (e.g. the default partition).
+    """
+    prefix = f'{TABLE}_p'
+    if not name.startswith(prefix):
+        return None
+    try:
+        return datetime.strptime(name[len(prefix):], '%Y_%m').date()
+    except ValueError:
+        return None
+
+def _bound(month):
+    """Partition bounds are stored in UTC so they are unambiguous"""
+    return datetime(month.year, month.month, 1, tzinfo=dt_timezone.utc).isoformat()
+
+def is_partitioned(conn=None):
+    conn = conn or connection
+    if not is_postgres(conn):
+        return False
+    with conn.cursor() as cursor:
+        cursor.execute(
+            'SELECT 1 FROM pg_partitioned_table p '
+            'JOIN pg_class c ON c.oid = p.partrelid '
+            'WHERE c.relname = %s',
+            [TABLE],
+        )
+        return cursor.fetchone() is not None
+
+def list_partitions(conn=None):
+    """Return the names of the table's monthly partitions, oldest first"""
+    conn = conn or connection
+    if not is_partitioned(conn):
+        return []
+    with conn.cursor() as cursor:
+        cursor.execute(
+            'SELECT child.relname FROM pg_inherits i '
+            'JOIN pg_class parent ON parent.oid = i.inhparent '
+            'JOIN pg_class child ON child.oid = i.inhrelid '
+            'WHERE parent.relname = %s',
+            [TABLE],
+        )
+        names = [row[0] for row in cursor.fetchall()]
+    return sorted(name for name in names if partition_month(name))
+
+def create_partition(month, conn=None):
+    """
+    Create the partition for `month`. If the month started before its
+    partition existed, its rows went to the default partition, and Postgres
+    won't add a partition whose range the default partition has rows in:
+    the default partition is then detached while they're moved over.
+    """
+    conn = conn or connection
+    quote = conn.ops.quote_name
+    start, end = _bound(month), _bound(add_months(month, 1))
+    create_sql = (
+        f'CREATE TABLE IF NOT EXISTS {quote(partition_name(month))} '
+        f'PARTITION OF {quote(TABLE)} '
+        f"FOR VALUES FROM ('{start}') TO ('{end}')"
+    )
+    in_range = f'{quote(PARTITION_KEY)} >= %s AND {quote(PARTITION_KEY)} < %s'
+
+    with transaction.atomic(using=conn.alias), conn.cursor() as cursor:
+        cursor.execute(
+            f'SELECT 1 FROM {quote(DEFAULT_PARTITION)} WHERE {in_range} LIMIT 1',
+            [start, end],
+        )
+        if cursor.fetchone() is None:
+            cursor.execute(create_sql)
+            return
+
+        # Detaching locks the table until the transaction ends, so no new
+        # rows can slip into the default partition in the meantime
+        cursor.execute(f'ALTER TABLE {quote(TABLE)} DETACH PARTITION {quote(DEFAULT_PARTITION)}')
+        cursor.execute(create_sql)
+        cursor.execute(
+            f'WITH moved AS (DELETE FROM {quote(DEFAULT_PARTITION)} '
+            f'WHERE {in_range} RETURNING *) '
+            f'INSERT INTO {quote(TABLE)} SELECT * FROM moved',
+            [start, end],
+        )
+        cursor.execute(
+            f'ALTER TABLE {quote(TABLE)} ATTACH PARTITION {quote(DEFAULT_PARTITION)} DEFAULT'
+        )
+
+def ensure_partitions(months_ahead, conn=None):
+    """Create partitions for the current month and the next `months_ahead`
+    months. Returns the names of partitions that were created.
+    """
+    conn = conn or connection
+    if not is_partitioned(conn):
+        return []
+
+    existing = set(list_partitions(conn))
+    this_month = month_start(timezone.now())
+    created = []
+    for month in month_range(this_month, add_months(this_month, months_ahead)):
+        if partition_name(month) not in existing:
+            create_partition(month, conn)
+            created.append(partition_name(month))
+    return created
+
+def expire_partitions(retention_months, drop=False, conn=None):
+    """
+    Detach (or, with `drop=True`, drop) partitions whose whole month is more
+    than `retention_months` months old. Detached partitions become ordinary
+    tables that can be dumped and removed separately. Returns the names of
+    the partitions that were expired.
+    """
+    conn = conn or connection
+    if not is_partitioned(conn):
+        return []
+
+    quote = conn.ops.quote_name
+    cutoff = add_months(month_start(timezone.now()), -retention_months)
+    expired = []
+    for name in list_partitions(conn):
+        if partition_month(name) >= cutoff:
+            continue
+        with transaction.atomic(using=conn.alias), conn.cursor() as cursor:
+            cursor.execute(f'ALTER TABLE {quote(TABLE)} DETACH PARTITION {quote(name)}')
+            if drop:
+                cursor.execute(f'DROP TABLE {quote(name)}')
+        expired.append(name)
+    return expired
+
+def compact_partitions(conn=None):
+    """
+    Freeze and analyze every partition before the current month. Closed
+    partitions are never written to again, so after one `VACUUM FREEZE` they
+    drop out of routine and anti-wraparound vacuums. Must run outside a
+    transaction.
+    """
+    conn = conn or connection
+    if not is_partitioned(conn):
+        return []
+
+    quote = conn.ops.quote_name
+    this_month = month_start(timezone.now())
+    compacted = []
+    for name in list_partitions(conn):
+        if partition_month(name) >= this_month:
+            continue
+        with conn.cursor() as cursor:
+            cursor.execute(f'VACUUM (FREEZE, ANALYZE) {quote(name)}')
+        compacted.append(name)
+    return compacted
+
+def partition_table(schema_editor, months_ahead=3):
+    """
+    Convert the existing `TaskStatusChange` table into a table partitioned
+    by month of `created_datetime`, copying every existing row. Called from
+    a migration.
+    """
+    conn = schema_editor.connection
+    if not is_postgres(conn) or is_partitioned(conn):
+        return
+
+    quote = conn.ops.quote_name
+    old_table = f'{TABLE}_unpartitioned'
+
+    with conn.cursor() as cursor:
+        cursor.execute(f'ALTER TABLE {quote(TABLE)} RENAME TO {quote(old_table)}')
+        cursor.execute(
+            f'CREATE TABLE {quote(TABLE)} '
+            f'(LIKE {quote(old_table)} INCLUDING DEFAULTS INCLUDING IDENTITY) '
+            f'PARTITION BY RANGE ({quote(PARTITION_KEY)})'
+        )
+        # The partition key has to be part of the primary key
+        cursor.execute(
+            f'ALTER TABLE {quote(TABLE)} '
+            f'ADD PRIMARY KEY ("id", {quote(PARTITION_KEY)})'
+        )
+        cursor.execute(
+            f'ALTER TABLE {quote(TABLE)} ADD CONSTRAINT {quote(TABLE + "_task_id_fk")} '
+            f'FOREIGN KEY ("task_id") REFERENCES {quote(TASK_TABLE)} ("id") '
+            f'DEFERRABLE INITIALLY DEFERRED'
+        )
+        cursor.execute(f'CREATE INDEX ON {quote(TABLE)} ("task_id")')
+        cursor.execute(f'CREATE INDEX ON {quote(TABLE)} ({quote(PARTITION_KEY)})')
+        cursor.execute(
+            f'CREATE TABLE {quote(DEFAULT_PARTITION)} PARTITION OF {quote(TABLE)} DEFAULT'
+        )
+
+        cursor.execute(f'SELECT MIN({quote(PARTITION_KEY)}) FROM {quote(old_table)}')
+        oldest = cursor.fetchone()[0] or timezone.now()
+        this_month = month_start(timezone.now())
+        for month in month_range(month_start(oldest), add_months(this_month, months_ahead)):
+            create_partition(month, conn)
+
+        cursor.execute(f'INSERT INTO {quote(TABLE)} SELECT * FROM {quote(old_table)}')
+
+        # A serial column's sequence belongs to the old table and would be
+        # dropped with it, so hand it over. An identity column got a fresh
+        # sequence from `LIKE ... INCLUDING IDENTITY`, which needs to start
+        # after the copied rows.
+        cursor.execute('SELECT pg_get_serial_sequence(%s, %s)', [old_table, 'id'])
+        old_sequence = cursor.fetchone()[0]
+        cursor.execute('SELECT pg_get_serial_sequence(%s, %s)', [TABLE, 'id'])
+        new_sequence = cursor.fetchone()[0]
+        if new_sequence is None and old_sequence:
+            cursor.execute(f'ALTER SEQUENCE {old_sequence} OWNED BY {quote(TABLE)}."id"')
+        elif new_sequence:
+            cursor.execute(
+                f'SELECT setval(%s, COALESCE((SELECT MAX("id") FROM {quote(TABLE)}), 0) + 1, false)',
+                [new_sequence],
+            )
+
+        cursor.execute(f'DROP TABLE {quote(old_table)}')
+
+def unpartition_table(schema_editor):
+    """Reverse `partition_table`, turning the partitions back into one table"""
+    conn = schema_editor.connection
+    if not is_partitioned(conn):
+        return
+
+    quote = conn.ops.quote_name
+    partitioned_table = f'{TABLE}_partitioned'
+
+    with conn.cursor() as cursor:
+        cursor.execute(f'ALTER TABLE {quote(TABLE)} RENAME TO {quote(partitioned_table)}')
+        cursor.execute(
+            f'CREATE TABLE {quote(TABLE)} '
+            f'(LIKE {quote(partitioned_table)} INCLUDING DEFAULTS INCLUDING IDENTITY)'
+        )
+        cursor.execute(f'ALTER TABLE {quote(TABLE)} ADD PRIMARY KEY ("id")')
+        cursor.execute(
+            f'ALTER TABLE {quote(TABLE)} ADD CONSTRAINT {quote(TABLE + "_task_id_fk")} '
+            f'FOREIGN KEY ("task_id") REFERENCES {quote(TASK_TABLE)} ("id") '
+            f'DEFERRABLE INITIALLY DEFERRED'
+        )
+        cursor.execute(f'CREATE INDEX ON {quote(TABLE)} ("task_id")')
+        cursor.execute(f'INSERT INTO {quote(TABLE)} SELECT * FROM {quote(partitioned_table)}')
+
+        cursor.execute('SELECT pg_get_serial_sequence(%s, %s)', [TABLE, 'id'])
+        new_sequence = cursor.fetchone()[0]
+        if new_sequence:
+            cursor.execute(
+                f'SELECT setval(%s, COALESCE((SELECT MAX("id") FROM {quote(TABLE)}), 0) + 1, false)',
+                [new_sequence],
+            )
+        else:
+            cursor.execute('SELECT pg_get_serial_sequence(%s, %s)', [partitioned_table, 'id'])
+            old_sequence = cursor.fetchone()[0]
+            if old_sequence:
+                cursor.execute(f'ALTER SEQUENCE {old_sequence} OWNED BY {quote(TABLE)}."id"')
+
+        cursor.execute(f'DROP TABLE {quote(partitioned_table)}')
@@ -0,0 +1,218 @@
+from bisect import bisect_left, insort
+from collections import namedtuple
+from datetime import date, timedelta
+import heapq
+
+from django.utils import timezone
+
+from task_time_tracker.utils.cache_helpers import (change_cached_state,
+                                                   get_cached_state,
+                                                   invalidate_cached_states)
+
+PlannedTask = namedtuple(
+    'PlannedTask',
+    ['task_id', 'task_name', 'remaining_mins', 'start_date', 'finish_date',
+     'deadline', 'late'],
+)
+
+PlanDay = namedtuple('PlanDay', ['date', 'tasks', 'planned_mins'])
+
+# Fields `DayPlanner` needs from each task
+PLAN_FIELDS = (
+    'id',
+    'task_name',
+    'expected_mins',
+    'actual_mins',
+    'priority',
+    'created_date',
+    'project__end_date',
+)
+
+def get_remaining_mins(expected_mins, actual_mins):
+    """Time left on a task, counted the same way as
+    `DashboardSummStats.unfinished_time`"""
+    return max(expected_mins - (actual_mins or 0), 0)
+
+def get_plan_key(task):
+    """
+    Order tasks are planned in: tasks whose project has an end date come
+    first, earliest deadline first, then higher priority, then older tasks.
+    `task` is a dict with the keys in `PLAN_FIELDS`.
+    """
+    return (
+        task['project__end_date'] or date.max,
+        -(task['priority'] or 0),
+        task['created_date'],
+        task['id'],
+    )
+
+class DayPlanner(object):
+    """
+    Packs tasks into consecutive days of `capacity_mins` each, starting on
+    `start_date`. A task that doesn't fit in what's left of a day carries
+    over into the next one.
+
+    The plan is built by popping tasks off a heap in `get_plan_key` order.
+    Afterwards `update` and `remove` re-plan incrementally: only the tasks
+    from the changed position onwards have their days recalculated.
+    """
+
+    def __init__(self, capacity_mins, start_date=None):
+        self.capacity_mins = max(capacity_mins, 1)
+        self.start_date = start_date or timezone.localdate()
+        self._keys = []
+        self._tasks = {}
+        # _offsets[i] is the number of minutes planned before _keys[i]
+        self._offsets = []
+
+    def plan(self, tasks):
+        """Replace the plan with one for `tasks` (dicts with `PLAN_FIELDS`)"""
+        self._tasks = {task['id']: task for task in tasks}
+        heap = [(get_plan_key(task), task['id']) for task in tasks]
+        heapq.heapify(heap)
+        self._keys = [heapq.heappop(heap)[0] for _ in range(len(heap))]
+        self._offsets = []
+        self._reflow(0)
+        return self
+
+    def update(self, task):
+        """Add a task to the plan, or re-plan it after it changed"""
+        start = len(self._keys)
+        if task['id'] in self._tasks:
+            start = self._discard(task['id'])
+
+        self._tasks[task['id']] = task
+        key = get_plan_key(task)
+        insort(self._keys, key)
+        self._reflow(min(start, bisect_left(self._keys, key)))
+
+    def remove(self, task_id):
+        """Drop a task (e.g. once it's completed) from the plan"""
+        if task_id in self._tasks:
+            start = self._discard(task_id)
+            del self._tasks[task_id]
+            self._reflow(start)
+
+    def _discard(self, task_id):
+        index = bisect_left(self._keys, get_plan_key(self._tasks[task_id]))
+        del self._keys[index]
+        return index
+
+    def _reflow(self, start):
+        """Recalculate `_offsets` from index `start` to the end"""
+        del self._offsets[start:]
+        offset = 0
+        if start:
+            previous = self._tasks[self._keys[start - 1][-1]]
+            offset = self._offsets[start - 1] + self._remaining(previous)
+        for key in self._keys[start:]:
+            self._offsets.append(offset)
+            offset += self._remaining(self._tasks[key[-1]])
+
+    def _remaining(self, task):
+        return get_remaining_mins(task['expected_mins'], task['actual_mins'])
+
+    def _day(self, minute):
+        return self.start_date + timedelta(days=minute // self.capacity_mins)
+
+    @property
+    def total_mins(self):
+        if not self._keys:
+            return 0
+        return self._offsets[-1] + self._remaining(self._tasks[self._keys[-1][-1]])
+
+    @property
+    def finish_date(self):
+        """Day the last planned task gets finished, or `None` if there is
+        nothing left to do"""
+        if not self.total_mins:
+            return None
+        return self._day(self.total_mins - 1)
+
+    def get_schedule(self):
+        """Return a `PlannedTask` for every task, in planned order"""
+        schedule = []
+        for key, offset in zip(self._keys, self._offsets):
+            task = self._tasks[key[-1]]
+            remaining_mins = self._remaining(task)
+            finish_date = self._day(offset + max(remaining_mins - 1, 0))
+            deadline = task['project__end_date']
+            schedule.append(PlannedTask(
+                task_id=task['id'],
+                task_name=task['task_name'],
+                remaining_mins=remaining_mins,
+                start_date=self._day(offset),
+                finish_date=finish_date,
+                deadline=deadline,
+                late=deadline is not None and finish_date > deadline,
+            ))
+        return schedule
+
+    def get_days(self):
+        """Group the schedule into a `PlanDay` per calendar day"""
+        tasks_by_day = {}
+        mins_by_day = {}
+        for planned_task, offset in zip(self.get_schedule(), self._offsets):
+            minute = offset
+            end = offset + planned_task.remaining_mins
+            while minute < end:
+                day = self._day(minute)
+                day_end = (minute // self.capacity_mins + 1) * self.capacity_mins
+                mins_today = min(end, day_end) - minute
+                tasks_by_day.setdefault(day, []).append(planned_task)
+                mins_by_day[day] = mins_by_day.get(day, 0) + mins_today
+                minute += mins_today
+        return [
+            PlanDay(day, day_tasks, mins_by_day[day])
+            for day, day_tasks in tasks_by_day.items()
+        ]
+
+
+# Per-user plans are cached so a change to one task only re-plans that
+# task (see `utils.cache_helpers`)
+
+def get_plannable_tasks(task_queryset):
+    return list(task_queryset.values(*PLAN_FIELDS))
+
+def get_user_plan(user, task_queryset):
+    """
+    Return the cached `DayPlanner` for `user`, building it from
+    `task_queryset` (the user's active tasks) if there is none or it's
+    out of date.
+    """
+    today = timezone.localdate()
+
+    def is_current(planner):
+        return (planner.start_date == today
+                and planner.capacity_mins == user.daily_capacity_mins)
+
+    def build():
+        planner = DayPlanner(user.daily_capacity_mins, start_date=today)
+        return planner.plan(get_plannable_tasks(task_queryset))
+
+    return get_cached_state('plan', user.pk, is_current, build)
+
+def update_user_plan(task):
+    """Re-plan `task` in its user's cached plan, if there is one, once the
+    change is committed"""
+    task_model, task_id = type(task), task.pk
+
+    def replan(planner):
+        plannable_tasks = get_plannable_tasks(
+            task_model.objects.filter(pk=task_id, active=True, completed=False))
+        if plannable_tasks:
+            planner.update(plannable_tasks[0])
+        else:
+            planner.remove(task_id)
+
+    change_cached_state('plan', task.user_id, replan)
+
+def invalidate_user_plans(user_ids):
+    """Drop cached plans, e.g. after tasks were created with `bulk_create`
+    (which doesn't send the signals that keep plans current)"""
+    invalidate_cached_states('plan', user_ids)
+
+def remove_from_user_plan(task):
+    # The task's pk is cleared by the time a delete commits
+    task_id = task.pk
+    change_cached_state('plan', task.user_id, lambda planner: planner.remove(task_id))
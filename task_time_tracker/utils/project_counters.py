@@ -0,0 +1,150 @@
+"""
+The denormalized totals on `Project` (`task_count`, `open_task_count`,
+`expected_mins` and `actual_mins`), over live and archived tasks.
+
+Saving or deleting a task applies the difference it makes to its
+project's totals (and, when it moves, to its old project's) as one
+`UPDATE ... SET x = x + delta`, so concurrent saves never overwrite each
+other. Writes that bypass `Task.save` (like `bulk_create`) recount the
+affected projects with `recount_projects` instead.
+"""
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from django.db import transaction
+from django.db.models import Count, F, Q, Sum
+
+from task_time_tracker.models import ArchivedTask, Project, Task
+
+COUNTERS = ('task_count', 'open_task_count', 'expected_mins', 'actual_mins')
+
+_suspended = ContextVar('project_counters_suspended', default=False)
+
+@contextmanager
+def counters_suspended():
+    """Don't count task saves and deletes made inside the block, e.g. when
+    moving tasks to the archive, which leaves the totals unchanged"""
+    token = _suspended.set(True)
+    try:
+        yield
+    finally:
+        _suspended.reset(token)
+
+def get_counts(counted_values):
+    """What one task with `Task.COUNTED_FIELDS` values `counted_values`
+    adds to its project's counters"""
+    project_id, completed, expected_mins, actual_mins = counted_values
+    return (1, 0 if completed else 1, expected_mins or 0, actual_mins or 0)
+
+def add_to_project(project_id, counts, sign=1):
+    deltas = {
+        name: F(name) + sign * count
+        for name, count in zip(COUNTERS, counts) if count
+    }
+    if project_id is not None and deltas:
+        Project.objects.filter(pk=project_id).update(**deltas)
+
+def count_saved_task(task, created, update_fields=None):
+    if _suspended.get():
+        return
+    new_values = task.get_counted_values()
+    old_values = None if created else task.counted_values
+    if new_values is None or (old_values is None and not created):
+        # Deferred fields weren't saved, so the project can't have changed
+        recount_projects([task.project_id])
+        task.counted_values = task.get_counted_values()
+        return
+
+    if update_fields is not None:
+        # Fields left out of `update_fields` weren't written
+        new_values = tuple(
+            new if name in update_fields or name.removesuffix('_id') in update_fields else old
+            for name, new, old in zip(task.COUNTED_FIELDS, new_values, old_values)
+        )
+    task.counted_values = new_values
+
+    new_counts = get_counts(new_values)
+    if created:
+        add_to_project(new_values[0], new_counts)
+        return
+
+    old_counts = get_counts(old_values)
+    if old_values[0] == new_values[0]:
+        add_to_project(new_values[0], [new - old for new, old in zip(new_counts, old_counts)])
+    else:
+        add_to_project(old_values[0], old_counts, sign=-1)
+        add_to_project(new_values[0], new_counts)
+
+def count_deleted_task(task):
+    if _suspended.get() or task.counted_values is None:
+        return
+    add_to_project(task.counted_values[0], get_counts(task.counted_values), sign=-1)
+
+def get_project_totals(project_ids):
+    """Count the totals of `project_ids` from the task tables"""
+    totals = {project_id: [0, 0, 0, 0] for project_id in project_ids}
+    for model in (Task, ArchivedTask):
+        rows = (model.objects
+                    .filter(project_id__in=project_ids)
+                    .values('project_id')
+                    .annotate(
+                        task_count=Count('id'),
+                        open_task_count=Count('id', filter=Q(completed=False)),
+                        expected_mins=Sum('expected_mins'),
+                        actual_mins=Sum('actual_mins'),
+                    )
+                    .order_by()
+        )
+        for row in rows:
+            project_totals = totals[row['project_id']]
+            for index, name in enumerate(COUNTERS):
+                project_totals[index] += row[name] or 0
+    return totals
+
+def recount_projects(project_ids):
+    """
+    Set the counters of `project_ids` from the task tables. The projects
+    are locked while they're counted, so deltas from concurrent task saves
+    are applied after the recount, not lost to it. Returns the number of
+    projects whose counters were wrong.
+    """
+    project_ids = [project_id for project_id in project_ids if project_id is not None]
+    if not project_ids:
+        return 0
+
+    with transaction.atomic():
+        projects = list(
+            Project.objects
+                .select_for_update()
+                .filter(pk__in=project_ids)
+                .order_by('pk')
+                .only('pk', *COUNTERS)
+        )
+        totals = get_project_totals([project.pk for project in projects])
+
+        drifted = []
+        for project in projects:
+            project_totals = totals[project.pk]
+            if [getattr(project, name) for name in COUNTERS] != project_totals:
+                for name, total in zip(COUNTERS, project_totals):
+                    setattr(project, name, total)
+                drifted.append(project)
+        Project.objects.bulk_update(drifted, COUNTERS)
+    return len(drifted)
+
+def reconcile_project_counters(batch_size=500):
+    """Recount every project, `batch_size` projects per transaction.
+    Returns the number of projects whose counters were wrong."""
+    drifted_count = 0
+    last_pk = 0
+    while True:
+        project_ids = list(
+            Project.objects
+                .filter(pk__gt=last_pk)
+                .order_by('pk')
+                .values_list('pk', flat=True)[:batch_size]
+        )
+        if not project_ids:
+            return drifted_count
+        last_pk = project_ids[-1]
+        drifted_count += recount_projects(project_ids)
@@ -0,0 +1,65 @@
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+
+from task_time_tracker.models import RecurringTask, Task
+from task_time_tracker.utils.cache_helpers import bump_user_generations
+from task_time_tracker.utils.critical_path import invalidate_user_critical_paths
+from task_time_tracker.utils.planner import invalidate_user_plans
+from task_time_tracker.utils.project_counters import recount_projects
+from task_time_tracker.utils.sync import stamp_new_rows
+
+def generate_recurring_tasks(now=None, batch_size=None, max_catch_up=None):
+    """
+    Create a task for every due occurrence of every active `RecurringTask`.
+
+    Due templates are read through the (active, next_run_date) index in
+    primary key order, `batch_size` at a time, and each batch is written
+    with one `bulk_create` and one `bulk_update`. At most `max_catch_up`
+    occurrences per template are created, so a template that was missed
+    for a while doesn't flood the user with copies. Returns the number of
+    occurrences generated.
+    """
+    now = now or timezone.now()
+    if batch_size is None:
+        batch_size = settings.RECURRING_TASK_BATCH_SIZE
+    if max_catch_up is None:
+        max_catch_up = settings.RECURRING_TASK_MAX_CATCH_UP
+
+    due_templates = (RecurringTask.objects
+                         # Accounts being deleted are inactive
+                         .filter(active=True, next_run_date__lte=now, user__is_active=True)
+                         .order_by('pk')
+    )
+
+    generated_count = 0
+    last_pk = 0
+    while True:
+        templates = list(due_templates.filter(pk__gt=last_pk)[:batch_size])
+        if not templates:
+            break
+        last_pk = templates[-1].pk
+
+        tasks = []
+        for template in templates:
+            occurrences = template.get_due_occurrences(now, limit=max_catch_up)
+            tasks.extend(template.build_task(occurrence) for occurrence in occurrences)
+            template.next_run_date = template.get_next_occurrence(occurrences[-1])
+
+        with transaction.atomic():
+            # Occurrences that already exist (e.g. from an overlapping run)
+            # are skipped by the unique (recurring_task, occurrence) constraint
+            stamp_new_rows(tasks)
+            Task.objects.bulk_create(tasks, ignore_conflicts=True)
+            RecurringTask.objects.bulk_update(templates, ['next_run_date'])
+            # `bulk_create` skips `Task.save`, and with `ignore_conflicts`
+            # doesn't say which tasks were created
+            recount_projects({task.project_id for task in tasks})
+
+        user_ids = {template.user_id for template in templates}
+        invalidate_user_plans(user_ids)
+        invalidate_user_critical_paths(user_ids)
+        bump_user_generations(user_ids)
+        generated_count += len(tasks)
+
+    return generated_count
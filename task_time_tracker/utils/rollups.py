@@ -0,0 +1,168 @@
+"""
+Expected, actual and remaining time rolled up trees of subtasks and
+sub-projects. Tasks in the trash are left out.
+
+Each tree is read with one recursive CTE, so summarizing it is one round
+trip however deep or wide it is. A node's rollup covers the node itself
+and everything below it. A task's remaining time is what's left of its
+estimate (`expected_mins - actual_mins`, at least 0) until it's completed.
+
+`get_task_rollup` sums a single subtree in the database. `get_task_rollups`
+and `get_project_rollups` return a rollup for every node of the trees under
+`root_ids`: the CTE returns each node's own totals and parent, which are
+added up the tree in one pass.
+"""
+from dataclasses import dataclass
+
+from django.db import connections, router
+
+from task_time_tracker.models import Project, Task
+
+@dataclass
+class Rollup:
+    task_count: int = 0
+    expected_mins: int = 0
+    actual_mins: int = 0
+    remaining_mins: int = 0
+
+    def add(self, other):
+        self.task_count += other.task_count
+        self.expected_mins += other.expected_mins
+        self.actual_mins += other.actual_mins
+        self.remaining_mins += other.remaining_mins
+
+REMAINING_MINS = """
+    CASE WHEN t.completed OR COALESCE(t.actual_mins, 0) >= t.expected_mins THEN 0
+         ELSE t.expected_mins - COALESCE(t.actual_mins, 0) END
+"""
+
+def subtree_cte(table, root_ids):
+    """
+    `WITH RECURSIVE subtree(id, parent_id)` over the rows of `table` under
+    (and including) `root_ids`. `UNION` rather than `UNION ALL`, so a cycle
+    in the data ends the recursion instead of looping forever.
+    """
+    placeholders = ', '.join(['%s'] * len(root_ids))
+    sql = f'''
+        WITH RECURSIVE subtree(id, parent_id) AS (
+            SELECT id, parent_id FROM {table} WHERE id IN ({placeholders})
+            UNION
+            SELECT child.id, child.parent_id
+            FROM {table} child JOIN subtree ON child.parent_id = subtree.id
+        )
+    '''
+    return sql, list(root_ids)
+
+def fetch(model, sql, params):
+    with connections[router.db_for_read(model)].cursor() as cursor:
+        cursor.execute(sql, params)
+        return cursor.fetchall()
+
+def quoted_table(model):
+    return connections[router.db_for_read(model)].ops.quote_name(model._meta.db_table)
+
+def get_task_rollup(task):
+    """Return the `Rollup` of `task` and all its subtasks"""
+    table = quoted_table(Task)
+    cte, params = subtree_cte(table, [task.pk])
+    (task_count, expected_mins, actual_mins, remaining_mins), = fetch(Task, f'''
+        {cte}
+        SELECT COUNT(*), SUM(t.expected_mins), SUM(COALESCE(t.actual_mins, 0)),
+               SUM({REMAINING_MINS})
+        FROM subtree JOIN {table} t ON t.id = subtree.id
+        WHERE t.deleted_date IS NULL
+    ''', params)
+    return Rollup(task_count, expected_mins or 0, actual_mins or 0, remaining_mins or 0)
+
+def roll_up(rows, root_ids):
+    """
+    Add the `(id, parent_id, Rollup)` of `rows` up their tree. Returns a
+    rollup for every row. Nodes are visited children first with an
+    explicit stack, since trees can be deeper than Python's recursion limit.
+    """
+    rollups = {}
+    parents = {}
+    children = {}
+    for node_id, parent_id, rollup in rows:
+        rollups[node_id] = rollup
+        parents[node_id] = parent_id
+        children.setdefault(parent_id, []).append(node_id)
+
+    # Start from the roots that aren't inside another root's tree, and
+    # remember which node each one was reached from
+    roots = [node_id for node_id in root_ids if node_id in rollups]
+    stack = [node_id for node_id in roots if parents[node_id] not in rollups] or roots
+    seen = set(stack)
+    reached_from = {}
+    order = []
+    while stack:
+        node_id = stack.pop()
+        order.append(node_id)
+        for child_id in children.get(node_id, ()):
+            if child_id not in seen:
+                seen.add(child_id)
+                reached_from[child_id] = node_id
+                stack.append(child_id)
+
+    for node_id in reversed(order):
+        if node_id in reached_from:
+            rollups[reached_from[node_id]].add(rollups[node_id])
+    return rollups
+
+def get_task_rollups(root_ids):
+    """Return `{task id: Rollup}` for every task in the trees of `root_ids`"""
+    root_ids = set(root_ids)
+    if not root_ids:
+        return {}
+    table = quoted_table(Task)
+    cte, params = subtree_cte(table, root_ids)
+    rows = fetch(Task, f'''
+        {cte}
+        SELECT t.id, t.parent_id, t.expected_mins, COALESCE(t.actual_mins, 0),
+               {REMAINING_MINS}
+        FROM subtree JOIN {table} t ON t.id = subtree.id
+        WHERE t.deleted_date IS NULL
+    ''', params)
+    return roll_up([
+        (task_id, parent_id, Rollup(1, expected_mins, actual_mins, remaining_mins))
+        for task_id, parent_id, expected_mins, actual_mins, remaining_mins in rows
+    ], root_ids)
+
+def get_project_rollups(root_ids):
+    """
+    Return `{project id: Rollup}` for every project in the trees of
+    `root_ids`, over the tasks in each project and its sub-projects.
+    Task counts and times come from the project counters (so archived tasks
+    are included); remaining time from the project's open tasks.
+    """
+    root_ids = set(root_ids)
+    if not root_ids:
+        return {}
+    table = quoted_table(Project)
+    task_table = quoted_table(Task)
+    cte, params = subtree_cte(table, root_ids)
+    rows = fetch(Project, f'''
+        {cte}
+        SELECT p.id, p.parent_id, p.task_count, p.expected_mins, p.actual_mins,
+               COALESCE(remaining.mins, 0)
+        FROM subtree
+        JOIN {table} p ON p.id = subtree.id
+        LEFT JOIN (
+            SELECT t.project_id, SUM({REMAINING_MINS}) AS mins
+            FROM {task_table} t
+            WHERE t.project_id IN (SELECT id FROM subtree) AND NOT t.completed
+                AND t.deleted_date IS NULL
+            GROUP BY t.project_id
+        ) remaining ON remaining.project_id = subtree.id
+    ''', params)
+    return roll_up([
+        (project_id, parent_id, Rollup(task_count, expected_mins, actual_mins, remaining_mins))
+        for project_id, parent_id, task_count, expected_mins, actual_mins, remaining_mins in rows
+    ], root_ids)
+
+def get_descendant_ids(model, pk):
+    """Return the ids of every row below `pk` in its tree, e.g. to stop a
+    task being moved under one of its own subtasks"""
+    cte, params = subtree_cte(quoted_table(model), [pk])
+    rows = fetch(model, f'{cte} SELECT id FROM subtree WHERE id <> %s', params + [pk])
+    return {row[0] for row in rows}
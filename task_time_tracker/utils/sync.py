@@ -0,0 +1,208 @@
+"""
+Changes to a user's tasks and projects since a client last synced.
+
+Every save stamps the row with the next value of the user's
+`User.change_seq`, and every delete leaves a `Tombstone` stamped the same
+way. Taking the next value locks the user's row, so a user's changes
+commit in sequence order: once a client has seen a change, it has seen
+everything with a lower sequence number.
+
+Writes that touch many rows at once (archiving, or the `SET NULL` when a
+project is deleted) stamp all of them with a single sequence number. Pages
+are therefore cut by `(change_seq, kind, id)` rather than by sequence
+number alone, and the token a client sends back is the last position it
+received, so no page boundary can split or skip a group.
+"""
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from django.db.models import Q
+
+from task_time_tracker.models import Project, Task, TaskDependency, Tombstone, User
+
+TASK_FIELDS = (
+    'id',
+    'task_name',
+    'task_category',
+    'task_notes',
+    'project_id',
+    'parent_id',
+    'expected_mins',
+    'actual_mins',
+    'completed',
+    'completed_date',
+    'active',
+    'priority',
+    'created_date',
+    'recurring_task_id',
+    'occurrence',
+    'change_seq',
+)
+
+PROJECT_FIELDS = (
+    'id',
+    'name',
+    'description',
+    'parent_id',
+    'created_date',
+    'start_date',
+    'end_date',
+    'completed_date',
+    'change_seq',
+)
+
+TOMBSTONE_FIELDS = (
+    'id',
+    'kind',
+    'object_id',
+    'archived',
+    'change_seq',
+)
+
+# Sources of changes, in the order they're paged within a sequence number.
+# The position in this tuple is the "kind" part of a token.
+SOURCES = (
+    ('projects', Project, PROJECT_FIELDS),
+    ('tasks', Task, TASK_FIELDS),
+    ('deleted', Tombstone, TOMBSTONE_FIELDS),
+)
+
+_suspended_users = ContextVar('sync_suspended_users', default=frozenset())
+
+def suspend_users(user_ids):
+    """Stop recording changes to the users' rows, e.g. while the users
+    themselves are being deleted"""
+    _suspended_users.set(_suspended_users.get() | set(user_ids))
+
+def resume_users(user_ids):
+    _suspended_users.set(_suspended_users.get() - set(user_ids))
+
+@contextmanager
+def sync_suspended(user_ids):
+    """Don't record changes to the users' rows made inside the block, e.g.
+    when archiving records its own tombstones"""
+    token = _suspended_users.set(_suspended_users.get() | set(user_ids))
+    try:
+        yield
+    finally:
+        _suspended_users.reset(token)
+
+def is_suspended(user_id):
+    return user_id in _suspended_users.get()
+
+def touch(queryset, user_id):
+    """Stamp the rows of `queryset` with one new change sequence number,
+    for writes that bypass `save`"""
+    if not is_suspended(user_id):
+        queryset.update(change_seq=User.next_change_seq(user_id))
+
+def record_deletion(instance, kind):
+    if not is_suspended(instance.user_id):
+        Tombstone.objects.create(
+            user_id=instance.user_id,
+            kind=kind,
+            object_id=instance.pk,
+            change_seq=User.next_change_seq(instance.user_id),
+        )
+
+def stamp_new_rows(instances):
+    """Set `change_seq` on unsaved `instances` that will be written with
+    `bulk_create`, one sequence number per user. Users are locked in id
+    order, so concurrent batches can't deadlock."""
+    change_seqs = {
+        user_id: User.next_change_seq(user_id)
+        for user_id in sorted({instance.user_id for instance in instances})
+    }
+    for instance in instances:
+        instance.change_seq = change_seqs[instance.user_id]
+
+def record_archived_tasks(tasks):
+    """Leave a tombstone for each of `tasks`, which are being moved to the
+    archive"""
+    tombstones = [
+        Tombstone(user_id=task.user_id, kind=Tombstone.Kind.TASK,
+                  object_id=task.pk, archived=True)
+        for task in tasks
+    ]
+    stamp_new_rows(tombstones)
+    Tombstone.objects.bulk_create(tombstones)
+
+class InvalidToken(ValueError):
+    pass
+
+def format_token(position):
+    return '.'.join(str(value) for value in position)
+
+def parse_token(token):
+    """The `(change_seq, kind, id)` position in a token, or one before
+    everything for no token"""
+    if not token:
+        return (-1, 0, 0)
+    try:
+        change_seq, kind, row_id = (int(value) for value in token.split('.'))
+    except ValueError:
+        raise InvalidToken(f'Invalid sync token: {token!r}')
+    if not 0 <= kind < len(SOURCES):
+        raise InvalidToken(f'Invalid sync token: {token!r}')
+    return (change_seq, kind, row_id)
+
+def get_after_filter(kind, position):
+    """Rows of source `kind` after `position` in `(change_seq, kind, id)`
+    order"""
+    change_seq, after_kind, row_id = position
+    if kind < after_kind:
+        return Q(change_seq__gt=change_seq)
+    if kind == after_kind:
+        return Q(change_seq__gt=change_seq) | Q(change_seq=change_seq, id__gt=row_id)
+    return Q(change_seq__gte=change_seq)
+
+def get_changes(user, token=None, limit=500):
+    """
+    Return the next `limit` changes after `token` (from the beginning for
+    no token):
+
+        {'projects': [...], 'tasks': [...], 'deleted': [...],
+         'token': ..., 'has_more': ...}
+
+    Each source is read through its `(user, change_seq, id)` index, so a
+    page costs a few small index range scans however much has changed
+    since. Tasks include the ids of the tasks they depend on.
+    """
+    position = parse_token(token)
+    candidates = []
+    has_more = False
+    for kind, (name, model, fields) in enumerate(SOURCES):
+        rows = list(
+            model.objects
+                .filter(get_after_filter(kind, position), user=user)
+                .order_by('change_seq', 'id')
+                .values(*fields)[:limit + 1]
+        )
+        has_more = has_more or len(rows) > limit
+        candidates.extend(((row['change_seq'], kind, row['id']), name, row)
+                          for row in rows[:limit])
+
+    candidates.sort(key=lambda candidate: candidate[0])
+    has_more = has_more or len(candidates) > limit
+    page = candidates[:limit]
+
+    changes = {name: [] for name, _, _ in SOURCES}
+    for _, name, row in page:
+        changes[name].append(row)
+
+    task_ids = [row['id'] for row in changes['tasks']]
+    # Dependencies are sent with the task that waits, leaving out tasks in
+    # the trash
+    depends_on = {task_id: [] for task_id in task_ids}
+    for task_id, depends_on_id in (TaskDependency.objects
+                                       .filter(task_id__in=task_ids,
+                                               depends_on__deleted_date=None)
+                                       .values_list('task_id', 'depends_on_id')
+                                       .order_by('pk')):
+        depends_on[task_id].append(depends_on_id)
+    for row in changes['tasks']:
+        row['depends_on'] = depends_on[row['id']]
+
+    changes['token'] = format_token(page[-1][0] if page else position)
+    changes['has_more'] = has_more
+    return changes
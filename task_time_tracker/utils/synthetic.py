@@ -0,0 +1,355 @@
+"""
+Synthetic users, projects, tasks and task status histories for scale
+testing (`manage.py seed_synthetic`).
+
+Rows are generated with numpy, a fixed-size chunk of users at a time, from a
+random generator seeded with `(seed, chunk index)`. The same seed and date
+range therefore always produce the same rows, however they are batched.
+They are written with `COPY` on Postgres and `executemany` elsewhere,
+bypassing `Task.save` and signals, with primary keys assigned here so that
+status changes can point at their tasks.
+
+Distributions, roughly:
+- tasks per user are skewed (a gamma-Poisson mix around the mean);
+- expected minutes are log-normal around 30, in steps of 5;
+- actual minutes run over the estimate more often than under it (the
+  ratio is log-normal around 1.2);
+- completion lag is log-normal around 20 hours, and most older tasks are
+  completed.
+"""
+from datetime import datetime, time, timezone as dt_timezone
+import csv
+import io
+
+import numpy as np
+from django.core.management.color import no_style
+from django.db import DatabaseError, connection, transaction
+
+from task_time_tracker.models import Project, Task, TaskStatusChange, User
+from task_time_tracker.utils import partitions
+
+# Users per random generator; changing it changes the generated data
+CHUNK_USERS = 50
+
+VERBS = np.array([
+    'Write', 'Review', 'Plan', 'Fix', 'Call', 'Email', 'Draft', 'Update',
+    'Clean', 'Read', 'Book', 'Prepare', 'Research', 'Organize', 'Test',
+    'Pay', 'Schedule', 'Refactor', 'Outline', 'Finish',
+])
+NOUNS = np.array([
+    'report', 'budget', 'slides', 'proposal', 'garden', 'kitchen', 'taxes',
+    'invoice', 'newsletter', 'dentist', 'notes', 'meeting', 'roadmap',
+    'blog post', 'spreadsheet', 'flights', 'backlog', 'inbox', 'chapter',
+    'release',
+])
+CATEGORIES = np.array(['', 'Work', 'Home', 'Errands', 'Health', 'Learning', 'Admin'])
+TIME_ZONES = np.array([
+    'America/New_York', 'America/Chicago', 'America/Los_Angeles',
+    'Europe/London', 'Europe/Berlin', 'Asia/Tokyo',
+])
+
+def get_username(seed, user_index):
+    return f'synthetic-{seed}-{user_index}'
+
+def format_datetimes(seconds, mask=None, vendor='postgresql'):
+    """Format epoch seconds as datetimes the database accepts, with `None`
+    where `mask` is `False`"""
+    seconds = seconds.astype('datetime64[s]')
+    if vendor == 'postgresql':
+        strings = np.datetime_as_string(seconds, timezone='UTC')
+    else:
+        # How Django stores them on SQLite, so they compare as text
+        strings = np.char.replace(np.datetime_as_string(seconds), 'T', ' ')
+    values = strings.tolist()
+    if mask is not None:
+        values = [value if keep else None for value, keep in zip(values, mask.tolist())]
+    return values
+
+def nullable(values, mask):
+    """`values` as a list, with `None` where `mask` is `False`"""
+    return [value if keep else None for value, keep in zip(values.tolist(), mask.tolist())]
+
+def generate_chunk(seed, chunk_index, user_count, tasks_per_user, projects_per_user,
+                   start, end, first_ids, vendor='postgresql'):
+    """
+    Generate the rows for users `chunk_index * CHUNK_USERS` onwards. Returns
+    `(rows, next_ids)`: `rows` maps each model to a dict of column lists, and
+    `next_ids` are the first free ids after this chunk.
+    """
+    rng = np.random.default_rng([seed, chunk_index])
+    first_user = chunk_index * CHUNK_USERS
+    user_indexes = np.arange(first_user, first_user + user_count)
+    start_seconds = int(start.timestamp())
+    end_seconds = int(end.timestamp())
+
+    # Users
+    user_ids = first_ids[User] + np.arange(user_count)
+    usernames = [get_username(seed, index) for index in user_indexes.tolist()]
+    users = {
+        'id': user_ids.tolist(),
+        'username': usernames,
+        # Can't be logged into
+        'password': ['!'] * user_count,
+        'email': [f'{username}@example.com' for username in usernames],
+        'date_joined': format_datetimes(
+            np.full(user_count, start_seconds), vendor=vendor),
+        'daily_capacity_mins': rng.choice([240, 360, 480], size=user_count).tolist(),
+        'time_zone': rng.choice(TIME_ZONES, size=user_count).tolist(),
+    }
+
+    # Projects
+    project_counts = rng.poisson(projects_per_user, size=user_count)
+    project_count = int(project_counts.sum())
+    project_ids = first_ids[Project] + np.arange(project_count)
+    project_users = np.repeat(user_ids, project_counts)
+    project_user_indexes = np.repeat(user_indexes, project_counts)
+    project_numbers = np.arange(project_count) - np.repeat(
+        np.cumsum(project_counts) - project_counts, project_counts)
+    project_created = rng.integers(start_seconds, end_seconds, size=project_count)
+    projects = {
+        'id': project_ids.tolist(),
+        'user_id': project_users.tolist(),
+        'name': [
+            f'{noun.capitalize()} {seed}-{user_index}-{number}'
+            for noun, user_index, number in zip(
+                rng.choice(NOUNS, size=project_count).tolist(),
+                project_user_indexes.tolist(),
+                project_numbers.tolist())
+        ],
+        'created_date': format_datetimes(project_created, vendor=vendor),
+    }
+
+    # Tasks
+    task_counts = rng.poisson(
+        rng.gamma(2, tasks_per_user / 2, size=user_count)).astype(np.int64)
+    task_count = int(task_counts.sum())
+    task_ids = first_ids[Task] + np.arange(task_count)
+    task_users = np.repeat(user_ids, task_counts)
+
+    # About 60% of the tasks of users with projects are in one of them
+    user_project_counts = np.repeat(project_counts, task_counts)
+    user_first_projects = np.repeat(
+        first_ids[Project] + np.cumsum(project_counts) - project_counts, task_counts)
+    in_project = (rng.random(task_count) < 0.6) & (user_project_counts > 0)
+    task_projects = user_first_projects + np.floor(
+        rng.random(task_count) * np.maximum(user_project_counts, 1)).astype(np.int64)
+
+    created = rng.integers(start_seconds, end_seconds, size=task_count)
+    expected_mins = np.clip(
+        np.round(rng.lognormal(np.log(30), 0.8, size=task_count) / 5) * 5, 5, 480
+    ).astype(np.int64)
+    priority = rng.choice([0, 1, 2, 3], size=task_count, p=[0.35, 0.3, 0.22, 0.13])
+
+    completion_lag = rng.lognormal(np.log(20 * 60 * 60), 1.2, size=task_count)
+    completed_at = created + completion_lag.astype(np.int64)
+    completed = (rng.random(task_count) < 0.8) & (completed_at <= end_seconds)
+
+    overrun = rng.lognormal(np.log(1.2), 0.45, size=task_count)
+    partial = rng.uniform(0.1, 0.9, size=task_count)
+    has_partial = rng.random(task_count) < 0.3
+    actual_mins = np.where(
+        completed,
+        np.maximum(1, np.round(expected_mins * overrun)),
+        np.maximum(1, np.round(expected_mins * partial)),
+    ).astype(np.int64)
+
+    # Open tasks that were set aside
+    deactivated = ~completed & (rng.random(task_count) < 0.25)
+    deactivated_at = created + (
+        rng.random(task_count) * (end_seconds - created)).astype(np.int64)
+    active = ~completed & ~deactivated
+
+    tasks = {
+        'id': task_ids.tolist(),
+        'user_id': task_users.tolist(),
+        'task_name': np.char.add(
+            np.char.add(rng.choice(VERBS, size=task_count), ' '),
+            rng.choice(NOUNS, size=task_count),
+        ).tolist(),
+        'task_category': rng.choice(
+            CATEGORIES, size=task_count,
+            p=[0.4, 0.2, 0.15, 0.1, 0.05, 0.05, 0.05]).tolist(),
+        'project_id': nullable(task_projects, in_project),
+        'expected_mins': expected_mins.tolist(),
+        'actual_mins': nullable(actual_mins, completed | has_partial),
+        'completed': completed.tolist(),
+        'created_date': format_datetimes(created, vendor=vendor),
+        'completed_date': format_datetimes(completed_at, completed, vendor=vendor),
+        'active': active.tolist(),
+        'priority': nullable(priority, priority > 0),
+    }
+
+    # Project counters, which `Task.save` would otherwise keep
+    project_indexes = task_projects[in_project] - first_ids[Project]
+    def total_by_project(weights=None):
+        return np.bincount(
+            project_indexes, weights, minlength=project_count).astype(np.int64).tolist()
+    counted_actual_mins = np.where(completed | has_partial, actual_mins, 0)
+    projects.update({
+        'task_count': total_by_project(),
+        'open_task_count': total_by_project((~completed[in_project]).astype(np.int64)),
+        'expected_mins': total_by_project(expected_mins[in_project]),
+        'actual_mins': total_by_project(counted_actual_mins[in_project]),
+    })
+
+    # Status changes, as `Task.save` records them: one when a task is
+    # completed and one when an open task is deactivated
+    changed = completed | deactivated
+    change_count = int(changed.sum())
+    changed_at = np.where(completed, completed_at, deactivated_at)[changed]
+    status_changes = {
+        'id': (first_ids[TaskStatusChange] + np.arange(change_count)).tolist(),
+        'task_id': task_ids[changed].tolist(),
+        'completed_datetime': format_datetimes(
+            changed_at, completed[changed], vendor=vendor),
+        'inactive_datetime': format_datetimes(
+            changed_at, deactivated[changed], vendor=vendor),
+        'created_datetime': format_datetimes(changed_at, vendor=vendor),
+    }
+
+    rows = {
+        User: users,
+        Project: projects,
+        Task: tasks,
+        TaskStatusChange: status_changes,
+    }
+    next_ids = {
+        User: first_ids[User] + user_count,
+        Project: first_ids[Project] + project_count,
+        Task: first_ids[Task] + task_count,
+        TaskStatusChange: first_ids[TaskStatusChange] + change_count,
+    }
+    return rows, next_ids
+
+def fill_defaults(model, columns, row_count, conn):
+    """Add every other concrete column of `model`, set to its default (or
+    NULL), so rows stay valid as fields are added to the models"""
+    for field in model._meta.concrete_fields:
+        if field.attname in columns:
+            continue
+        if field.has_default() or not field.null:
+            value = field.get_db_prep_save(field.get_default(), conn)
+        else:
+            value = None
+        columns[field.attname] = [value] * row_count
+    return columns
+
+def write_rows(model, columns, conn=None):
+    """Insert the rows in `columns` (a dict of equal-length column lists)"""
+    conn = conn or connection
+    row_count = len(columns['id'])
+    if not row_count:
+        return 0
+    columns = fill_defaults(model, dict(columns), row_count, conn)
+
+    quote = conn.ops.quote_name
+    table = quote(model._meta.db_table)
+    names = list(columns)
+    column_list = ', '.join(quote(name) for name in names)
+    rows = zip(*columns.values())
+
+    with conn.cursor() as cursor:
+        if conn.vendor == 'postgresql':
+            # An unquoted empty field is NULL in CSV, so keep empty strings
+            # in NOT NULL text columns
+            not_null = [
+                quote(field.column) for field in model._meta.concrete_fields
+                if not field.null and field.get_internal_type() in ('CharField', 'TextField')
+            ]
+            options = 'FORMAT csv'
+            if not_null:
+                options += f", FORCE_NOT_NULL ({', '.join(not_null)})"
+
+            buffer = io.StringIO()
+            csv.writer(buffer).writerows(rows)
+            buffer.seek(0)
+            cursor.copy_expert(f'COPY {table} ({column_list}) FROM STDIN WITH ({options})', buffer)
+        else:
+            placeholders = ', '.join(['%s'] * len(names))
+            cursor.executemany(
+                f'INSERT INTO {table} ({column_list}) VALUES ({placeholders})',
+                list(rows),
+            )
+    return row_count
+
+def get_first_ids(conn=None):
+    conn = conn or connection
+    quote = conn.ops.quote_name
+    first_ids = {}
+    with conn.cursor() as cursor:
+        for model in (User, Project, Task, TaskStatusChange):
+            cursor.execute(f'SELECT MAX(id) FROM {quote(model._meta.db_table)}')
+            first_ids[model] = (cursor.fetchone()[0] or 0) + 1
+    return first_ids
+
+def create_history_partitions(start, end, conn=None):
+    """Create `TaskStatusChange` partitions for the months being seeded,
+    where possible. Rows for months that can't get one (because the
+    default partition already has rows for them) go to the default
+    partition."""
+    conn = conn or connection
+    if not partitions.is_partitioned(conn):
+        return
+    existing = set(partitions.list_partitions(conn))
+    for month in partitions.month_range(start, partitions.month_start(end)):
+        if partitions.partition_name(month) in existing:
+            continue
+        try:
+            with transaction.atomic(using=conn.alias):
+                partitions.create_partition(month, conn)
+        except DatabaseError:
+            pass
+
+def seed_synthetic(users, tasks_per_user, projects_per_user, seed, start, end,
+                   batch_size=100_000, conn=None, progress=None):
+    """
+    Generate and insert `users` users with their projects, tasks and status
+    changes, dated between dates `start` and `end`. Everything is inserted
+    in one transaction. Returns the number of rows inserted per model.
+    `progress`, if given, is called with the running counts after each
+    batch.
+    """
+    conn = conn or connection
+    start = datetime.combine(start, time.min, tzinfo=dt_timezone.utc)
+    end = datetime.combine(end, time.max, tzinfo=dt_timezone.utc)
+    models = [User, Project, Task, TaskStatusChange]
+    counts = {model: 0 for model in models}
+
+    with transaction.atomic(using=conn.alias):
+        if conn.vendor == 'postgresql':
+            tables = ', '.join(conn.ops.quote_name(model._meta.db_table) for model in models)
+            with conn.cursor() as cursor:
+                # Nothing else may take ids while they are being assigned here
+                cursor.execute(f'LOCK TABLE {tables} IN SHARE ROW EXCLUSIVE MODE')
+        create_history_partitions(start, end, conn)
+
+        next_ids = get_first_ids(conn)
+        pending = {model: {} for model in models}
+
+        def flush():
+            for model in models:
+                if pending[model]:
+                    counts[model] += write_rows(model, pending[model], conn)
+                    pending[model] = {}
+            if progress:
+                progress(counts)
+
+        chunk_count = (users + CHUNK_USERS - 1) // CHUNK_USERS
+        for chunk_index in range(chunk_count):
+            user_count = min(CHUNK_USERS, users - chunk_index * CHUNK_USERS)
+            rows, next_ids = generate_chunk(
+                seed, chunk_index, user_count, tasks_per_user, projects_per_user,
+                start, end, next_ids, vendor=conn.vendor,
+            )
+            for model, columns in rows.items():
+                for name, values in columns.items():
+                    pending[model].setdefault(name, []).extend(values)
+            if len(pending[Task].get('id', [])) >= batch_size:
+                flush()
+        flush()
+
+        with conn.cursor() as cursor:
+            for sql in conn.ops.sequence_reset_sql(no_style(), models):
+                cursor.execute(sql)
+
+    return counts
@@ -0,0 +1,36 @@
+import logging
+import os
+
+from django.apps import apps
+from django.conf import settings
+from django.template import TemplateSyntaxError
+from django.template.loader import get_template
+
+logger = logging.getLogger(__name__)
+
+def get_app_template_names(app_label='task_time_tracker'):
+    """Return the name of every template in `templates/<app_label>`"""
+    templates_dir = os.path.join(apps.get_app_config(app_label).path, 'templates')
+    names = []
+    for dirpath, _, filenames in os.walk(os.path.join(templates_dir, app_label)):
+        for filename in filenames:
+            if filename.endswith('.html'):
+                path = os.path.relpath(os.path.join(dirpath, filename), templates_dir)
+                names.append(path.replace(os.sep, '/'))
+    return sorted(names)
+
+def warm_template_cache():
+    """
+    Compile the app's templates (and the django-tables2 table template)
+    so the cached template loader has them before the first request.
+    Returns the number of templates compiled.
+    """
+    compiled = 0
+    for name in get_app_template_names() + [settings.DJANGO_TABLES2_TEMPLATE]:
+        try:
+            get_template(name)
+        except TemplateSyntaxError:
+            logger.exception('Could not compile template %s', name)
+        else:
+            compiled += 1
+    return compiled
@@ -0,0 +1,149 @@
+"""
+Deleting tasks by moving them to the trash, so a delete can be undone.
+
+Trashing a task sets its `deleted_date` with one `UPDATE`, which hides it
+from `Task.objects`; its status changes stay where they are. Everything
+kept in step with the live tasks (project counters, cached plans, sync
+tombstones, live updates) is told through `task_trashed`, and through
+`task_restored` when it's taken back out. Restoring a task also restores
+the subtasks trashed along with it, and any trashed tasks above it, so a
+live task is never left under one in the trash.
+
+`purge_deleted_tasks` (run by `manage.py purge_deleted_tasks`) deletes
+tasks that have been in the trash for TASK_PURGE_AFTER_DAYS for good, with
+their status changes, a bounded batch per transaction.
+"""
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Exists, OuterRef
+from django.dispatch import Signal
+from django.utils import timezone
+
+from task_time_tracker.models import Task, TaskStatusChange, User
+from task_time_tracker.utils.project_counters import counters_suspended
+from task_time_tracker.utils.rollups import get_descendant_ids
+from task_time_tracker.utils.sync import sync_suspended, touch
+
+# Sent with `instance` for each task moved to the trash
+task_trashed = Signal()
+# Sent with `instance` and `created=True` for each task taken back out,
+# which is new to everything derived from the live tasks
+task_restored = Signal()
+
+def trash_task(task):
+    """Move `task` and its subtasks to the trash"""
+    deleted_date = timezone.now()
+    with transaction.atomic():
+        # No query for the subtasks of a task that has none
+        tasks = [task, *Task.objects.filter(pk__in=get_descendant_ids(Task, task.pk))]
+        Task.objects.filter(pk__in=[each.pk for each in tasks]).update(deleted_date=deleted_date)
+        for each in tasks:
+            each.deleted_date = deleted_date
+            task_trashed.send(sender=Task, instance=each)
+
+def get_trashed_ancestors(task):
+    """The trashed tasks above `task`, up to the first live one, locked"""
+    ancestors = []
+    parent_id = task.parent_id
+    while parent_id is not None:
+        parent = (Task.all_objects
+                      .select_for_update()
+                      .filter(pk=parent_id)
+                      .exclude(deleted_date=None)
+                      .first())
+        if parent is None:
+            break
+        ancestors.append(parent)
+        parent_id = parent.parent_id
+    return ancestors
+
+def restore_task(task):
+    """Take `task` back out of the trash, with the subtasks that were
+    trashed along with it and the trashed tasks above it"""
+    with transaction.atomic():
+        tasks = {
+            each.pk: each for each in (
+                Task.all_objects
+                    .select_for_update()
+                    .filter(pk__in=[task.pk, *get_descendant_ids(Task, task.pk)],
+                            deleted_date=task.deleted_date)
+                    .exclude(deleted_date=None)
+                    .order_by('pk')
+            )
+        }
+        if task.pk not in tasks:
+            return
+        tasks[task.pk] = task
+        for ancestor in get_trashed_ancestors(task):
+            tasks[ancestor.pk] = ancestor
+
+        change_seq = User.next_change_seq(task.user_id)
+        Task.all_objects.filter(pk__in=list(tasks)).update(
+            deleted_date=None, change_seq=change_seq)
+        for each in tasks.values():
+            each.deleted_date = None
+            each.change_seq = change_seq
+            task_restored.send(sender=Task, instance=each, created=True)
+
+def get_purge_cutoff(days=None):
+    """Return the datetime before which trashed tasks get purged"""
+    if days is None:
+        days = settings.TASK_PURGE_AFTER_DAYS
+    return timezone.now() - timedelta(days=days)
+
+def purge_deleted_tasks(cutoff, batch_size=None):
+    """
+    Delete tasks trashed before `cutoff`, and their status changes, for
+    good. Each transaction deletes at most `batch_size` status changes or
+    tasks, so a task with a long history never holds locks for long: a
+    batch of tasks stays locked (and can't be restored) only while its
+    status changes are deleted, then the tasks themselves go. Returns the
+    number of tasks purged.
+    """
+    if batch_size is None:
+        batch_size = settings.TASK_PURGE_BATCH_SIZE
+
+    purged_count = 0
+    while True:
+        with transaction.atomic():
+            tasks = list(
+                Task.all_objects
+                    .select_for_update()
+                    .filter(deleted_date__lt=cutoff)
+                    # Deleting a parent deletes its subtasks, so parents
+                    # wait until their trashed subtasks have been purged
+                    .exclude(Exists(Task.all_objects.filter(
+                        parent=OuterRef('pk'), deleted_date__isnull=False)))
+                    .order_by('pk')[:batch_size]
+            )
+            if not tasks:
+                break
+
+            status_change_ids = list(
+                TaskStatusChange.objects
+                    .filter(task__in=tasks)
+                    .values_list('pk', flat=True)[:batch_size]
+            )
+            if status_change_ids:
+                TaskStatusChange.objects.filter(pk__in=status_change_ids).delete()
+                continue
+
+            # Live subtasks (restored before their parent could be) are
+            # kept, as top-level tasks
+            live_subtasks = Task.objects.filter(parent__in=tasks)
+            for user_id in set(live_subtasks.values_list('user_id', flat=True)):
+                user_subtasks = Task.objects.filter(
+                    pk__in=list(live_subtasks.filter(user_id=user_id).values_list('pk', flat=True)))
+                user_subtasks.update(parent=None)
+                touch(user_subtasks, user_id)
+
+            # The project counters and tombstones were updated when the
+            # tasks were trashed
+            with counters_suspended(), sync_suspended({task.user_id for task in tasks}):
+                Task.all_objects.filter(pk__in=[task.pk for task in tasks]).delete()
+
+        purged_count += len(tasks)
+
+    return purged_count
@@ -0,0 +1,137 @@
+"""
+Expected vs. actual time of completed tasks over time, for the trends page.
+
+Tasks are grouped by when they were completed, in the user's time zone, into
+days, weeks (starting on Monday) or months. Both the `Task` and the
+`ArchivedTask` tables are read, in one grouped query.
+"""
+from datetime import datetime, time, timedelta
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Count, DateField, Sum
+from django.db.models.functions import TruncDay, TruncMonth, TruncWeek
+
+from task_time_tracker.models import ArchivedTask, Task
+from task_time_tracker.utils.cache_helpers import get_user_generation
+from task_time_tracker.utils.partitions import add_months
+
+BUCKETS = {
+    'day': TruncDay,
+    'week': TruncWeek,
+    'month': TruncMonth,
+}
+
+# What a bucket is downsampled to when a range has too many points
+COARSER_BUCKETS = {
+    'day': 'week',
+    'week': 'month',
+}
+
+def truncate_date(value, bucket):
+    """Return the first day of the bucket `value` falls in"""
+    if bucket == 'week':
+        return value - timedelta(days=value.weekday())
+    if bucket == 'month':
+        return value.replace(day=1)
+    return value
+
+def next_bucket(value, bucket):
+    if bucket == 'week':
+        return value + timedelta(weeks=1)
+    if bucket == 'month':
+        return add_months(value, 1)
+    return value + timedelta(days=1)
+
+def get_bucket_dates(start, end, bucket):
+    """Return the first day of every bucket from `start` through `end`"""
+    dates = []
+    value = truncate_date(start, bucket)
+    while value <= end:
+        dates.append(value)
+        value = next_bucket(value, bucket)
+    return dates
+
+def choose_bucket(start, end, bucket, max_points=None):
+    """Return `bucket`, or a coarser one if the range would have more than
+    `max_points` points"""
+    if max_points is None:
+        max_points = settings.TREND_MAX_POINTS
+    while (bucket in COARSER_BUCKETS
+           and len(get_bucket_dates(start, end, bucket)) > max_points):
+        bucket = COARSER_BUCKETS[bucket]
+    return bucket
+
+def get_trends_cache_key(user, start, end, bucket):
+    generation = get_user_generation(user.pk)
+    return (f'task_time_tracker:trends:{user.pk}:{generation}:'
+            f'{user.time_zone}:{start}:{end}:{bucket}')
+
+def _grouped(queryset, user, start_datetime, end_datetime, bucket, tzinfo):
+    return (queryset
+                .filter(
+                    user=user,
+                    completed_date__gte=start_datetime,
+                    completed_date__lt=end_datetime,
+                )
+                .annotate(bucket=BUCKETS[bucket](
+                    'completed_date', output_field=DateField(), tzinfo=tzinfo))
+                .values('bucket')
+                .annotate(
+                    expected_mins=Sum('expected_mins'),
+                    actual_mins=Sum('actual_mins'),
+                    completed_count=Count('id'),
+                )
+                .order_by()
+    )
+
+def get_trend_series(user, start, end, bucket='day'):
+    """
+    Return the expected minutes, actual minutes and number of tasks
+    completed per `bucket` from date `start` through date `end`, with a
+    point for every bucket in the range (empty ones are zero). The bucket
+    may be coarser than asked for; the one used is returned as `bucket`.
+    """
+    bucket = choose_bucket(start, end, bucket)
+    cache_key = get_trends_cache_key(user, start, end, bucket)
+    series = cache.get(cache_key)
+    if series is not None:
+        return series
+
+    tzinfo = user.get_time_zone()
+    start_datetime = datetime.combine(start, time.min, tzinfo=tzinfo)
+    end_datetime = datetime.combine(end + timedelta(days=1), time.min, tzinfo=tzinfo)
+
+    rows = (_grouped(Task.objects.filter(completed=True),
+                     user, start_datetime, end_datetime, bucket, tzinfo)
+                .union(_grouped(ArchivedTask.objects,
+                                user, start_datetime, end_datetime, bucket, tzinfo),
+                       all=True)
+    )
+
+    # A bucket can have a row from each table
+    totals = {}
+    for row in rows:
+        total = totals.setdefault(row['bucket'], [0, 0, 0])
+        total[0] += row['expected_mins'] or 0
+        total[1] += row['actual_mins'] or 0
+        total[2] += row['completed_count']
+
+    points = []
+    for date in get_bucket_dates(start, end, bucket):
+        expected_mins, actual_mins, completed_count = totals.get(date, (0, 0, 0))
+        points.append({
+            'date': date.isoformat(),
+            'expected_mins': expected_mins,
+            'actual_mins': actual_mins,
+            'completed_count': completed_count,
+        })
+
+    series = {
+        'start': start.isoformat(),
+        'end': end.isoformat(),
+        'bucket': bucket,
+        'points': points,
+    }
+    cache.set(cache_key, series, settings.TREND_CACHE_SECONDS)
+    return series
@@ -1,31 +1,48 @@
 from datetime import date, timedelta
 import logging
 
-from django.contrib.auth import views as auth_views
+from django.conf import settings
+from django.contrib import messages
+from django.contrib.auth import logout, views as auth_views
 from django.contrib.auth.decorators import login_required
 from django.contrib.auth.mixins import LoginRequiredMixin
 from django.contrib.messages.views import SuccessMessageMixin
 from django.db.models import Sum, Q
-from django.http import HttpResponse, HttpResponseRedirect
+from django.http import HttpResponse, HttpResponseRedirect, JsonResponse
 from django.template import loader
 from django.shortcuts import get_object_or_404, redirect, render
 from django.urls import reverse, reverse_lazy
 from django.utils import timezone
 from django.views import View
-from django.views.generic import ListView
+from django.views.decorators.http import require_POST
+from django.views.generic import ListView, TemplateView
 from django.views.generic.edit import CreateView, DeleteView, UpdateView
 
 from django_tables2 import SingleTableView, RequestConfig
 
+from .conditional import ConditionalPageMixin, conditional_page
 from .forms import (NewProjectForm,
                     NewTaskForm,
                     NewTaskPageForm,
                     EditTaskForm,
+                    RecurringTaskForm,
                     SitePasswordResetForm,
+                    TrendsForm,
                     SiteUserCreationForm)
-from .models import Project, Task, User
-from .tables import DashboardTaskTable, AllTaskTable, CompletedTaskTable
-from .utils.model_helpers import DashboardSummStats, format_time
+from .models import Project, RecurringTask, Task, User
+from .routers import ReplicaReadsMixin, replica_reads
+from .tables import DashboardTaskTable, AllTaskTable, CompletedTaskTable, ProjectTable
+from .utils.account_deletion import request_account_deletion
+from .utils.archive_helpers import get_completed_tasks
+from .utils import model_helpers
+from .utils.model_helpers import DashboardSummStats, format_time, is_todays_task
+from .utils.critical_path import get_user_critical_path
+from .utils.forecast import forecast_projects, forecast_todays_tasks
+from .utils.planner import get_user_plan
+from .utils.rollups import get_project_rollups
+from .utils.sync import InvalidToken, get_changes
+from .utils.trash import restore_task, trash_task
+from .utils.trends import get_trend_series
 
 logger = logging.getLogger(__name__)
 
@@ -34,13 +51,7 @@ def get_todays_tasks(request):
     Return active incomplete and complete tasks, excluding tasks that were
     completed before today.
     """
-    return (Task.objects
-                .filter(user=request.user)
-                .filter(
-                    Q(active=True) 
-                    | Q(completed_date__gt=timezone.now() - timedelta(days=1))
-                )
-    )
+    return model_helpers.get_todays_tasks(request.user)
 
 def get_active_tasks(request):
     """Return active tasks that have not been completed."""
@@ -50,7 +61,75 @@ def get_active_tasks(request):
                 .exclude(completed=True)
     )
 
+def is_fragment_request(request):
+    """Whether the dashboard script asked for fragments instead of a
+    redirect (see `render_task_fragments`)"""
+    return request.headers.get('X-Fragment') == 'true'
+
+def get_summ_stats_context(todays_tasks):
+    """Context for the `components/summ_stats.html` card, without the
+    outlook (see `get_outlook_context`)"""
+    summ_stats = DashboardSummStats(todays_tasks)
+
+    return {
+        'summ_stats_obj': summ_stats,
+        'initial_estimated_time': format_time(summ_stats.initial_estimated_time),
+        'current_estimated_time': format_time(summ_stats.current_estimated_time),
+        'actual_time': format_time(summ_stats.actual_time),
+        'unfinished_time': format_time(summ_stats.unfinished_time),
+    }
+
+def get_outlook_context(request):
+    """Context for the `components/outlook.html` part of the stats card.
+    Planning and forecasting read all of the user's open tasks, so the
+    fragments sent after each change leave it out and the dashboard
+    script loads it from `dashboard_outlook` instead."""
+    # When the active tasks should be done, given the user's daily capacity
+    plan = get_user_plan(request.user, get_active_tasks(request))
+
+    return {
+        'outlook_loaded': True,
+        'projected_finish': plan.finish_date,
+        # How long the open tasks will likely take, given how far off the
+        # user's estimates usually are
+        'forecast_times': [
+            (point.percentile, format_time(point.remaining_mins))
+            for point in forecast_todays_tasks(request.user)
+            if point.finish_date is not None
+        ],
+    }
+
+def render_task_fragments(request, task_id, task=None, message=None):
+    """
+    Respond to a change made from the dashboard with just the pieces of the
+    page it affects: the task's table row (`None` if it was deleted or no
+    longer belongs on the dashboard) and the summary stats card, plus an
+    optional `message` to show (HTML). The card's outlook is left for the
+    script to load.
+    """
+    row = None
+    if task is not None and is_todays_task(task):
+        row = loader.render_to_string(
+            'task_time_tracker/components/task_row.html',
+            {'table': DashboardTaskTable([task], request=request)},
+            request,
+        )
+    stats = loader.render_to_string(
+        'task_time_tracker/components/summ_stats.html',
+        get_summ_stats_context(get_todays_tasks(request)),
+        request,
+    )
+    return JsonResponse({'id': task_id, 'row': row, 'stats': stats, 'message': message})
+
+def render_form_fragment(request, template_name, context):
+    """Send an invalid form back to the dashboard script for redisplay"""
+    return JsonResponse(
+        {'form': loader.render_to_string(template_name, context, request)},
+        status=400,
+    )
+
 @login_required
+@conditional_page(refresh_hourly=True)
 def dashboard(request):
     """Dashboard page for the time tracker.
     Includes new tasks, active tasks w/edit,
@@ -62,53 +141,63 @@ def dashboard(request):
     # Set page title
     page_title = 'Dashboard'
 
-    # Read in task data, format table
-    todays_tasks = get_todays_tasks(request).order_by('completed', '-expected_mins')
-    dashboard_task_table = DashboardTaskTable(todays_tasks, request=request)
-    dashboard_task_table.paginate(
-        page=request.GET.get('page', 1),
-        per_page=10,
-    )
-
     # New task form
     if request.method == 'POST':
         new_task_form = NewTaskForm(data=request.POST)
         new_task_form.instance.user = request.user
         if new_task_form.is_valid():
-            new_task_form.save()
+            task = new_task_form.save()
+            if is_fragment_request(request):
+                return render_task_fragments(request, task.pk, task)
             reload_url = reverse('dashboard')
             return redirect(reload_url)
+        if is_fragment_request(request):
+            return render_form_fragment(
+                request,
+                'task_time_tracker/components/new_task_form.html',
+                {'new_task_form': new_task_form},
+            )
     else:
         new_task_form = NewTaskForm()
 
-    # Summary stats
-    summ_stats = DashboardSummStats(todays_tasks)
-
-    # initial_estimated_time = format_time(summ_stats.initial_estimated_time)
-    current_estimated_time = format_time(summ_stats.current_estimated_time)
-    actual_time = format_time(summ_stats.actual_time)
-    unfinished_time = format_time(summ_stats.unfinished_time)
-
+    # Read in task data, format table
+    todays_tasks = get_todays_tasks(request).order_by('completed', '-expected_mins')
+    dashboard_task_table = DashboardTaskTable(todays_tasks, request=request)
+    dashboard_task_table.paginate(
+        page=request.GET.get('page', 1),
+        per_page=10,
+    )
 
     # Assign variables
     context = {
         'page_title': page_title,
         'new_task_form': new_task_form,
         'active_task_table': dashboard_task_table,
-        'summ_stats_obj': summ_stats,
-        'initial_estimated_time': format_time(summ_stats.initial_estimated_time),
-        'current_estimated_time': current_estimated_time,
-        'actual_time': actual_time,
-        'unfinished_time': unfinished_time,
+        'live_updates_url': settings.LIVE_UPDATES_PATH,
+        **get_summ_stats_context(todays_tasks),
+        **get_outlook_context(request),
     }
     return render(request, template, context)
 
+@login_required
+def dashboard_outlook(request):
+    """The stats card's projected finish and forecast, for the dashboard
+    script to load after a change"""
+    return render(request, 'task_time_tracker/components/outlook.html',
+                  get_outlook_context(request))
+
 def all_tasks(request):
     all_task_list = Task.objects.all()
     output = ', '.join([task.task_name for task in all_task_list])
     return HttpResponse(output)
 
-class NewTaskView(LoginRequiredMixin, CreateView):
+class UserFormMixin:
+    """Passes the user to forms that limit their choices to the user's
+    own tasks or projects"""
+    def get_form_kwargs(self):
+        return {**super().get_form_kwargs(), 'user': self.request.user}
+
+class NewTaskView(LoginRequiredMixin, UserFormMixin, CreateView):
     model = Task
     form_class = NewTaskPageForm
     template_name = 'task_time_tracker/new-task.html'
@@ -122,7 +211,7 @@ class NewTaskView(LoginRequiredMixin, CreateView):
     def get_success_url(self):
         return reverse('dashboard')
 
-class NewProjectView(LoginRequiredMixin, CreateView):
+class NewProjectView(LoginRequiredMixin, UserFormMixin, CreateView):
     model = Project
     form_class = NewProjectForm
     template_name = 'task_time_tracker/new-project.html'
@@ -136,7 +225,21 @@ class NewProjectView(LoginRequiredMixin, CreateView):
     def get_success_url(self):
         return reverse('dashboard')
 
-class EditTaskView(LoginRequiredMixin, UpdateView):
+class NewRecurringTaskView(LoginRequiredMixin, CreateView):
+    model = RecurringTask
+    form_class = RecurringTaskForm
+    template_name = 'task_time_tracker/new-recurring-task.html'
+
+    extra_context = {'page_title': 'New Recurring Task'}
+
+    def form_valid(self, form):
+        form.instance.user = self.request.user
+        return super().form_valid(form)
+
+    def get_success_url(self):
+        return reverse('dashboard')
+
+class EditTaskView(LoginRequiredMixin, UserFormMixin, UpdateView):
     model = Task
     form_class = EditTaskForm
     template_name = 'task_time_tracker/edit_task.html'
@@ -144,17 +247,59 @@ class EditTaskView(LoginRequiredMixin, UpdateView):
 
     extra_context = {'page_title': 'Edit Task'}
 
+    def get_template_names(self):
+        """Just the form when the dashboard opens it inline"""
+        if is_fragment_request(self.request):
+            return ['task_time_tracker/components/edit_task_form.html']
+        return super().get_template_names()
+
     def form_valid(self, form):
         task = form.save(commit=False)
         task.save()
+        form.save_m2m()
+        if is_fragment_request(self.request):
+            return render_task_fragments(self.request, task.pk, task)
         return redirect('dashboard')
 
+    def form_invalid(self, form):
+        if is_fragment_request(self.request):
+            return render_form_fragment(
+                self.request,
+                'task_time_tracker/components/edit_task_form.html',
+                self.get_context_data(form=form),
+            )
+        return super().form_invalid(form)
+
 class DeleteTaskView(LoginRequiredMixin, DeleteView):
     model = Task
     success_url = reverse_lazy('dashboard')
     context_object_name = 'task'
 
-class ActiveTaskView(LoginRequiredMixin, SingleTableView):
+    def form_valid(self, form):
+        """Move the task to the trash, offering to undo it"""
+        trash_task(self.object)
+        undo_message = loader.render_to_string(
+            'task_time_tracker/components/undo_delete.html',
+            {'task': self.object},
+            self.request,
+        )
+        if is_fragment_request(self.request):
+            return render_task_fragments(self.request, self.object.pk, message=undo_message)
+        messages.success(self.request, undo_message)
+        return HttpResponseRedirect(self.get_success_url())
+
+@login_required
+@require_POST
+def undo_delete_task(request, pk):
+    """Take a task deleted from the dashboard back out of the trash"""
+    task = get_object_or_404(
+        Task.all_objects.exclude(deleted_date=None), pk=pk, user=request.user)
+    restore_task(task)
+    if is_fragment_request(request):
+        return render_task_fragments(request, task.pk, task)
+    return redirect('dashboard')
+
+class ActiveTaskView(LoginRequiredMixin, ConditionalPageMixin, SingleTableView):
     template_name = 'task_time_tracker/active-tasks.html'
     table_class = AllTaskTable
 
@@ -167,14 +312,100 @@ class ActiveTaskView(LoginRequiredMixin, SingleTableView):
             '-priority',
         )
 
-class CompletedTaskView(LoginRequiredMixin, SingleTableView):
+class CompletedTaskView(LoginRequiredMixin, ConditionalPageMixin, ReplicaReadsMixin, SingleTableView):
     template_name = 'task_time_tracker/completed_tasks.html'
     table_class = CompletedTaskTable
     extra_context = {'page_title': 'Completed Tasks'}
 
     def get_queryset(self):
-        return Task.objects.filter(user=self.request.user).filter(completed=True)
+        """Show completed tasks from both the live and archive tables"""
+        return get_completed_tasks(self.request.user)
+
+class ProjectsView(LoginRequiredMixin, SingleTableView):
+    template_name = 'task_time_tracker/projects.html'
+    table_class = ProjectTable
+    extra_context = {'page_title': 'Projects'}
 
+    def get_queryset(self):
+        """The totals are columns on `Project`, so this is one query with
+        no aggregation over the tasks"""
+        return (Project.objects
+                    .filter(user=self.request.user)
+                    .order_by('name'))
+
+    def get_table_kwargs(self):
+        """Totals over sub-projects, for all the user's project trees in
+        one query, and forecast finishes from the tasks' dependencies"""
+        root_ids = Project.objects.filter(
+            user=self.request.user, parent=None).values_list('pk', flat=True)
+        return {
+            'rollups': get_project_rollups(list(root_ids)),
+            'finish_dates': get_user_critical_path(self.request.user).get_project_finish_dates(),
+            'forecasts': forecast_projects(self.request.user),
+        }
+
+class PlanView(LoginRequiredMixin, TemplateView):
+    """Active tasks laid out over the coming days"""
+    template_name = 'task_time_tracker/plan.html'
+    extra_context = {'page_title': 'Plan'}
+
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        plan = get_user_plan(self.request.user, get_active_tasks(self.request))
+        context['plan'] = plan
+        context['plan_days'] = [
+            (day, format_time(day.planned_mins)) for day in plan.get_days()
+        ]
+        return context
+
+
+def get_trends_form(request):
+    today = timezone.localdate(timezone=request.user.get_time_zone())
+    return TrendsForm(data=request.GET, today=today)
+
+class TrendsView(LoginRequiredMixin, TemplateView):
+    """Chart of expected vs. actual time over a range of dates"""
+    template_name = 'task_time_tracker/trends.html'
+    extra_context = {'page_title': 'Trends'}
+
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        context['form'] = get_trends_form(self.request)
+        return context
+
+@login_required
+@replica_reads
+def trends_data(request):
+    """The series charted on the trends page, as JSON"""
+    form = get_trends_form(request)
+    if not form.is_valid():
+        return JsonResponse({'errors': form.errors}, status=400)
+
+    series = get_trend_series(
+        request.user,
+        form.cleaned_data['start'],
+        form.cleaned_data['end'],
+        form.cleaned_data['bucket'],
+    )
+    return JsonResponse(series)
+
+@login_required
+def sync(request):
+    """
+    The user's tasks and projects changed since the `token` of the last
+    response, at most `limit` at a time, as JSON (see `utils.sync`).
+    Without a token, everything is sent.
+    """
+    try:
+        limit = int(request.GET.get('limit', settings.SYNC_PAGE_SIZE))
+    except ValueError:
+        return JsonResponse({'errors': {'limit': ['Enter a whole number.']}}, status=400)
+    try:
+        changes = get_changes(request.user, request.GET.get('token'),
+                              min(max(limit, 1), settings.SYNC_PAGE_SIZE))
+    except InvalidToken as error:
+        return JsonResponse({'errors': {'token': [str(error)]}}, status=400)
+    return JsonResponse(changes)
 
 # Authentication Views
 
@@ -214,4 +445,16 @@ class SignupView(SuccessMessageMixin, CreateView):
     success_url = reverse_lazy('login')
     success_message = 'Your profile was created successfully'
 
-    extra_context = {'page_title': 'Sign Up'}
\ No newline at end of file
+    extra_context = {'page_title': 'Sign Up'}
+
+class DeleteAccountView(LoginRequiredMixin, TemplateView):
+    """Deactivate the user's account and log them out. Their data is
+    deleted in the background by `manage.py delete_accounts`."""
+    template_name = 'task_time_tracker/delete_account.html'
+    extra_context = {'page_title': 'Delete Your Account'}
+
+    def post(self, request, *args, **kwargs):
+        request_account_deletion(request.user)
+        logout(request)
+        messages.success(request, 'Your account was deleted')
+        return redirect('login')
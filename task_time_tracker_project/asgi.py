@@ -13,4 +13,16 @@ from django.core.asgi import get_asgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'task_time_tracker_project.settings.development')
 
-application = get_asgi_application()
+django_application = get_asgi_application()
+
+# Imported once Django is set up. Serves the live dashboard updates stream
+# and hands everything else to Django.
+from django.conf import settings  # noqa: E402
+
+from task_time_tracker.live import LiveUpdatesApp  # noqa: E402
+from task_time_tracker.utils.template_helpers import warm_template_cache  # noqa: E402
+
+application = LiveUpdatesApp(django_application)
+
+if settings.TEMPLATE_WARM_UP:
+    warm_template_cache()
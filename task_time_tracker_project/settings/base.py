@@ -1,4 +1,5 @@
 import os
+import tempfile
 
 from dotenv import load_dotenv
 load_dotenv()
@@ -22,11 +23,15 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'task_time_tracker.metrics.MetricsMiddleware',
     'django.middleware.security.SecurityMiddleware',
+    'task_time_tracker.middleware.CompressionMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
+    'task_time_tracker.middleware.ReplicaMiddleware',
+    'task_time_tracker.middleware.SlowQueryMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
@@ -35,7 +40,8 @@ ROOT_URLCONF = 'task_time_tracker_project.urls'
 
 TEMPLATES = [
     {
-        'BACKEND': 'django.template.backends.django.DjangoTemplates',
+        # Django's backend, timing renders for /metrics
+        'BACKEND': 'task_time_tracker.metrics.DjangoTemplates',
         'DIRS': [],
         'APP_DIRS': True,
         'OPTIONS': {
@@ -44,6 +50,7 @@ TEMPLATES = [
                 'django.template.context_processors.request',
                 'django.contrib.auth.context_processors.auth',
                 'django.contrib.messages.context_processors.messages',
+                'task_time_tracker.context_processors.navigation',
             ],
         },
     },
@@ -62,6 +69,13 @@ DATABASES = {
     }
 }
 
+# Reads for read-only views and commands (see `task_time_tracker/routers.py`)
+# go to the REPLICA_DATABASE alias when it is set, except for
+# REPLICA_STICKY_SECONDS after a user's own writes, so they always see them.
+DATABASE_ROUTERS = ['task_time_tracker.routers.ReplicaRouter']
+REPLICA_DATABASE = None
+REPLICA_STICKY_SECONDS = 10
+
 AUTH_USER_MODEL = 'task_time_tracker.User'
 
 LOGIN_REDIRECT_URL = '/'
@@ -92,6 +106,62 @@ USE_L10N = True
 
 USE_TZ = True
 
+# Compile every app template when a worker boots (`warm_template_cache`)
+TEMPLATE_WARM_UP = False
+
+# Day plans, critical paths and the generations that expire cached
+# forecasts and trends are kept in the cache and must be shared by every
+# process (`utils.cache_helpers`). The in-memory default is only shared
+# within one process, which is enough for development and tests;
+# production uses Redis.
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    },
+}
+
+# How long the navigation sidebar in base_layout.html is cached
+NAV_CACHE_SECONDS = 60 * 60
+
+# Metrics (`task_time_tracker/metrics.py`) are served at /metrics. If
+# METRICS_TOKEN is set, scrapers must send it as a bearer token. Without
+# one they're only served when DEBUG is on.
+METRICS_TOKEN = os.getenv('METRICS_TOKEN')
+
+# Slow-query log (`task_time_tracker/slow_queries.py`). Queries slower than
+# SLOW_QUERY_THRESHOLD_MS (None turns this off) are logged to
+# SLOW_QUERY_LOG_FILE and saved for the admin from a background thread. On
+# Postgres, SLOW_QUERY_EXPLAIN_RATE of slow SELECTs are also EXPLAINed.
+SLOW_QUERY_THRESHOLD_MS = 200
+SLOW_QUERY_EXPLAIN_RATE = 0.1
+SLOW_QUERY_EXPLAIN_TIMEOUT_MS = 5000
+SLOW_QUERY_MAX_PENDING = 100
+SLOW_QUERY_ALWAYS_EAGER = False
+SLOW_QUERY_LOG_FILE = os.getenv(
+    'SLOW_QUERY_LOG_FILE',
+    os.path.join(tempfile.gettempdir(), 'task_time_tracker_slow_queries.log'),
+)
+
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'handlers': {
+        'slow_queries': {
+            'class': 'logging.handlers.RotatingFileHandler',
+            'filename': SLOW_QUERY_LOG_FILE,
+            'maxBytes': 10 * 1024 * 1024,
+            'backupCount': 5,
+            'delay': True,
+        },
+    },
+    'loggers': {
+        'task_time_tracker.slow_queries': {
+            'handlers': ['slow_queries'],
+            'level': 'WARNING',
+        },
+    },
+}
+
 # Static files settings
 STATIC_URL = '/static/'
 STATIC_ROOT = os.path.join(BASE_DIR, 'staticfiles')
@@ -104,4 +174,102 @@ CRISPY_TEMPLATE_PACK = 'bootstrap4'
 DJANGO_TABLES2_TEMPLATE = 'django_tables2/bootstrap-responsive.html'
 
 # Email backend for development. Have to replace for production
-EMAIL_BACKEND = 'django.core.mail.backends.console.EmailBackend'
\ No newline at end of file
+EMAIL_BACKEND = 'django.core.mail.backends.console.EmailBackend'
+
+# Completed tasks older than this are moved to the archive tables by
+# `manage.py archive_tasks`
+TASK_ARCHIVE_AFTER_DAYS = 90
+TASK_ARCHIVE_BATCH_SIZE = 500
+
+# Deleted tasks stay in the trash, where a delete can be undone, for this
+# long before `manage.py purge_deleted_tasks` deletes them for good
+TASK_PURGE_AFTER_DAYS = 30
+TASK_PURGE_BATCH_SIZE = 500
+
+# Deleted accounts are removed by `manage.py delete_accounts` this many
+# rows per transaction, and at most this many rows a second (None or 0
+# for no limit) so a heavy user doesn't load the primary
+ACCOUNT_DELETION_BATCH_SIZE = 500
+ACCOUNT_DELETION_ROWS_PER_SECOND = 2000
+
+# TaskStatusChange partitioning on Postgres (`manage.py manage_partitions`).
+# A retention of None keeps every partition.
+TASK_STATUS_CHANGE_PARTITIONS_AHEAD = 3
+TASK_STATUS_CHANGE_RETENTION_MONTHS = None
+
+# Background jobs (`task_time_tracker/jobs.py`, run by `manage.py run_jobs`).
+# Set JOB_QUEUE_BROKER to 'redis' to keep the queue in Redis instead of
+# the database.
+JOB_QUEUE_BROKER = os.getenv('JOB_QUEUE_BROKER', 'database')
+JOB_QUEUE_REDIS_URL = os.getenv('REDIS_URL', 'redis://localhost:6379/0')
+JOB_QUEUE_ALWAYS_EAGER = False
+JOB_QUEUE_MAX_ATTEMPTS = 5
+JOB_QUEUE_RETRY_BASE_DELAY = 30
+JOB_QUEUE_RETRY_MAX_DELAY = 60 * 60
+JOB_QUEUE_LEASE_SECONDS = 5 * 60
+JOB_QUEUE_POLL_INTERVAL = 1
+
+# Emails are sent from the job worker, but still don't let a slow SMTP
+# server hang it indefinitely
+EMAIL_TIMEOUT = 30
+
+# Recurring tasks (`manage.py generate_recurring_tasks`). Only the most
+# recent RECURRING_TASK_MAX_CATCH_UP missed occurrences are created.
+RECURRING_TASK_BATCH_SIZE = 1000
+RECURRING_TASK_MAX_CATCH_UP = 1
+
+# Live dashboard updates (`task_time_tracker/live.py`), streamed from
+# LIVE_UPDATES_PATH when running under ASGI. Set LIVE_UPDATES_BROKER to
+# 'redis' when there is more than one web process (production always does).
+LIVE_UPDATES_PATH = '/live/'
+LIVE_UPDATES_BROKER = os.getenv('LIVE_UPDATES_BROKER', 'memory')
+LIVE_UPDATES_REDIS_URL = os.getenv('REDIS_URL', 'redis://localhost:6379/0')
+LIVE_UPDATES_QUEUE_SIZE = 100
+LIVE_UPDATES_KEEPALIVE_SECONDS = 20
+LIVE_UPDATES_RETRY_MS = 5000
+
+# Trends page (`utils/trends.py`). Ranges that would have more points than
+# TREND_MAX_POINTS are grouped by week or month instead of day.
+TREND_MAX_POINTS = 400
+TREND_CACHE_SECONDS = 60 * 60 * 24
+
+# Completion forecasts (`utils/forecast.py`), sampled from the ratio of
+# actual to expected time of the user's last FORECAST_HISTORY_SIZE
+# completed tasks. Users with fewer than FORECAST_MIN_HISTORY get their
+# estimates taken at face value.
+FORECAST_TRIALS = 10_000
+FORECAST_HISTORY_SIZE = 500
+FORECAST_MIN_HISTORY = 10
+FORECAST_CACHE_SECONDS = 60 * 60 * 24
+
+# Conditional responses for the task pages (`task_time_tracker/
+# conditional.py`). Pages cached by browsers are revalidated against
+# PAGE_CACHE_VERSION too, so a release (which may change the templates)
+# renders them again.
+PAGE_CACHE_VERSION = os.getenv('HEROKU_RELEASE_VERSION', '')
+
+# Compression of dynamic responses (`task_time_tracker/compression.py`),
+# with brotli if it's installed and gzip otherwise. Bodies smaller than
+# COMPRESSION_MIN_BYTES aren't worth the CPU or the headers.
+COMPRESSION_MIN_BYTES = 860
+COMPRESSION_BROTLI_QUALITY = 5
+COMPRESSION_GZIP_LEVEL = 6
+COMPRESSION_CONTENT_TYPES = (
+    'text/html',
+    'text/plain',
+    'text/css',
+    'text/csv',
+    'text/javascript',
+    'application/javascript',
+    'application/json',
+    'application/xml',
+    'image/svg+xml',
+)
+
+# Delta sync for offline clients (`utils/sync.py`, served at /sync/). Pages
+# hold at most SYNC_PAGE_SIZE changed rows.
+SYNC_PAGE_SIZE = 500
+
+# Admin changelists count rows exactly up to ADMIN_EXACT_COUNT_LIMIT, and
+# past that show Postgres's estimate (`admin.EstimatedCountPaginator`).
+ADMIN_EXACT_COUNT_LIMIT = 10_000
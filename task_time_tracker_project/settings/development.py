@@ -4,4 +4,20 @@ DEBUG = True
 
 ALLOWED_HOSTS = [
     '127.0.0.1',
-]
\ No newline at end of file
+]
+
+# Run background jobs inline so no worker is needed locally
+JOB_QUEUE_ALWAYS_EAGER = True
+
+# Don't record slow queries. Tests would otherwise depend on how fast the
+# machine running them is, and records saved from the background thread
+# are committed outside the test's transaction.
+SLOW_QUERY_THRESHOLD_MS = None
+
+# A second connection to the local database stands in for a read replica;
+# set REPLICA_DATABASE = 'replica' to route to it. Tests get a separate
+# database for it, so they can tell which one a read went to.
+DATABASES['replica'] = {
+    **DATABASES['default'],
+    'TEST': {'NAME': f"test_{DATABASES['default']['NAME']}_replica"},
+}
@@ -1,4 +1,7 @@
+import os
+
 import dj_database_url
+from django.core.exceptions import ImproperlyConfigured
 
 from .base import *
 
@@ -16,5 +19,47 @@ MIDDLEWARE += [
     'whitenoise.middleware.WhiteNoiseMiddleware',
 ]
 
+# `collectstatic` writes gzip (and, with brotli installed, brotli) copies
+# of the static files, which WhiteNoise serves to clients that accept them
+STATICFILES_STORAGE = 'whitenoise.storage.CompressedStaticFilesStorage'
+
+# Templates are compiled once per process and kept in memory, and all of
+# the app's templates are compiled when a worker boots (see wsgi.py/asgi.py)
+TEMPLATES[0]['APP_DIRS'] = False
+TEMPLATES[0]['OPTIONS']['loaders'] = [
+    ('django.template.loaders.cached.Loader', [
+        'django.template.loaders.filesystem.Loader',
+        'django.template.loaders.app_directories.Loader',
+    ]),
+]
+TEMPLATE_WARM_UP = True
+
 db_from_env = dj_database_url.config(conn_max_age=500)
-DATABASES['default'].update(db_from_env)
\ No newline at end of file
+DATABASES['default'].update(db_from_env)
+
+# A follower database for reports and exports, if there is one
+if os.getenv('REPLICA_DATABASE_URL'):
+    DATABASES['replica'] = dj_database_url.parse(
+        os.getenv('REPLICA_DATABASE_URL'),
+        conn_max_age=500,
+    )
+    REPLICA_DATABASE = 'replica'
+
+# /metrics shows every URL's traffic, so it isn't served without a token
+if not METRICS_TOKEN:
+    raise ImproperlyConfigured('METRICS_TOKEN must be set in production')
+
+# Web workers, job workers and scheduled commands all change and read the
+# same cached state, so they need a cache they share
+if not os.getenv('REDIS_URL'):
+    raise ImproperlyConfigured('REDIS_URL must be set in production')
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+        'LOCATION': os.getenv('REDIS_URL'),
+    },
+}
+
+# Every web process has to see every change for the live dashboard, and
+# in-memory fan out only reaches the process that made it
+LIVE_UPDATES_BROKER = 'redis'
@@ -1,7 +1,10 @@
 from django.contrib import admin
 from django.urls import include, path
 
+from task_time_tracker.metrics import metrics_view
+
 urlpatterns = [
     path('admin/', admin.site.urls),
+    path('metrics', metrics_view, name='metrics'),
     path('', include('task_time_tracker.urls')),
 ]
@@ -14,4 +14,11 @@ from whitenoise import WhiteNoise
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'task_time_tracker_project.settings.development')
 
-application = WhiteNoise(get_wsgi_application())
\ No newline at end of file
+application = WhiteNoise(get_wsgi_application())
+
+from django.conf import settings  # noqa: E402
+
+from task_time_tracker.utils.template_helpers import warm_template_cache  # noqa: E402
+
+if settings.TEMPLATE_WARM_UP:
+    warm_template_cache()
\ No newline at end of file